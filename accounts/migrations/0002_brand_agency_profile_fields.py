@@ -0,0 +1,127 @@
+# Generated by Django 4.2.23 on 2026-10-19 17:25
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='customuser',
+            name='bio',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='is_verified',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='profile_image',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='website',
+        ),
+        migrations.AddField(
+            model_name='agency',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='agency',
+            name='stripe_account_id',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='agency',
+            name='stripe_onboarding_completed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='brand',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='brand',
+            name='shopify_access_token',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='brand',
+            name='shopify_connected',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='brand',
+            name='shopify_domain',
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='brand',
+            name='stripe_customer_id',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AlterField(
+            model_name='agency',
+            name='certifications',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AlterField(
+            model_name='agency',
+            name='competitiveness_score',
+            field=models.IntegerField(default=50),
+        ),
+        migrations.AlterField(
+            model_name='agency',
+            name='team_size',
+            field=models.IntegerField(),
+        ),
+        migrations.AlterField(
+            model_name='agency',
+            name='total_campaigns',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='agency',
+            name='years_experience',
+            field=models.IntegerField(),
+        ),
+        migrations.AlterField(
+            model_name='brand',
+            name='annual_ad_spend',
+            field=models.DecimalField(decimal_places=2, max_digits=12),
+        ),
+        migrations.AlterField(
+            model_name='brand',
+            name='company_size',
+            field=models.CharField(max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='brand',
+            name='industry',
+            field=models.CharField(max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='brand',
+            name='target_demographics',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='customuser',
+            name='company_name',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
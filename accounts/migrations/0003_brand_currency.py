@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-19 17:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_brand_agency_profile_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='brand',
+            name='currency',
+            field=models.CharField(default='DKK', max_length=3),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.23 on 2026-10-19 17:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_brand_currency'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='agency',
+            index=models.Index(fields=['-competitiveness_score', 'id'], name='accounts_ag_competi_95f78b_idx'),
+        ),
+    ]
@@ -33,6 +33,9 @@ class Brand(models.Model):
     # Platform fees and payments
     stripe_customer_id = models.CharField(max_length=255, blank=True)
     
+    # Orders are reported in this currency (ISO 4217)
+    currency = models.CharField(max_length=3, default='DKK')
+    
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
@@ -60,5 +63,11 @@ class Agency(models.Model):
     stripe_account_id = models.CharField(max_length=255, blank=True)
     stripe_onboarding_completed = models.BooleanField(default=False)
     
+    class Meta:
+        indexes = [
+            # Marketplace ranking (scores are kept current by campaigns.scoring)
+            models.Index(fields=['-competitiveness_score', 'id']),
+        ]
+    
     def __str__(self):
         return f"{self.user.company_name} - {self.specializations}"
@@ -0,0 +1,172 @@
+# attribution/dedupe.py - Duplicate journey event filtering
+
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter sized for a capacity and false-positive rate"""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def __contains__(self, key):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    def add(self, key):
+        for p in self._positions(key):
+            self.bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def clear(self):
+        self.bits = bytearray(len(self.bits))
+        self.count = 0
+
+
+class RotatingBloomFilter:
+    """Two time-bucketed Bloom filters: the current window and the previous one.
+
+    Keys are remembered for one to two windows, after which the older filter
+    is recycled, so memory stays at two filters no matter how long the
+    process runs.
+    """
+
+    def __init__(self, capacity, error_rate, window_seconds):
+        self.window_seconds = window_seconds
+        self.current = BloomFilter(capacity, error_rate)
+        self.previous = BloomFilter(capacity, error_rate)
+        self.window = None
+
+    def _rotate(self, now):
+        window = int(now // self.window_seconds)
+        if self.window is None:
+            self.window = window
+        elif window == self.window + 1:
+            self.previous, self.current = self.current, self.previous
+            self.current.clear()
+            self.window = window
+        elif window != self.window:
+            self.previous.clear()
+            self.current.clear()
+            self.window = window
+
+    def contains(self, key, now):
+        self._rotate(now)
+        return key in self.current or key in self.previous
+
+    def add(self, key, now):
+        self._rotate(now)
+        self.current.add(key)
+
+    @property
+    def memory_bytes(self):
+        return len(self.current.bits) + len(self.previous.bits)
+
+
+class JourneyDeduplicator:
+    """Drop repeated pixel beacons before they become CustomerJourney rows.
+
+    Ordinary events are keyed on (session_id, event_type, page_url, coarse
+    timestamp) and dropped on a Bloom filter hit; the configured error rate
+    is the share of genuine events that may be discarded. CONVERSION events
+    and anything carrying an order_id are keyed on the order instead and a
+    Bloom hit is confirmed exactly, so a false positive never loses a sale.
+    """
+
+    def __init__(self, capacity=None, error_rate=None, window_seconds=None,
+                 coarse_seconds=None, exact_cache_size=None):
+        self.coarse_seconds = coarse_seconds or getattr(settings, 'JOURNEY_DEDUPE_COARSE_SECONDS', 10)
+        self.exact_cache_size = exact_cache_size or getattr(settings, 'JOURNEY_DEDUPE_EXACT_CACHE_SIZE', 50000)
+        self.bloom = RotatingBloomFilter(
+            capacity or getattr(settings, 'JOURNEY_DEDUPE_CAPACITY', 1000000),
+            error_rate or getattr(settings, 'JOURNEY_DEDUPE_ERROR_RATE', 0.001),
+            window_seconds or getattr(settings, 'JOURNEY_DEDUPE_WINDOW_SECONDS', 3600),
+        )
+        self._recent_exact = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def needs_exact_check(event_type, order_id=''):
+        return event_type == 'CONVERSION' or bool(order_id)
+
+    def _key(self, session_id, event_type, page_url, order_id, event_time, now):
+        """Filter key of an event and, for ordinary events, the previous bucket's key"""
+        if self.needs_exact_check(event_type, order_id):
+            return f'{session_id}|{event_type}|{order_id or page_url}', None
+        bucket = int((now if event_time is None else event_time) // self.coarse_seconds)
+        base = f'{session_id}|{event_type}|{page_url}|'
+        return base + str(bucket), base + str(bucket - 1)
+
+    def is_duplicate(self, session_id, event_type, page_url, order_id='', event_time=None, now=None):
+        """Return True if the event was already recorded.
+
+        ``event_time`` is the epoch time the pixel stamped on the event. A
+        retry carries the same stamp however late it arrives, so the coarse
+        bucket is taken from it and server time is only the fallback.
+
+        Only checks: call ``record`` once the event has been queued or
+        written, so a beacon that was rejected (queue full, failed write)
+        is not dropped as a duplicate when the pixel retries it.
+
+        May run one indexed query for conversion events, so call it through
+        ``sync_to_async`` from async views when ``needs_exact_check`` is true.
+        """
+
+        now = time.time() if now is None else now
+        key, previous = self._key(session_id, event_type, page_url, order_id, event_time, now)
+
+        with self._lock:
+            if previous is not None:
+                # Also look at the previous bucket so a retry that straddles
+                # a bucket boundary is still caught.
+                return self.bloom.contains(key, now) or self.bloom.contains(previous, now)
+            maybe_seen = self.bloom.contains(key, now)
+            if maybe_seen and key in self._recent_exact:
+                self._recent_exact.move_to_end(key)
+                return True
+
+        return maybe_seen and self._exists(session_id, event_type, page_url, order_id)
+
+    def record(self, session_id, event_type, page_url, order_id='', event_time=None, now=None):
+        """Remember an accepted event, so later copies are duplicates"""
+
+        now = time.time() if now is None else now
+        key, previous = self._key(session_id, event_type, page_url, order_id, event_time, now)
+        with self._lock:
+            self.bloom.add(key, now)
+            if previous is None:
+                self._remember(key)
+
+    def _remember(self, key):
+        self._recent_exact[key] = True
+        if len(self._recent_exact) > self.exact_cache_size:
+            self._recent_exact.popitem(last=False)
+
+    def _exists(self, session_id, event_type, page_url, order_id):
+        from .models import CustomerJourney
+
+        events = CustomerJourney.objects.filter(session_id=session_id, event_type=event_type)
+        if order_id:
+            events = events.filter(order_id=order_id)
+        else:
+            events = events.filter(page_url=page_url)
+        return events.exists()
+
+
+journey_deduplicator = JourneyDeduplicator()
@@ -0,0 +1,222 @@
+# attribution/ingestion.py - Async journey event ingestion
+
+import asyncio
+import atexit
+import logging
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+JOURNEY_EVENT_TYPES = {
+    'IMPRESSION', 'CLICK', 'VIEW', 'CONVERSION', 'EMAIL_OPEN', 'EMAIL_CLICK',
+}
+UTM_KEYS = ['utm_source', 'utm_medium', 'utm_campaign', 'utm_content', 'utm_term']
+
+
+class InvalidJourneyEvent(ValueError):
+    """Raised when a beacon payload cannot be turned into a journey event"""
+
+
+def parse_event_time(value):
+    """Epoch seconds from the pixel's ``timestamp``: ISO 8601 or epoch milliseconds"""
+
+    if value in (None, ''):
+        return None
+    if isinstance(value, bool):
+        raise InvalidJourneyEvent('invalid timestamp')
+    if isinstance(value, (int, float)):
+        # Date.now() is in milliseconds
+        return value / 1000 if value > 1e11 else float(value)
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        raise InvalidJourneyEvent('invalid timestamp')
+
+
+def parse_journey_event(data, meta):
+    """Validate a pixel payload and return CustomerJourney field values.
+
+    Runs without touching the database so it is safe to call on the event
+    loop. The campaign is kept as a raw ``campaign_id`` and resolved by the
+    writer in bulk; ``sent_at`` is the client's timestamp, used for
+    deduplication only.
+    """
+
+    if not isinstance(data, dict):
+        raise InvalidJourneyEvent('payload must be a JSON object')
+
+    session_id = data.get('session_id')
+    event_type = data.get('event_type')
+
+    if not session_id or not event_type:
+        raise InvalidJourneyEvent('missing_data')
+    if not isinstance(session_id, str) or len(session_id) > 255:
+        raise InvalidJourneyEvent('invalid session_id')
+    if event_type not in JOURNEY_EVENT_TYPES:
+        raise InvalidJourneyEvent('invalid event_type')
+
+    campaign_id = data.get('campaign_id')
+    if campaign_id in (None, ''):
+        campaign_id = None
+    else:
+        try:
+            campaign_id = int(campaign_id)
+        except (TypeError, ValueError):
+            raise InvalidJourneyEvent('invalid campaign_id')
+
+    conversion_value = data.get('conversion_value')
+    if conversion_value in (None, ''):
+        conversion_value = None
+    else:
+        try:
+            conversion_value = round(float(conversion_value), 2)
+        except (TypeError, ValueError):
+            raise InvalidJourneyEvent('invalid conversion_value')
+
+    utm_data = data.get('utm_data') or {}
+    if not isinstance(utm_data, dict):
+        raise InvalidJourneyEvent('invalid utm_data')
+
+    event = {
+        'session_id': session_id,
+        'event_type': event_type,
+        'campaign_id': campaign_id,
+        'page_url': str(data.get('page_url') or '')[:200],
+        'referrer_url': str(data.get('referrer_url') or '')[:200],
+        'ip_address': meta.get('REMOTE_ADDR') or '0.0.0.0',
+        'user_agent': meta.get('HTTP_USER_AGENT', ''),
+        'conversion_value': conversion_value,
+        'order_id': str(data.get('order_id') or '')[:255],
+        'user_agent_hash': str(data.get('user_agent_hash') or '')[:64],
+        'customer_email': data.get('customer_email') or None,
+        'sent_at': parse_event_time(data.get('timestamp')),
+    }
+    for key in UTM_KEYS:
+        event[key] = str(utm_data.get(key) or '')[:100]
+
+    return event
+
+
+def write_journey_events(events):
+    """Persist parsed journey events with one campaign lookup and one INSERT"""
+    from campaigns.models import Campaign
+    from .models import CustomerJourney
+
+    campaign_ids = {e['campaign_id'] for e in events if e['campaign_id']}
+    active = dict(
+        Campaign.objects.filter(id__in=campaign_ids, status='ACTIVE')
+        .values_list('id', 'selected_agency_id')
+    ) if campaign_ids else {}
+
+    rows = []
+    for event in events:
+        fields = dict(event)
+        fields.pop('sent_at', None)
+        campaign_id = fields.pop('campaign_id')
+        if campaign_id in active:
+            fields['campaign_id'] = campaign_id
+            fields['agency_id'] = active[campaign_id]
+        rows.append(CustomerJourney(**fields))
+
+    return CustomerJourney.objects.bulk_create(rows, batch_size=len(rows) or None)
+
+
+class JourneyIngestQueue:
+    """Bounded asyncio queue drained by a single database writer task.
+
+    Beacon requests only parse and enqueue, so one ASGI process can hold
+    thousands of open keepalive connections while inserts happen in batches
+    on a single thread.
+    """
+
+    def __init__(self, maxsize=None, batch_size=None, flush_interval=None):
+        self.maxsize = maxsize or getattr(settings, 'JOURNEY_INGEST_QUEUE_SIZE', 10000)
+        self.batch_size = batch_size or getattr(settings, 'JOURNEY_INGEST_BATCH_SIZE', 500)
+        self.flush_interval = flush_interval or getattr(settings, 'JOURNEY_INGEST_FLUSH_INTERVAL', 0.5)
+        self._queue = None
+        self._loop = None
+        self._writer = None
+        # Events taken off the queue but not yet handed to the database
+        self._batch = []
+
+    def _ensure_writer(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # New event loop (first request, or a dev server that spins up a
+            # loop per request): rebind the queue and writer to it.
+            self._queue = asyncio.Queue(maxsize=self.maxsize)
+            self._loop = loop
+            self._writer = None
+        if self._writer is None or self._writer.done():
+            self._writer = loop.create_task(self._drain())
+
+    def put_nowait(self, event):
+        """Enqueue an event; raises asyncio.QueueFull when the writer lags"""
+        self._ensure_writer()
+        self._queue.put_nowait(event)
+
+    async def _drain(self):
+        write = sync_to_async(write_journey_events, thread_sensitive=True)
+        while True:
+            self._batch = batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self._batch = []
+            try:
+                await write(batch)
+            except Exception:
+                logger.exception('Failed to write %d journey events', len(batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def join(self):
+        """Wait until every queued event has been written"""
+        if self._queue is not None and self._loop is asyncio.get_running_loop():
+            await self._queue.join()
+
+    async def aclose(self):
+        """Write everything queued, then stop the writer (ASGI lifespan shutdown)"""
+        if self._queue is None or self._loop is not asyncio.get_running_loop():
+            return
+        await self._queue.join()
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+
+    def flush(self):
+        """Synchronously write events still sitting in the queue.
+
+        Registered with atexit for servers that stop the event loop without
+        a lifespan shutdown; this includes a batch the writer was still
+        collecting when the loop stopped.
+        """
+        if self._queue is None:
+            return 0
+        batch, self._batch = self._batch, []
+        while not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        for start in range(0, len(batch), self.batch_size):
+            try:
+                write_journey_events(batch[start:start + self.batch_size])
+            except Exception:
+                logger.exception('Failed to flush %d journey events', len(batch) - start)
+                break
+        return len(batch)
+
+    def qsize(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+
+journey_queue = JourneyIngestQueue()
+atexit.register(journey_queue.flush)
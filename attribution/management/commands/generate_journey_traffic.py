@@ -0,0 +1,346 @@
+# attribution/management/commands/generate_journey_traffic.py
+
+import base64
+import hashlib
+import hmac
+import json
+import random
+import threading
+import time
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Agency, Brand
+from attribution.models import CustomerJourney
+from campaigns.models import Campaign
+
+User = get_user_model()
+
+# Relative frequency of touchpoints inside a session (before any conversion)
+EVENT_MIX = [('IMPRESSION', 0.35), ('CLICK', 0.20), ('VIEW', 0.45)]
+SOURCES = [
+    ('facebook', 'social', 'https://www.facebook.com/'),
+    ('google', 'cpc', 'https://www.google.com/'),
+    ('tiktok', 'paid', 'https://www.tiktok.com/'),
+]
+USER_AGENTS = [
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 Mobile/15E148',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/124.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 14_4) AppleWebKit/605.1.15 Version/17.4 Safari/605.1.15',
+]
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic customer journey traffic (and matching Shopify orders) for load tests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sessions', type=int, default=10000, help='Number of visitor sessions to synthesize')
+        parser.add_argument('--brands', type=int, default=3, help='Load-test brands to create or reuse')
+        parser.add_argument('--agencies-per-brand', type=int, default=3, help='Active campaigns (one agency each) per brand')
+        parser.add_argument('--conversion-rate', type=float, default=0.03, help='Share of sessions ending in a purchase')
+        parser.add_argument('--session-alpha', type=float, default=1.6, help='Pareto exponent for session length (lower = heavier tail)')
+        parser.add_argument('--max-session-events', type=int, default=200)
+        parser.add_argument('--days', type=int, default=30, help='Spread sessions over this many past days')
+        parser.add_argument('--mode', choices=['db', 'http'], default='db',
+                            help='db: insert rows directly; http: POST beacons to the tracking endpoint')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per insert batch in db mode')
+        parser.add_argument('--target-url', default='http://127.0.0.1:8000', help='Server to post to in http mode')
+        parser.add_argument('--rate', type=float, default=500, help='Target requests per second in http mode')
+        parser.add_argument('--concurrency', type=int, default=64, help='Concurrent connections in http mode')
+        parser.add_argument('--orders-out', help='Write matching Shopify order webhook payloads (NDJSON) to this file')
+        parser.add_argument('--post-orders', action='store_true', help='POST order payloads to the Shopify webhook in http mode')
+        parser.add_argument('--seed', type=int, help='Random seed for reproducible traffic')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.options = options
+
+        campaigns_by_brand = self.setup_campaigns(options['brands'], options['agencies_per_brand'])
+        self.now = timezone.now()
+
+        orders_file = open(options['orders_out'], 'w') if options['orders_out'] else None
+        started = time.monotonic()
+
+        try:
+            sessions = self.generate_sessions(campaigns_by_brand, options['sessions'])
+            if options['mode'] == 'db':
+                events, orders = self.write_db(sessions, orders_file)
+            else:
+                events, orders = self.post_http(sessions, orders_file)
+        finally:
+            if orders_file:
+                orders_file.close()
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {events} journey events and {orders} orders in {elapsed:.1f}s '
+            f'({events / elapsed if elapsed else 0:.0f} events/s)'
+        ))
+
+    def setup_campaigns(self, brand_count, agencies_per_brand):
+        """Create or reuse load-test brands, each running campaigns with several agencies"""
+
+        agencies = []
+        for i in range(agencies_per_brand):
+            user, _ = User.objects.get_or_create(
+                username=f'loadtest_agency_{i}',
+                defaults={'user_type': 'AGENCY', 'company_name': f'Load Test Agency {i}'}
+            )
+            agency, _ = Agency.objects.get_or_create(user=user, defaults={'team_size': 10, 'years_experience': 5})
+            agencies.append(agency)
+
+        campaigns_by_brand = {}
+        today = timezone.now().date()
+        for b in range(brand_count):
+            user, _ = User.objects.get_or_create(
+                username=f'loadtest_brand_{b}',
+                defaults={'user_type': 'BRAND', 'company_name': f'Load Test Brand {b}'}
+            )
+            brand, _ = Brand.objects.get_or_create(user=user, defaults={
+                'industry': 'Load Test',
+                'company_size': '50-100',
+                'annual_ad_spend': 1000000,
+                'shopify_domain': f'loadtest-{b}.myshopify.com',
+                'shopify_connected': True,
+            })
+
+            campaigns = []
+            for a, agency in enumerate(agencies):
+                campaign, _ = Campaign.objects.get_or_create(
+                    utm_campaign=f'loadtest_{b}_{a}',
+                    defaults={
+                        'brand': brand,
+                        'title': f'Load Test Campaign {b}-{a}',
+                        'description': 'Synthetic campaign for load testing',
+                        'platforms': ['META', 'GOOGLE', 'TIKTOK'],
+                        'budget_min': 10000,
+                        'budget_max': 50000,
+                        'target_roas': 3,
+                        'campaign_start': today - timedelta(days=self.options['days']),
+                        'campaign_end': today + timedelta(days=30),
+                        'bidding_deadline': timezone.now() - timedelta(days=self.options['days'] + 1),
+                        'status': 'ACTIVE',
+                        'selected_agency': agency,
+                    }
+                )
+                campaigns.append(campaign)
+            campaigns_by_brand[brand] = campaigns
+
+        return campaigns_by_brand
+
+    def session_length(self):
+        """Power-law session length: most visitors bounce, a few browse a lot"""
+        length = int(self.rng.paretovariate(self.options['session_alpha']))
+        return max(1, min(length, self.options['max_session_events']))
+
+    def generate_sessions(self, campaigns_by_brand, count):
+        """Yield (events, order_payload) per session; events are CustomerJourney field dicts"""
+
+        brands = list(campaigns_by_brand.items())
+        event_types = [e for e, _ in EVENT_MIX]
+        weights = [w for _, w in EVENT_MIX]
+        span = self.options['days'] * 86400
+
+        for _ in range(count):
+            brand, campaigns = self.rng.choice(brands)
+            session_id = f'session_{uuid.uuid4().hex[:12]}'
+            user_agent = self.rng.choice(USER_AGENTS)
+            ua_hash = 'ua_' + hashlib.md5(user_agent.encode()).hexdigest()[:10]
+            ip = f'10.{self.rng.randint(0, 255)}.{self.rng.randint(0, 255)}.{self.rng.randint(1, 254)}'
+            store = f'https://{brand.shopify_domain.replace(".myshopify.com", "")}.com'
+
+            ts = self.now - timedelta(seconds=self.rng.uniform(0, span))
+            # Sessions usually involve one agency, sometimes several of the brand's
+            touched = self.rng.sample(campaigns, k=min(len(campaigns), 1 + int(self.rng.random() < 0.3)))
+
+            events = []
+            last_campaign = touched[0]
+            for position in range(self.session_length()):
+                campaign = self.rng.choice(touched)
+                source, medium, referrer = self.rng.choice(SOURCES)
+                event_type = 'CLICK' if position == 0 and self.rng.random() < 0.5 else \
+                    self.rng.choices(event_types, weights)[0]
+                if event_type == 'CLICK':
+                    last_campaign = campaign
+                events.append(self._event(
+                    session_id, event_type, campaign, ts, store, referrer, ip, user_agent, ua_hash,
+                    utm_source=source, utm_medium=medium, utm_campaign=campaign.utm_campaign,
+                ))
+                ts += timedelta(seconds=self.rng.expovariate(1 / 45))
+
+            order = None
+            if self.rng.random() < self.options['conversion_rate']:
+                order_id = self.rng.randint(10 ** 12, 10 ** 13 - 1)
+                value = round(self.rng.lognormvariate(6.2, 0.6), 2)
+                email = f'{session_id}@loadtest.example'
+                conversion = self._event(
+                    session_id, 'CONVERSION', last_campaign, ts, store, '', ip, user_agent, ua_hash,
+                    utm_campaign=last_campaign.utm_campaign, conversion_value=value,
+                    order_id=str(order_id), customer_email=email,
+                )
+                conversion['page_url'] = f'{store}/thank-you?order_id={order_id}'
+                events.append(conversion)
+                order = self._order_payload(brand, last_campaign, order_id, value, email, ts, store)
+
+            yield events, order
+
+    def _event(self, session_id, event_type, campaign, ts, store, referrer, ip, user_agent, ua_hash, **extra):
+        event = {
+            'session_id': session_id,
+            'event_type': event_type,
+            'campaign_id': campaign.id,
+            'agency_id': campaign.selected_agency_id,
+            'page_url': f'{store}/products/{self.rng.randint(1, 500)}',
+            'referrer_url': referrer,
+            'ip_address': ip,
+            'user_agent': user_agent,
+            'user_agent_hash': ua_hash,
+            'timestamp': ts,
+            'utm_source': '', 'utm_medium': '', 'utm_campaign': '', 'utm_content': '', 'utm_term': '',
+            'order_id': '',
+            'conversion_value': None,
+            'customer_email': None,
+        }
+        event.update(extra)
+        return event
+
+    def _order_payload(self, brand, campaign, order_id, value, email, ts, store):
+        """Shopify orders/create webhook body matching the converting session"""
+        source = self.rng.choice(SOURCES)
+        landing = (f'{store}/?utm_source={source[0]}&utm_medium={source[1]}'
+                   f'&utm_campaign={campaign.utm_campaign}&utm_content=agency_{campaign.selected_agency_id}')
+        return {
+            'shop_domain': brand.shopify_domain,
+            'order': {
+                'id': order_id,
+                'order_number': str(order_id)[-6:],
+                'total_price': f'{value:.2f}',
+                'currency': 'DKK',
+                'email': email,
+                'landing_site_ref': landing,
+                'referring_site': source[2],
+                'source_name': 'web',
+                'created_at': ts.isoformat(),
+            },
+        }
+
+    def write_db(self, sessions, orders_file):
+        """Insert journey rows in fixed-size batches; memory stays flat at any volume"""
+
+        batch_size = self.options['batch_size']
+        batch = []
+        events_written = orders_written = 0
+        fields = [f for f in CustomerJourney._meta.local_concrete_fields if not f.primary_key]
+
+        def flush():
+            rows = [CustomerJourney(**e) for e in batch]
+            step = connection.ops.bulk_batch_size(fields, rows) or len(rows)
+            with transaction.atomic():
+                # A raw insert skips pre_save, so auto_now_add keeps the
+                # generated historical timestamps instead of stamping now
+                for start in range(0, len(rows), step):
+                    CustomerJourney.objects._insert(rows[start:start + step], fields=fields, raw=True)
+
+        for events, order in sessions:
+            batch.extend(events)
+            if order is not None:
+                orders_written += 1
+                if orders_file:
+                    orders_file.write(json.dumps(order) + '\n')
+            if len(batch) >= batch_size:
+                flush()
+                events_written += len(batch)
+                batch = []
+                if events_written % (batch_size * 20) < batch_size:
+                    self.stdout.write(f'{events_written} events written...')
+        if batch:
+            flush()
+            events_written += len(batch)
+
+        return events_written, orders_written
+
+    def post_http(self, sessions, orders_file):
+        """POST beacons to the journey endpoint, paced to the target request rate"""
+
+        base_url = self.options['target_url'].rstrip('/')
+        journey_url = f'{base_url}/api/journey/'
+        webhook_url = base_url + reverse('shopify_integration:order_webhook')
+        interval = 1.0 / self.options['rate'] if self.options['rate'] > 0 else 0
+        secret = (settings.SHOPIFY_WEBHOOK_SECRET or '').encode('utf-8')
+        if self.options['post_orders'] and not secret:
+            raise CommandError('SHOPIFY_WEBHOOK_SECRET must be set to post signed order webhooks')
+
+        stats = {'events': 0, 'orders': 0, 'errors': 0}
+        # Bound the number of queued requests so a slow server cannot grow memory
+        in_flight = threading.BoundedSemaphore(self.options['concurrency'] * 4)
+        lock = threading.Lock()
+
+        def post(url, body, headers):
+            request = urllib.request.Request(url, data=body, method='POST', headers={
+                'Content-Type': 'application/json', **headers
+            })
+            try:
+                with urllib.request.urlopen(request, timeout=10) as response:
+                    response.read()
+            except Exception:
+                with lock:
+                    stats['errors'] += 1
+            finally:
+                in_flight.release()
+
+        next_send = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.options['concurrency']) as pool:
+            def submit(url, payload, headers=None):
+                nonlocal next_send
+                delay = next_send - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                next_send = max(next_send + interval, time.monotonic() - 1)
+                in_flight.acquire()
+                pool.submit(post, url, payload, headers or {})
+
+            for events, order in sessions:
+                for event in events:
+                    submit(journey_url, json.dumps(self._beacon(event)).encode('utf-8'))
+                    stats['events'] += 1
+                if order is None:
+                    continue
+                stats['orders'] += 1
+                if orders_file:
+                    orders_file.write(json.dumps(order) + '\n')
+                if self.options['post_orders']:
+                    body = json.dumps(order['order']).encode('utf-8')
+                    signature = base64.b64encode(hmac.new(secret, body, hashlib.sha256).digest()).decode()
+                    submit(webhook_url, body, {
+                        'X-Shopify-Hmac-Sha256': signature,
+                        'X-Shopify-Shop-Domain': order['shop_domain'],
+                    })
+
+        if stats['errors']:
+            self.stdout.write(self.style.WARNING(f"{stats['errors']} requests failed"))
+        return stats['events'], stats['orders']
+
+    def _beacon(self, event):
+        """Tracking pixel payload for a generated event"""
+        return {
+            'session_id': event['session_id'],
+            'user_agent_hash': event['user_agent_hash'],
+            'event_type': event['event_type'],
+            'page_url': event['page_url'],
+            'referrer_url': event['referrer_url'],
+            'utm_data': {k: event[k] for k in ('utm_source', 'utm_medium', 'utm_campaign') if event[k]},
+            'timestamp': event['timestamp'].isoformat(),
+            'campaign_id': event['campaign_id'],
+            'conversion_value': event['conversion_value'],
+            'order_id': event['order_id'],
+            'customer_email': event['customer_email'],
+        }
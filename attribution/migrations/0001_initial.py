@@ -0,0 +1,86 @@
+# Generated by Django 4.2.23 on 2026-10-19 17:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('accounts', '0002_brand_agency_profile_fields'),
+        ('campaigns', '0002_brand_agency_relations_and_payments'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MultiTouchAttribution',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attribution_data', models.JSONField(default=dict)),
+                ('attribution_confidence', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('supporting_agencies', models.JSONField(default=list)),
+                ('attribution_model_used', models.CharField(max_length=20)),
+                ('calculated_at', models.DateTimeField(auto_now_add=True)),
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='multi_touch_attribution', to='campaigns.shopifyorder')),
+                ('primary_agency', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='primary_attributions', to='accounts.agency')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CustomerJourney',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_id', models.CharField(max_length=255)),
+                ('customer_email', models.EmailField(blank=True, max_length=254, null=True)),
+                ('user_agent_hash', models.CharField(max_length=64)),
+                ('event_type', models.CharField(choices=[('IMPRESSION', 'Ad Impression'), ('CLICK', 'Ad Click'), ('VIEW', 'Page View'), ('CONVERSION', 'Purchase'), ('EMAIL_OPEN', 'Email Open'), ('EMAIL_CLICK', 'Email Click')], max_length=20)),
+                ('utm_source', models.CharField(blank=True, max_length=100)),
+                ('utm_medium', models.CharField(blank=True, max_length=100)),
+                ('utm_campaign', models.CharField(blank=True, max_length=100)),
+                ('utm_content', models.CharField(blank=True, max_length=100)),
+                ('utm_term', models.CharField(blank=True, max_length=100)),
+                ('page_url', models.URLField()),
+                ('referrer_url', models.URLField(blank=True)),
+                ('ip_address', models.GenericIPAddressField()),
+                ('user_agent', models.TextField()),
+                ('conversion_value', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('order_id', models.CharField(blank=True, max_length=255)),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+                ('agency', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='accounts.agency')),
+                ('campaign', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='campaigns.campaign')),
+            ],
+            options={
+                'ordering': ['timestamp'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AttributionWindow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('click_window_days', models.IntegerField(default=7)),
+                ('view_window_days', models.IntegerField(default=1)),
+                ('attribution_model', models.CharField(choices=[('FIRST_CLICK', 'First Click'), ('LAST_CLICK', 'Last Click'), ('LINEAR', 'Linear Attribution'), ('TIME_DECAY', 'Time Decay'), ('POSITION_BASED', 'Position Based (40-20-40)')], default='LAST_CLICK', max_length=20)),
+                ('cross_device_enabled', models.BooleanField(default=False)),
+                ('include_organic_search', models.BooleanField(default=True)),
+                ('include_direct_traffic', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('campaign', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='attribution_window', to='campaigns.campaign')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AttributionRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rule_type', models.CharField(choices=[('PLATFORM_PRIORITY', 'Platform Priority'), ('RECENCY_WEIGHT', 'Recency Weighting'), ('SPEND_THRESHOLD', 'Minimum Spend Threshold'), ('INTERACTION_TYPE', 'Interaction Type Priority')], max_length=20)),
+                ('rule_config', models.JSONField(default=dict)),
+                ('priority', models.IntegerField(default=0)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('brand', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attribution_rules', to='accounts.brand')),
+            ],
+            options={
+                'ordering': ['-priority', 'created_at'],
+            },
+        ),
+    ]
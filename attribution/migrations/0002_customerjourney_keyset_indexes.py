@@ -0,0 +1,21 @@
+# Generated by Django 4.2.23 on 2026-10-19 17:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attribution', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customerjourney',
+            index=models.Index(fields=['campaign', 'timestamp', 'id'], name='attribution_campaig_e9fd65_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customerjourney',
+            index=models.Index(fields=['agency', 'timestamp', 'id'], name='attribution_agency__e35cfd_idx'),
+        ),
+    ]
@@ -2,11 +2,10 @@
 
 # attribution/models.py - Advanced attribution tracking
 
+from django.conf import settings
 from django.db import models
-from django.utils import timezone
 from campaigns.models import Campaign
 from accounts.models import Agency
-import json
 
 class AttributionWindow(models.Model):
     """Configure attribution windows per campaign"""
@@ -79,6 +78,11 @@ class CustomerJourney(models.Model):
     
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            # Keyset pagination seeks (campaigns.pagination)
+            models.Index(fields=['campaign', 'timestamp', 'id']),
+            models.Index(fields=['agency', 'timestamp', 'id']),
+        ]
     
     def __str__(self):
         return f"{self.event_type} - {self.session_id[:8]} - {self.timestamp}"
@@ -608,103 +612,3 @@ def generate_advanced_tracking_pixel(campaign):
 """
     
     return pixel_code
-
-# API endpoints for advanced attribution
-@csrf_exempt
-@require_POST
-def journey_tracking_api(request):
-    """Track customer journey events"""
-    
-    try:
-        data = json.loads(request.body)
-        
-        # Extract event data
-        session_id = data.get('session_id')
-        event_type = data.get('event_type')
-        campaign_id = data.get('campaign_id')
-        
-        if not all([session_id, event_type]):
-            return JsonResponse({'status': 'missing_data'}, status=400)
-        
-        # Find campaign and agency
-        campaign = None
-        agency = None
-        
-        if campaign_id:
-            try:
-                campaign = Campaign.objects.get(id=campaign_id, status='ACTIVE')
-                agency = campaign.selected_agency
-            except Campaign.DoesNotExist:
-                pass
-        
-        # Create journey event
-        journey_event = CustomerJourney.objects.create(
-            session_id=session_id,
-            event_type=event_type,
-            campaign=campaign,
-            agency=agency,
-            utm_source=data.get('utm_data', {}).get('utm_source', ''),
-            utm_medium=data.get('utm_data', {}).get('utm_medium', ''),
-            utm_campaign=data.get('utm_data', {}).get('utm_campaign', ''),
-            utm_content=data.get('utm_data', {}).get('utm_content', ''),
-            utm_term=data.get('utm_data', {}).get('utm_term', ''),
-            page_url=data.get('page_url', ''),
-            referrer_url=data.get('referrer_url', ''),
-            ip_address=request.META.get('REMOTE_ADDR', ''),
-            user_agent=request.META.get('HTTP_USER_AGENT', ''),
-            conversion_value=data.get('conversion_value'),
-            order_id=data.get('order_id', ''),
-            user_agent_hash=data.get('user_agent_hash', '')
-        )
-        
-        return JsonResponse({'status': 'tracked', 'event_id': journey_event.id})
-        
-    except Exception as e:
-        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
-
-@csrf_exempt
-@require_POST 
-def advanced_attribution_api(request):
-    """Process advanced attribution with journey data"""
-    
-    try:
-        data = json.loads(request.body)
-        order_data = data.get('order', {})
-        session_id = data.get('session_id')
-        
-        if not session_id:
-            return JsonResponse({'status': 'no_session'})
-        
-        # Get customer journey for this session
-        journey_events = CustomerJourney.objects.filter(
-            session_id=session_id
-        ).order_by('timestamp')
-        
-        if not journey_events.exists():
-            return JsonResponse({'status': 'no_journey'})
-        
-        # Find the campaign from journey
-        campaign_events = journey_events.filter(campaign__isnull=False)
-        if not campaign_events.exists():
-            return JsonResponse({'status': 'no_campaign'})
-        
-        # Use the most recent campaign
-        campaign = campaign_events.last().campaign
-        
-        # Process advanced attribution
-        processor = AdvancedAttributionProcessor(campaign)
-        attribution_result = processor.process_order_attribution(order_data, list(journey_events))
-        
-        # Store the result (when Shopify webhook comes in, we'll match this)
-        # For now, just return the attribution decision
-        
-        return JsonResponse({
-            'status': 'attributed',
-            'primary_agency': attribution_result['primary_agency'].user.company_name if attribution_result['primary_agency'] else None,
-            'confidence': attribution_result['attribution_confidence'],
-            'model': attribution_result['model_used'],
-            'touchpoints': attribution_result['touchpoints']
-        })
-        
-    except Exception as e:
-        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
\ No newline at end of file
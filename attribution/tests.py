@@ -1,3 +1,243 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import os
+import re
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from performance_marketing.testing import create_agency, create_brand, create_campaign
+from .dedupe import BloomFilter, JourneyDeduplicator
+from .ingestion import InvalidJourneyEvent, JourneyIngestQueue, journey_queue, parse_event_time, parse_journey_event
+from .models import CustomerJourney
+from .views import journey_tracking_api
+
+
+def beacon(session_id, event_type='VIEW', **fields):
+    return dict(session_id=session_id, event_type=event_type, page_url='https://shop.example/p/1', **fields)
+
+
+class JourneyEventParsingTests(TestCase):
+    
+    def test_valid_payload(self):
+        event = parse_journey_event(
+            beacon('s1', campaign_id='7', conversion_value='19.999', utm_data={'utm_source': 'x' * 150}),
+            {'REMOTE_ADDR': '10.0.0.1', 'HTTP_USER_AGENT': 'UA'},
+        )
+        self.assertEqual(event['campaign_id'], 7)
+        self.assertEqual(event['conversion_value'], 20.0)
+        self.assertEqual(event['ip_address'], '10.0.0.1')
+        self.assertEqual(len(event['utm_source']), 100)
+        self.assertEqual(event['utm_medium'], '')
+        self.assertIsNone(event['sent_at'])
+    
+    def test_event_time(self):
+        self.assertEqual(parse_event_time('2026-01-01T00:00:00.000Z'), 1767225600.0)
+        self.assertEqual(parse_event_time(1767225600000), 1767225600.0)
+        self.assertEqual(parse_event_time(1767225600), 1767225600.0)
+        with self.assertRaises(InvalidJourneyEvent):
+            parse_event_time('yesterday')
+    
+    def test_invalid_payloads(self):
+        for data in (
+            [],
+            {'event_type': 'VIEW'},
+            beacon('s1', event_type='DROP TABLE'),
+            beacon('s' * 300),
+            beacon('s1', campaign_id='abc'),
+            beacon('s1', conversion_value='free'),
+            beacon('s1', utm_data=['utm_source']),
+            beacon('s1', timestamp=True),
+        ):
+            with self.subTest(data=data), self.assertRaises(InvalidJourneyEvent):
+                parse_journey_event(data, {})
+
+
+class JourneyDeduplicatorTests(TestCase):
+    
+    def setUp(self):
+        self.dedupe = JourneyDeduplicator(capacity=1000, error_rate=0.01, window_seconds=3600, coarse_seconds=10)
+    
+    def seen(self, *args, **kwargs):
+        """is_duplicate, recording the event when it is accepted (as the views do)"""
+        duplicate = self.dedupe.is_duplicate(*args, **kwargs)
+        if not duplicate:
+            self.dedupe.record(*args, **kwargs)
+        return duplicate
+    
+    def test_bloom_filter(self):
+        bloom = BloomFilter(1000, 0.01)
+        for n in range(1000):
+            bloom.add(f'key-{n}')
+        self.assertTrue(all(f'key-{n}' in bloom for n in range(1000)))
+        false_positives = sum(f'other-{n}' in bloom for n in range(10000))
+        self.assertLess(false_positives, 300)
+    
+    def test_retry_is_bucketed_on_the_event_timestamp(self):
+        sent = 1767225605.0
+        self.assertFalse(self.seen('s1', 'VIEW', '/p', event_time=sent, now=sent + 1))
+        # The same beacon retried 40s later by the browser
+        self.assertTrue(self.seen('s1', 'VIEW', '/p', event_time=sent, now=sent + 41))
+        # A real second view of the page
+        self.assertFalse(self.seen('s1', 'VIEW', '/p', event_time=sent + 30, now=sent + 42))
+        # Without a client stamp the server time is the bucket
+        self.assertFalse(self.seen('s2', 'VIEW', '/p', now=sent))
+        self.assertTrue(self.seen('s2', 'VIEW', '/p', now=sent + 9))
+        self.assertFalse(self.seen('s2', 'VIEW', '/p', now=sent + 25))
+    
+    def test_conversion_is_confirmed_exactly(self):
+        self.assertFalse(self.seen('s1', 'CONVERSION', '/thanks', order_id='1001', now=100))
+        with self.assertNumQueries(0):
+            self.assertTrue(self.seen('s1', 'CONVERSION', '/thanks', order_id='1001', now=5000))
+        
+        # A Bloom hit the in-process cache cannot confirm goes to the database
+        self.dedupe._recent_exact.clear()
+        with self.assertNumQueries(1):
+            self.assertFalse(self.seen('s1', 'CONVERSION', '/thanks', order_id='1001', now=5001))
+        CustomerJourney.objects.create(session_id='s1', event_type='CONVERSION', order_id='1001', ip_address='0.0.0.0')
+        self.dedupe._recent_exact.clear()
+        self.assertTrue(self.seen('s1', 'CONVERSION', '/thanks', order_id='1001', now=5002))
+    
+    def test_beacon_retry_is_dropped(self):
+        data = json.dumps(beacon('retry-1', timestamp='2026-01-01T00:00:00Z'))
+        with override_settings(JOURNEY_INGEST_QUEUE_ENABLED=False):
+            first = self.client.post('/api/journey/', data, content_type='application/json')
+            second = self.client.post('/api/journey/', data, content_type='application/json')
+        self.assertEqual(first.json()['status'], 'tracked')
+        self.assertEqual(second.json()['status'], 'duplicate')
+        self.assertEqual(CustomerJourney.objects.filter(session_id='retry-1').count(), 1)
+    
+    def test_check_does_not_record(self):
+        self.assertFalse(self.dedupe.is_duplicate('s1', 'CONVERSION', '/thanks', order_id='1001', now=100))
+        self.assertFalse(self.dedupe.is_duplicate('s1', 'CONVERSION', '/thanks', order_id='1001', now=101))
+        self.dedupe.record('s1', 'CONVERSION', '/thanks', order_id='1001', now=102)
+        self.assertTrue(self.dedupe.is_duplicate('s1', 'CONVERSION', '/thanks', order_id='1001', now=103))
+    
+    @override_settings(JOURNEY_INGEST_QUEUE_ENABLED=True)
+    async def test_rejected_beacon_retry_is_accepted(self):
+        data = json.dumps(beacon('busy-retry', event_type='CONVERSION', order_id='2001'))
+        with mock.patch.object(journey_queue, 'put_nowait', side_effect=asyncio.QueueFull):
+            response = await self.async_client.post('/api/journey/', data, content_type='application/json')
+        self.assertEqual(response.status_code, 503)
+        
+        with override_settings(JOURNEY_INGEST_QUEUE_ENABLED=False):
+            retry = await self.async_client.post('/api/journey/', data, content_type='application/json')
+            again = await self.async_client.post('/api/journey/', data, content_type='application/json')
+        self.assertEqual(retry.json()['status'], 'tracked')
+        self.assertEqual(again.json()['status'], 'duplicate')
+    
+    def test_both_views_key_on_the_stored_page_url(self):
+        data = beacon('long-url', timestamp='2026-01-01T00:00:00Z')
+        data['page_url'] += '?q=' + 'x' * 300
+        response = journey_tracking_api(RequestFactory().post('/', json.dumps(data), content_type='application/json'))
+        self.assertEqual(json.loads(response.content)['status'], 'tracked')
+        
+        retry = self.client.post('/api/journey/', json.dumps(data), content_type='application/json')
+        self.assertEqual(retry.json()['status'], 'duplicate')
+        self.assertEqual(len(CustomerJourney.objects.get(session_id='long-url').page_url), 200)
+
+
+class JourneyIngestTests(TestCase):
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = create_brand('ingestbrand')
+        cls.agency = create_agency('ingestagency')
+        cls.campaign = create_campaign(cls.brand, 1, agency=cls.agency)
+        cls.draft = create_campaign(cls.brand, 2, status='DRAFT')
+    
+    def post(self, data, client=None):
+        return (client or self.client).post('/api/journey/', json.dumps(data), content_type='application/json')
+    
+    def test_rejects_invalid_beacon(self):
+        self.assertEqual(self.post({'event_type': 'VIEW'}).status_code, 400)
+        response = self.client.post('/api/journey/', 'not json', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get('/api/journey/').status_code, 405)
+        self.assertFalse(CustomerJourney.objects.exists())
+    
+    @override_settings(JOURNEY_INGEST_QUEUE_ENABLED=False)
+    def test_inline_write_resolves_active_campaign(self):
+        self.assertEqual(self.post(beacon('inline-1', campaign_id=self.campaign.id)).json()['status'], 'tracked')
+        self.assertEqual(self.post(beacon('inline-2', campaign_id=self.draft.id)).json()['status'], 'tracked')
+        
+        journeys = {j.session_id: j for j in CustomerJourney.objects.all()}
+        self.assertEqual(journeys['inline-1'].campaign_id, self.campaign.id)
+        self.assertEqual(journeys['inline-1'].agency_id, self.agency.id)
+        # Only ACTIVE campaigns are credited
+        self.assertIsNone(journeys['inline-2'].campaign_id)
+    
+    @override_settings(JOURNEY_INGEST_QUEUE_ENABLED=True)
+    async def test_queued_events_are_written_in_batches(self):
+        for n in range(3):
+            response = await self.async_client.post(
+                '/api/journey/', json.dumps(beacon(f'queued-{n}', campaign_id=self.campaign.id)),
+                content_type='application/json',
+            )
+            self.assertEqual(response.status_code, 202)
+        
+        await journey_queue.join()
+        count = await sync_to_async(CustomerJourney.objects.filter(session_id__startswith='queued-', agency=self.agency).count)()
+        self.assertEqual(count, 3)
+        self.assertEqual(journey_queue.qsize(), 0)
+    
+    @override_settings(JOURNEY_INGEST_QUEUE_ENABLED=True)
+    async def test_full_queue_rejects_and_close_writes_the_rest(self):
+        queue = JourneyIngestQueue(maxsize=1)
+        queue.put_nowait(parse_journey_event(beacon('busy-0'), {}))
+        with self.assertRaises(asyncio.QueueFull):
+            queue.put_nowait(parse_journey_event(beacon('busy-1'), {}))
+        await queue.aclose()
+        self.assertTrue(await sync_to_async(CustomerJourney.objects.filter(session_id='busy-0').exists)())
+    
+    def test_flush_writes_events_left_when_the_loop_stops(self):
+        queue = JourneyIngestQueue()
+        
+        async def enqueue():
+            for n in range(2):
+                queue.put_nowait(parse_journey_event(beacon(f'left-{n}'), {}))
+        
+        # asyncio.run cancels the writer before it runs, like a worker
+        # stopped without a lifespan shutdown
+        asyncio.run(enqueue())
+        self.assertFalse(CustomerJourney.objects.exists())
+        
+        self.assertEqual(queue.flush(), 2)
+        self.assertEqual(CustomerJourney.objects.filter(session_id__startswith='left-').count(), 2)
+        self.assertEqual(queue.flush(), 0)
+
+
+
+class GenerateJourneyTrafficTests(TestCase):
+    
+    def test_db_mode_writes_every_event_with_its_historical_timestamp(self):
+        out = io.StringIO()
+        with tempfile.TemporaryDirectory() as tmp:
+            orders_out = os.path.join(tmp, 'orders.ndjson')
+            # A batch size below the event count exercises several flushes
+            call_command(
+                'generate_journey_traffic', sessions=60, brands=2, agencies_per_brand=2, days=5,
+                conversion_rate=0.5, batch_size=25, seed=7, orders_out=orders_out, stdout=out,
+            )
+            with open(orders_out) as f:
+                orders = [json.loads(line) for line in f]
+        
+        events, order_count = map(int, re.search(r'Generated (\d+) journey events and (\d+) orders', out.getvalue()).groups())
+        self.assertEqual(CustomerJourney.objects.count(), events)
+        self.assertEqual(CustomerJourney.objects.filter(event_type='CONVERSION').count(), order_count)
+        self.assertEqual(len(orders), order_count)
+        self.assertEqual(CustomerJourney.objects.values('session_id').distinct().count(), 60)
+        
+        # Timestamps are spread over the past days, not stamped at insert time
+        timestamps = list(CustomerJourney.objects.filter(event_type='CLICK').values_list('timestamp', flat=True))
+        self.assertLess(min(timestamps), timezone.now() - timedelta(days=1))
+        self.assertGreater(max(timestamps) - min(timestamps), timedelta(days=1))
+        
+        conversion = CustomerJourney.objects.get(order_id=str(orders[0]['order']['id']))
+        self.assertEqual(conversion.timestamp.isoformat(), orders[0]['order']['created_at'])
@@ -1,5 +1,6 @@
 # shopify_integration/views.py - Webhook handling and attribution
 
+import base64
 import json
 import hmac
 import hashlib
@@ -13,8 +14,7 @@ from urllib.parse import urlparse, parse_qs
 from datetime import datetime
 
 from accounts.models import Brand, Agency
-from campaigns.models import Campaign, CampaignPerformance
-from .models import ShopifyOrder
+from campaigns.models import Campaign, CampaignPerformance, ShopifyOrder
 
 @csrf_exempt
 @require_POST
@@ -56,11 +56,12 @@ def verify_shopify_webhook(request):
         return False
     
     webhook_secret = settings.SHOPIFY_WEBHOOK_SECRET
-    computed_signature = hmac.new(
+    # Shopify sends the base64-encoded digest
+    computed_signature = base64.b64encode(hmac.new(
         webhook_secret.encode('utf-8'),
         request.body,
         hashlib.sha256
-    ).digest()
+    ).digest())
     
     return hmac.compare_digest(signature.encode('utf-8'), computed_signature)
 
@@ -390,4 +391,214 @@ def setup_shopify_webhooks(brand):
     else:
         print(f"Webhook creation failed: {response.text}")
 
-# Attribution debug and analytics
\ No newline at end of file
+# API endpoints for advanced attribution
+from .dedupe import journey_deduplicator
+from .ingestion import parse_event_time
+from .models import AdvancedAttributionProcessor, CustomerJourney
+
+@csrf_exempt
+@require_POST
+def journey_tracking_api(request):
+    """Track customer journey events"""
+    
+    try:
+        data = json.loads(request.body)
+        
+        # Extract event data
+        session_id = data.get('session_id')
+        event_type = data.get('event_type')
+        campaign_id = data.get('campaign_id')
+        
+        if not all([session_id, event_type]):
+            return JsonResponse({'status': 'missing_data'}, status=400)
+        
+        # Drop pixel retries, double-loaded pages and repeated auto-conversions;
+        # the key uses the stored (truncated) page_url, as the async ingest does
+        page_url = str(data.get('page_url') or '')[:200]
+        dedupe_key = (session_id, event_type, page_url, data.get('order_id', ''), parse_event_time(data.get('timestamp')))
+        dedupe = getattr(settings, 'JOURNEY_DEDUPE_ENABLED', True)
+        if dedupe and journey_deduplicator.is_duplicate(*dedupe_key):
+            return JsonResponse({'status': 'duplicate'})
+        
+        # Find campaign and agency
+        campaign = None
+        agency = None
+        
+        if campaign_id:
+            try:
+                campaign = Campaign.objects.get(id=campaign_id, status='ACTIVE')
+                agency = campaign.selected_agency
+            except Campaign.DoesNotExist:
+                pass
+        
+        # Create journey event
+        journey_event = CustomerJourney.objects.create(
+            session_id=session_id,
+            event_type=event_type,
+            campaign=campaign,
+            agency=agency,
+            utm_source=data.get('utm_data', {}).get('utm_source', ''),
+            utm_medium=data.get('utm_data', {}).get('utm_medium', ''),
+            utm_campaign=data.get('utm_data', {}).get('utm_campaign', ''),
+            utm_content=data.get('utm_data', {}).get('utm_content', ''),
+            utm_term=data.get('utm_data', {}).get('utm_term', ''),
+            page_url=page_url,
+            referrer_url=data.get('referrer_url', ''),
+            ip_address=request.META.get('REMOTE_ADDR', ''),
+            user_agent=request.META.get('HTTP_USER_AGENT', ''),
+            conversion_value=data.get('conversion_value'),
+            order_id=data.get('order_id', ''),
+            user_agent_hash=data.get('user_agent_hash', '')
+        )
+        if dedupe:
+            journey_deduplicator.record(*dedupe_key)
+        
+        return JsonResponse({'status': 'tracked', 'event_id': journey_event.id})
+        
+    except Exception as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+@csrf_exempt
+@require_POST 
+def advanced_attribution_api(request):
+    """Process advanced attribution with journey data"""
+    
+    try:
+        data = json.loads(request.body)
+        order_data = data.get('order', {})
+        session_id = data.get('session_id')
+        
+        if not session_id:
+            return JsonResponse({'status': 'no_session'})
+        
+        # Get customer journey for this session
+        journey_events = CustomerJourney.objects.filter(
+            session_id=session_id
+        ).order_by('timestamp')
+        
+        if not journey_events.exists():
+            return JsonResponse({'status': 'no_journey'})
+        
+        # Find the campaign from journey
+        campaign_events = journey_events.filter(campaign__isnull=False)
+        if not campaign_events.exists():
+            return JsonResponse({'status': 'no_campaign'})
+        
+        # Use the most recent campaign
+        campaign = campaign_events.last().campaign
+        
+        # Process advanced attribution
+        processor = AdvancedAttributionProcessor(campaign)
+        attribution_result = processor.process_order_attribution(order_data, list(journey_events))
+        
+        # Store the result (when Shopify webhook comes in, we'll match this)
+        # For now, just return the attribution decision
+        
+        return JsonResponse({
+            'status': 'attributed',
+            'primary_agency': attribution_result['primary_agency'].user.company_name if attribution_result['primary_agency'] else None,
+            'confidence': attribution_result['attribution_confidence'],
+            'model': attribution_result['model_used'],
+            'touchpoints': attribution_result['touchpoints']
+        })
+        
+    except Exception as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+# Attribution debug and analytics
+
+# Async journey ingestion (served from the ASGI application)
+import asyncio
+from asgiref.sync import sync_to_async
+from .ingestion import journey_queue, parse_journey_event, write_journey_events
+
+async def journey_ingest_api(request):
+    """Accept a journey beacon without holding a worker thread.
+
+    The event is validated on the event loop and handed to the shared
+    ingestion queue; a single writer task batches the inserts.
+    """
+    
+    if request.method != 'POST':
+        return JsonResponse({'status': 'method_not_allowed'}, status=405)
+    
+    try:
+        data = json.loads(request.body)
+        event = parse_journey_event(data, request.META)
+    except (ValueError, UnicodeDecodeError) as e:
+        return JsonResponse({'status': 'invalid', 'message': str(e)}, status=400)
+    
+    dedupe = getattr(settings, 'JOURNEY_DEDUPE_ENABLED', True)
+    args = (event['session_id'], event['event_type'], event['page_url'], event['order_id'], event['sent_at'])
+    if dedupe:
+        if journey_deduplicator.needs_exact_check(event['event_type'], event['order_id']):
+            # Exact confirmation may hit the database
+            duplicate = await sync_to_async(journey_deduplicator.is_duplicate)(*args)
+        else:
+            duplicate = journey_deduplicator.is_duplicate(*args)
+        if duplicate:
+            return JsonResponse({'status': 'duplicate'})
+    
+    # Recorded only once the event is written or queued: a rejected beacon's
+    # retry must not be taken for a duplicate
+    if not getattr(settings, 'JOURNEY_INGEST_QUEUE_ENABLED', False):
+        # WSGI / runserver: no long-lived event loop to host the writer task
+        await sync_to_async(write_journey_events)([event])
+        response = JsonResponse({'status': 'tracked'})
+    else:
+        try:
+            journey_queue.put_nowait(event)
+        except asyncio.QueueFull:
+            return JsonResponse({'status': 'busy'}, status=503)
+        response = JsonResponse({'status': 'queued'}, status=202)
+    
+    if dedupe:
+        journey_deduplicator.record(*args)
+    return response
+
+journey_ingest_api.csrf_exempt = True
+
+# Journey event listing, keyset-paginated
+from django.contrib.auth.decorators import login_required
+from campaigns.pagination import JOURNEY_KEYS, InvalidCursor, keyset_page
+from .models import CustomerJourney
+
+JOURNEY_LIST_FIELDS = (
+    'id', 'timestamp', 'event_type', 'session_id', 'customer_email', 'campaign_id', 'agency_id',
+    'utm_source', 'utm_medium', 'utm_campaign', 'page_url', 'referrer_url', 'conversion_value', 'order_id',
+)
+
+@login_required
+def journey_events_api(request):
+    """Journey events of the user's campaigns, newest first.
+    
+    Pass ``cursor`` from the previous response for the next page; every
+    page costs one index seek. Optional filters: ``campaign``,
+    ``session_id`` and ``event_type``.
+    """
+    
+    user = request.user
+    if user.user_type == 'BRAND':
+        events = CustomerJourney.objects.filter(campaign__brand=get_object_or_404(Brand, user=user))
+    elif user.user_type == 'AGENCY':
+        events = CustomerJourney.objects.filter(agency=get_object_or_404(Agency, user=user))
+    else:
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    
+    try:
+        if request.GET.get('campaign'):
+            events = events.filter(campaign_id=int(request.GET['campaign']))
+        if request.GET.get('session_id'):
+            events = events.filter(session_id=request.GET['session_id'])
+        if request.GET.get('event_type'):
+            events = events.filter(event_type=request.GET['event_type'])
+        page_size = int(request.GET['page_size']) if request.GET.get('page_size') else None
+        rows, next_cursor = keyset_page(
+            events, JOURNEY_KEYS, request.GET.get('cursor'), page_size, fields=JOURNEY_LIST_FIELDS
+        )
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except ValueError:
+        return JsonResponse({'error': 'campaign and page_size must be integers'}, status=400)
+    
+    return JsonResponse({'events': rows, 'next_cursor': next_cursor})
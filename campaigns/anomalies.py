@@ -0,0 +1,255 @@
+# campaigns/anomalies.py - Streaming anomaly detection on campaign revenue, orders and spend
+#
+# Each (campaign, metric, granularity) has one AnomalyState row: the open
+# bucket (hour or day) being accumulated and an exponentially weighted mean
+# and variance of the closed buckets. Closing a bucket is O(1):
+#
+#     z = (x - mean) / sigma          compared before the update
+#     diff = x - mean; mean += alpha * diff
+#     variance = (1 - alpha) * (variance + alpha * diff**2)
+#
+# and a bucket further than ANOMALY_THRESHOLD_SIGMA from the baseline (once
+# ANOMALY_WARMUP_BUCKETS have been seen) is kept on the row as an alert,
+# which brand_conditions turns into a dashboard notification.
+#
+# Hourly revenue and orders are fed by every attributed order as it is
+# ingested (observe_order). Daily revenue, orders, spend and ROAS are closed
+# from the day's CampaignPerformance row once ANOMALY_DAILY_GRACE_HOURS
+# have passed, so spend reported the next morning is included. The
+# periodic evaluate_notifications pass also closes hours in which nothing
+# happened, which is what a collapse looks like. The state survives worker
+# restarts without rescanning any history.
+
+import math
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import AnomalyState, Campaign, CampaignPerformance
+
+HOURLY_METRICS = ('revenue', 'orders')
+DAILY_METRICS = ('revenue', 'orders', 'spend', 'roas')
+
+METRIC_LABELS = dict(AnomalyState.METRIC_CHOICES)
+
+# A long idle stretch is folded in one bucket at a time up to this many
+# buckets; beyond that the state restarts its bucket clock at the present
+MAX_GAP_BUCKETS = 24 * 7
+
+# Floor for sigma relative to the mean, so a very steady series does not
+# alert on noise
+MIN_SIGMA_FRACTION = 0.05
+
+STATE_FIELDS = [
+    'bucket_start', 'bucket_value', 'mean', 'variance', 'count',
+    'alert_bucket', 'alert_value', 'alert_baseline', 'alert_sigmas',
+]
+
+
+def _params(granularity):
+    return {
+        'alpha': getattr(settings, 'ANOMALY_EWMA_ALPHA', {'hour': 0.05, 'day': 0.15})[granularity],
+        'warmup': getattr(settings, 'ANOMALY_WARMUP_BUCKETS', {'hour': 72, 'day': 14})[granularity],
+        'threshold': getattr(settings, 'ANOMALY_THRESHOLD_SIGMA', 3.0),
+    }
+
+
+def _next_bucket(granularity, start):
+    if granularity == 'hour':
+        return start + timedelta(hours=1)
+    # Via the local date, so days stay at local midnight across DST changes
+    return day_start(timezone.localdate(start) + timedelta(days=1))
+
+
+def hour_start(moment):
+    return timezone.localtime(moment).replace(minute=0, second=0, microsecond=0)
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def close_bucket(state, value, params):
+    """Fold a finished bucket into the baseline and set or clear the alert. Returns True if the alert changed."""
+
+    had_alert = state.alert_bucket is not None
+    alert = None
+    if state.count >= params['warmup']:
+        sigma = max(math.sqrt(state.variance), MIN_SIGMA_FRACTION * abs(state.mean), 1e-9)
+        sigmas = (value - state.mean) / sigma
+        if abs(sigmas) >= params['threshold']:
+            alert = (state.bucket_start, value, state.mean, sigmas)
+
+    if state.count == 0:
+        state.mean, state.variance = value, 0.0
+    else:
+        diff = value - state.mean
+        increment = params['alpha'] * diff
+        state.mean += increment
+        state.variance = (1 - params['alpha']) * (state.variance + diff * increment)
+    state.count += 1
+
+    if alert:
+        state.alert_bucket, state.alert_value, state.alert_baseline, state.alert_sigmas = alert
+    else:
+        state.alert_bucket = state.alert_value = state.alert_baseline = state.alert_sigmas = None
+    return alert is not None or had_alert
+
+
+def advance(state, until, bucket_values=None):
+    """Close every bucket that starts before ``until``; returns True if the alert changed.
+
+    The open bucket closes with its accumulated value, later ones with the
+    value from ``bucket_values(start)`` (0 when not given). A value of None
+    (e.g. ROAS of a day without spend) leaves the baseline untouched.
+    """
+
+    params = _params(state.granularity)
+    changed = False
+    closed = 0
+    while state.bucket_start < until:
+        if closed >= MAX_GAP_BUCKETS:
+            state.bucket_start = until
+            state.bucket_value = 0
+            break
+        value = bucket_values(state.bucket_start) if bucket_values else (state.bucket_value if closed == 0 else 0)
+        if value is not None:
+            changed |= close_bucket(state, value, params)
+        state.bucket_start = _next_bucket(state.granularity, state.bucket_start)
+        state.bucket_value = 0
+        closed += 1
+    return changed
+
+
+def _save(states):
+    AnomalyState.objects.bulk_create(
+        states, batch_size=1000, update_conflicts=True,
+        unique_fields=['campaign', 'metric', 'granularity'], update_fields=STATE_FIELDS
+    )
+
+
+def observe_order(order):
+    """Add an attributed order to its campaign's hourly revenue and orders. Returns True if an alert changed."""
+
+    if not (order.is_attributed and order.campaign_id):
+        return False
+
+    hour = hour_start(order.order_created_at)
+    values = {'orders': 1}
+    # Without an FX rate yet the revenue is unknown, not zero
+    if order.normalized_total is not None:
+        values['revenue'] = float(order.normalized_total)
+
+    with transaction.atomic():
+        states = {
+            state.metric: state
+            for state in AnomalyState.objects.select_for_update().filter(
+                campaign_id=order.campaign_id, granularity='hour', metric__in=HOURLY_METRICS
+            )
+        }
+        changed = False
+        for metric in HOURLY_METRICS:
+            state = states.get(metric)
+            if state is None:
+                state = states[metric] = AnomalyState(
+                    campaign_id=order.campaign_id, metric=metric, granularity='hour', bucket_start=hour
+                )
+            changed |= advance(state, hour)
+            # Orders for hours already closed are too late for the hourly baseline
+            if state.bucket_start == hour:
+                state.bucket_value += values.get(metric, 0)
+        _save(list(states.values()))
+    return changed
+
+
+def _daily_value(metric, row):
+    if row is None:
+        return None if metric == 'roas' else 0
+    spend, revenue = float(row['total_spend']), float(row['attributed_revenue'])
+    if metric == 'roas':
+        return revenue / spend if spend else None
+    return {'revenue': revenue, 'orders': row['attributed_orders'], 'spend': spend}[metric]
+
+
+def close_days(now=None):
+    """Close daily buckets of ACTIVE campaigns past the grace period. Returns brand ids whose alerts changed."""
+
+    now = now or timezone.now()
+    grace = timedelta(hours=getattr(settings, 'ANOMALY_DAILY_GRACE_HOURS', 6))
+    # Day D can be closed once D + 1 day + grace has passed
+    until = day_start(timezone.localdate(now - grace))
+    seed_days = getattr(settings, 'ANOMALY_SEED_DAYS', 28)
+
+    campaigns = {
+        campaign.id: campaign
+        for campaign in Campaign.objects.filter(status='ACTIVE').only('id', 'brand_id', 'campaign_start')
+    }
+    states = {
+        (state.campaign_id, state.metric): state
+        for state in AnomalyState.objects.filter(campaign_id__in=campaigns, granularity='day')
+    }
+    for campaign in campaigns.values():
+        # A new state learns its baseline from recent history, once
+        start = day_start(max(campaign.campaign_start, timezone.localdate(until) - timedelta(days=seed_days)))
+        for metric in DAILY_METRICS:
+            if (campaign.id, metric) not in states:
+                states[(campaign.id, metric)] = AnomalyState(
+                    campaign_id=campaign.id, metric=metric, granularity='day', bucket_start=start
+                )
+
+    pending = [state for state in states.values() if state.bucket_start < until]
+    if not pending:
+        return set()
+
+    first_day = timezone.localdate(min(state.bucket_start for state in pending))
+    rows = {
+        (row['campaign_id'], row['date']): row
+        for row in CampaignPerformance.objects.filter(
+            campaign_id__in={state.campaign_id for state in pending},
+            date__gte=first_day, date__lt=timezone.localdate(until),
+        ).values('campaign_id', 'date', 'total_spend', 'attributed_revenue', 'attributed_orders')
+    }
+
+    changed_brands = set()
+    for state in pending:
+        def bucket_values(start, state=state):
+            return _daily_value(state.metric, rows.get((state.campaign_id, timezone.localdate(start))))
+        if advance(state, until, bucket_values):
+            changed_brands.add(campaigns[state.campaign_id].brand_id)
+    _save(pending)
+    return changed_brands
+
+
+def close_hours(now=None):
+    """Close hourly buckets nothing has arrived in. Returns brand ids whose alerts changed."""
+
+    until = hour_start(now or timezone.now())
+    changed_brands = set()
+    with transaction.atomic():
+        states = list(AnomalyState.objects.select_for_update(of=('self',)).filter(
+            granularity='hour', bucket_start__lt=until, campaign__status='ACTIVE'
+        ))
+        brands = dict(Campaign.objects.filter(id__in={s.campaign_id for s in states}).values_list('id', 'brand_id'))
+        for state in states:
+            if advance(state, until):
+                changed_brands.add(brands[state.campaign_id])
+        _save(states)
+    return changed_brands
+
+
+def anomaly_message(state):
+    """Dashboard text for an AnomalyState (or values() dict) with an alert"""
+    get = state.get if isinstance(state, dict) else lambda field: getattr(state, field)
+    label = METRIC_LABELS[get('metric')]
+    sigmas = get('alert_sigmas')
+    direction = 'dropped' if sigmas < 0 else 'jumped'
+    side = 'below' if sigmas < 0 else 'above'
+    bucket = timezone.localtime(get('alert_bucket'))
+    when = f'at {bucket:%H}:00' if get('granularity') == 'hour' else f'on {bucket:%b %d}'
+    number = '{:.2f}' if get('metric') == 'roas' else '{:,.0f}'
+    return (
+        f'{label} {direction} {abs(sigmas):.1f}σ {side} baseline {when} '
+        f'({number.format(get("alert_value"))} vs {number.format(get("alert_baseline"))})'
+    )
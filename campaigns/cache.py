@@ -0,0 +1,83 @@
+# campaigns/cache.py - Versioned per-tenant caching for dashboards and analytics
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _version_key(kind, tenant_id):
+    return f'dataver:{kind}:{tenant_id}'
+
+
+def _new_version():
+    # Versions are seeded from the clock rather than 1: after an eviction a
+    # restarted counter could reach a version an old cached entry carries
+    return time.time_ns()
+
+
+def get_data_version(kind, tenant_id):
+    """Current data version for a brand or agency"""
+    version = cache.get(_version_key(kind, tenant_id))
+    if version is None:
+        seed = _new_version()
+        cache.add(_version_key(kind, tenant_id), seed, None)
+        version = cache.get(_version_key(kind, tenant_id), seed)
+    return version
+
+
+def get_data_versions(kind, tenant_ids):
+    """{tenant_id: data version} for several brands or agencies in one round trip"""
+    keys = {_version_key(kind, tenant_id): tenant_id for tenant_id in tenant_ids}
+    found = cache.get_many(keys)
+    return {
+        tenant_id: found[key] if key in found else get_data_version(kind, tenant_id)
+        for key, tenant_id in keys.items()
+    }
+
+
+def bump_data_version(kind, tenant_id):
+    """Invalidate every cached payload of a tenant by moving its version forward"""
+    if tenant_id is None:
+        return
+    key = _version_key(kind, tenant_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # No version stored yet (or evicted): any new value is unseen by readers
+        cache.add(key, _new_version(), None)
+
+
+def bump_campaign_tenants(campaign):
+    """Bump the brand and the selected agency a campaign belongs to"""
+    bump_data_version('brand', campaign.brand_id)
+    bump_data_version('agency', campaign.selected_agency_id)
+
+
+def cached_for_tenant(kind, tenant_id, name, builder, timeout=None):
+    """Return builder() cached under the tenant's current data version.
+
+    The entry is stored next to the version it was built from, so a read is
+    a single get_many round trip and a bump makes old entries unreachable
+    without deleting them.
+    """
+
+    if timeout is None:
+        timeout = getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300)
+
+    version_key = _version_key(kind, tenant_id)
+    value_key = f'tenantcache:{kind}:{tenant_id}:{name}'
+
+    found = cache.get_many([version_key, value_key])
+    version = found.get(version_key)
+    entry = found.get(value_key)
+
+    if version is not None and entry is not None and entry[0] == version:
+        return entry[1]
+
+    if version is None:
+        version = get_data_version(kind, tenant_id)
+
+    value = builder()
+    cache.set(value_key, (version, value), timeout)
+    return value
@@ -0,0 +1,84 @@
+# campaigns/charts.py - Chart series helpers
+
+from datetime import timedelta
+
+
+def fill_daily_gaps(rows, start_date, end_date, cumulative_fields=(), daily_fields=()):
+    """Return one row per day between start_date and end_date.
+
+    ``rows`` are dicts with a ``date`` key, ordered by date. Missing days
+    carry cumulative fields forward from the previous day and set daily
+    fields to 0.
+    """
+
+    by_date = {row['date']: row for row in rows}
+    filled = []
+    last = {field: 0 for field in cumulative_fields}
+
+    day = start_date
+    while day <= end_date:
+        row = by_date.get(day)
+        if row is not None:
+            last = {field: row[field] or 0 for field in cumulative_fields}
+            filled.append({'date': day, **last, **{field: row[field] or 0 for field in daily_fields}})
+        else:
+            filled.append({'date': day, **last, **{field: 0 for field in daily_fields}})
+        day += timedelta(days=1)
+
+    return filled
+
+
+def lttb_indices(values, threshold):
+    """Largest-Triangle-Three-Buckets downsampling over an evenly spaced series.
+
+    Returns the indices of the points to keep (always including the first and
+    last), so several series sharing an x-axis can be sampled consistently.
+    """
+
+    n = len(values)
+    if threshold >= n or n <= 2:
+        return list(range(n))
+    if threshold < 3:
+        return [0, n - 1]
+
+    indices = [0]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third triangle vertex
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        avg_x = (next_start + next_end - 1) / 2
+        avg_y = sum(values[next_start:next_end]) / (next_end - next_start)
+
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        ax, ay = a, values[a]
+
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (values[j] - ay) - (ax - j) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+
+        indices.append(best)
+        a = best
+
+    indices.append(n - 1)
+    return indices
+
+
+def bucket_sums(values, keep):
+    """Sum a per-day series onto the points kept by lttb_indices.
+
+    Each kept point carries its own value plus those of the dropped points
+    since the previous kept one, so the sampled series has the same total.
+    """
+
+    sums = []
+    previous = -1
+    for index in keep:
+        sums.append(sum(values[previous + 1:index + 1]))
+        previous = index
+    return sums
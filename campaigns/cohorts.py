@@ -0,0 +1,330 @@
+# campaigns/cohorts.py - Acquisition cohorts and repeat-purchase (LTV) analytics
+#
+# A customer (ShopifyOrder.customer_email, trimmed and lowercased, within
+# a brand) belongs to the cohort of the month of their first order, credited
+# to the campaign and agency that order was attributed to; orders without an
+# email are left out. Each CustomerCohort row holds one (brand, cohort
+# month, campaign, agency) cohort: its size, and per month since
+# acquisition the customers who ordered, the orders and the revenue.
+#
+# Orders are read with values_list in chunks of COHORT_CHUNK_SIZE into
+# NumPy columns (never model instances) and grouped with sorts and
+# bincounts, so a full rebuild is one pass over the brand's orders.
+# ShopifyOrder.in_cohorts marks the orders folded in; an id high-water mark
+# would skip an order whose transaction commits after one with a higher id.
+# New orders are added by recomputing only the customers they belong to,
+# from those customers' full history with and without the new orders, and
+# applying the difference to the stored rows; that also covers an old
+# customer whose "first" order arrives late and moves them to an earlier
+# cohort. `manage.py update_cohorts --interval N` does this in batches
+# outside the webhook request, and `--rebuild` picks up edited or deleted
+# orders.
+from datetime import date
+from decimal import Decimal
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import Lower, Trim
+from django.utils import timezone
+
+from .models import CohortCursor, CustomerCohort, ShopifyOrder
+
+ORDER_FIELDS = ('id', 'customer_key', 'order_created_at', 'normalized_total', 'campaign_id', 'agency_id')
+COLUMNS = ('id', 'customer', 'timestamp', 'month', 'cents', 'campaign', 'agency')
+SERIES = ('active_customers', 'orders', 'revenue')
+CENT = Decimal('0.01')
+
+# Values per IN (...) when reading customers' histories or marking orders folded in
+IN_BATCH = 500
+
+
+def month_index(day):
+    return day.year * 12 + day.month - 1
+
+
+def month_start(index):
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _chunk_size():
+    return getattr(settings, 'COHORT_CHUNK_SIZE', 20000)
+
+
+def _empty_columns():
+    return {
+        name: np.zeros(0, dtype=np.float64 if name == 'timestamp' else np.int64)
+        for name in COLUMNS
+    }
+
+
+def with_customer_key(queryset):
+    """Orders with an email, annotated with the customer key (indexed per brand)"""
+    return queryset.annotate(customer_key=Lower(Trim('customer_email'))).exclude(customer_key='')
+
+
+def order_columns(queryset, customers=None):
+    """NumPy columns of the orders in a queryset (optionally of the given customer keys), streamed in chunks.
+
+    Customers are identified by the hash of their key, which is stable
+    within the process; only the grouping, never the hash, is stored.
+    """
+
+    tz = timezone.get_current_timezone()
+    chunk_size = _chunk_size()
+    queryset = with_customer_key(queryset)
+    if customers is not None:
+        queryset = queryset.filter(customer_key__in=customers)
+    rows = queryset.order_by().values_list(*ORDER_FIELDS).iterator(chunk_size=chunk_size)
+    parts = {name: [] for name in COLUMNS}
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        n = len(chunk)
+        parts['id'].append(np.fromiter((row[0] for row in chunk), dtype=np.int64, count=n))
+        parts['customer'].append(np.fromiter((hash(row[1]) for row in chunk), dtype=np.int64, count=n))
+        parts['timestamp'].append(np.fromiter((row[2].timestamp() for row in chunk), dtype=np.float64, count=n))
+        parts['month'].append(np.fromiter((month_index(row[2].astimezone(tz)) for row in chunk), dtype=np.int64, count=n))
+        parts['cents'].append(np.fromiter((int((row[3] or 0) * 100) for row in chunk), dtype=np.int64, count=n))
+        parts['campaign'].append(np.fromiter((row[4] or 0 for row in chunk), dtype=np.int64, count=n))
+        parts['agency'].append(np.fromiter((row[5] or 0 for row in chunk), dtype=np.int64, count=n))
+    if not parts['id']:
+        return _empty_columns()
+    return {name: np.concatenate(arrays) for name, arrays in parts.items()}
+
+
+def cohort_cells(columns):
+    """Group order columns into {(cohort month index, campaign id, agency id): cell}.
+
+    A cell is {'customers': int, 'active_customers', 'orders', 'cents'}, the
+    last three int64 arrays indexed by months since acquisition (0 = none).
+    """
+
+    if not columns['id'].size:
+        return {}
+
+    _, customer = np.unique(columns['customer'], return_inverse=True)
+    customer = customer.reshape(-1)
+
+    # First order of each customer: earliest, ties broken by the lower id
+    by_customer = np.lexsort((columns['id'], columns['timestamp'], customer))
+    first = by_customer[np.unique(customer[by_customer], return_index=True)[1]]
+    cohort = columns['month'][first]
+    keys = np.stack([cohort, columns['campaign'][first], columns['agency'][first]], axis=1)
+    groups, customer_group = np.unique(keys, axis=0, return_inverse=True)
+    customer_group = customer_group.reshape(-1)
+
+    offset = columns['month'] - cohort[customer]
+    width = int(offset.max()) + 1
+    size = len(groups) * width
+    cell = customer_group[customer] * width + offset
+    orders = np.bincount(cell, minlength=size).reshape(len(groups), width)
+    # Float sums of integer cents are exact far beyond any realistic revenue
+    cents = np.rint(np.bincount(cell, weights=columns['cents'], minlength=size)).astype(np.int64).reshape(len(groups), width)
+
+    # Customers active in a month: distinct (customer, month) pairs
+    pairs = np.unique(customer * width + offset)
+    active = np.bincount(
+        customer_group[pairs // width] * width + pairs % width, minlength=size
+    ).reshape(len(groups), width)
+    sizes = np.bincount(customer_group, minlength=len(groups))
+
+    return {
+        (int(key[0]), int(key[1]), int(key[2])): {
+            'customers': int(sizes[g]), 'active_customers': active[g], 'orders': orders[g], 'cents': cents[g],
+        }
+        for g, key in enumerate(groups)
+    }
+
+
+def _series(cell):
+    """Stored JSON lists for a cell, without trailing empty months"""
+    used = np.flatnonzero(cell['orders'])
+    width = int(used[-1]) + 1 if used.size else 0
+    return {
+        'active_customers': [int(value) for value in cell['active_customers'][:width]],
+        'orders': [int(value) for value in cell['orders'][:width]],
+        'revenue': [str((Decimal(int(value)) / 100).quantize(CENT)) for value in cell['cents'][:width]],
+    }
+
+
+def _row_cell(row):
+    return {
+        'customers': row.customers,
+        'active_customers': np.array(row.active_customers, dtype=np.int64),
+        'orders': np.array(row.orders, dtype=np.int64),
+        'cents': np.array([int(Decimal(value) * 100) for value in row.revenue], dtype=np.int64),
+    }
+
+
+def _empty_cell():
+    return {'customers': 0, **{field: np.zeros(0, dtype=np.int64) for field in ('active_customers', 'orders', 'cents')}}
+
+
+def _add_cells(total, cell, sign=1):
+    width = max(len(total['orders']), len(cell['orders']))
+    result = {'customers': total['customers'] + sign * cell['customers']}
+    for field in ('active_customers', 'orders', 'cents'):
+        values = np.zeros(width, dtype=np.int64)
+        values[:len(total[field])] += total[field]
+        values[:len(cell[field])] += sign * cell[field]
+        result[field] = values
+    return result
+
+
+def _cohort_row(brand_id, key, cell):
+    return CustomerCohort(
+        brand_id=brand_id, cohort_month=month_start(key[0]),
+        campaign_id=key[1] or None, agency_id=key[2] or None,
+        customers=cell['customers'], **_series(cell)
+    )
+
+
+def _lock_cursor(brand_id):
+    CohortCursor.objects.get_or_create(brand_id=brand_id)
+    return CohortCursor.objects.select_for_update().get(brand_id=brand_id)
+
+
+def rebuild_cohorts(brand_id):
+    """Recompute a brand's cohorts from all of its orders. Returns the number of orders read."""
+
+    with transaction.atomic():
+        cursor = _lock_cursor(brand_id)
+        # Mark first and read the marked orders: one committing in between
+        # stays unmarked for the next refresh instead of being skipped
+        ShopifyOrder.objects.filter(brand_id=brand_id, in_cohorts=False).update(in_cohorts=True)
+        columns = order_columns(ShopifyOrder.objects.filter(brand_id=brand_id, in_cohorts=True))
+
+        CustomerCohort.objects.filter(brand_id=brand_id).delete()
+        CustomerCohort.objects.bulk_create(
+            [_cohort_row(brand_id, key, cell) for key, cell in cohort_cells(columns).items()], batch_size=1000
+        )
+        _advance_cursor(cursor, columns['id'])
+    return int(columns['id'].size)
+
+
+def refresh_cohorts(brand_id):
+    """Fold orders not yet in a brand's cohorts into them. Returns the number of new orders."""
+
+    with transaction.atomic():
+        cursor = _lock_cursor(brand_id)
+        pending = ShopifyOrder.objects.filter(brand_id=brand_id, in_cohorts=False)
+        if cursor.last_order_id == 0:
+            # First build
+            return rebuild_cohorts(brand_id) if pending.exists() else 0
+
+        limit = getattr(settings, 'COHORT_INCREMENTAL_MAX_CUSTOMERS', 5000)
+        customers = list(
+            with_customer_key(pending).order_by().values_list('customer_key', flat=True).distinct()[:limit + 1]
+        )
+        if len(customers) > limit:
+            # A backlog where one pass over everything is cheaper
+            return rebuild_cohorts(brand_id)
+
+        # Both reads are limited to these customers, so orders committing
+        # meanwhile (of any customer) stay pending for the next refresh
+        batches = [customers[i:i + IN_BATCH] for i in range(0, len(customers), IN_BATCH)]
+        new = _concat([order_columns(pending, batch) for batch in batches])
+        known = _concat([
+            order_columns(ShopifyOrder.objects.filter(brand_id=brand_id, in_cohorts=True), batch) for batch in batches
+        ])
+        _apply_changes(brand_id, cohort_cells(known), cohort_cells(_concat([known, new])))
+
+        # Orders without an email are never part of a cohort
+        new_ids = [int(order_id) for order_id in new['id']]
+        pending.annotate(email=Trim('customer_email')).filter(email='').update(in_cohorts=True)
+        for i in range(0, len(new_ids), IN_BATCH):
+            ShopifyOrder.objects.filter(id__in=new_ids[i:i + IN_BATCH]).update(in_cohorts=True)
+        _advance_cursor(cursor, new['id'])
+    return len(new_ids)
+
+
+def _concat(parts):
+    return {name: np.concatenate([part[name] for part in parts]) for name in COLUMNS} if parts else _empty_columns()
+
+
+def _advance_cursor(cursor, ids):
+    if ids.size:
+        cursor.last_order_id = max(cursor.last_order_id, int(ids.max()))
+    cursor.save(update_fields=['last_order_id', 'updated_at'])
+
+
+def _apply_changes(brand_id, before, after):
+    keys = set(before) | set(after)
+    rows = {
+        (month_index(row.cohort_month), row.campaign_id or 0, row.agency_id or 0): row
+        for row in CustomerCohort.objects.select_for_update().filter(
+            brand_id=brand_id, cohort_month__in={month_start(key[0]) for key in keys}
+        )
+    }
+
+    changed, created, emptied = [], [], []
+    for key in keys:
+        cell = _row_cell(rows[key]) if key in rows else _empty_cell()
+        if key in after:
+            cell = _add_cells(cell, after[key])
+        if key in before:
+            cell = _add_cells(cell, before[key], sign=-1)
+
+        if key not in rows:
+            if cell['customers']:
+                created.append(_cohort_row(brand_id, key, cell))
+        elif cell['customers']:
+            row = rows[key]
+            row.customers = cell['customers']
+            for field, values in _series(cell).items():
+                setattr(row, field, values)
+            changed.append(row)
+        else:
+            emptied.append(rows[key].id)
+
+    CustomerCohort.objects.filter(id__in=emptied).delete()
+    # An upsert on the primary key writes every changed row in one statement;
+    # campaign and agency can be NULL, so new rows are created explicitly
+    CustomerCohort.objects.bulk_create(
+        changed, batch_size=1000, update_conflicts=True, unique_fields=['id'],
+        update_fields=['customers', *SERIES, 'updated_at']
+    )
+    CustomerCohort.objects.bulk_create(created, batch_size=1000)
+
+
+def cohort_report(rows):
+    """Cohort x month matrix from CustomerCohort rows (or values() dicts), merged across campaigns.
+
+    One entry per cohort month, oldest first, with retention (% of the
+    cohort ordering in each month since acquisition) and cumulative revenue
+    per acquired customer (LTV to date).
+    """
+
+    cohorts = {}
+    for row in rows:
+        get = row.get if isinstance(row, dict) else lambda field: getattr(row, field)
+        merged = cohorts.setdefault(get('cohort_month'), {'customers': 0, 'active_customers': [], 'orders': [], 'revenue': []})
+        merged['customers'] += get('customers')
+        for field in SERIES:
+            values = get(field)
+            target = merged[field]
+            target.extend([0] * (len(values) - len(target)))
+            for i, value in enumerate(values):
+                target[i] += Decimal(value) if field == 'revenue' else value
+
+    report = []
+    for cohort_month in sorted(cohorts):
+        merged = cohorts[cohort_month]
+        customers = merged['customers']
+        cumulative, ltv = Decimal('0'), []
+        for revenue in merged['revenue']:
+            cumulative += revenue
+            ltv.append((cumulative / customers).quantize(CENT) if customers else Decimal('0'))
+        report.append({
+            'cohort_month': cohort_month,
+            'customers': customers,
+            'active_customers': merged['active_customers'],
+            'retention': [round(active * 100 / customers, 1) if customers else 0 for active in merged['active_customers']],
+            'orders': merged['orders'],
+            'revenue': [Decimal(value) for value in merged['revenue']],
+            'cumulative_ltv': ltv,
+        })
+    return report
@@ -0,0 +1,132 @@
+# campaigns/conditional.py - ETag/Last-Modified for the dashboard polling APIs
+#
+# Each poll first reads a few high-water marks for the tenant in a single
+# query. If they match what the client already has, Django's ``condition``
+# decorator answers 304 without running the view's aggregations.
+
+import hashlib
+
+from django.db.models import Max, OuterRef, Subquery
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from accounts.models import Agency, Brand
+from .notifications import notifications_for_user
+from .models import Campaign, CampaignBid, CampaignPerformance, EscrowPayment, PerformanceMetric, RollingMetric, ShopifyOrder
+
+# Newest-change timestamps that feed the analytics payload: (key, model, field)
+ANALYTICS_SOURCES = [
+    ('last_perf', CampaignPerformance, 'last_updated'),
+    ('last_order', ShopifyOrder, 'processed_at'),
+    ('last_escrow', EscrowPayment, 'updated_at'),
+    ('last_bid', CampaignBid, 'updated_at'),
+    ('last_metric', PerformanceMetric, 'updated_at'),
+    ('last_rolling', RollingMetric, 'updated_at'),
+]
+
+
+def _latest(queryset, field):
+    """Correlated subquery returning the newest value of field"""
+    return Subquery(queryset.order_by(f'-{field}').values(field)[:1])
+
+
+def _poll_state(request, key, compute):
+    """Memoize the high-water marks on the request so ETag and Last-Modified share one query"""
+    cache = request.__dict__.setdefault('_poll_state', {})
+    if key not in cache:
+        cache[key] = compute()
+    return cache[key]
+
+
+def _etag(*parts):
+    return hashlib.md5('|'.join(str(p) for p in parts).encode('utf-8')).hexdigest()
+
+
+def _newest(*timestamps):
+    present = [t for t in timestamps if t is not None]
+    return max(present) if present else None
+
+
+def campaign_analytics_state(request, campaign_id):
+    def compute():
+        row = Campaign.objects.filter(id=campaign_id).values(
+            'updated_at', 'brand__user_id', 'selected_agency__user_id',
+            **{key: _latest(model.objects.filter(campaign=OuterRef('pk')), field) for key, model, field in ANALYTICS_SOURCES},
+        ).first()
+        # Only owners get validators; everyone else falls through to the view's 403/404
+        if row is None or request.user.id not in (row['brand__user_id'], row['selected_agency__user_id']):
+            return None
+        return row
+    return _poll_state(request, 'campaign_analytics', compute)
+
+
+def campaign_analytics_etag(request, campaign_id):
+    row = campaign_analytics_state(request, campaign_id)
+    if row is None:
+        return None
+    return _etag(
+        'analytics', campaign_id, request.GET.urlencode(), timezone.localdate(),
+        row['updated_at'], *(row[key] for key, _, _ in ANALYTICS_SOURCES),
+    )
+
+
+def campaign_analytics_last_modified(request, campaign_id):
+    row = campaign_analytics_state(request, campaign_id)
+    if row is None:
+        return None
+    # The payload's date range moves at midnight
+    start_of_day = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    return _newest(start_of_day, row['updated_at'], *(row[key] for key, _, _ in ANALYTICS_SOURCES))
+
+
+def notifications_state(request):
+    def compute():
+        notifications = notifications_for_user(request.user)
+        if notifications is None:
+            return None
+        return notifications.order_by('-id').values('id', 'created_at').first() or {'id': 0, 'created_at': None}
+    return _poll_state(request, 'notifications', compute)
+
+
+def notifications_etag(request):
+    row = notifications_state(request)
+    if row is None:
+        return None
+    return _etag('notifications', request.user.id, request.GET.urlencode(), row['id'])
+
+
+def notifications_last_modified(request):
+    row = notifications_state(request)
+    return row['created_at'] if row else None
+
+
+def shopify_status_state(request):
+    def compute():
+        return Brand.objects.filter(user=request.user).annotate(
+            last_order=Max('shopify_orders__processed_at'),
+            last_order_id=Max('shopify_orders__id'),
+        ).values('shopify_connected', 'shopify_domain', 'last_order', 'last_order_id').first()
+    return _poll_state(request, 'shopify_status', compute)
+
+
+def shopify_status_etag(request):
+    row = shopify_status_state(request)
+    if row is None:
+        return None
+    return _etag('shopify_status', *row.values())
+
+
+def shopify_status_last_modified(request):
+    row = shopify_status_state(request)
+    return row['last_order'] if row else None
+
+
+campaign_analytics_condition = condition(
+    etag_func=campaign_analytics_etag, last_modified_func=campaign_analytics_last_modified
+)
+notifications_condition = condition(
+    etag_func=notifications_etag, last_modified_func=notifications_last_modified
+)
+shopify_status_condition = condition(
+    etag_func=shopify_status_etag, last_modified_func=shopify_status_last_modified
+)
@@ -0,0 +1,212 @@
+# campaigns/connector_stub.py - Local stand-in for the ad platform reporting APIs
+#
+# Serves the three endpoints the spend connectors call, with the same
+# request and response shapes, so connectors can be tested and benchmarked
+# offline:
+#
+#   GET  /<version>/act_<account>/insights                  Meta insights
+#   POST /<version>/customers/<id>/googleAds:searchStream   Google Ads
+#   GET  /open_api/<version>/report/integrated/get/          TikTok report
+#
+# Spend is a deterministic function of (platform, campaign name, day), so
+# tests can compute what a sync must have stored. Optional per-request
+# latency and a per-platform requests-per-second limit (answered with 429
+# and Retry-After) make the concurrency and rate limiting measurable.
+
+import hashlib
+import json
+import re
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+META_PATH = re.compile(r'^/[^/]+/act_[^/]+/insights$')
+GOOGLE_PATH = re.compile(r'^/[^/]+/customers/[^/]+/googleAds:searchStream$')
+TIKTOK_PATH = re.compile(r'^/open_api/[^/]+/report/integrated/get/?$')
+
+GAQL_DATES = re.compile(r"segments\.date BETWEEN '(\d{4}-\d{2}-\d{2})' AND '(\d{4}-\d{2}-\d{2})'")
+GAQL_NAMES = re.compile(r"campaign\.name IN \((.*)\)")
+GAQL_STRING = re.compile(r"'((?:[^'\\]|\\.)*)'")
+
+
+def stub_spend(platform, name, day):
+    """Spend the stub reports for a campaign and day (0.00 - 499.99)"""
+    digest = hashlib.sha256(f'{platform}:{name}:{day.isoformat()}'.encode()).hexdigest()
+    return Decimal(int(digest[:8], 16) % 50000) / 100
+
+
+def _days(since, until):
+    day = since
+    while day <= until:
+        yield day
+        day += timedelta(days=1)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real APIs
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _admit(self, platform):
+        stub = self.server.stub
+        stub.count(platform)
+        if stub.latency:
+            time.sleep(stub.latency)
+        if stub.over_limit(platform):
+            self._send(429, {'error': 'rate limited'}, {'Retry-After': '1'})
+            return False
+        return True
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        if META_PATH.match(parts.path):
+            if not query.get('access_token'):
+                return self._send(401, {'error': {'message': 'Invalid OAuth access token'}})
+            if self._admit('META'):
+                self._meta(parts.path, query)
+        elif TIKTOK_PATH.match(parts.path):
+            if not self.headers.get('Access-Token'):
+                return self._send(200, {'code': 40105, 'message': 'Access token is incorrect'})
+            if self._admit('TIKTOK'):
+                self._tiktok(query)
+        else:
+            self._send(404, {'error': 'not found'})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        if GOOGLE_PATH.match(urlsplit(self.path).path):
+            if not self.headers.get('Authorization') or not self.headers.get('developer-token'):
+                return self._send(401, {'error': {'status': 'UNAUTHENTICATED'}})
+            if self._admit('GOOGLE'):
+                self._google(payload.get('query', ''))
+        else:
+            self._send(404, {'error': 'not found'})
+
+    def _meta(self, path, query):
+        time_range = json.loads(query['time_range'])
+        since, until = date.fromisoformat(time_range['since']), date.fromisoformat(time_range['until'])
+        names = []
+        for condition in json.loads(query.get('filtering', '[]')):
+            if condition.get('field') == 'campaign.name':
+                names.extend(condition.get('value', []))
+
+        rows = [
+            {'campaign_name': name, 'date_start': day.isoformat(), 'date_stop': day.isoformat(),
+             'spend': str(stub_spend('META', name, day))}
+            for name in sorted(names) for day in _days(since, until)
+        ]
+        offset, limit = int(query.get('after', 0)), int(query.get('limit', 25))
+        payload = {'data': rows[offset:offset + limit], 'paging': {}}
+        if offset + limit < len(rows):
+            next_query = dict(query, after=offset + limit)
+            payload['paging']['next'] = f"http://{self.headers['Host']}{path}?{urlencode(next_query)}"
+        self._send(200, payload)
+
+    def _google(self, gaql):
+        dates = GAQL_DATES.search(gaql)
+        names_clause = GAQL_NAMES.search(gaql)
+        if not dates or not names_clause:
+            return self._send(400, {'error': {'status': 'INVALID_ARGUMENT', 'message': 'Unsupported query'}})
+        since, until = date.fromisoformat(dates.group(1)), date.fromisoformat(dates.group(2))
+        names = [re.sub(r'\\(.)', r'\1', name) for name in GAQL_STRING.findall(names_clause.group(1))]
+
+        results = [
+            {'campaign': {'name': name}, 'segments': {'date': day.isoformat()},
+             'metrics': {'costMicros': str(int(stub_spend('GOOGLE', name, day) * 1000000))}}
+            for name in sorted(names) for day in _days(since, until)
+        ]
+        self._send(200, [{'results': results[i:i + 10000]} for i in range(0, len(results), 10000)] or [{'results': []}])
+
+    def _tiktok(self, query):
+        since, until = date.fromisoformat(query['start_date']), date.fromisoformat(query['end_date'])
+        rows = [
+            {'dimensions': {'campaign_id': str(1000 + i), 'stat_time_day': f'{day.isoformat()} 00:00:00'},
+             'metrics': {'campaign_name': name, 'spend': str(stub_spend('TIKTOK', name, day))}}
+            for i, name in enumerate(self.server.stub.campaigns) for day in _days(since, until)
+        ]
+        page, page_size = int(query.get('page', 1)), int(query.get('page_size', 10))
+        total_pages = max(1, -(-len(rows) // page_size))
+        self._send(200, {'code': 0, 'message': 'OK', 'data': {
+            'list': rows[(page - 1) * page_size:page * page_size],
+            'page_info': {'page': page, 'page_size': page_size, 'total_number': len(rows), 'total_page': total_pages},
+        }})
+
+
+class AdPlatformStub:
+    """Threaded stub server; use as a context manager or call start()/stop().
+
+    ``campaigns`` are the campaign names the TikTok endpoint lists (Meta and
+    Google answer for whatever names a request filters on).
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, campaigns=(), latency=0.0, requests_per_second=0):
+        self.campaigns = list(campaigns)
+        self.latency = latency
+        self.requests_per_second = requests_per_second
+        self.requests = {}
+        self.windows = {}
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), StubHandler)
+        self.server.daemon_threads = True
+        self.server.stub = self
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def connector_configs(self, requests_per_second=0):
+        """AD_PLATFORM_CONNECTORS pointing every platform at this stub"""
+        common = {'base_url': self.url, 'access_token': 'stub-token', 'requests_per_second': requests_per_second}
+        return {
+            'META': {**common, 'account_id': '1000'},
+            'GOOGLE': {**common, 'customer_id': '123-456-7890', 'developer_token': 'stub-developer'},
+            'TIKTOK': {**common, 'advertiser_id': '7000'},
+        }
+
+    def count(self, platform):
+        with self.lock:
+            self.requests[platform] = self.requests.get(platform, 0) + 1
+
+    def over_limit(self, platform):
+        if not self.requests_per_second:
+            return False
+        second = int(time.monotonic())
+        with self.lock:
+            window, used = self.windows.get(platform, (second, 0))
+            if window != second:
+                window, used = second, 0
+            self.windows[platform] = (window, used + 1)
+            return used + 1 > self.requests_per_second
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,361 @@
+# campaigns/connectors.py - Daily spend connectors for the ad platform reporting APIs
+#
+# sync_spend() pulls daily spend for every ACTIVE campaign from Meta, Google
+# Ads and TikTok and writes it into the per-platform spend columns of
+# CampaignPerformance through the same batch writer the CSV importer uses.
+#
+# Requests run on a bounded thread pool (SPEND_SYNC_WORKERS). Work is split
+# into tasks of up to SPEND_SYNC_CHUNK_SIZE campaigns and
+# SPEND_SYNC_WINDOW_DAYS days; each platform has its own request pacing
+# (requests_per_second) shared by all threads, and every worker thread keeps
+# one keep-alive connection per host. Workers only do HTTP: results are
+# written to the database from the calling thread as tasks complete.
+#
+# Platform campaigns are matched by name to Campaign.utm_campaign. A
+# SpendSyncCursor per campaign and platform records the last day fetched;
+# the next run starts SPEND_SYNC_LOOKBACK_DAYS before it because platforms
+# restate recent spend.
+
+import http.client
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Campaign, SpendSyncCursor
+from .spend_import import SpendImporter
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class ConnectorError(Exception):
+    """A reporting API request failed after retries"""
+
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across threads"""
+
+    def __init__(self, requests_per_second):
+        self.interval = 1.0 / requests_per_second if requests_per_second > 0 else 0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class HttpPool:
+    """Keep-alive HTTP(S) connections, one per host and worker thread"""
+
+    def __init__(self, timeout=30):
+        self.timeout = timeout
+        self.local = threading.local()
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def _connections(self):
+        if not hasattr(self.local, 'connections'):
+            self.local.connections = {}
+        return self.local.connections
+
+    def request(self, method, url, body=None, headers=None):
+        """(status, headers, body bytes); reconnects once if a kept-alive connection was dropped"""
+        parts = urlsplit(url)
+        path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        key = (parts.scheme, parts.netloc)
+        connections = self._connections()
+
+        for attempt in range(2):
+            connection = connections.get(key)
+            if connection is None:
+                connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+                connection = connections[key] = connection_class(parts.netloc, timeout=self.timeout)
+            try:
+                connection.request(method, path, body=body, headers=headers or {})
+                response = connection.getresponse()
+                data = response.read()
+            except (http.client.HTTPException, OSError) as e:
+                connection.close()
+                del connections[key]
+                if attempt:
+                    raise ConnectorError(f'{method} {parts.netloc}{parts.path}: {e}')
+                continue
+            with self.lock:
+                self.requests += 1
+            return response.status, response.headers, data
+
+
+class SpendConnector:
+    """Fetches (campaign name, day, spend) rows from one platform"""
+
+    platform = None
+    # Campaign names per request; None when the API cannot filter by name
+    chunk_size = None
+
+    def __init__(self, config, http):
+        self.config = config
+        self.http = http
+        self.limiter = RateLimiter(config.get('requests_per_second', 5))
+
+    @property
+    def configured(self):
+        return bool(self.config.get('access_token'))
+
+    def request_json(self, method, url, payload=None, headers=None):
+        """Rate-limited request with retries on 429 and 5xx"""
+        body = json.dumps(payload).encode('utf-8') if payload is not None else None
+        headers = {'Accept': 'application/json', **(headers or {})}
+        if body is not None:
+            headers['Content-Type'] = 'application/json'
+
+        retries = getattr(settings, 'SPEND_SYNC_MAX_RETRIES', 3)
+        for attempt in range(retries + 1):
+            self.limiter.wait()
+            status, response_headers, data = self.http.request(method, url, body=body, headers=headers)
+            if status == 200:
+                return json.loads(data)
+            if status not in RETRY_STATUSES or attempt == retries:
+                raise ConnectorError(f'{self.platform} API returned {status}: {data[:200]!r}')
+            try:
+                delay = float(response_headers.get('Retry-After', ''))
+            except ValueError:
+                delay = 0.5 * 2 ** attempt
+            time.sleep(delay)
+
+    def fetch(self, names, since, until):
+        raise NotImplementedError
+
+    def collect(self, names, since, until):
+        return list(self.fetch(names, since, until))
+
+
+class MetaConnector(SpendConnector):
+    """Marketing API insights, campaign level, one row per campaign and day"""
+
+    platform = 'META'
+    chunk_size = 50
+
+    @property
+    def configured(self):
+        return super().configured and bool(self.config.get('account_id'))
+
+    def fetch(self, names, since, until):
+        params = {
+            'level': 'campaign',
+            'fields': 'campaign_name,spend',
+            'time_increment': 1,
+            'time_range': json.dumps({'since': since.isoformat(), 'until': until.isoformat()}),
+            'filtering': json.dumps([{'field': 'campaign.name', 'operator': 'IN', 'value': list(names)}]),
+            'limit': 500,
+            'access_token': self.config['access_token'],
+        }
+        url = f"{self.config['base_url']}/{self.config.get('version', 'v19.0')}/act_{self.config['account_id']}/insights?{urlencode(params)}"
+        while url:
+            data = self.request_json('GET', url)
+            for row in data.get('data', []):
+                yield row['campaign_name'], date.fromisoformat(row['date_start']), Decimal(row.get('spend') or '0')
+            url = data.get('paging', {}).get('next')
+
+
+class GoogleAdsConnector(SpendConnector):
+    """Google Ads searchStream with a GAQL campaign/date query (cost in micros)"""
+
+    platform = 'GOOGLE'
+    chunk_size = 100
+
+    @property
+    def configured(self):
+        return super().configured and bool(self.config.get('customer_id') and self.config.get('developer_token'))
+
+    def fetch(self, names, since, until):
+        quoted = ', '.join("'%s'" % name.replace('\\', '\\\\').replace("'", "\\'") for name in names)
+        query = (
+            'SELECT campaign.name, segments.date, metrics.cost_micros FROM campaign '
+            f"WHERE segments.date BETWEEN '{since.isoformat()}' AND '{until.isoformat()}' "
+            f'AND campaign.name IN ({quoted})'
+        )
+        headers = {
+            'Authorization': f"Bearer {self.config['access_token']}",
+            'developer-token': self.config['developer_token'],
+        }
+        if self.config.get('login_customer_id'):
+            headers['login-customer-id'] = self.config['login_customer_id']
+
+        customer_id = str(self.config['customer_id']).replace('-', '')
+        url = f"{self.config['base_url']}/{self.config.get('version', 'v16')}/customers/{customer_id}/googleAds:searchStream"
+        for batch in self.request_json('POST', url, {'query': query}, headers):
+            for result in batch.get('results', []):
+                yield (
+                    result['campaign']['name'],
+                    date.fromisoformat(result['segments']['date']),
+                    Decimal(int(result['metrics'].get('costMicros', 0))) / 1000000,
+                )
+
+
+class TikTokConnector(SpendConnector):
+    """Integrated report per campaign and day; filtered to our names locally"""
+
+    platform = 'TIKTOK'
+    chunk_size = None
+
+    @property
+    def configured(self):
+        return super().configured and bool(self.config.get('advertiser_id'))
+
+    def fetch(self, names, since, until):
+        wanted = set(names)
+        base = f"{self.config['base_url']}/open_api/{self.config.get('version', 'v1.3')}/report/integrated/get/"
+        page, total_pages = 1, 1
+        while page <= total_pages:
+            params = {
+                'advertiser_id': self.config['advertiser_id'],
+                'report_type': 'BASIC',
+                'data_level': 'AUCTION_CAMPAIGN',
+                'dimensions': json.dumps(['campaign_id', 'stat_time_day']),
+                'metrics': json.dumps(['spend', 'campaign_name']),
+                'start_date': since.isoformat(),
+                'end_date': until.isoformat(),
+                'page': page,
+                'page_size': 1000,
+            }
+            data = self.request_json('GET', f'{base}?{urlencode(params)}', headers={'Access-Token': self.config['access_token']})
+            if data.get('code') != 0:
+                raise ConnectorError(f"TIKTOK API error {data.get('code')}: {data.get('message')}")
+            for row in data['data'].get('list', []):
+                name = row['metrics']['campaign_name']
+                if name in wanted:
+                    day = datetime.strptime(row['dimensions']['stat_time_day'][:10], '%Y-%m-%d').date()
+                    yield name, day, Decimal(row['metrics'].get('spend') or '0')
+            total_pages = data['data'].get('page_info', {}).get('total_page', 1)
+            page += 1
+
+
+CONNECTORS = {
+    'META': MetaConnector,
+    'GOOGLE': GoogleAdsConnector,
+    'TIKTOK': TikTokConnector,
+}
+
+
+def _windows(since, until, days):
+    while since <= until:
+        end = min(until, since + timedelta(days=days - 1))
+        yield since, end
+        since = end + timedelta(days=1)
+
+
+def _chunks(items, size):
+    if not size:
+        yield items
+        return
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def sync_spend(platforms=None, configs=None, workers=None, until=None):
+    """Fetch and store daily spend of ACTIVE campaigns; returns run statistics"""
+
+    configs = configs if configs is not None else getattr(settings, 'AD_PLATFORM_CONNECTORS', {})
+    workers = workers or getattr(settings, 'SPEND_SYNC_WORKERS', 8)
+    lookback = timedelta(days=getattr(settings, 'SPEND_SYNC_LOOKBACK_DAYS', 3))
+    window_days = getattr(settings, 'SPEND_SYNC_WINDOW_DAYS', 30)
+    until = until or timezone.localdate()
+    started = time.perf_counter()
+
+    http = HttpPool(timeout=getattr(settings, 'SPEND_SYNC_TIMEOUT', 30))
+    connectors = [
+        CONNECTORS[platform](configs[platform], http)
+        for platform in (platforms or CONNECTORS)
+        if platform in configs
+    ]
+    connectors = [connector for connector in connectors if connector.configured]
+
+    campaigns = Campaign.objects.filter(status='ACTIVE').exclude(utm_campaign='')
+    active = list(campaigns.only('id', 'brand_id', 'selected_agency_id', 'utm_campaign', 'platforms',
+                                 'campaign_start', 'campaign_end'))
+    cursors = {
+        (cursor.campaign_id, cursor.platform): cursor.synced_through
+        for cursor in SpendSyncCursor.objects.filter(campaign__in=campaigns)
+    }
+
+    stats = {'platforms': [c.platform for c in connectors], 'tasks': 0, 'rows': 0, 'days': 0, 'errors': []}
+    importers, ranges, tasks = {}, {}, []
+    for connector in connectors:
+        platform = connector.platform
+        importers[platform] = SpendImporter(platform, campaigns=campaigns, source='API')
+
+        # Per campaign: the days still to fetch
+        for campaign in active:
+            if platform not in (campaign.platforms or []):
+                continue
+            cursor = cursors.get((campaign.id, platform))
+            since = max(campaign.campaign_start, cursor - lookback) if cursor else campaign.campaign_start
+            end = min(until, campaign.campaign_end)
+            if since <= end:
+                ranges[(platform, campaign.utm_campaign)] = (campaign, since, end)
+
+        names = sorted(name for p, name in ranges if p == platform)
+        for chunk in _chunks(names, connector.chunk_size):
+            since = min(ranges[(platform, name)][1] for name in chunk)
+            end = max(ranges[(platform, name)][2] for name in chunk)
+            for window in _windows(since, end, window_days):
+                tasks.append((connector, chunk, *window))
+
+    failed = set()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(connector.collect, chunk, since, end): (connector, chunk)
+                   for connector, chunk, since, end in tasks}
+        for future in as_completed(futures):
+            connector, chunk = futures[future]
+            platform = connector.platform
+            try:
+                rows = future.result()
+            except ConnectorError as e:
+                stats['errors'].append(str(e))
+                failed.update((platform, name) for name in chunk)
+                continue
+            except Exception as e:
+                # A malformed response (missing keys, bad JSON or amounts) only
+                # fails its own task, so the others still write and move cursors
+                logger.exception('%s spend task failed', platform)
+                stats['errors'].append(f'{platform} response could not be read: {e!r}')
+                failed.update((platform, name) for name in chunk)
+                continue
+
+            batch = defaultdict(Decimal)
+            for name, day, spend in rows:
+                found = ranges.get((platform, name))
+                if found and found[1] <= day <= found[2]:
+                    batch[(found[0].id, day)] += spend
+            if batch:
+                importers[platform].write(dict(batch))
+            stats['rows'] += len(rows)
+            stats['days'] += len(batch)
+
+    # Only campaigns whose every window succeeded move their cursor
+    SpendSyncCursor.objects.bulk_create(
+        [SpendSyncCursor(campaign=campaign, platform=platform, synced_through=end)
+         for (platform, name), (campaign, since, end) in ranges.items() if (platform, name) not in failed],
+        batch_size=1000, update_conflicts=True, unique_fields=['campaign', 'platform'],
+        update_fields=['synced_through', 'updated_at'],
+    )
+    for importer in importers.values():
+        importer.finish()
+
+    stats.update(tasks=len(tasks), requests=http.requests, seconds=time.perf_counter() - started)
+    return stats
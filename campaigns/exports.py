@@ -0,0 +1,197 @@
+# campaigns/exports.py - Streaming raw-data exports (CSV or NDJSON, optionally gzipped)
+#
+# Rows are read with values_list().iterator(chunk_size=EXPORT_CHUNK_SIZE)
+# in primary-key order and written out a chunk at a time, so neither the
+# queryset nor the file is ever held in memory: an export of 10M rows uses
+# the same memory as one of 10. Gzip is applied on the fly with one
+# compressobj per export.
+#
+# The first column is always the row id. An interrupted download resumes
+# with ``after=<last id received>`` (keyset, not OFFSET), and ``until_id``
+# pins the upper end so the pieces of a resumed export line up.
+#
+# Under ASGI, Django reads a sync streaming iterator to the end before
+# sending any of it, so the view hands it AsyncChunks instead, which pulls
+# one chunk per sync_to_async call.
+
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import CampaignPerformance, ShopifyOrder
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def _journey_model():
+    from attribution.models import CustomerJourney
+    return CustomerJourney
+
+
+def _attribution_model():
+    from attribution.models import MultiTouchAttribution
+    return MultiTouchAttribution
+
+
+# dataset: model, exported columns, the time column for since/until, and
+# the lookups that scope rows to a brand or an agency
+EXPORTS = {
+    'orders': {
+        'model': lambda: ShopifyOrder,
+        'fields': (
+            'id', 'shopify_order_id', 'order_number', 'order_created_at', 'total_price', 'currency',
+            'normalized_total', 'customer_email', 'campaign_id', 'agency_id', 'is_attributed',
+            'attribution_confidence', 'attribution_method', 'utm_source', 'utm_medium', 'utm_campaign',
+            'utm_content', 'utm_term', 'source_name',
+        ),
+        'time_field': 'order_created_at',
+        'brand': 'brand_id',
+        'agency': 'agency_id',
+    },
+    'journeys': {
+        'model': _journey_model,
+        'fields': (
+            'id', 'timestamp', 'session_id', 'customer_email', 'user_agent_hash', 'event_type', 'campaign_id',
+            'agency_id', 'utm_source', 'utm_medium', 'utm_campaign', 'utm_content', 'utm_term', 'page_url',
+            'referrer_url', 'conversion_value', 'order_id',
+        ),
+        'time_field': 'timestamp',
+        'brand': 'campaign__brand_id',
+        'agency': 'agency_id',
+    },
+    'performance': {
+        'model': lambda: CampaignPerformance,
+        'fields': (
+            'id', 'campaign_id', 'date', 'total_spend', 'meta_spend', 'google_spend', 'tiktok_spend',
+            'attributed_revenue', 'attributed_orders', 'roas', 'cpa', 'spend_data_source',
+        ),
+        'time_field': 'date',
+        'brand': 'campaign__brand_id',
+        'agency': 'campaign__selected_agency_id',
+    },
+    'attributions': {
+        'model': _attribution_model,
+        'fields': (
+            'id', 'order_id', 'primary_agency_id', 'attribution_confidence', 'attribution_model_used',
+            'attribution_data', 'supporting_agencies', 'calculated_at',
+        ),
+        'time_field': 'calculated_at',
+        'brand': 'order__brand_id',
+        'agency': 'primary_agency_id',
+    },
+}
+
+
+class ExportError(ValueError):
+    """Unknown dataset or format, or an invalid range"""
+
+
+def export_queryset(dataset, kind, tenant_id, after=None, until_id=None, since=None, until=None):
+    """values_list() rows of a dataset for one brand or agency, in id order.
+
+    ``after``/``until_id`` bound the ids (exclusive/inclusive) and
+    ``since``/``until`` the dataset's time column (days, until exclusive).
+    """
+
+    spec = EXPORTS.get(dataset)
+    if spec is None:
+        raise ExportError(f'Unknown dataset {dataset!r}; choose from {", ".join(EXPORTS)}')
+
+    model = spec['model']()
+    rows = model.objects.filter(**{spec[kind]: tenant_id})
+    if after is not None:
+        rows = rows.filter(id__gt=after)
+    if until_id is not None:
+        rows = rows.filter(id__lte=until_id)
+
+    # since/until are days; timestamps compare from local midnight
+    bound = lambda day: day
+    if model._meta.get_field(spec['time_field']).get_internal_type() == 'DateTimeField':
+        bound = lambda day: timezone.make_aware(datetime.combine(day, time.min))
+    if since is not None:
+        rows = rows.filter(**{f"{spec['time_field']}__gte": bound(since)})
+    if until is not None:
+        rows = rows.filter(**{f"{spec['time_field']}__lt": bound(until)})
+    return rows.order_by('id').values_list(*spec['fields'])
+
+
+def _csv_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, cls=DjangoJSONEncoder)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def export_chunks(dataset, rows, export_format='csv', chunk_size=None):
+    """Encoded text of an export, one chunk of rows at a time"""
+
+    if export_format not in FORMATS:
+        raise ExportError(f'Unknown format {export_format!r}; choose from {", ".join(FORMATS)}')
+    chunk_size = chunk_size or getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+    fields = EXPORTS[dataset]['fields']
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == 'csv':
+        writer.writerow(fields)
+
+    for i, row in enumerate(rows.iterator(chunk_size=chunk_size), 1):
+        if export_format == 'csv':
+            writer.writerow([_csv_value(value) for value in row])
+        else:
+            buffer.write(json.dumps(dict(zip(fields, row)), cls=DjangoJSONEncoder))
+            buffer.write('\n')
+        if i % chunk_size == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def gzip_chunks(chunks, level=6):
+    """Gzip a stream of byte chunks as it is produced"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip header and trailer
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+class AsyncChunks:
+    """Async iterator over a sync stream of chunks, one chunk per sync_to_async call.
+
+    The calls are thread sensitive, so the database cursor behind the
+    stream is used (and, by ``close``, which the response calls, closed)
+    on one thread.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        chunk = await sync_to_async(next)(self.chunks, None)
+        if chunk is None:
+            raise StopAsyncIteration
+        return chunk
+
+    def close(self):
+        close = getattr(self.chunks, 'close', None)
+        if close is not None:
+            close()
@@ -0,0 +1,82 @@
+# campaigns/fx.py - Currency normalization from the local FxRate table
+#
+# Rates are loaded into memory once per process (refreshed every
+# FX_RATE_CACHE_SECONDS) and looked up with a binary search on date, so
+# converting an order at ingest costs no query. Rates are quoted per EUR,
+# the ECB reference format; other pairs are crossed through EUR.
+
+import threading
+import time
+from bisect import bisect_right
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import FxRate
+
+PIVOT_CURRENCY = 'EUR'
+CENT = Decimal('0.01')
+
+
+class FxRateTable:
+    """In-memory copy of FxRate: currency -> (sorted dates, rates)"""
+
+    def __init__(self):
+        self.series = None
+        self.loaded_at = 0
+        self.lock = threading.Lock()
+
+    def _load(self):
+        series = {}
+        for currency, day, rate in FxRate.objects.order_by('currency', 'date').values_list('currency', 'date', 'rate'):
+            dates, rates = series.setdefault(currency, ([], []))
+            dates.append(day)
+            rates.append(rate)
+        return series
+
+    def _current(self):
+        max_age = getattr(settings, 'FX_RATE_CACHE_SECONDS', 3600)
+        if self.series is None or time.monotonic() - self.loaded_at > max_age:
+            with self.lock:
+                if self.series is None or time.monotonic() - self.loaded_at > max_age:
+                    self.series = self._load()
+                    self.loaded_at = time.monotonic()
+        return self.series
+
+    def invalidate(self):
+        self.series = None
+
+    def rate(self, currency, day):
+        """Units of currency per EUR on day (latest earlier rate if the day has none)"""
+        if currency == PIVOT_CURRENCY:
+            return Decimal('1')
+        found = self._current().get(currency)
+        if not found:
+            return None
+        dates, rates = found
+        i = bisect_right(dates, day)
+        # Before the first known rate fall back to the earliest one
+        return rates[i - 1] if i else rates[0]
+
+    def convert(self, amount, from_currency, to_currency, day):
+        """amount converted between currencies at day's rates, or None if a rate is unknown"""
+        amount = Decimal(str(amount))
+        if from_currency == to_currency:
+            return amount
+        from_rate = self.rate(from_currency, day)
+        to_rate = self.rate(to_currency, day)
+        if not from_rate or not to_rate:
+            return None
+        return (amount * to_rate / from_rate).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+fx_rates = FxRateTable()
+
+
+def normalize_order_total(order, brand_currency):
+    """The order's total_price in the brand's currency (None until a rate is loaded)"""
+    return fx_rates.convert(
+        order.total_price, (order.currency or brand_currency).upper(), brand_currency.upper(),
+        timezone.localdate(order.order_created_at)
+    )
@@ -0,0 +1,131 @@
+# campaigns/ledger.py - Agency earnings ledger and running totals
+#
+# Each escrow contributes to three buckets of its agency:
+#   EARNED  - payouts of PaymentRelease rows other than setup fees
+#   SETUP   - payouts of SETUP releases
+#   PENDING - commission still to be released while the escrow is HELD
+# Whenever an escrow or one of its releases is written, the escrow's target
+# per bucket is compared with what the ledger already holds for it, and the
+# difference is appended as entries and added to AgencyEarnings with F().
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import AgencyEarnings, AgencyLedgerEntry, EscrowPayment
+
+BUCKET_TOTAL_FIELDS = {'EARNED': 'earned', 'PENDING': 'pending', 'SETUP': 'setup_fees'}
+
+CENT = Decimal('0.01')
+
+
+def _money(field_expr):
+    return Coalesce(field_expr, Value(0), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def _escrows_with_payouts(escrows):
+    """Annotate escrows with their released commission and setup fee payouts"""
+    return escrows.annotate(
+        released=_money(Sum('releases__agency_payout', filter=~Q(releases__release_type='SETUP'))),
+        setup_paid=_money(Sum('releases__agency_payout', filter=Q(releases__release_type='SETUP'))),
+        commission=ExpressionWrapper(
+            F('total_budget') * F('commission_rate') / 100,
+            output_field=DecimalField(max_digits=14, decimal_places=4)
+        ),
+    )
+
+
+def escrow_targets(escrow):
+    """{bucket: amount} an annotated escrow should contribute"""
+    pending = Decimal('0')
+    if escrow.status == 'HELD':
+        pending = max(Decimal(escrow.commission) - escrow.released, Decimal('0'))
+    return {
+        'EARNED': escrow.released,
+        'PENDING': pending.quantize(CENT),
+        'SETUP': escrow.setup_paid,
+    }
+
+
+def _apply_to_totals(agency_id, deltas):
+    AgencyEarnings.objects.get_or_create(agency_id=agency_id)
+    AgencyEarnings.objects.filter(agency_id=agency_id).update(**{
+        BUCKET_TOTAL_FIELDS[bucket]: F(BUCKET_TOTAL_FIELDS[bucket]) + amount
+        for bucket, amount in deltas.items()
+    })
+
+
+def sync_escrow_earnings(escrow_id, release_id=None, reason='escrow'):
+    """Post whatever entries bring an escrow's ledger in line with its current state.
+
+    Idempotent: calling it again without a change writes nothing. For a
+    deleted escrow everything it contributed is reversed.
+    """
+
+    with transaction.atomic():
+        desired = {}
+        # Lock the escrow first: concurrent syncs of one escrow then run one
+        # after the other, and the second sees the entries the first posted
+        try:
+            EscrowPayment.objects.select_for_update().get(id=escrow_id)
+        except EscrowPayment.DoesNotExist:
+            pass
+        else:
+            escrow = _escrows_with_payouts(EscrowPayment.objects.filter(id=escrow_id)).get()
+            desired = {(escrow.agency_id, bucket): amount for bucket, amount in escrow_targets(escrow).items()}
+
+        current = {
+            (row['agency_id'], row['bucket']): row['total']
+            for row in AgencyLedgerEntry.objects.filter(escrow_id=escrow_id).values('agency_id', 'bucket').annotate(
+                total=Sum('amount')
+            ).order_by()
+        }
+
+        entries = []
+        deltas = defaultdict(dict)
+        for slot in set(desired) | set(current):
+            delta = desired.get(slot, 0) - current.get(slot, 0)
+            if delta:
+                agency_id, bucket = slot
+                entries.append(AgencyLedgerEntry(
+                    agency_id=agency_id, escrow_id=escrow_id, release_id=release_id,
+                    bucket=bucket, amount=delta, reason=reason
+                ))
+                deltas[agency_id][bucket] = delta
+
+        if entries:
+            AgencyLedgerEntry.objects.bulk_create(entries)
+            for agency_id, agency_deltas in deltas.items():
+                _apply_to_totals(agency_id, agency_deltas)
+
+    return len(entries)
+
+
+def rebuild_ledger():
+    """Replace the whole ledger and all running totals with one entry per escrow bucket"""
+
+    entries = []
+    totals = defaultdict(lambda: dict.fromkeys(BUCKET_TOTAL_FIELDS.values(), Decimal('0')))
+
+    for escrow in _escrows_with_payouts(EscrowPayment.objects.all()).iterator(chunk_size=2000):
+        for bucket, amount in escrow_targets(escrow).items():
+            if amount:
+                entries.append(AgencyLedgerEntry(
+                    agency_id=escrow.agency_id, escrow_id=escrow.id,
+                    bucket=bucket, amount=amount, reason='rebuild'
+                ))
+                totals[escrow.agency_id][BUCKET_TOTAL_FIELDS[bucket]] += amount
+
+    with transaction.atomic():
+        AgencyLedgerEntry.objects.all().delete()
+        AgencyEarnings.objects.all().delete()
+        AgencyLedgerEntry.objects.bulk_create(entries, batch_size=1000)
+        AgencyEarnings.objects.bulk_create(
+            [AgencyEarnings(agency_id=agency_id, **values) for agency_id, values in totals.items()],
+            batch_size=1000
+        )
+
+    return len(entries), len(totals)
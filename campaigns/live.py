@@ -0,0 +1,186 @@
+# campaigns/live.py - Live dashboard events (Server-Sent Events)
+#
+# Writers call publish(), which appends a row to the LiveEvent log. Every
+# ASGI process runs one tail task that reads new rows once per poll interval
+# and fans them out to the asyncio queues of its connected dashboards, so a
+# webhook handled by one worker reaches clients held by any other worker
+# without an external broker, at one query per process per interval.
+#
+# Ids are assigned at insert but become visible at commit, so the tail keeps
+# re-reading ids it stepped over for LIVE_EVENTS_LOOKBACK_SECONDS in case
+# their transaction commits late. A dashboard that cannot keep up is dropped;
+# its EventSource reconnects and replays from Last-Event-ID.
+
+import asyncio
+import json
+import logging
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import LiveEvent
+
+logger = logging.getLogger(__name__)
+
+# Larger jumps between ids read by the tail come from bulk rollbacks, not
+# from transactions still in flight
+MAX_GAP_IDS = 1000
+
+
+def channel_for(kind, tenant_id):
+    return f'{kind}:{tenant_id}'
+
+
+def publish(event_kind, payload, brand_id=None, agency_id=None):
+    """Queue an event for a brand's and/or agency's live dashboards"""
+
+    payload = json.loads(json.dumps(payload, cls=DjangoJSONEncoder))
+    rows = [
+        LiveEvent(channel=channel_for(kind, tenant_id), kind=event_kind, payload=payload)
+        for kind, tenant_id in (('brand', brand_id), ('agency', agency_id))
+        if tenant_id is not None
+    ]
+    if rows:
+        LiveEvent.objects.bulk_create(rows)
+
+
+def publish_order(order):
+    """Announce a newly attributed order"""
+    if not order.is_attributed:
+        return
+    publish('order', {
+        'order_number': order.order_number,
+        'campaign_id': order.campaign_id,
+        'total_price': order.total_price,
+        'currency': order.currency,
+        'normalized_total': order.normalized_total,
+        'utm_source': order.utm_source,
+        'attribution_confidence': order.attribution_confidence,
+        'order_created_at': order.order_created_at,
+    }, brand_id=order.brand_id, agency_id=order.agency_id)
+
+
+def publish_performance(campaign, performance):
+    """Announce a changed daily performance row for a campaign"""
+    publish('performance', {
+        'campaign_id': campaign.id,
+        'date': performance.date,
+        'total_spend': performance.total_spend,
+        'attributed_revenue': performance.attributed_revenue,
+        'attributed_orders': performance.attributed_orders,
+        'roas': performance.roas,
+        'cpa': performance.cpa,
+    }, brand_id=campaign.brand_id, agency_id=campaign.selected_agency_id)
+
+
+def format_sse(event):
+    return f'id: {event.id}\nevent: {event.kind}\ndata: {json.dumps(event.payload)}\n\n'
+
+
+class LiveEventHub:
+    """Per-process fan-out of LiveEvent rows to subscribed connections"""
+
+    def __init__(self):
+        self.subscribers = {}  # channel -> set of asyncio.Queue
+        self.last_id = None
+        self.gaps = {}  # id below last_id not read yet -> monotonic time first skipped
+        self._polls = 0
+        self._loop = None
+        self._tail = None
+
+    def _ensure_tail(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._tail is None or self._tail.done():
+            self._loop = loop
+            self._tail = loop.create_task(self._run())
+
+    def subscribe(self, channels):
+        self._ensure_tail()
+        queue = asyncio.Queue(maxsize=getattr(settings, 'LIVE_EVENTS_QUEUE_SIZE', 100))
+        for channel in channels:
+            self.subscribers.setdefault(channel, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, channels, queue):
+        for channel in channels:
+            queues = self.subscribers.get(channel)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self.subscribers[channel]
+
+    def _fan_out(self, events):
+        for event in events:
+            for queue in list(self.subscribers.get(event.channel, ())):
+                try:
+                    queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    self._drop(queue)
+
+    def _drop(self, queue):
+        """Close a slow client's stream: it reconnects and replays from Last-Event-ID"""
+        while not queue.empty():
+            queue.get_nowait()
+        # None tells the stream to end
+        queue.put_nowait(None)
+        self.unsubscribe(list(self.subscribers), queue)
+
+    async def _run(self):
+        interval = getattr(settings, 'LIVE_EVENTS_POLL_INTERVAL', 1.0)
+        fetch = sync_to_async(self._fetch, thread_sensitive=True)
+        while True:
+            try:
+                events = await fetch()
+                self._fan_out(events)
+            except Exception:
+                logger.exception('Live event tail failed')
+            await asyncio.sleep(interval)
+
+    def _fetch(self):
+        self._polls += 1
+        if self._polls % 600 == 1:
+            self._prune()
+        if self.last_id is None:
+            self.last_id = LiveEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0
+            return []
+        if not self.subscribers:
+            # Nobody listening: just move the cursor
+            self.last_id = LiveEvent.objects.order_by('-id').values_list('id', flat=True).first() or self.last_id
+            self.gaps = {}
+            return []
+
+        # Skipped ids that never show up were rolled back or pruned
+        now = time.monotonic()
+        lookback = getattr(settings, 'LIVE_EVENTS_LOOKBACK_SECONDS', 10)
+        self.gaps = {event_id: skipped for event_id, skipped in self.gaps.items() if now - skipped < lookback}
+
+        query = Q(id__gt=self.last_id)
+        if self.gaps:
+            query |= Q(id__in=list(self.gaps))
+        events = list(LiveEvent.objects.filter(query).order_by('id')[:1000])
+        for event in events:
+            if event.id < self.last_id:
+                self.gaps.pop(event.id, None)
+                continue
+            if event.id - self.last_id - 1 <= MAX_GAP_IDS:
+                for skipped in range(self.last_id + 1, event.id):
+                    self.gaps[skipped] = now
+            self.last_id = event.id
+        return events
+
+    def _prune(self):
+        retention = getattr(settings, 'LIVE_EVENTS_RETENTION_SECONDS', 3600)
+        LiveEvent.objects.filter(created_at__lt=timezone.now() - timedelta(seconds=retention)).delete()
+
+
+def replay_since(channels, last_event_id):
+    """Events a reconnecting client missed (bounded to the retention window)"""
+    return list(LiveEvent.objects.filter(channel__in=channels, id__gt=last_event_id).order_by('id')[:500])
+
+
+live_hub = LiveEventHub()
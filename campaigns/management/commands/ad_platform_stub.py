@@ -0,0 +1,33 @@
+# campaigns/management/commands/ad_platform_stub.py
+
+from django.core.management.base import BaseCommand
+
+from campaigns.connector_stub import AdPlatformStub
+from campaigns.models import Campaign
+
+
+class Command(BaseCommand):
+    help = 'Serve a local stub of the Meta, Google Ads and TikTok reporting APIs for the spend connectors'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency', type=float, default=0.0, help='Seconds to wait per request')
+        parser.add_argument('--requests-per-second', type=int, default=0,
+                            help='Answer 429 above this many requests per second and platform (0: unlimited)')
+    
+    def handle(self, *args, **options):
+        names = Campaign.objects.filter(status='ACTIVE').exclude(utm_campaign='').values_list('utm_campaign', flat=True)
+        stub = AdPlatformStub(
+            options['host'], options['port'], campaigns=names,
+            latency=options['latency'], requests_per_second=options['requests_per_second']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Stub platform APIs at {stub.url} - point META_ADS_API_URL, GOOGLE_ADS_API_URL and TIKTOK_ADS_API_URL here'
+        ))
+        try:
+            stub.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stub.server.server_close()
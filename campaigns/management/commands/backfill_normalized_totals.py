@@ -0,0 +1,89 @@
+# campaigns/management/commands/backfill_normalized_totals.py
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from campaigns.cache import bump_data_version
+from campaigns.fx import normalize_order_total
+from campaigns.models import CampaignPerformance, ShopifyOrder
+from campaigns.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Fill ShopifyOrder.normalized_total (brand currency) from the local FX rates"
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Recompute every order, not only missing values')
+        parser.add_argument('--batch-size', type=int, default=2000)
+    
+    def handle(self, *args, **options):
+        orders = ShopifyOrder.objects.all()
+        if not options['all']:
+            orders = orders.filter(normalized_total__isnull=True)
+        orders = orders.select_related('brand').only(
+            'id', 'total_price', 'currency', 'order_created_at', 'processed_at', 'normalized_total',
+            'is_attributed', 'campaign_id', 'agency_id', 'brand_id', 'brand__currency'
+        ).order_by('id')
+        
+        batch_size = options['batch_size']
+        updated = missing = 0
+        last_id = 0
+        # Attributed revenue each campaign day is missing: {(campaign_id, day): amount}
+        revenue_deltas = defaultdict(Decimal)
+        order_days, brand_ids, agency_ids = set(), set(), set()
+        while True:
+            # Keyset batches: rows that stay NULL (no rate) are not revisited
+            batch = list(orders.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            
+            changed = []
+            for order in batch:
+                normalized = normalize_order_total(order, order.brand.currency)
+                if normalized is None:
+                    missing += 1
+                elif normalized != order.normalized_total:
+                    if order.is_attributed and order.campaign_id:
+                        # The webhook books revenue on the (UTC) day it processed the order
+                        revenue_deltas[order.campaign_id, order.processed_at.date()] += normalized - (order.normalized_total or 0)
+                    order_days.add(timezone.localdate(order.order_created_at))
+                    brand_ids.add(order.brand_id)
+                    agency_ids.add(order.agency_id)
+                    order.normalized_total = normalized
+                    changed.append(order)
+            ShopifyOrder.objects.bulk_update(changed, ['normalized_total'])
+            updated += len(changed)
+        
+        if updated:
+            self.repair_revenue(revenue_deltas, order_days, brand_ids, agency_ids)
+        
+        self.stdout.write(self.style.SUCCESS(f'Normalized {updated} orders'))
+        if missing:
+            self.stdout.write(self.style.WARNING(f'{missing} orders have a currency without FX rates'))
+    
+    def repair_revenue(self, revenue_deltas, order_days, brand_ids, agency_ids):
+        """Add the revenue that orders ingested without a rate were booked without"""
+        
+        repaired = 0
+        with transaction.atomic():
+            for performance in CampaignPerformance.objects.select_for_update().filter(
+                campaign_id__in={campaign_id for campaign_id, _ in revenue_deltas},
+                date__in={day for _, day in revenue_deltas},
+            ):
+                delta = revenue_deltas.get((performance.campaign_id, performance.date))
+                if delta:
+                    performance.attributed_revenue += delta
+                    performance.calculate_metrics()
+                    repaired += 1
+            rebuild_rollups(min(order_days), max(order_days))
+        
+        for brand_id in brand_ids:
+            bump_data_version('brand', brand_id)
+        for agency_id in agency_ids:
+            bump_data_version('agency', agency_id)
+        self.stdout.write(f'Updated attributed revenue of {repaired} campaign days')
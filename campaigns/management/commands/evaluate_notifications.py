@@ -0,0 +1,25 @@
+# campaigns/management/commands/evaluate_notifications.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from campaigns.notifications import evaluate_notifications
+
+
+class Command(BaseCommand):
+    help = 'Close anomaly buckets and re-evaluate dashboard notifications for all brands and agencies (run from cron or with --interval)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Keep running and re-evaluate every N seconds')
+    
+    def handle(self, *args, **options):
+        while True:
+            brands, agencies = evaluate_notifications()
+            self.stdout.write(self.style.SUCCESS(
+                f'Wrote {brands} brand and {agencies} agency notification changes'
+            ))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,52 @@
+# campaigns/management/commands/export_data.py
+
+import sys
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from campaigns.exports import EXPORTS, FORMATS, ExportError, export_chunks, export_queryset, gzip_chunks
+
+
+class Command(BaseCommand):
+    help = 'Stream a brand or agency export of orders, journeys, performance or attributions to a file or stdout'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=list(EXPORTS))
+        tenant = parser.add_mutually_exclusive_group(required=True)
+        tenant.add_argument('--brand', type=int, help='Brand id')
+        tenant.add_argument('--agency', type=int, help='Agency id')
+        parser.add_argument('--format', default='csv', choices=list(FORMATS))
+        parser.add_argument('--gzip', action='store_true', help='Compress the output')
+        parser.add_argument('--after', type=int, help='Resume after this id')
+        parser.add_argument('--until-id', type=int, help='Stop at this id (inclusive)')
+        parser.add_argument('--since', type=date.fromisoformat, help='First day (YYYY-MM-DD)')
+        parser.add_argument('--until', type=date.fromisoformat, help='Day to stop before (YYYY-MM-DD)')
+        parser.add_argument('--output', '-o', help='File to write (default: stdout)')
+    
+    def handle(self, *args, **options):
+        kind, tenant_id = ('brand', options['brand']) if options['brand'] else ('agency', options['agency'])
+        try:
+            rows = export_queryset(
+                options['dataset'], kind, tenant_id, after=options['after'], until_id=options['until_id'],
+                since=options['since'], until=options['until']
+            )
+        except ExportError as e:
+            raise CommandError(str(e))
+        
+        chunks = export_chunks(options['dataset'], rows, options['format'])
+        if options['gzip']:
+            chunks = gzip_chunks(chunks)
+        
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        written = 0
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+                written += len(chunk)
+        finally:
+            if options['output']:
+                output.close()
+        
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(f'Wrote {written} bytes to {options["output"]}'))
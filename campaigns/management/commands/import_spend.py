@@ -0,0 +1,42 @@
+# campaigns/management/commands/import_spend.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from campaigns.models import Campaign
+from campaigns.spend_import import PLATFORM_COLUMNS, SpendImportError, import_spend
+
+
+class Command(BaseCommand):
+    help = 'Import a Meta, Google Ads or TikTok spend export (one row per campaign and day) into CampaignPerformance'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or tab-separated campaign report')
+        parser.add_argument('--platform', required=True, choices=[p.lower() for p in PLATFORM_COLUMNS])
+        parser.add_argument('--brand', type=int, help='Only match campaigns of this brand id')
+        parser.add_argument('--agency', type=int, help='Only match campaigns run by this agency id')
+        parser.add_argument('--source', default='AGENCY_REPORT', choices=['MANUAL', 'API', 'AGENCY_REPORT'])
+        parser.add_argument('--encoding', default='utf-8-sig')
+    
+    def handle(self, *args, **options):
+        campaigns = Campaign.objects.all()
+        if options['brand']:
+            campaigns = campaigns.filter(brand_id=options['brand'])
+        if options['agency']:
+            campaigns = campaigns.filter(selected_agency_id=options['agency'])
+        
+        try:
+            with open(options['path'], 'rb') as f:
+                result = import_spend(
+                    f, options['platform'].upper(), campaigns=campaigns,
+                    source=options['source'], encoding=options['encoding']
+                )
+        except (OSError, SpendImportError, UnicodeDecodeError) as e:
+            raise CommandError(f'Could not import {options["path"]}: {e}')
+        
+        for name, count in result['unmatched'].most_common(10):
+            self.stdout.write(self.style.WARNING(f'No campaign with utm_campaign {name!r} ({count} rows)'))
+        
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['imported']} of {result['rows']} rows into {result['days']} campaign days "
+            f"({result['invalid']} invalid, {sum(result['unmatched'].values())} unmatched)"
+        ))
@@ -0,0 +1,48 @@
+# campaigns/management/commands/load_fx_rates.py
+
+import csv
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+
+from campaigns.fx import fx_rates
+from campaigns.models import FxRate
+
+
+class Command(BaseCommand):
+    help = 'Load reference FX rates from a local ECB CSV file (Date,USD,DKK,... per 1 EUR)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file, e.g. an unzipped eurofxref-hist.csv')
+        parser.add_argument('--currencies', help='Comma-separated currencies to keep (default: all columns)')
+    
+    def handle(self, *args, **options):
+        keep = None
+        if options['currencies']:
+            keep = {c.strip().upper() for c in options['currencies'].split(',')}
+        
+        rows = []
+        try:
+            with open(options['path'], newline='') as f:
+                for record in csv.DictReader(f, skipinitialspace=True):
+                    day = datetime.strptime(record.pop('Date'), '%Y-%m-%d').date()
+                    for currency, value in record.items():
+                        currency = (currency or '').strip().upper()
+                        if not currency or (keep and currency not in keep):
+                            continue
+                        try:
+                            rate = Decimal(value)
+                        except (InvalidOperation, TypeError):
+                            continue  # 'N/A' and empty cells
+                        rows.append(FxRate(date=day, currency=currency, rate=rate))
+        except (OSError, KeyError, ValueError) as e:
+            raise CommandError(f'Could not read {options["path"]}: {e}')
+        
+        FxRate.objects.bulk_create(
+            rows, batch_size=2000,
+            update_conflicts=True, unique_fields=['date', 'currency'], update_fields=['rate']
+        )
+        fx_rates.invalidate()
+        
+        self.stdout.write(self.style.SUCCESS(f'Loaded {len(rows)} FX rates'))
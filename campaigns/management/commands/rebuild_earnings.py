@@ -0,0 +1,16 @@
+# campaigns/management/commands/rebuild_earnings.py
+
+from django.core.management.base import BaseCommand
+
+from campaigns.ledger import rebuild_ledger
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the agency earnings ledger and running totals from escrows and payment releases'
+    
+    def handle(self, *args, **options):
+        entries, agencies = rebuild_ledger()
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {entries} ledger entries for {agencies} agencies'
+        ))
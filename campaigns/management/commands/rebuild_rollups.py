@@ -0,0 +1,26 @@
+# campaigns/management/commands/rebuild_rollups.py
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from campaigns.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild brand and agency daily rollups from raw orders and campaign spend'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Only rebuild the last N days (default: all history)')
+    
+    def handle(self, *args, **options):
+        start_date = None
+        if options['days']:
+            start_date = timezone.localdate() - timedelta(days=options['days'])
+        
+        brand_rows, agency_rows = rebuild_rollups(start_date=start_date)
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {brand_rows} brand-day and {agency_rows} agency-day rollups'
+        ))
@@ -0,0 +1,16 @@
+# campaigns/management/commands/rebuild_search_index.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from campaigns.search import available, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the marketplace full-text search index from all campaigns (after bulk imports or restores)'
+    
+    def handle(self, *args, **options):
+        if not available():
+            raise CommandError('Full-text search needs SQLite FTS5; other databases search with icontains')
+        
+        rows = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {rows} campaigns'))
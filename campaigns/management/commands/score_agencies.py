@@ -0,0 +1,24 @@
+# campaigns/management/commands/score_agencies.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from campaigns.scoring import score_agencies
+
+
+class Command(BaseCommand):
+    help = 'Recompute agency ratings, success rates and competitiveness scores from completed campaigns'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--agency', type=int, action='append', help='Only this agency id (repeatable)')
+        parser.add_argument('--interval', type=int, default=0, help='Keep running and rescore every N seconds')
+    
+    def handle(self, *args, **options):
+        while True:
+            changed = score_agencies(options['agency'], reason='batch')
+            self.stdout.write(self.style.SUCCESS(f'Updated the scores of {len(changed)} agencies'))
+            
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,50 @@
+# campaigns/management/commands/sync_spend.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from campaigns.connector_stub import AdPlatformStub
+from campaigns.connectors import CONNECTORS, sync_spend
+from campaigns.models import Campaign
+
+
+class Command(BaseCommand):
+    help = 'Fetch daily spend of ACTIVE campaigns from the ad platform APIs (run from cron or with --interval)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--platform', action='append', choices=[p.lower() for p in CONNECTORS],
+                            help='Only sync this platform (repeatable)')
+        parser.add_argument('--workers', type=int, help='Concurrent requests (default SPEND_SYNC_WORKERS)')
+        parser.add_argument('--interval', type=int, default=0, help='Keep running and sync every N seconds')
+        parser.add_argument('--stub', action='store_true',
+                            help='Run against an in-process stub of the platform APIs (offline testing and benchmarks)')
+        parser.add_argument('--stub-latency', type=float, default=0.05, help='Seconds the stub waits per request')
+    
+    def handle(self, *args, **options):
+        platforms = [p.upper() for p in options['platform']] if options['platform'] else None
+        
+        stub = None
+        configs = None
+        if options['stub']:
+            names = Campaign.objects.filter(status='ACTIVE').exclude(utm_campaign='').values_list('utm_campaign', flat=True)
+            stub = AdPlatformStub(campaigns=names, latency=options['stub_latency']).start()
+            configs = stub.connector_configs()
+            self.stdout.write(f'Stub platform APIs at {stub.url}')
+        
+        try:
+            while True:
+                stats = sync_spend(platforms=platforms, configs=configs, workers=options['workers'])
+                for error in stats['errors']:
+                    self.stdout.write(self.style.ERROR(error))
+                self.stdout.write(self.style.SUCCESS(
+                    f"Synced {', '.join(stats['platforms']) or 'no configured platforms'}: {stats['days']} campaign days "
+                    f"from {stats['rows']} rows in {stats['tasks']} tasks / {stats['requests']} requests, "
+                    f"{stats['seconds']:.2f}s"
+                ))
+                if not options['interval']:
+                    break
+                time.sleep(options['interval'])
+        finally:
+            if stub is not None:
+                stub.stop()
@@ -0,0 +1,43 @@
+# campaigns/management/commands/update_cohorts.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.models import Brand
+from campaigns.cache import bump_data_version
+from campaigns.cohorts import rebuild_cohorts, refresh_cohorts
+from campaigns.models import CustomerCohort, ShopifyOrder
+
+
+class Command(BaseCommand):
+    help = 'Fold new orders into the customer cohorts of every brand (or rebuild them)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--brand', type=int, help='Only this brand id')
+        parser.add_argument('--rebuild', action='store_true', help='Recompute from all orders (picks up edited and deleted orders)')
+        parser.add_argument('--interval', type=int, default=0, help='Keep running and refresh every N seconds')
+    
+    def handle(self, *args, **options):
+        while True:
+            brands = Brand.objects.all()
+            if options['brand']:
+                brands = brands.filter(id=options['brand'])
+            if not options['rebuild']:
+                # Only brands with orders not yet folded in
+                brands = brands.filter(id__in=ShopifyOrder.objects.filter(in_cohorts=False).values('brand_id'))
+            
+            orders = 0
+            for brand_id in brands.values_list('id', flat=True):
+                folded = rebuild_cohorts(brand_id) if options['rebuild'] else refresh_cohorts(brand_id)
+                if folded:
+                    orders += folded
+                    bump_data_version('brand', brand_id)
+                    for agency_id in CustomerCohort.objects.filter(brand_id=brand_id, agency__isnull=False).values_list('agency_id', flat=True).distinct():
+                        bump_data_version('agency', agency_id)
+            self.stdout.write(self.style.SUCCESS(f'Folded {orders} orders into customer cohorts'))
+            
+            if not options['interval']:
+                break
+            options['rebuild'] = False
+            time.sleep(options['interval'])
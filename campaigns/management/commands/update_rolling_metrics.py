@@ -0,0 +1,49 @@
+# campaigns/management/commands/update_rolling_metrics.py
+
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from campaigns.cache import bump_campaign_tenants
+from campaigns.models import Campaign, CampaignPerformance, PerformanceMetric, RollingMetric
+from campaigns.rolling import refresh_rolling, rolling_windows
+
+
+class Command(BaseCommand):
+    help = 'Advance the rolling-window KPIs of every campaign to today (run daily from cron or with --interval)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Drop and recompute all rolling rows')
+        parser.add_argument('--interval', type=int, default=0, help='Keep running and update every N seconds')
+    
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            RollingMetric.objects.all().delete()
+        
+        while True:
+            today = timezone.localdate()
+            cutoff = today - timedelta(days=max(rolling_windows()) - 1)
+            
+            # Campaigns whose windows can still change: running, or with data in the longest window
+            campaign_ids = set(Campaign.objects.filter(status='ACTIVE').values_list('id', flat=True))
+            if options['rebuild']:
+                campaign_ids.update(CampaignPerformance.objects.values_list('campaign_id', flat=True).distinct())
+                campaign_ids.update(PerformanceMetric.objects.values_list('campaign_id', flat=True).distinct())
+            else:
+                campaign_ids.update(CampaignPerformance.objects.filter(date__gte=cutoff).values_list('campaign_id', flat=True).distinct())
+                campaign_ids.update(PerformanceMetric.objects.filter(date__gte=cutoff).values_list('campaign_id', flat=True).distinct())
+            
+            rows = 0
+            for campaign in Campaign.objects.filter(id__in=campaign_ids).only('id', 'brand_id', 'selected_agency_id'):
+                written = refresh_rolling(campaign.id, through=today)
+                if written:
+                    rows += written
+                    bump_campaign_tenants(campaign)
+            self.stdout.write(self.style.SUCCESS(f'Wrote {rows} rolling rows for {len(campaign_ids)} campaigns'))
+            
+            if not options['interval']:
+                break
+            options['rebuild'] = False
+            time.sleep(options['interval'])
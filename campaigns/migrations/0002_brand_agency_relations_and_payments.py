@@ -0,0 +1,282 @@
+# Generated by Django 4.2.23 on 2026-10-19 17:25
+
+import secrets
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def link_profiles(apps, schema_editor):
+    """Point campaigns and bids at Brand/Agency profiles instead of their users"""
+    Campaign = apps.get_model('campaigns', 'Campaign')
+    CampaignBid = apps.get_model('campaigns', 'CampaignBid')
+    brands = dict(apps.get_model('accounts', 'Brand').objects.values_list('user_id', 'id'))
+    agencies = dict(apps.get_model('accounts', 'Agency').objects.values_list('user_id', 'id'))
+
+    for campaign in Campaign.objects.all():
+        campaign.brand_id = brands.get(campaign.brand_user_id)
+        campaign.selected_agency_id = agencies.get(campaign.selected_agency_user_id)
+        campaign.utm_campaign = f'agencymatch_{secrets.token_urlsafe(8).lower()}'
+        campaign.save(update_fields=['brand', 'selected_agency', 'utm_campaign'])
+    for bid in CampaignBid.objects.all():
+        bid.agency_id = agencies.get(bid.agency_user_id)
+        bid.save(update_fields=['agency'])
+
+    # Rows of users without a brand or agency profile have no owner in the new schema
+    CampaignBid.objects.filter(agency__isnull=True).delete()
+    Campaign.objects.filter(brand__isnull=True).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_brand_agency_profile_fields'),
+        ('campaigns', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CampaignPerformance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('total_spend', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('meta_spend', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('google_spend', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('tiktok_spend', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('attributed_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('attributed_orders', models.IntegerField(default=0)),
+                ('roas', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('cpa', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('spend_data_source', models.CharField(default='MANUAL', max_length=20)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EscrowPayment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_budget', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('commission_rate', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('setup_fee', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('target_roas', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('minimum_spend', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending Setup'), ('HELD', 'Funds in Escrow'), ('RELEASED', 'Released to Agency'), ('REFUNDED', 'Refunded to Brand'), ('DISPUTED', 'Under Dispute')], default='PENDING', max_length=20)),
+                ('stripe_payment_intent_id', models.CharField(blank=True, max_length=255)),
+                ('auto_release_date', models.DateField(blank=True, null=True)),
+                ('performance_check_date', models.DateField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('agency', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounts.agency')),
+                ('brand', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounts.brand')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PaymentRelease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('release_type', models.CharField(choices=[('FULL', 'Full Release'), ('PARTIAL', 'Partial Release'), ('BONUS', 'Performance Bonus'), ('SETUP', 'Setup Fee')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('platform_fee', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('agency_payout', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('period_start', models.DateField()),
+                ('period_end', models.DateField()),
+                ('achieved_roas', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('spend_amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('stripe_transfer_id', models.CharField(blank=True, max_length=255)),
+                ('released_at', models.DateTimeField(auto_now_add=True)),
+                ('escrow', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='releases', to='campaigns.escrowpayment')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ShopifyOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shopify_order_id', models.BigIntegerField(unique=True)),
+                ('order_number', models.CharField(max_length=50)),
+                ('total_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('currency', models.CharField(default='DKK', max_length=3)),
+                ('customer_email', models.EmailField(max_length=254)),
+                ('utm_source', models.CharField(blank=True, max_length=100)),
+                ('utm_medium', models.CharField(blank=True, max_length=100)),
+                ('utm_campaign', models.CharField(blank=True, max_length=100)),
+                ('utm_content', models.CharField(blank=True, max_length=100)),
+                ('utm_term', models.CharField(blank=True, max_length=100)),
+                ('is_attributed', models.BooleanField(default=False)),
+                ('attribution_confidence', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('attribution_method', models.CharField(default='UTM', max_length=50)),
+                ('landing_site_ref', models.TextField(blank=True)),
+                ('referring_site', models.TextField(blank=True)),
+                ('source_name', models.CharField(blank=True, max_length=100)),
+                ('order_created_at', models.DateTimeField()),
+                ('processed_at', models.DateTimeField(auto_now_add=True)),
+                ('agency', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='accounts.agency')),
+                ('brand', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopify_orders', to='accounts.brand')),
+            ],
+        ),
+        migrations.RenameField(
+            model_name='campaignbid',
+            old_name='proposed_fee_percentage',
+            new_name='commission_percentage',
+        ),
+        migrations.AlterUniqueTogether(
+            name='campaignbid',
+            unique_together=set(),
+        ),
+        migrations.RemoveField(
+            model_name='campaign',
+            name='currency',
+        ),
+        migrations.RemoveField(
+            model_name='campaign',
+            name='target_ctr',
+        ),
+        migrations.AddField(
+            model_name='campaign',
+            name='brand',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='campaigns', to='accounts.brand'),
+        ),
+        migrations.AddField(
+            model_name='campaign',
+            name='escrow_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='campaign',
+            name='selected_agency',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='accounts.agency'),
+        ),
+        migrations.AddField(
+            model_name='campaign',
+            name='selected_bid',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='campaigns.campaignbid'),
+        ),
+        migrations.AddField(
+            model_name='campaign',
+            name='stripe_payment_intent_id',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='campaign',
+            name='tracking_pixel_installed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='campaign',
+            name='utm_campaign',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='campaignbid',
+            name='agency',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='bids', to='accounts.agency'),
+        ),
+        migrations.AddField(
+            model_name='campaignbid',
+            name='bonus_percentage',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=5),
+        ),
+        migrations.AddField(
+            model_name='campaignbid',
+            name='bonus_threshold_roas',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True),
+        ),
+        migrations.AddField(
+            model_name='campaignbid',
+            name='setup_fee',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.RunPython(link_profiles, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='campaign',
+            name='brand',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='campaigns', to='accounts.brand'),
+        ),
+        migrations.AlterField(
+            model_name='campaign',
+            name='utm_campaign',
+            field=models.CharField(blank=True, max_length=100, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='campaignbid',
+            name='agency',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bids', to='accounts.agency'),
+        ),
+        migrations.RemoveField(
+            model_name='campaign',
+            name='brand_user',
+        ),
+        migrations.RemoveField(
+            model_name='campaign',
+            name='selected_agency_user',
+        ),
+        migrations.RemoveField(
+            model_name='campaignbid',
+            name='agency_user',
+        ),
+        migrations.AlterField(
+            model_name='campaign',
+            name='status',
+            field=models.CharField(choices=[('DRAFT', 'Draft'), ('BIDDING', 'Open for Bidding'), ('SELECTED', 'Agency Selected'), ('ACTIVE', 'Campaign Running'), ('COMPLETED', 'Completed'), ('CANCELLED', 'Cancelled')], default='DRAFT', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='campaign',
+            name='target_roas',
+            field=models.DecimalField(decimal_places=2, max_digits=5),
+        ),
+        migrations.AlterField(
+            model_name='campaign',
+            name='title',
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='campaignbid',
+            name='competitiveness_score',
+            field=models.IntegerField(default=50),
+        ),
+        migrations.AlterField(
+            model_name='campaignbid',
+            name='estimated_timeline',
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='campaignbid',
+            name='guaranteed_roas',
+            field=models.DecimalField(decimal_places=2, max_digits=5),
+        ),
+        migrations.AlterUniqueTogether(
+            name='campaignbid',
+            unique_together={('campaign', 'agency')},
+        ),
+        migrations.AddField(
+            model_name='shopifyorder',
+            name='campaign',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='attributed_orders', to='campaigns.campaign'),
+        ),
+        migrations.AddField(
+            model_name='escrowpayment',
+            name='campaign',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='escrow', to='campaigns.campaign'),
+        ),
+        migrations.AddField(
+            model_name='campaignperformance',
+            name='campaign',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_performance', to='campaigns.campaign'),
+        ),
+        migrations.RemoveField(
+            model_name='campaignbid',
+            name='bonus_structure',
+        ),
+        migrations.RemoveField(
+            model_name='campaignbid',
+            name='guaranteed_ctr',
+        ),
+        migrations.RemoveField(
+            model_name='campaignbid',
+            name='updated_at',
+        ),
+        migrations.AlterUniqueTogether(
+            name='campaignperformance',
+            unique_together={('campaign', 'date')},
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.23 on 2026-10-19 17:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_brand_agency_profile_fields'),
+        ('campaigns', '0002_brand_agency_relations_and_payments'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BrandDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('orders', models.IntegerField(default=0)),
+                ('attributed_orders', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('attributed_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('confidence_sum', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('high_confidence_orders', models.IntegerField(default=0)),
+                ('medium_confidence_orders', models.IntegerField(default=0)),
+                ('low_confidence_orders', models.IntegerField(default=0)),
+                ('spend', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('source_counts', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('brand', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='accounts.brand')),
+            ],
+            options={
+                'unique_together': {('brand', 'date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='AgencyDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('orders', models.IntegerField(default=0)),
+                ('attributed_orders', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('attributed_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('confidence_sum', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('high_confidence_orders', models.IntegerField(default=0)),
+                ('medium_confidence_orders', models.IntegerField(default=0)),
+                ('low_confidence_orders', models.IntegerField(default=0)),
+                ('spend', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('source_counts', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('agency', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='accounts.agency')),
+                ('campaign', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='campaigns.campaign')),
+            ],
+            options={
+                'unique_together': {('agency', 'campaign', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.23 on 2026-10-19 17:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0003_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='campaignperformance',
+            index=models.Index(fields=['campaign', 'last_updated'], name='campaigns_c_campaig_0dd939_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shopifyorder',
+            index=models.Index(fields=['brand', 'processed_at'], name='campaigns_s_brand_i_e5a895_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shopifyorder',
+            index=models.Index(fields=['campaign', 'processed_at'], name='campaigns_s_campaig_a25baa_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.23 on 2026-10-19 17:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_brand_agency_profile_fields'),
+        ('campaigns', '0005_live_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=50)),
+                ('level', models.CharField(choices=[('info', 'Info'), ('success', 'Success'), ('warning', 'Warning')], max_length=10)),
+                ('title', models.CharField(max_length=100)),
+                ('message', models.CharField(max_length=255)),
+                ('action', models.CharField(blank=True, max_length=100)),
+                ('url', models.CharField(blank=True, max_length=200)),
+                ('resolved', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('agency', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='accounts.agency')),
+                ('brand', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='accounts.brand')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['brand', 'id'], name='campaigns_d_brand_i_536f9d_idx'), models.Index(fields=['agency', 'id'], name='campaigns_d_agency__f775da_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.23 on 2026-10-19 17:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_brand_agency_profile_fields'),
+        ('campaigns', '0006_dashboard_notifications'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgencyEarnings',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('earned', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('pending', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('setup_fees', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('agency', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='earnings', to='accounts.agency')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AgencyLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.CharField(choices=[('EARNED', 'Earned'), ('PENDING', 'Pending'), ('SETUP', 'Setup Fees')], max_length=10)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('reason', models.CharField(max_length=50)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('agency', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='accounts.agency')),
+                ('escrow', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='ledger_entries', to='campaigns.escrowpayment')),
+                ('release', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='ledger_entries', to='campaigns.paymentrelease')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['escrow', 'bucket'], name='campaigns_a_escrow__e6f527_idx'), models.Index(fields=['agency', 'created_at'], name='campaigns_a_agency__0f4e1b_idx')],
+            },
+        ),
+    ]
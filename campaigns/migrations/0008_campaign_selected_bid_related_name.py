@@ -0,0 +1,19 @@
+# Generated by Django 4.2.23 on 2026-10-19 17:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0007_agency_ledger'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='campaign',
+            name='selected_bid',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='selected_for', to='campaigns.campaignbid'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-19 17:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0009_fx_rates'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='performancemetric',
+            name='platform',
+            field=models.CharField(choices=[('META', 'Meta (Facebook & Instagram)'), ('GOOGLE', 'Google Ads'), ('TIKTOK', 'TikTok'), ('LINKEDIN', 'LinkedIn')], max_length=20),
+        ),
+    ]
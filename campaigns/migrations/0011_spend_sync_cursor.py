@@ -0,0 +1,27 @@
+# Generated by Django 4.2.23 on 2026-10-19 17:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0010_performancemetric_platform_choices'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpendSyncCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('platform', models.CharField(choices=[('META', 'Meta (Facebook & Instagram)'), ('GOOGLE', 'Google Ads'), ('TIKTOK', 'TikTok'), ('LINKEDIN', 'LinkedIn')], max_length=20)),
+                ('synced_through', models.DateField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('campaign', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spend_cursors', to='campaigns.campaign')),
+            ],
+            options={
+                'unique_together': {('campaign', 'platform')},
+            },
+        ),
+    ]
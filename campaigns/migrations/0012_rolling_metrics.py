@@ -0,0 +1,36 @@
+# Generated by Django 4.2.23 on 2026-10-19 17:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0011_spend_sync_cursor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollingMetric',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('window', models.PositiveSmallIntegerField()),
+                ('spend', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('impressions', models.PositiveBigIntegerField(default=0)),
+                ('clicks', models.PositiveBigIntegerField(default=0)),
+                ('roas', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('cpa', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('ctr', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('campaign', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rolling_metrics', to='campaigns.campaign')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['campaign', 'date'], name='campaigns_r_campaig_3da970_idx')],
+                'unique_together': {('campaign', 'window', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.23 on 2026-10-19 17:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0012_rolling_metrics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnomalyState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(choices=[('revenue', 'Revenue'), ('orders', 'Orders'), ('spend', 'Spend'), ('roas', 'ROAS')], max_length=10)),
+                ('granularity', models.CharField(choices=[('hour', 'Hourly'), ('day', 'Daily')], max_length=4)),
+                ('bucket_start', models.DateTimeField()),
+                ('bucket_value', models.FloatField(default=0)),
+                ('mean', models.FloatField(default=0)),
+                ('variance', models.FloatField(default=0)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('alert_bucket', models.DateTimeField(blank=True, null=True)),
+                ('alert_value', models.FloatField(blank=True, null=True)),
+                ('alert_baseline', models.FloatField(blank=True, null=True)),
+                ('alert_sigmas', models.FloatField(blank=True, null=True)),
+                ('campaign', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='anomaly_states', to='campaigns.campaign')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['granularity', 'bucket_start'], name='campaigns_a_granula_9ff404_idx')],
+                'unique_together': {('campaign', 'metric', 'granularity')},
+            },
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 4.2.23 on 2026-10-19 17:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_brand_currency'),
+        ('campaigns', '0013_anomaly_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CohortCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_order_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CustomerCohort',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cohort_month', models.DateField()),
+                ('customers', models.PositiveIntegerField(default=0)),
+                ('active_customers', models.JSONField(default=list)),
+                ('orders', models.JSONField(default=list)),
+                ('revenue', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='shopifyorder',
+            index=models.Index(fields=['brand', 'customer_email'], name='campaigns_s_brand_i_597618_idx'),
+        ),
+        migrations.AddField(
+            model_name='customercohort',
+            name='agency',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='customer_cohorts', to='accounts.agency'),
+        ),
+        migrations.AddField(
+            model_name='customercohort',
+            name='brand',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='customer_cohorts', to='accounts.brand'),
+        ),
+        migrations.AddField(
+            model_name='customercohort',
+            name='campaign',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='customer_cohorts', to='campaigns.campaign'),
+        ),
+        migrations.AddField(
+            model_name='cohortcursor',
+            name='brand',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='cohort_cursor', to='accounts.brand'),
+        ),
+        migrations.AddIndex(
+            model_name='customercohort',
+            index=models.Index(fields=['brand', 'cohort_month'], name='campaigns_c_brand_i_466d70_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customercohort',
+            index=models.Index(fields=['agency', 'cohort_month'], name='campaigns_c_agency__ba56a2_idx'),
+        ),
+    ]
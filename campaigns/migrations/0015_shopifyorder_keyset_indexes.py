@@ -0,0 +1,25 @@
+# Generated by Django 4.2.23 on 2026-10-19 17:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0014_customer_cohorts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='shopifyorder',
+            index=models.Index(fields=['brand', 'order_created_at', 'id'], name='campaigns_s_brand_i_f75aee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shopifyorder',
+            index=models.Index(fields=['agency', 'order_created_at', 'id'], name='campaigns_s_agency__61ff31_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shopifyorder',
+            index=models.Index(fields=['campaign', 'order_created_at', 'id'], name='campaigns_s_campaig_fe3d28_idx'),
+        ),
+    ]
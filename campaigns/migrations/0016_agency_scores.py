@@ -0,0 +1,36 @@
+# Generated by Django 4.2.23 on 2026-10-19 17:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_agency_competitiveness_index'),
+        ('campaigns', '0015_shopifyorder_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgencyScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_campaigns', models.PositiveIntegerField(default=0)),
+                ('scored_campaigns', models.PositiveIntegerField(default=0)),
+                ('successful_campaigns', models.PositiveIntegerField(default=0)),
+                ('roas_attainment', models.DecimalField(decimal_places=3, default=0, max_digits=6)),
+                ('settled_escrows', models.PositiveIntegerField(default=0)),
+                ('released_escrows', models.PositiveIntegerField(default=0)),
+                ('success_rate', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('avg_rating', models.DecimalField(decimal_places=2, default=0, max_digits=3)),
+                ('competitiveness_score', models.IntegerField(default=50)),
+                ('reason', models.CharField(blank=True, max_length=100)),
+                ('computed_at', models.DateTimeField(auto_now_add=True)),
+                ('agency', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='score_history', to='accounts.agency')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['agency', 'computed_at'], name='campaigns_a_agency__4e8e5b_idx')],
+            },
+        ),
+    ]
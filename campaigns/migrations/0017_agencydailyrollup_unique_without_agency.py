@@ -0,0 +1,50 @@
+# Generated by Django 4.2.23 on 2026-10-19 17:28
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+TOTAL_FIELDS = [
+    'orders', 'attributed_orders', 'revenue', 'attributed_revenue', 'confidence_sum',
+    'high_confidence_orders', 'medium_confidence_orders', 'low_confidence_orders', 'spend',
+]
+
+
+def merge_duplicate_rows(apps, schema_editor):
+    """Fold rows that the new constraint would reject into the oldest one"""
+    AgencyDailyRollup = apps.get_model('campaigns', 'AgencyDailyRollup')
+
+    kept = {}
+    duplicate_ids = []
+    for row in AgencyDailyRollup.objects.filter(agency__isnull=True).order_by('id'):
+        first = kept.setdefault((row.campaign_id, row.date), row)
+        if first is row:
+            continue
+        for field in TOTAL_FIELDS:
+            setattr(first, field, getattr(first, field) + getattr(row, field))
+        for source, counts in row.source_counts.items():
+            merged = first.source_counts.setdefault(source, {'orders': 0, 'revenue': '0'})
+            merged['orders'] += counts['orders']
+            merged['revenue'] = str(Decimal(merged['revenue']) + Decimal(counts['revenue']))
+        first.merged = True
+        duplicate_ids.append(row.id)
+
+    for row in kept.values():
+        if getattr(row, 'merged', False):
+            row.save()
+    AgencyDailyRollup.objects.filter(id__in=duplicate_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0016_agency_scores'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_rows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='agencydailyrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('agency__isnull', True)), fields=('campaign', 'date'), name='agencydailyrollup_unique_without_agency'),
+        ),
+    ]
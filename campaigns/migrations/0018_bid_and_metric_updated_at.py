@@ -0,0 +1,23 @@
+# Generated by Django 4.2.23 on 2026-10-19 17:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0017_agencydailyrollup_unique_without_agency'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='campaignbid',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='performancemetric',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.23 on 2026-10-19 17:50
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+def mark_folded_orders(apps, schema_editor):
+    """Orders up to each brand's cursor are in its cohorts (run update_cohorts --rebuild for any it skipped)"""
+    CohortCursor = apps.get_model('campaigns', 'CohortCursor')
+    ShopifyOrder = apps.get_model('campaigns', 'ShopifyOrder')
+
+    for brand_id, last_order_id in CohortCursor.objects.filter(last_order_id__gt=0).values_list('brand_id', 'last_order_id'):
+        ShopifyOrder.objects.filter(brand_id=brand_id, id__lte=last_order_id).update(in_cohorts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0018_bid_and_metric_updated_at'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='shopifyorder',
+            name='campaigns_s_brand_i_597618_idx',
+        ),
+        migrations.AddField(
+            model_name='shopifyorder',
+            name='in_cohorts',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_folded_orders, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='shopifyorder',
+            index=models.Index(models.F('brand'), django.db.models.functions.text.Lower(django.db.models.functions.text.Trim('customer_email')), name='shopifyorder_customer_key'),
+        ),
+        migrations.AddIndex(
+            model_name='shopifyorder',
+            index=models.Index(condition=models.Q(('in_cohorts', False)), fields=['brand'], name='shopifyorder_cohort_pending'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.23 on 2026-10-19 18:05
+
+from django.db import migrations
+
+from campaigns import search
+
+
+def create_search_index(apps, schema_editor):
+    """Create the FTS5 marketplace search table (SQLite only) and index the existing campaigns"""
+    if search.available(schema_editor.connection):
+        search.create_search_index(schema_editor.connection)
+        search.rebuild_search_index(schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    if search.available(schema_editor.connection):
+        schema_editor.execute(f'DROP TABLE IF EXISTS {search.TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_agency_competitiveness_index'),
+        ('campaigns', '0019_shopifyorder_in_cohorts'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
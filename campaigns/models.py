@@ -1,5 +1,6 @@
 # campaigns/models.py
 from django.db import models
+from django.db.models.functions import Lower, Trim
 from django.utils import timezone
 from accounts.models import Brand, Agency
 
@@ -40,7 +41,7 @@ class Campaign(models.Model):
     # Agency selection
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='DRAFT')
     selected_agency = models.ForeignKey('accounts.Agency', on_delete=models.SET_NULL, null=True, blank=True)
-    selected_bid = models.OneToOneField('CampaignBid', on_delete=models.SET_NULL, null=True, blank=True)
+    selected_bid = models.OneToOneField('CampaignBid', on_delete=models.SET_NULL, null=True, blank=True, related_name='selected_for')
     
     # Attribution tracking
     utm_campaign = models.CharField(max_length=100, unique=True, blank=True)
@@ -122,6 +123,7 @@ class CampaignBid(models.Model):
     is_selected = models.BooleanField(default=False)
     
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         unique_together = ['campaign', 'agency']
@@ -142,7 +144,11 @@ class ShopifyOrder(models.Model):
     # Order details
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
     currency = models.CharField(max_length=3, default='DKK')
+    # total_price in the brand's currency, converted once at ingest; every revenue sum uses this
+    normalized_total = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
     customer_email = models.EmailField()
+    # Folded into the brand's CustomerCohort rows (campaigns.cohorts)
+    in_cohorts = models.BooleanField(default=False)
     
     # Attribution data
     utm_source = models.CharField(max_length=100, blank=True)
@@ -165,6 +171,22 @@ class ShopifyOrder(models.Model):
     order_created_at = models.DateTimeField()
     processed_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            # High-water marks for conditional GETs on the polling APIs
+            models.Index(fields=['brand', 'processed_at']),
+            models.Index(fields=['campaign', 'processed_at']),
+            # A customer's order history, for repeat-purchase cohorts; customers
+            # are keyed by the trimmed, lowercased email
+            models.Index(models.F('brand'), Lower(Trim('customer_email')), name='shopifyorder_customer_key'),
+            # Orders not yet folded into the cohorts
+            models.Index(fields=['brand'], condition=models.Q(in_cohorts=False), name='shopifyorder_cohort_pending'),
+            # Keyset pagination seeks (campaigns.pagination)
+            models.Index(fields=['brand', 'order_created_at', 'id']),
+            models.Index(fields=['agency', 'order_created_at', 'id']),
+            models.Index(fields=['campaign', 'order_created_at', 'id']),
+        ]
+    
     def __str__(self):
         return f"Order #{self.order_number} - {self.brand.shopify_domain}"
 
@@ -194,6 +216,9 @@ class CampaignPerformance(models.Model):
     
     class Meta:
         unique_together = ['campaign', 'date']
+        indexes = [
+            models.Index(fields=['campaign', 'last_updated']),
+        ]
     
     def calculate_metrics(self):
         """Calculate ROAS and CPA based on current data"""
@@ -205,6 +230,182 @@ class CampaignPerformance(models.Model):
             self.cpa = 0
         self.save()
 
+class PerformanceMetric(models.Model):
+    """Daily ad platform delivery metrics per campaign and platform"""
+    
+    campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE, related_name='metrics')
+    platform = models.CharField(max_length=20, choices=Campaign.PLATFORM_CHOICES)
+    date = models.DateField()
+    
+    impressions = models.PositiveIntegerField(default=0)
+    clicks = models.PositiveIntegerField(default=0)
+    conversions = models.PositiveIntegerField(default=0)
+    spend = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    
+    # Per-row ratios; never average these, weight them (see performance.metrics)
+    ctr = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    cpa = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    cpm = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    roas = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['campaign', 'platform', 'date']
+    
+    def __str__(self):
+        return f"{self.campaign.title} - {self.platform} - {self.date}"
+
+class SpendSyncCursor(models.Model):
+    """Last day a spend connector has fetched for a campaign on a platform"""
+
+    campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE, related_name='spend_cursors')
+    platform = models.CharField(max_length=20, choices=Campaign.PLATFORM_CHOICES)
+    synced_through = models.DateField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['campaign', 'platform']
+
+    def __str__(self):
+        return f"{self.campaign_id} - {self.platform} through {self.synced_through}"
+
+class RollingMetric(models.Model):
+    """Trailing-window sums and ratios of a campaign, as of one day (see campaigns.rolling)"""
+
+    campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE, related_name='rolling_metrics')
+    date = models.DateField()
+    window = models.PositiveSmallIntegerField()  # days, e.g. 7, 14, 28
+
+    # Sums over [date - window + 1, date]
+    spend = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    orders = models.PositiveIntegerField(default=0)
+    impressions = models.PositiveBigIntegerField(default=0)
+    clicks = models.PositiveBigIntegerField(default=0)
+
+    roas = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    cpa = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    ctr = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['campaign', 'window', 'date']
+        indexes = [
+            models.Index(fields=['campaign', 'date']),
+        ]
+
+    def __str__(self):
+        return f"{self.campaign_id} - {self.window}d as of {self.date}"
+
+class AnomalyState(models.Model):
+    """EWMA baseline of one campaign metric per hour or day (see campaigns.anomalies)"""
+
+    METRIC_CHOICES = [
+        ('revenue', 'Revenue'),
+        ('orders', 'Orders'),
+        ('spend', 'Spend'),
+        ('roas', 'ROAS'),
+    ]
+    GRANULARITY_CHOICES = [
+        ('hour', 'Hourly'),
+        ('day', 'Daily'),
+    ]
+
+    campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE, related_name='anomaly_states')
+    metric = models.CharField(max_length=10, choices=METRIC_CHOICES)
+    granularity = models.CharField(max_length=4, choices=GRANULARITY_CHOICES)
+
+    # Open bucket: start and what has accumulated in it so far
+    bucket_start = models.DateTimeField()
+    bucket_value = models.FloatField(default=0)
+
+    # Exponentially weighted mean and variance of closed buckets
+    mean = models.FloatField(default=0)
+    variance = models.FloatField(default=0)
+    count = models.PositiveIntegerField(default=0)
+
+    # Last closed bucket, when it was anomalous
+    alert_bucket = models.DateTimeField(null=True, blank=True)
+    alert_value = models.FloatField(null=True, blank=True)
+    alert_baseline = models.FloatField(null=True, blank=True)
+    alert_sigmas = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ['campaign', 'metric', 'granularity']
+        indexes = [
+            models.Index(fields=['granularity', 'bucket_start']),
+        ]
+
+    def __str__(self):
+        return f"{self.campaign_id} - {self.granularity}ly {self.metric}"
+
+class CustomerCohort(models.Model):
+    """Customers first acquired in one month by one campaign, and their orders by month since (see campaigns.cohorts)"""
+
+    brand = models.ForeignKey(Brand, on_delete=models.CASCADE, related_name='customer_cohorts')
+    cohort_month = models.DateField()  # first day of the month of the customers' first order
+    # Attribution of the first order; both NULL for customers acquired without a campaign
+    campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE, null=True, blank=True, related_name='customer_cohorts')
+    agency = models.ForeignKey('accounts.Agency', on_delete=models.SET_NULL, null=True, blank=True, related_name='customer_cohorts')
+
+    customers = models.PositiveIntegerField(default=0)
+    # One entry per month since cohort_month: customers who ordered, orders, revenue (decimal strings)
+    active_customers = models.JSONField(default=list)
+    orders = models.JSONField(default=list)
+    revenue = models.JSONField(default=list)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['brand', 'cohort_month']),
+            models.Index(fields=['agency', 'cohort_month']),
+        ]
+
+    def __str__(self):
+        return f"{self.brand_id} - {self.cohort_month:%Y-%m} - {self.campaign_id or 'unattributed'}"
+
+class CohortCursor(models.Model):
+    """Lock row of a brand's CustomerCohort rows, and the highest ShopifyOrder id folded in"""
+
+    brand = models.OneToOneField(Brand, on_delete=models.CASCADE, related_name='cohort_cursor')
+    last_order_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.brand_id} through order {self.last_order_id}"
+
+class AgencyScore(models.Model):
+    """One scoring of an agency from its campaign outcomes (see campaigns.scoring); the latest is copied onto Agency"""
+
+    agency = models.ForeignKey('accounts.Agency', on_delete=models.CASCADE, related_name='score_history')
+
+    total_campaigns = models.PositiveIntegerField(default=0)  # completed campaigns
+    scored_campaigns = models.PositiveIntegerField(default=0)  # of which with spend
+    successful_campaigns = models.PositiveIntegerField(default=0)  # achieved ROAS >= guaranteed
+    roas_attainment = models.DecimalField(max_digits=6, decimal_places=3, default=0)  # spend-weighted achieved / guaranteed
+    settled_escrows = models.PositiveIntegerField(default=0)
+    released_escrows = models.PositiveIntegerField(default=0)
+
+    success_rate = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    avg_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0)
+    competitiveness_score = models.IntegerField(default=50)
+
+    reason = models.CharField(max_length=100, blank=True)  # e.g. 'batch', 'campaign 12 completed'
+    computed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['agency', 'computed_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.agency_id} - {self.competitiveness_score} at {self.computed_at:%Y-%m-%d %H:%M}"
+
 # NEW: Payment and Escrow Models
 class EscrowPayment(models.Model):
     """Handle escrow payments between brands and agencies"""
@@ -305,4 +506,208 @@ class PaymentRelease(models.Model):
     released_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
-        return f"{self.release_type} - {self.amount} DKK to {self.escrow.agency.user.company_name}"
\ No newline at end of file
+        return f"{self.release_type} - {self.amount} DKK to {self.escrow.agency.user.company_name}"
+
+class FxRate(models.Model):
+    """Reference exchange rate: units of currency per 1 EUR on a day (ECB format)"""
+    
+    date = models.DateField()
+    currency = models.CharField(max_length=3)
+    rate = models.DecimalField(max_digits=18, decimal_places=8)
+    
+    class Meta:
+        unique_together = ['date', 'currency']
+    
+    def __str__(self):
+        return f"{self.date} - 1 EUR = {self.rate} {self.currency}"
+
+# Agency earnings ledger: append-only entries per escrow plus running totals
+class AgencyLedgerEntry(models.Model):
+    """A change to one of an agency's earnings buckets, caused by an escrow or release event"""
+    
+    BUCKET_CHOICES = [
+        ('EARNED', 'Earned'),
+        ('PENDING', 'Pending'),
+        ('SETUP', 'Setup Fees'),
+    ]
+    
+    agency = models.ForeignKey('accounts.Agency', on_delete=models.CASCADE, related_name='ledger_entries')
+    # No constraint: entries keep the ids of deleted escrows/releases so they can be reversed
+    escrow = models.ForeignKey(EscrowPayment, on_delete=models.DO_NOTHING, db_constraint=False, related_name='ledger_entries')
+    release = models.ForeignKey(PaymentRelease, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='ledger_entries')
+    
+    bucket = models.CharField(max_length=10, choices=BUCKET_CHOICES)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)  # Signed delta
+    reason = models.CharField(max_length=50)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['escrow', 'bucket']),
+            models.Index(fields=['agency', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.agency} - {self.bucket} {self.amount:+} ({self.reason})"
+
+class AgencyEarnings(models.Model):
+    """Running totals of an agency's ledger, updated with every entry"""
+    
+    agency = models.OneToOneField('accounts.Agency', on_delete=models.CASCADE, related_name='earnings')
+    earned = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    pending = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    setup_fees = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.agency} - earned {self.earned} DKK"
+
+# Daily rollups maintained on ingest so dashboards never rescan raw orders
+class DailyRollup(models.Model):
+    """Per-day order, attribution and spend totals"""
+    
+    date = models.DateField()
+    
+    orders = models.IntegerField(default=0)
+    attributed_orders = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    attributed_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    confidence_sum = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    # Attribution confidence buckets (high >= 80, medium >= 50, low < 50)
+    high_confidence_orders = models.IntegerField(default=0)
+    medium_confidence_orders = models.IntegerField(default=0)
+    low_confidence_orders = models.IntegerField(default=0)
+    
+    spend = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    # Attributed orders per utm_source: {'facebook': {'orders': 3, 'revenue': '1200.00'}}
+    source_counts = models.JSONField(default=dict)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        abstract = True
+    
+    def add_order(self, order):
+        """Fold one ShopifyOrder into this rollup row"""
+        from decimal import Decimal
+        
+        price = Decimal(str(order.normalized_total or 0))
+        confidence = Decimal(str(order.attribution_confidence or 0))
+        
+        self.orders += 1
+        self.revenue += price
+        self.confidence_sum += confidence
+        
+        if confidence >= 80:
+            self.high_confidence_orders += 1
+        elif confidence >= 50:
+            self.medium_confidence_orders += 1
+        else:
+            self.low_confidence_orders += 1
+        
+        if order.is_attributed:
+            self.attributed_orders += 1
+            self.attributed_revenue += price
+            source = self.source_counts.setdefault(order.utm_source or '', {'orders': 0, 'revenue': '0'})
+            source['orders'] += 1
+            source['revenue'] = str(Decimal(source['revenue']) + price)
+
+class BrandDailyRollup(DailyRollup):
+    """All of a brand's orders and campaign spend for one day"""
+    
+    brand = models.ForeignKey(Brand, on_delete=models.CASCADE, related_name='daily_rollups')
+    
+    class Meta:
+        unique_together = ['brand', 'date']
+    
+    def __str__(self):
+        return f"{self.brand} - {self.date}"
+
+class AgencyDailyRollup(DailyRollup):
+    """An agency's attributed orders and spend for one campaign and day"""
+    
+    agency = models.ForeignKey('accounts.Agency', on_delete=models.CASCADE, null=True, blank=True, related_name='daily_rollups')
+    campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE, related_name='daily_rollups')
+    
+    class Meta:
+        unique_together = ['agency', 'campaign', 'date']
+        constraints = [
+            # NULLs are distinct in unique_together, so rows for campaigns
+            # without an agency need their own (partial) unique index
+            models.UniqueConstraint(
+                fields=['campaign', 'date'], condition=models.Q(agency__isnull=True),
+                name='agencydailyrollup_unique_without_agency',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.agency} - {self.campaign.title} - {self.date}"
+
+class LiveEvent(models.Model):
+    """Short-lived event log fanned out to live dashboard connections (SSE)"""
+    
+    # 'brand:<id>' or 'agency:<id>'
+    channel = models.CharField(max_length=50)
+    kind = models.CharField(max_length=30)  # order, performance, notification
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['channel', 'id']),
+            models.Index(fields=['created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.channel} - {self.kind} #{self.id}"
+
+class DashboardNotification(models.Model):
+    """Materialized dashboard notification for a brand or an agency.
+    
+    At most one unresolved row exists per (tenant, key). A changed condition
+    supersedes it with a new row and a cleared condition appends a resolved
+    marker, so ids only grow and clients can page by cursor.
+    """
+    
+    LEVEL_CHOICES = [
+        ('info', 'Info'),
+        ('success', 'Success'),
+        ('warning', 'Warning'),
+    ]
+    
+    brand = models.ForeignKey(Brand, on_delete=models.CASCADE, null=True, blank=True, related_name='notifications')
+    agency = models.ForeignKey(Agency, on_delete=models.CASCADE, null=True, blank=True, related_name='notifications')
+    
+    key = models.CharField(max_length=50)  # low_attribution, release_ready, ...
+    level = models.CharField(max_length=10, choices=LEVEL_CHOICES)
+    title = models.CharField(max_length=100)
+    message = models.CharField(max_length=255)
+    action = models.CharField(max_length=100, blank=True)
+    url = models.CharField(max_length=200, blank=True)
+    
+    resolved = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['brand', 'id']),
+            models.Index(fields=['agency', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.brand or self.agency} - {self.key} #{self.id}"
+    
+    def as_dict(self):
+        return {
+            'id': self.id,
+            'key': self.key,
+            'type': self.level,
+            'title': self.title,
+            'message': self.message,
+            'action': self.action,
+            'url': self.url,
+            'resolved': self.resolved,
+            'created_at': self.created_at.isoformat(),
+        }
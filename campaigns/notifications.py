@@ -0,0 +1,254 @@
+# campaigns/notifications.py - Materialized dashboard notifications
+#
+# Conditions are evaluated in bulk, with a fixed handful of grouped queries
+# for any number of tenants, and diffed against the unresolved rows. The
+# dashboard endpoint then only reads DashboardNotification by cursor.
+# Evaluation runs after ingestion events (webhook, spend entry, bids) and
+# periodically from the evaluate_notifications command for the time-based
+# conditions.
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from accounts.models import Agency
+from .anomalies import anomaly_message, close_days, close_hours
+from .live import publish
+from .models import (
+    AnomalyState, BrandDailyRollup, Campaign, CampaignBid, CampaignPerformance, DashboardNotification, EscrowPayment,
+)
+
+BRAND_KEYS = ('low_attribution', 'release_ready')
+# One notification per anomalous campaign metric: 'anomaly:<campaign>:<metric>:<granularity>'
+BRAND_KEY_PREFIXES = ('anomaly:',)
+AGENCY_KEYS = ('new_opportunities', 'payment_setup')
+
+LOW_ATTRIBUTION_RATE = 0.6
+
+NOTIFICATION_PAGE_SIZE = 100
+
+NOTIFICATION_FIELDS = ('level', 'title', 'message', 'action', 'url')
+
+
+def _campaign_total(field):
+    """Sum of a CampaignPerformance field for the outer row's campaign"""
+    totals = CampaignPerformance.objects.filter(campaign=OuterRef('campaign')).order_by().values('campaign').annotate(
+        total=Sum(field)
+    ).values('total')
+    return Coalesce(Subquery(totals), Value(0), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def brand_conditions(brand_ids=None):
+    """{brand_id: {key: fields}} for every brand notification that currently holds"""
+
+    found = defaultdict(dict)
+
+    # Low attribution over the last 7 days
+    rollups = BrandDailyRollup.objects.filter(date__gte=timezone.localdate() - timedelta(days=7))
+    if brand_ids is not None:
+        rollups = rollups.filter(brand_id__in=brand_ids)
+    for row in rollups.values('brand_id').annotate(
+        n_orders=Sum('orders'), n_attributed=Sum('attributed_orders')
+    ).order_by():
+        if not row['n_orders']:
+            continue
+        attribution_rate = row['n_attributed'] / row['n_orders']
+        if attribution_rate < LOW_ATTRIBUTION_RATE:
+            found[row['brand_id']]['low_attribution'] = {
+                'level': 'warning',
+                'title': 'Low Attribution Rate',
+                'message': f'Only {attribution_rate*100:.1f}% of recent orders are attributed to campaigns',
+                'action': 'Review tracking setup',
+                'url': '/shopify/analytics/',
+            }
+
+    # Held escrows whose release conditions are met (same test as
+    # EscrowPayment.check_release_conditions, for all escrows in one query)
+    escrows = EscrowPayment.objects.filter(status='HELD')
+    if brand_ids is not None:
+        escrows = escrows.filter(brand_id__in=brand_ids)
+    ready = defaultdict(int)
+    for row in escrows.annotate(
+        spend=_campaign_total('total_spend'), revenue=_campaign_total('attributed_revenue')
+    ).values('brand_id', 'target_roas', 'minimum_spend', 'spend', 'revenue'):
+        actual_roas = row['revenue'] / row['spend'] if row['spend'] > 0 else 0
+        if actual_roas >= row['target_roas'] and row['spend'] >= row['minimum_spend']:
+            ready[row['brand_id']] += 1
+    for brand_id, count in ready.items():
+        found[brand_id]['release_ready'] = {
+            'level': 'success',
+            'title': 'Payments Ready for Release',
+            'message': f'{count} campaigns have met performance targets',
+            'action': 'Release payments',
+            'url': '/payments/dashboard/',
+        }
+
+    # Campaign metrics whose last closed hour or day left the EWMA baseline
+    anomalies = AnomalyState.objects.filter(alert_bucket__isnull=False, campaign__status='ACTIVE')
+    if brand_ids is not None:
+        anomalies = anomalies.filter(campaign__brand_id__in=brand_ids)
+    for row in anomalies.values(
+        'campaign_id', 'campaign__brand_id', 'campaign__title', 'metric', 'granularity',
+        'alert_bucket', 'alert_value', 'alert_baseline', 'alert_sigmas',
+    ):
+        key = f"anomaly:{row['campaign_id']}:{row['metric']}:{row['granularity']}"
+        found[row['campaign__brand_id']][key] = {
+            'level': 'warning',
+            'title': f"Anomaly: {row['campaign__title']}"[:100],
+            'message': anomaly_message(row)[:255],
+            'action': 'View campaign performance',
+            'url': f"/performance/campaign/{row['campaign_id']}/",
+        }
+
+    return found
+
+
+def agency_conditions(agency_ids=None):
+    """{agency_id: {key: fields}} for every agency notification that currently holds"""
+
+    found = defaultdict(dict)
+    now = timezone.now()
+
+    agencies = Agency.objects.all()
+    if agency_ids is not None:
+        agencies = agencies.filter(id__in=agency_ids)
+    agencies = list(agencies.values_list('id', 'stripe_account_id'))
+
+    # New campaigns from the last 24 hours the agency has not bid on yet
+    open_campaigns = list(Campaign.objects.filter(
+        status='BIDDING',
+        created_at__gte=now - timedelta(hours=24),
+        bidding_deadline__gt=now
+    ).values_list('id', flat=True))
+    bid_counts = {}
+    if open_campaigns:
+        bids = CampaignBid.objects.filter(campaign_id__in=open_campaigns)
+        if agency_ids is not None:
+            bids = bids.filter(agency_id__in=agency_ids)
+        bid_counts = dict(bids.values('agency_id').annotate(n=Count('campaign_id', distinct=True)).values_list(
+            'agency_id', 'n'
+        ).order_by())
+
+    for agency_id, stripe_account_id in agencies:
+        new_campaigns = len(open_campaigns) - bid_counts.get(agency_id, 0)
+        if new_campaigns > 0:
+            found[agency_id]['new_opportunities'] = {
+                'level': 'info',
+                'title': 'New Opportunities',
+                'message': f'{new_campaigns} new campaigns available for bidding',
+                'action': 'View campaigns',
+                'url': '/marketplace/',
+            }
+        if not stripe_account_id:
+            found[agency_id]['payment_setup'] = {
+                'level': 'warning',
+                'title': 'Payment Setup Required',
+                'message': 'Complete Stripe onboarding to receive payments',
+                'action': 'Set up payments',
+                'url': '/payments/onboarding/',
+            }
+
+    return found
+
+
+def sync_notifications(kind, keys, desired, tenant_ids=None, key_prefixes=()):
+    """Bring the unresolved notifications of the evaluated tenants in line with desired.
+
+    ``desired`` maps tenant id -> {key: fields}. Unchanged notifications are
+    left alone, changed ones are superseded by a new row and cleared ones get
+    a resolved marker. Keys starting with one of ``key_prefixes`` are owned
+    by this evaluation as well. Returns the number of rows written.
+    """
+
+    tenant_field = f'{kind}_id'
+    owned = Q(key__in=keys)
+    for prefix in key_prefixes:
+        owned |= Q(key__startswith=prefix)
+    current_rows = DashboardNotification.objects.filter(owned, resolved=False)
+    if tenant_ids is None:
+        current_rows = current_rows.filter(**{f'{tenant_field}__isnull': False})
+    else:
+        current_rows = current_rows.filter(**{f'{tenant_field}__in': tenant_ids})
+
+    current = {}
+    superseded = []
+    for notification in current_rows.order_by('id'):
+        slot = (getattr(notification, tenant_field), notification.key)
+        if slot in current:
+            # Left behind by a concurrent evaluation: keep only the newest
+            superseded.append(current[slot].id)
+        current[slot] = notification
+
+    created = []
+    for tenant_id, conditions in desired.items():
+        for key, fields in conditions.items():
+            existing = current.pop((tenant_id, key), None)
+            if existing is not None:
+                if all(getattr(existing, f) == fields[f] for f in NOTIFICATION_FIELDS):
+                    continue
+                superseded.append(existing.id)
+            created.append(DashboardNotification(**{tenant_field: tenant_id}, key=key, **fields))
+
+    for (tenant_id, key), existing in current.items():
+        superseded.append(existing.id)
+        created.append(DashboardNotification(
+            **{tenant_field: tenant_id}, key=key, resolved=True,
+            **{f: getattr(existing, f) for f in NOTIFICATION_FIELDS}
+        ))
+
+    if not created and not superseded:
+        return 0
+
+    with transaction.atomic():
+        if superseded:
+            DashboardNotification.objects.filter(id__in=superseded).update(resolved=True)
+        created = DashboardNotification.objects.bulk_create(created)
+
+    for notification in created:
+        publish('notification', notification.as_dict(), **{tenant_field: getattr(notification, tenant_field)})
+
+    return len(created)
+
+
+def notifications_for_user(user):
+    """The DashboardNotification queryset a dashboard user may read"""
+    if user.user_type == 'BRAND':
+        return DashboardNotification.objects.filter(brand__user=user)
+    if user.user_type == 'AGENCY':
+        return DashboardNotification.objects.filter(agency__user=user)
+    return None
+
+
+def refresh_brand_notifications(brand_id):
+    return sync_notifications('brand', BRAND_KEYS, brand_conditions([brand_id]), [brand_id], BRAND_KEY_PREFIXES)
+
+
+def refresh_agency_notifications(agency_id=None):
+    """Re-evaluate one agency, or every agency when agency_id is None"""
+    if agency_id is None:
+        return sync_notifications('agency', AGENCY_KEYS, agency_conditions())
+    return sync_notifications('agency', AGENCY_KEYS, agency_conditions([agency_id]), [agency_id])
+
+
+def refresh_opportunity_notifications(campaign_id):
+    """Re-evaluate the agencies whose new opportunities count a campaign.
+
+    That is every agency without a bid on it; agencies that bid are
+    already past it either way.
+    """
+    agency_ids = Agency.objects.exclude(bids__campaign_id=campaign_id).values('id')
+    return sync_notifications('agency', AGENCY_KEYS, agency_conditions(agency_ids), agency_ids)
+
+
+def evaluate_notifications():
+    """Periodic pass over all tenants (picks up time-based changes)"""
+    # Close elapsed hours and days first, so quiet hours can raise anomalies
+    close_hours()
+    close_days()
+    brands = sync_notifications('brand', BRAND_KEYS, brand_conditions(), key_prefixes=BRAND_KEY_PREFIXES)
+    agencies = refresh_agency_notifications()
+    return brands, agencies
@@ -0,0 +1,219 @@
+# campaigns/pacing.py - Budget pacing and end-of-campaign forecasts
+#
+# For a set of campaigns, daily spend and revenue (CampaignPerformance) from
+# campaign start through yesterday are laid out as two float matrices of
+# shape (campaigns, days), zero-filled and masked outside each campaign's
+# run. A least-squares line is fitted to every row of the trailing
+# PACING_TREND_DAYS in one pass:
+#
+#     slope = (n*Sxy - Sx*Sy) / (n*Sxx - Sx**2)    intercept = (Sy - slope*Sx) / n
+#
+# and extended over the days left until campaign_end (today included, since
+# today's numbers are still partial), clipped at zero. Projected final spend
+# and revenue are what has been booked plus that extension; the band is
+# +/- PACING_CONFIDENCE_Z residual standard deviations scaled by the square
+# root of the remaining days. Projected spend is compared with budget_min /
+# budget_max and projected ROAS with target_roas.
+#
+# Forecasts are cached per campaign under its brand's data version, so a
+# write to one campaign only re-fits the campaigns whose data changed.
+
+from datetime import timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .cache import get_data_versions
+from .models import CampaignPerformance
+
+CENT = Decimal('0.01')
+
+
+def _decimal(value):
+    return Decimal(repr(float(value))).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def _params():
+    return {
+        'trend_days': getattr(settings, 'PACING_TREND_DAYS', 14),
+        'z': getattr(settings, 'PACING_CONFIDENCE_Z', 1.96),
+        'tolerance': getattr(settings, 'PACING_TOLERANCE', 0.05),
+    }
+
+
+def fit_trends(values, mask):
+    """Least-squares line per row over the masked cells of (rows, days) arrays.
+
+    Returns (intercept, slope, residual sigma) arrays; x is the column index.
+    Rows with one observed day get a flat line, rows with none get zeros.
+    """
+
+    x = np.arange(values.shape[1], dtype=np.float64)
+    weights = mask.astype(np.float64)
+    n = weights.sum(axis=1)
+    sx = weights @ x
+    sxx = weights @ (x * x)
+    sy = (values * weights).sum(axis=1)
+    sxy = (values * weights) @ x
+
+    denominator = n * sxx - sx * sx
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(denominator > 0, (n * sxy - sx * sy) / denominator, 0.0)
+        intercept = np.where(n > 0, (sy - slope * sx) / n, 0.0)
+        residuals = (values - (intercept[:, None] + slope[:, None] * x)) * weights
+        sigma = np.where(n > 2, np.sqrt((residuals ** 2).sum(axis=1) / (n - 2)), 0.0)
+    return intercept, slope, sigma
+
+
+def extend_trends(intercept, slope, start, remaining):
+    """Sum of each line from column ``start`` over its ``remaining`` days, clipped at zero per day"""
+    horizon = int(remaining.max()) if remaining.size else 0
+    if horizon <= 0:
+        return np.zeros_like(intercept)
+    x = start + np.arange(horizon, dtype=np.float64)
+    daily = np.clip(intercept[:, None] + slope[:, None] * x, 0.0, None)
+    daily[np.arange(horizon) >= remaining[:, None]] = 0.0
+    return daily.sum(axis=1)
+
+
+def _daily_matrices(campaigns, first_day, last_day):
+    days = (last_day - first_day).days + 1
+    index = {campaign.id: row for row, campaign in enumerate(campaigns)}
+    spend = np.zeros((len(campaigns), days))
+    revenue = np.zeros((len(campaigns), days))
+
+    rows = list(CampaignPerformance.objects.filter(
+        campaign_id__in=index, date__range=[first_day, last_day]
+    ).values_list('campaign_id', 'date', 'total_spend', 'attributed_revenue'))
+    if rows:
+        row_index = np.fromiter((index[row[0]] for row in rows), dtype=np.int64, count=len(rows))
+        columns = np.fromiter(((row[1] - first_day).days for row in rows), dtype=np.int64, count=len(rows))
+        spend[row_index, columns] = np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows))
+        revenue[row_index, columns] = np.fromiter((row[3] for row in rows), dtype=np.float64, count=len(rows))
+    return spend, revenue
+
+
+def forecast_campaigns(campaigns, as_of=None):
+    """{campaign_id: forecast} for Campaign instances, fitted in one query and one NumPy pass.
+
+    A forecast holds spend and revenue to date, projected final spend,
+    revenue and ROAS with low/high bounds, the daily spend needed to reach
+    budget_min, and the pacing verdicts. Campaigns that have not completed a
+    day yet get None.
+    """
+
+    campaigns = list(campaigns)
+    as_of = as_of or timezone.localdate()
+    params = _params()
+    started = [c for c in campaigns if c.campaign_start < as_of]
+    forecasts = {campaign.id: None for campaign in campaigns}
+    if not started:
+        return forecasts
+
+    # Columns are days from the earliest start to yesterday
+    first_day = min(c.campaign_start for c in started)
+    last_day = as_of - timedelta(days=1)
+    spend, revenue = _daily_matrices(started, first_day, last_day)
+
+    days = np.arange(spend.shape[1])
+    start_columns = np.array([(c.campaign_start - first_day).days for c in started])
+    end_columns = np.array([(min(c.campaign_end, last_day) - first_day).days for c in started])
+    running = (days >= start_columns[:, None]) & (days <= end_columns[:, None])
+    spend_to_date = (spend * running).sum(axis=1)
+    revenue_to_date = (revenue * running).sum(axis=1)
+
+    # Trend over the trailing window of each campaign's run
+    window = min(params['trend_days'], spend.shape[1])
+    recent = running[:, -window:]
+    spend_line = fit_trends(spend[:, -window:], recent)
+    revenue_line = fit_trends(revenue[:, -window:], recent)
+
+    remaining = np.array([max((c.campaign_end - as_of).days + 1, 0) for c in started])
+    spend_final = spend_to_date + extend_trends(*spend_line[:2], window, remaining)
+    revenue_final = revenue_to_date + extend_trends(*revenue_line[:2], window, remaining)
+
+    scale = params['z'] * np.sqrt(remaining)
+    spend_band = spend_line[2] * scale
+    revenue_band = revenue_line[2] * scale
+    spend_low = np.maximum(spend_final - spend_band, spend_to_date)
+    spend_high = spend_final + spend_band
+    revenue_low = np.maximum(revenue_final - revenue_band, revenue_to_date)
+    revenue_high = revenue_final + revenue_band
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        roas = np.where(spend_final > 0, revenue_final / spend_final, 0.0)
+        # Widest plausible spread: low revenue on high spend and vice versa
+        roas_low = np.where(spend_high > 0, revenue_low / spend_high, 0.0)
+        roas_high = np.where(spend_low > 0, revenue_high / spend_low, 0.0)
+
+    tolerance = params['tolerance']
+    for i, campaign in enumerate(started):
+        budget_min, budget_max = float(campaign.budget_min), float(campaign.budget_max)
+        if spend_final[i] < budget_min * (1 - tolerance):
+            spend_pacing = 'UNDER'
+        elif spend_final[i] > budget_max * (1 + tolerance):
+            spend_pacing = 'OVER'
+        else:
+            spend_pacing = 'ON_TRACK'
+        shortfall = max(budget_min - spend_to_date[i], 0.0)
+        forecasts[campaign.id] = {
+            'spend_to_date': _decimal(spend_to_date[i]),
+            'revenue_to_date': _decimal(revenue_to_date[i]),
+            'days_remaining': int(remaining[i]),
+            'projected_spend': _decimal(spend_final[i]),
+            'projected_spend_low': _decimal(spend_low[i]),
+            'projected_spend_high': _decimal(spend_high[i]),
+            'projected_revenue': _decimal(revenue_final[i]),
+            'projected_revenue_low': _decimal(revenue_low[i]),
+            'projected_revenue_high': _decimal(revenue_high[i]),
+            'projected_roas': _decimal(roas[i]),
+            'projected_roas_low': _decimal(roas_low[i]),
+            'projected_roas_high': _decimal(roas_high[i]),
+            'required_daily_spend': _decimal(shortfall / remaining[i]) if remaining[i] else None,
+            'spend_pacing': spend_pacing,
+            'meets_target_roas': bool(spend_final[i] > 0 and roas[i] >= float(campaign.target_roas)),
+        }
+    return forecasts
+
+
+def cached_forecasts(campaigns, as_of=None):
+    """forecast_campaigns() with each campaign's forecast cached under its brand's data version.
+
+    Only campaigns whose entry is missing or stale are fitted, together.
+    """
+
+    campaigns = list(campaigns)
+    as_of = as_of or timezone.localdate()
+    versions = get_data_versions('brand', {campaign.brand_id for campaign in campaigns})
+    keys = {
+        campaign.id: f'pacing:{campaign.id}:{versions[campaign.brand_id]}:{as_of.isoformat()}'
+        for campaign in campaigns
+    }
+    found = cache.get_many(keys.values())
+
+    forecasts = {cid: found[key] for cid, key in keys.items() if key in found}
+    missing = [campaign for campaign in campaigns if campaign.id not in forecasts]
+    if missing:
+        fitted = forecast_campaigns(missing, as_of)
+        forecasts.update(fitted)
+        cache.set_many(
+            {keys[cid]: forecast for cid, forecast in fitted.items()},
+            getattr(settings, 'PACING_CACHE_TIMEOUT', 3600)
+        )
+    return forecasts
+
+
+def pacing_summary(forecasts):
+    """Counts of the dashboard's campaigns by spend pacing and ROAS outlook"""
+    summary = {'UNDER': 0, 'ON_TRACK': 0, 'OVER': 0, 'missing_target_roas': 0, 'no_data': 0}
+    for forecast in forecasts.values():
+        if forecast is None:
+            summary['no_data'] += 1
+            continue
+        summary[forecast['spend_pacing']] += 1
+        if not forecast['meets_target_roas']:
+            summary['missing_target_roas'] += 1
+    return summary
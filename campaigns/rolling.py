@@ -0,0 +1,155 @@
+# campaigns/rolling.py - Incrementally maintained rolling-window KPIs
+#
+# For every campaign and day, RollingMetric holds the sums of spend,
+# revenue and orders (CampaignPerformance) and impressions and clicks
+# (PerformanceMetric, all platforms) over the trailing ROLLING_WINDOWS
+# days, plus the ROAS, CPA and CTR of those sums.
+#
+# Rows are produced by sliding each window one day at a time from the last
+# stored row: add the day that enters, subtract the day that leaves. Each
+# step is O(1) per window whatever its length, and sums of Decimals and
+# integers stay exact, so no drift builds up. A write to day X recomputes
+# the rows from X forward (usually just today, for live orders and spend);
+# `manage.py update_rolling_metrics` advances every campaign to today.
+
+from datetime import timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.db.models import Min, Sum
+from django.utils import timezone
+
+from .models import CampaignPerformance, PerformanceMetric, RollingMetric
+
+SUM_FIELDS = ('spend', 'revenue', 'orders', 'impressions', 'clicks')
+RATIO_FIELDS = ('roas', 'cpa', 'ctr')
+CENT = Decimal('0.01')
+ONE_DAY = timedelta(days=1)
+
+
+def rolling_windows():
+    return tuple(sorted(getattr(settings, 'ROLLING_WINDOWS', (7, 14, 28))))
+
+
+def rolling_ratios(sums):
+    """ROAS, CPA and CTR of a window's sums (weighted by construction)"""
+    spend, revenue, orders = Decimal(sums['spend']), Decimal(sums['revenue']), sums['orders']
+    impressions, clicks = sums['impressions'], sums['clicks']
+    return {
+        'roas': (revenue / spend).quantize(CENT, rounding=ROUND_HALF_UP) if spend else Decimal('0'),
+        'cpa': (spend / orders).quantize(CENT, rounding=ROUND_HALF_UP) if orders else Decimal('0'),
+        'ctr': (Decimal(clicks * 100) / impressions).quantize(CENT, rounding=ROUND_HALF_UP) if impressions else Decimal('0'),
+    }
+
+
+def _daily_values(campaign_id, start_date, end_date):
+    """{date: [spend, revenue, orders, impressions, clicks]} for the days that have data"""
+    values = {}
+    for day, spend, revenue, orders in CampaignPerformance.objects.filter(
+        campaign_id=campaign_id, date__range=[start_date, end_date]
+    ).values_list('date', 'total_spend', 'attributed_revenue', 'attributed_orders'):
+        values[day] = [spend, revenue, orders, 0, 0]
+
+    for row in PerformanceMetric.objects.filter(
+        campaign_id=campaign_id, date__range=[start_date, end_date]
+    ).values('date').annotate(impressions=Sum('impressions'), clicks=Sum('clicks')).order_by():
+        day_values = values.setdefault(row['date'], [Decimal('0'), Decimal('0'), 0, 0, 0])
+        day_values[3], day_values[4] = row['impressions'], row['clicks']
+    return values
+
+
+def _first_day(campaign_id):
+    days = [
+        CampaignPerformance.objects.filter(campaign_id=campaign_id).aggregate(first=Min('date'))['first'],
+        PerformanceMetric.objects.filter(campaign_id=campaign_id).aggregate(first=Min('date'))['first'],
+    ]
+    days = [day for day in days if day is not None]
+    return min(days) if days else None
+
+
+def refresh_rolling(campaign_id, from_date=None, through=None):
+    """Recompute a campaign's rolling rows from from_date (default: after the last stored row) to through.
+
+    Returns the number of rows written.
+    """
+
+    windows = rolling_windows()
+    through = through or timezone.localdate()
+
+    previous = RollingMetric.objects.filter(campaign_id=campaign_id)
+    if from_date is not None:
+        previous = previous.filter(date__lt=from_date)
+    last = previous.order_by('-date').values_list('date', flat=True).first()
+
+    state = {}
+    if last is not None:
+        for row in RollingMetric.objects.filter(campaign_id=campaign_id, date=last, window__in=windows):
+            state[row.window] = [getattr(row, field) for field in SUM_FIELDS]
+    if last is not None and len(state) == len(windows):
+        start = last + ONE_DAY
+    else:
+        # Nothing stored yet (or ROLLING_WINDOWS changed): start from the first day with data
+        start = _first_day(campaign_id)
+        if start is None:
+            return 0
+        state = {window: [Decimal('0'), Decimal('0'), 0, 0, 0] for window in windows}
+
+    if start > through:
+        return 0
+
+    # Each day is read once when it enters and once when it leaves a window
+    values = _daily_values(campaign_id, start - timedelta(days=max(windows)), through)
+
+    rows = []
+    day = start
+    while day <= through:
+        entering = values.get(day)
+        for window in windows:
+            sums = state[window]
+            leaving = values.get(day - timedelta(days=window))
+            for i in range(len(SUM_FIELDS)):
+                if entering:
+                    sums[i] += entering[i]
+                if leaving:
+                    sums[i] -= leaving[i]
+            named = dict(zip(SUM_FIELDS, sums))
+            rows.append(RollingMetric(campaign_id=campaign_id, date=day, window=window, **named, **rolling_ratios(named)))
+        day += ONE_DAY
+
+    RollingMetric.objects.bulk_create(
+        rows, batch_size=1000, update_conflicts=True, unique_fields=['campaign', 'window', 'date'],
+        update_fields=[*SUM_FIELDS, *RATIO_FIELDS, 'updated_at']
+    )
+    return len(rows)
+
+
+def rolling_summary(rows):
+    """{window: sums and ratios} from RollingMetric rows (or dicts) of one day, summed over campaigns"""
+    summary = {}
+    for row in rows:
+        get = row.get if isinstance(row, dict) else lambda field: getattr(row, field)
+        sums = summary.setdefault(get('window'), {field: 0 for field in SUM_FIELDS})
+        for field in SUM_FIELDS:
+            sums[field] += get(field)
+    for sums in summary.values():
+        sums.update(rolling_ratios(sums))
+    return summary
+
+
+def latest_rolling(campaigns, as_of=None):
+    """{window: sums and ratios} over a set of campaigns as of a day.
+
+    Uses each campaign's newest rows from as_of or the day before, so a
+    nightly update that has not run yet shows yesterday's windows instead
+    of nothing. One query.
+    """
+
+    as_of = as_of or timezone.localdate()
+    newest = {}
+    for row in RollingMetric.objects.filter(
+        campaign__in=campaigns, date__range=[as_of - ONE_DAY, as_of]
+    ).values('campaign_id', 'window', 'date', *SUM_FIELDS):
+        key = (row['campaign_id'], row['window'])
+        if key not in newest or row['date'] > newest[key]['date']:
+            newest[key] = row
+    return rolling_summary(newest.values())
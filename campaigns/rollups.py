@@ -0,0 +1,223 @@
+# campaigns/rollups.py - Incremental maintenance of the daily rollup tables
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .cache import bump_data_version
+from .models import AgencyDailyRollup, BrandDailyRollup, CampaignPerformance, ShopifyOrder
+
+CENTS = Decimal('0.01')
+
+ROLLUP_TOTAL_FIELDS = [
+    'orders', 'attributed_orders', 'revenue', 'attributed_revenue', 'confidence_sum',
+    'high_confidence_orders', 'medium_confidence_orders', 'low_confidence_orders', 'spend',
+]
+
+
+def apply_order(order):
+    """Add a newly ingested ShopifyOrder to the brand and agency rollups"""
+
+    day = timezone.localdate(order.order_created_at)
+
+    with transaction.atomic():
+        rollup, _ = BrandDailyRollup.objects.select_for_update().get_or_create(brand_id=order.brand_id, date=day)
+        rollup.add_order(order)
+        rollup.save()
+
+        if order.is_attributed and order.campaign_id:
+            rollup, _ = AgencyDailyRollup.objects.select_for_update().get_or_create(
+                agency_id=order.agency_id, campaign_id=order.campaign_id, date=day
+            )
+            rollup.add_order(order)
+            rollup.save()
+
+    # Saving the order bumped its tenants already, but a dashboard read
+    # between that save and these updates cached the old totals under the
+    # new version; bump again once the rollups are committed
+    brand_id, agency_id = order.brand_id, order.agency_id if order.is_attributed else None
+
+    def bump_tenants():
+        bump_data_version('brand', brand_id)
+        bump_data_version('agency', agency_id)
+    transaction.on_commit(bump_tenants)
+
+
+def apply_spend(campaign, day, spend_delta):
+    """Add a change in a campaign's reported spend for a day to the rollups"""
+
+    if not spend_delta:
+        return
+
+    with transaction.atomic():
+        BrandDailyRollup.objects.get_or_create(brand_id=campaign.brand_id, date=day)
+        BrandDailyRollup.objects.filter(brand_id=campaign.brand_id, date=day).update(
+            spend=F('spend') + spend_delta
+        )
+
+        AgencyDailyRollup.objects.get_or_create(
+            agency_id=campaign.selected_agency_id, campaign_id=campaign.id, date=day
+        )
+        AgencyDailyRollup.objects.filter(
+            agency_id=campaign.selected_agency_id, campaign_id=campaign.id, date=day
+        ).update(spend=F('spend') + spend_delta)
+
+
+def apply_spend_deltas(deltas):
+    """Bulk apply_spend for imports: {(campaign, day): spend_delta} in a few queries"""
+
+    brand_deltas = defaultdict(Decimal)
+    agency_deltas = defaultdict(Decimal)
+    for (campaign, day), delta in deltas.items():
+        if delta:
+            brand_deltas[(campaign.brand_id, day)] += delta
+            agency_deltas[(campaign.selected_agency_id, campaign.id, day)] += delta
+
+    with transaction.atomic():
+        _add_spend(BrandDailyRollup, ('brand_id', 'date'), brand_deltas)
+        _add_spend(AgencyDailyRollup, ('agency_id', 'campaign_id', 'date'), agency_deltas)
+
+
+def _add_spend(model, key_fields, deltas):
+    if not deltas:
+        return
+
+    rows = model.objects.select_for_update().filter(**{
+        f'{field}__in': {key[i] for key in deltas} for i, field in enumerate(key_fields) if field != 'agency_id'
+    })
+    existing = {tuple(getattr(row, field) for field in key_fields): row for row in rows}
+
+    changed = []
+    for key, row in existing.items():
+        if key in deltas:
+            row.spend += deltas[key]
+            changed.append(row)
+    # An upsert on the primary key writes every changed row in one statement;
+    # bulk_update would build a CASE expression per row
+    model.objects.bulk_create(
+        changed, batch_size=1000, update_conflicts=True, unique_fields=['id'], update_fields=['spend']
+    )
+
+    # agency_id can be NULL, where uniqueness comes from a partial index
+    # that ON CONFLICT cannot target, so missing rows are created explicitly
+    model.objects.bulk_create(
+        [model(spend=delta, **dict(zip(key_fields, key))) for key, delta in deltas.items() if key not in existing],
+        batch_size=1000
+    )
+
+
+def summarize_rollups(rows):
+    """Sum rollup rows into one totals dict, merging per-source breakdowns"""
+
+    totals = {field: 0 for field in ROLLUP_TOTAL_FIELDS}
+    sources = defaultdict(lambda: {'orders': 0, 'revenue': Decimal('0')})
+
+    for row in rows:
+        for field in ROLLUP_TOTAL_FIELDS:
+            totals[field] += getattr(row, field)
+        for source, counts in row.source_counts.items():
+            sources[source]['orders'] += counts['orders']
+            sources[source]['revenue'] += Decimal(counts['revenue'])
+
+    totals['avg_confidence'] = totals['confidence_sum'] / totals['orders'] if totals['orders'] else 0
+    totals['attribution_rate'] = totals['attributed_orders'] / totals['orders'] * 100 if totals['orders'] else 0
+    totals['sources'] = sorted(
+        ({'utm_source': source, 'order_count': c['orders'], 'revenue': c['revenue']} for source, c in sources.items()),
+        key=lambda s: s['revenue'], reverse=True
+    )
+    return totals
+
+
+def _order_aggregates(orders, group_by):
+    """Grouped order totals and per-source counts keyed by the group_by values"""
+
+    attributed = Q(is_attributed=True)
+    orders = orders.annotate(day=TruncDate('order_created_at'))
+
+    totals = {}
+    for row in orders.values(*group_by, 'day').annotate(
+        n_orders=Count('id'),
+        n_attributed=Count('id', filter=attributed),
+        sum_revenue=Sum('normalized_total'),
+        sum_attributed_revenue=Sum('normalized_total', filter=attributed),
+        sum_confidence=Sum('attribution_confidence'),
+        n_high=Count('id', filter=Q(attribution_confidence__gte=80)),
+        n_medium=Count('id', filter=Q(attribution_confidence__gte=50, attribution_confidence__lt=80)),
+        n_low=Count('id', filter=Q(attribution_confidence__lt=50)),
+    ).order_by():
+        key = tuple(row[g] for g in group_by) + (row['day'],)
+        totals[key] = {
+            'orders': row['n_orders'],
+            'attributed_orders': row['n_attributed'],
+            'revenue': row['sum_revenue'] or 0,
+            'attributed_revenue': row['sum_attributed_revenue'] or 0,
+            'confidence_sum': row['sum_confidence'] or 0,
+            'high_confidence_orders': row['n_high'],
+            'medium_confidence_orders': row['n_medium'],
+            'low_confidence_orders': row['n_low'],
+            'source_counts': {},
+        }
+
+    for row in orders.filter(attributed).values(*group_by, 'day', 'utm_source').annotate(
+        n_orders=Count('id'), sum_revenue=Sum('normalized_total')
+    ).order_by():
+        key = tuple(row[g] for g in group_by) + (row['day'],)
+        totals[key]['source_counts'][row['utm_source'] or ''] = {
+            # Same string form as DailyRollup.add_order writes ('150.50')
+            'orders': row['n_orders'], 'revenue': str(Decimal(row['sum_revenue'] or 0).quantize(CENTS))
+        }
+
+    return totals
+
+
+def rebuild_rollups(start_date=None, end_date=None):
+    """Recompute rollups from raw orders and spend for a date range (all dates if omitted)"""
+
+    orders = ShopifyOrder.objects.all()
+    performance = CampaignPerformance.objects.all()
+    brand_rollups = BrandDailyRollup.objects.all()
+    agency_rollups = AgencyDailyRollup.objects.all()
+
+    if start_date:
+        orders = orders.filter(order_created_at__date__gte=start_date)
+        performance = performance.filter(date__gte=start_date)
+        brand_rollups = brand_rollups.filter(date__gte=start_date)
+        agency_rollups = agency_rollups.filter(date__gte=start_date)
+    if end_date:
+        orders = orders.filter(order_created_at__date__lte=end_date)
+        performance = performance.filter(date__lte=end_date)
+        brand_rollups = brand_rollups.filter(date__lte=end_date)
+        agency_rollups = agency_rollups.filter(date__lte=end_date)
+
+    brand_rows = _order_aggregates(orders, ['brand_id'])
+    for row in performance.values('campaign__brand_id', 'date').annotate(total=Sum('total_spend')).order_by():
+        brand_rows.setdefault((row['campaign__brand_id'], row['date']), {})['spend'] = row['total']
+
+    agency_rows = _order_aggregates(
+        orders.filter(is_attributed=True, campaign__isnull=False), ['agency_id', 'campaign_id']
+    )
+    for row in performance.values('campaign__selected_agency_id', 'campaign_id', 'date').annotate(
+        total=Sum('total_spend')
+    ).order_by():
+        key = (row['campaign__selected_agency_id'], row['campaign_id'], row['date'])
+        agency_rows.setdefault(key, {})['spend'] = row['total']
+
+    with transaction.atomic():
+        brand_rollups.delete()
+        agency_rollups.delete()
+        BrandDailyRollup.objects.bulk_create(
+            [BrandDailyRollup(brand_id=brand_id, date=day, **values)
+             for (brand_id, day), values in brand_rows.items()],
+            batch_size=1000
+        )
+        AgencyDailyRollup.objects.bulk_create(
+            [AgencyDailyRollup(agency_id=agency_id, campaign_id=campaign_id, date=day, **values)
+             for (agency_id, campaign_id, day), values in agency_rows.items()],
+            batch_size=1000
+        )
+
+    return len(brand_rows), len(agency_rows)
@@ -0,0 +1,168 @@
+# campaigns/scoring.py - Agency scores from actual campaign outcomes
+#
+# Every COMPLETED campaign with an agency is one outcome: its achieved ROAS
+# (attributed revenue / spend over all CampaignPerformance days) against the
+# ROAS the agency guaranteed in its winning bid (the campaign's target when
+# the bid had none), and how its escrow was settled (RELEASED, or REFUNDED /
+# DISPUTED). One query loads the outcomes and NumPy bincounts aggregate
+# them per agency:
+#
+#   total_campaigns        completed campaigns
+#   success_rate           % of campaigns with spend whose ROAS met the guarantee
+#   avg_rating             mean of 5 stars x min(attainment / AGENCY_RATING_FULL_ATTAINMENT, 1),
+#                          halved for campaigns whose escrow was not released
+#   competitiveness_score  0-100 blend of success rate, spend-weighted attainment
+#                          and escrow release rate, shrunk towards 50 for agencies
+#                          with few campaigns (AGENCY_SCORE_PRIOR_CAMPAIGNS)
+#
+# Results are written onto Agency, so the marketplace ranks by a column,
+# and every change is kept as an AgencyScore row. The batch run scores all
+# agencies; completing a campaign or settling its escrow rescores just
+# that agency through the same code path.
+
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+
+from accounts.models import Agency
+from .models import AgencyScore, Campaign
+
+AGENCY_FIELDS = ('total_campaigns', 'success_rate', 'avg_rating', 'competitiveness_score')
+SETTLED_STATUSES = ('RELEASED', 'REFUNDED', 'DISPUTED')
+
+
+def _params():
+    return {
+        'full_attainment': getattr(settings, 'AGENCY_RATING_FULL_ATTAINMENT', 1.25),
+        'attainment_cap': getattr(settings, 'AGENCY_SCORE_ATTAINMENT_CAP', 1.5),
+        'weights': getattr(settings, 'AGENCY_SCORE_WEIGHTS', {'success': 0.5, 'attainment': 0.3, 'release': 0.2}),
+        'prior_campaigns': getattr(settings, 'AGENCY_SCORE_PRIOR_CAMPAIGNS', 3),
+    }
+
+
+def _outcomes(agency_ids):
+    """Completed campaigns as columns: agency, spend, revenue, guaranteed ROAS, escrow status"""
+    campaigns = Campaign.objects.filter(status='COMPLETED', selected_agency__isnull=False)
+    if agency_ids is not None:
+        campaigns = campaigns.filter(selected_agency_id__in=agency_ids)
+    rows = list(campaigns.annotate(
+        spend=Sum('daily_performance__total_spend'),
+        revenue=Sum('daily_performance__attributed_revenue'),
+    ).values_list('selected_agency_id', 'spend', 'revenue', 'selected_bid__guaranteed_roas', 'target_roas', 'escrow__status'))
+
+    n = len(rows)
+    return {
+        'agency': np.fromiter((row[0] for row in rows), dtype=np.int64, count=n),
+        'spend': np.fromiter((row[1] or 0 for row in rows), dtype=np.float64, count=n),
+        'revenue': np.fromiter((row[2] or 0 for row in rows), dtype=np.float64, count=n),
+        'guaranteed': np.fromiter((row[3] or row[4] or 0 for row in rows), dtype=np.float64, count=n),
+        'released': np.fromiter((row[5] == 'RELEASED' for row in rows), dtype=bool, count=n),
+        'settled': np.fromiter((row[5] in SETTLED_STATUSES for row in rows), dtype=bool, count=n),
+    }
+
+
+def compute_scores(agency_ids, outcomes, params=None):
+    """Aggregate outcome columns into per-agency stat arrays, in the order of ``agency_ids``"""
+
+    params = params or _params()
+    agency_ids = np.asarray(agency_ids, dtype=np.int64)
+    order = np.argsort(agency_ids)
+    index = order[np.searchsorted(agency_ids, outcomes['agency'], sorter=order)]
+    count = lambda weights=None: np.bincount(index, weights=weights, minlength=len(agency_ids))
+
+    spend, revenue, guaranteed = outcomes['spend'], outcomes['revenue'], outcomes['guaranteed']
+    scored = spend > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        achieved = np.where(scored, revenue / spend, 0.0)
+        attainment = np.where(guaranteed > 0, achieved / guaranteed, np.where(achieved > 0, 1.0, 0.0))
+    attainment = np.where(scored, attainment, 0.0)
+    success = scored & (attainment >= 1)
+
+    stars = 5 * np.clip(attainment / params['full_attainment'], 0, 1)
+    stars = np.where(outcomes['settled'] & ~outcomes['released'], stars / 2, stars)
+
+    total = count().astype(np.int64)
+    n_scored = count(scored.astype(np.float64))
+    n_success = count(success.astype(np.float64))
+    spend_sum = count(np.where(scored, spend, 0.0))
+    n_settled = count(outcomes['settled'].astype(np.float64))
+    n_released = count(outcomes['released'].astype(np.float64))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        success_rate = np.where(n_scored > 0, n_success / n_scored, 0.0)
+        weighted_attainment = np.where(spend_sum > 0, count(np.minimum(attainment, params['attainment_cap']) * spend) / spend_sum, 0.0)
+        avg_rating = np.where(n_scored > 0, count(np.where(scored, stars, 0.0)) / n_scored, 0.0)
+        # Without settled escrows the release component carries no extra signal
+        release_rate = np.where(n_settled > 0, n_released / n_settled, success_rate)
+
+    weights = params['weights']
+    raw = (
+        weights['success'] * success_rate
+        + weights['attainment'] * weighted_attainment / params['attainment_cap']
+        + weights['release'] * release_rate
+    )
+    prior = params['prior_campaigns']
+    score = np.rint(100 * (prior * 0.5 + n_scored * raw) / (prior + n_scored)).astype(np.int64)
+
+    return {
+        'total_campaigns': total,
+        'scored_campaigns': n_scored.astype(np.int64),
+        'successful_campaigns': n_success.astype(np.int64),
+        'roas_attainment': weighted_attainment,
+        'settled_escrows': n_settled.astype(np.int64),
+        'released_escrows': n_released.astype(np.int64),
+        'success_rate': np.round(success_rate * 100, 2),
+        'avg_rating': np.round(avg_rating, 2),
+        'competitiveness_score': score,
+    }
+
+
+def score_agencies(agency_ids=None, reason='batch'):
+    """Rescore the given agencies (default: all) and record the ones whose stats changed.
+
+    Returns the ids of the agencies whose scores changed.
+    """
+
+    with transaction.atomic():
+        agencies = Agency.objects.select_for_update().order_by('id')
+        if agency_ids is not None:
+            agencies = agencies.filter(id__in=[agency_id for agency_id in agency_ids if agency_id])
+        agencies = list(agencies)
+        if not agencies:
+            return []
+
+        ids = [agency.id for agency in agencies]
+        stats = compute_scores(ids, _outcomes(None if agency_ids is None else ids))
+
+        changed, history = [], []
+        for i, agency in enumerate(agencies):
+            values = {
+                'total_campaigns': int(stats['total_campaigns'][i]),
+                'success_rate': _decimal(stats['success_rate'][i]),
+                'avg_rating': _decimal(stats['avg_rating'][i]),
+                'competitiveness_score': int(stats['competitiveness_score'][i]),
+            }
+            if all(getattr(agency, field) == value for field, value in values.items()):
+                continue
+            for field, value in values.items():
+                setattr(agency, field, value)
+            changed.append(agency)
+            history.append(AgencyScore(
+                agency=agency, reason=reason[:100], **values,
+                scored_campaigns=int(stats['scored_campaigns'][i]),
+                successful_campaigns=int(stats['successful_campaigns'][i]),
+                roas_attainment=_decimal(stats['roas_attainment'][i], '0.001'),
+                settled_escrows=int(stats['settled_escrows'][i]),
+                released_escrows=int(stats['released_escrows'][i]),
+            ))
+
+        Agency.objects.bulk_update(changed, AGENCY_FIELDS, batch_size=1000)
+        AgencyScore.objects.bulk_create(history, batch_size=1000)
+    return [agency.id for agency in changed]
+
+
+def _decimal(value, places='0.01'):
+    return Decimal(repr(float(value))).quantize(Decimal(places), rounding=ROUND_HALF_UP)
@@ -0,0 +1,133 @@
+# campaigns/search.py - Full-text marketplace search on an SQLite FTS5 index
+#
+# icontains across title, description and the brand's company name is a
+# full scan of campaigns (plus a join to the brand's user) on every search.
+# Instead every campaign has a row in the FTS5 table campaign_search, with
+# rowid = campaign id:
+#
+#     campaign_search(title, description, company_name)
+#
+# A search is then an inverted-index lookup: each word of the query
+# becomes a quoted prefix term ("spring"* "sale"*), all of which must
+# match, and results are ranked by bm25 with title and brand weighted
+# above the description. The table is created and filled by a migration;
+# saving a campaign or renaming a brand's company rewrites the affected
+# rows in the same transaction, and rebuild_search_index recovers from
+# bulk writes that bypass signals. On other databases search falls back
+# to icontains.
+
+import re
+
+from django.conf import settings
+from django.db import connection as default_connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from accounts.models import Brand, CustomUser
+from .models import Campaign
+
+TABLE = 'campaign_search'
+COLUMNS = ('title', 'description', 'company_name')
+MAX_TERMS = 8
+
+_WORD = re.compile(r'\w+')
+
+
+def available(connection=None):
+    return (connection or default_connection).vendor == 'sqlite'
+
+
+def _weights():
+    weights = getattr(settings, 'MARKETPLACE_SEARCH_WEIGHTS', {'title': 10.0, 'description': 1.0, 'company_name': 5.0})
+    return ', '.join(str(float(weights[column])) for column in COLUMNS)
+
+
+def match_expression(text):
+    """FTS5 query for free text: every word as a prefix term, all required.
+
+    Words are quoted, so operators and punctuation in the input are never
+    parsed as FTS5 syntax. Returns '' when the text has no words.
+    """
+    words = _WORD.findall(text or '')[:MAX_TERMS]
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def _select_documents():
+    campaign, brand, user = Campaign._meta.db_table, Brand._meta.db_table, CustomUser._meta.db_table
+    return (
+        f'SELECT c.id, c.title, c.description, u.company_name FROM {campaign} c '
+        f'JOIN {brand} b ON b.id = c.brand_id JOIN {user} u ON u.id = b.user_id'
+    )
+
+
+def create_search_index(connection=None):
+    """Create the (empty) FTS5 table; called by the migration that adds it"""
+
+    connection = connection or default_connection
+    with connection.cursor() as cursor:
+        # prefix='2 3': short prefixes (the first keystrokes) get their own index
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+            f"{', '.join(COLUMNS)}, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+
+
+def index_campaigns(campaign_ids=None, brand_user_id=None):
+    """Rewrite the index rows of the given campaigns, or of every campaign of a brand user"""
+
+    if not available():
+        return
+    if campaign_ids is not None:
+        if not campaign_ids:
+            return
+        where, params = f'c.id IN ({", ".join(["%s"] * len(campaign_ids))})', list(campaign_ids)
+    else:
+        where, params = f'c.brand_id IN (SELECT id FROM {Brand._meta.db_table} WHERE user_id = %s)', [brand_user_id]
+
+    with default_connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid IN (SELECT c.id FROM {Campaign._meta.db_table} c WHERE {where})', params)
+        cursor.execute(f'INSERT INTO {TABLE} (rowid, {", ".join(COLUMNS)}) {_select_documents()} WHERE {where}', params)
+
+
+def unindex_campaign(campaign_id):
+    if available():
+        with default_connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [campaign_id])
+
+
+def rebuild_search_index(connection=None):
+    """Refill the whole index from the campaigns table; returns the row count"""
+
+    with (connection or default_connection).cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        cursor.execute(f'INSERT INTO {TABLE} (rowid, {", ".join(COLUMNS)}) {_select_documents()}')
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+        cursor.execute(f'SELECT COUNT(*) FROM {TABLE}')
+        return cursor.fetchone()[0]
+
+
+def search_campaigns(queryset, text):
+    """Narrow a Campaign queryset to matches of ``text``, annotated with search_rank.
+
+    search_rank is the bm25 score (lower is more relevant), so ordering by
+    it puts the best matches first. Without FTS5 the rank is constant.
+    """
+
+    if not available():
+        return queryset.filter(
+            Q(title__icontains=text) | Q(description__icontains=text) | Q(brand__user__company_name__icontains=text)
+        ).annotate(search_rank=Value(0.0))
+
+    expression = match_expression(text)
+    if not expression:
+        return queryset.annotate(search_rank=Value(0.0)).none()
+    # The MATCH subquery is run once and the campaigns are then read by
+    # primary key, so only matching campaigns are read; the rank of each is
+    # the bm25 score with the configured column weights
+    rank = RawSQL(
+        f'SELECT rank FROM {TABLE} WHERE {TABLE} MATCH %s AND rank MATCH %s AND rowid = {Campaign._meta.db_table}.id',
+        [expression, f'bm25({_weights()})'], output_field=FloatField(),
+    )
+    return queryset.filter(
+        id__in=RawSQL(f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s', [expression])
+    ).annotate(search_rank=rank)
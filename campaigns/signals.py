@@ -0,0 +1,148 @@
+# campaigns/signals.py - Bump tenant data versions and re-evaluate notifications
+# when dashboard inputs change
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from accounts.models import Agency, CustomUser
+from . import search
+from .cache import bump_campaign_tenants, bump_data_version
+from .ledger import sync_escrow_earnings
+from .notifications import refresh_agency_notifications, refresh_brand_notifications, refresh_opportunity_notifications
+from .rolling import refresh_rolling
+from .scoring import SETTLED_STATUSES, score_agencies
+from .models import Campaign, CampaignBid, CampaignPerformance, EscrowPayment, PaymentRelease, PerformanceMetric, ShopifyOrder
+
+
+@receiver([post_save, post_delete], sender=ShopifyOrder)
+def order_changed(sender, instance, **kwargs):
+    bump_data_version('brand', instance.brand_id)
+    if instance.is_attributed:
+        bump_data_version('agency', instance.agency_id)
+
+
+@receiver([post_save, post_delete], sender=CampaignPerformance)
+@receiver([post_save, post_delete], sender=PerformanceMetric)
+def spend_changed(sender, instance, **kwargs):
+    bump_campaign_tenants(instance.campaign)
+    # Rolling windows from the changed day on (today only for live orders)
+    campaign, day = instance.campaign, instance.date
+
+    def update_rolling():
+        refresh_rolling(campaign.id, day)
+        bump_campaign_tenants(campaign)
+    transaction.on_commit(update_rolling)
+
+
+# Campaign fields that open or close bidding, and with it agency opportunities
+BIDDING_FIELDS = ('status', 'bidding_deadline')
+
+
+@receiver(pre_save, sender=Campaign)
+def remember_campaign_state(sender, instance, **kwargs):
+    """Stored values of BIDDING_FIELDS, so post_save can tell what changed (None when new)"""
+    instance._saved_state = Campaign.objects.filter(pk=instance.pk).values(*BIDDING_FIELDS).first() if instance.pk else None
+
+
+def _opportunity_changed(instance, saved):
+    # Only BIDDING campaigns of the last 24 hours count as new opportunities
+    if instance.created_at < timezone.now() - timedelta(hours=24):
+        return False
+    if saved is None:
+        return instance.status == 'BIDDING'
+    return 'BIDDING' in (saved['status'], instance.status) and any(
+        saved[field] != getattr(instance, field) for field in BIDDING_FIELDS
+    )
+
+
+@receiver([post_save, post_delete], sender=Campaign)
+def campaign_changed(sender, instance, signal, **kwargs):
+    bump_campaign_tenants(instance)
+    saved = getattr(instance, '_saved_state', None) if signal is post_save else None
+    if _opportunity_changed(instance, saved):
+        campaign_id = instance.id
+        transaction.on_commit(lambda: refresh_opportunity_notifications(campaign_id))
+    # Scores move when a campaign outcome is added or removed, not on every
+    # later save of a completed campaign
+    was_completed = saved is not None and saved['status'] == 'COMPLETED'
+    is_completed = signal is post_save and instance.status == 'COMPLETED'
+    if was_completed != is_completed and instance.selected_agency_id:
+        agency_id = instance.selected_agency_id
+        reason = f'campaign {instance.id} {"completed" if is_completed else "reopened"}'
+        transaction.on_commit(lambda: score_agencies([agency_id], reason))
+
+
+@receiver([post_save, post_delete], sender=CampaignBid)
+def bid_changed(sender, instance, **kwargs):
+    bump_data_version('agency', instance.agency_id)
+    bump_data_version('brand', instance.campaign.brand_id)
+    transaction.on_commit(lambda: refresh_agency_notifications(instance.agency_id))
+
+
+@receiver([post_save, post_delete], sender=EscrowPayment)
+def escrow_changed(sender, instance, **kwargs):
+    bump_data_version('brand', instance.brand_id)
+    bump_data_version('agency', instance.agency_id)
+    transaction.on_commit(lambda: refresh_brand_notifications(instance.brand_id))
+    if instance.status in SETTLED_STATUSES:
+        reason = f'escrow {instance.id} {instance.status.lower()}'
+        transaction.on_commit(lambda: score_agencies([instance.agency_id], reason))
+
+
+@receiver([post_save, post_delete], sender=PaymentRelease)
+def release_changed(sender, instance, **kwargs):
+    escrow_changed(EscrowPayment, instance.escrow)
+
+
+@receiver(post_save, sender=Agency)
+def agency_changed(sender, instance, created, **kwargs):
+    transaction.on_commit(lambda: refresh_agency_notifications(instance.id))
+
+
+# Earnings ledger: saves post entries in the same transaction; deletes wait for
+# commit so cascades (e.g. a deleted agency) have finished first
+@receiver(post_save, sender=EscrowPayment)
+def escrow_saved(sender, instance, **kwargs):
+    sync_escrow_earnings(instance.id, reason=f'escrow {instance.status.lower()}')
+
+
+@receiver(post_save, sender=PaymentRelease)
+def release_saved(sender, instance, **kwargs):
+    sync_escrow_earnings(instance.escrow_id, release_id=instance.id, reason=f'release {instance.release_type.lower()}')
+
+
+@receiver(post_delete, sender=EscrowPayment)
+def escrow_deleted(sender, instance, **kwargs):
+    escrow_id = instance.id
+    transaction.on_commit(lambda: sync_escrow_earnings(escrow_id, reason='escrow deleted'))
+
+
+@receiver(post_delete, sender=PaymentRelease)
+def release_deleted(sender, instance, **kwargs):
+    escrow_id, release_id = instance.escrow_id, instance.id
+    transaction.on_commit(lambda: sync_escrow_earnings(escrow_id, release_id=release_id, reason='release deleted'))
+
+
+# Marketplace search index: rows are rewritten inside the saving transaction,
+# so a rolled-back save leaves the index as it was
+@receiver(post_save, sender=Campaign)
+def campaign_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or {'title', 'description', 'brand'} & set(update_fields):
+        search.index_campaigns([instance.id])
+
+
+@receiver(post_delete, sender=Campaign)
+def campaign_deleted(sender, instance, **kwargs):
+    search.unindex_campaign(instance.id)
+
+
+@receiver(post_save, sender=CustomUser)
+def company_renamed(sender, instance, created, update_fields=None, **kwargs):
+    if created or instance.user_type != 'BRAND':
+        return
+    if update_fields is None or 'company_name' in update_fields:
+        search.index_campaigns(brand_user_id=instance.id)
@@ -0,0 +1,273 @@
+# campaigns/spend_import.py - Streaming import of ad-platform spend exports
+#
+# Reads a Meta, Google Ads or TikTok campaign report (CSV or tab separated,
+# one row per campaign and day) row by row and writes the platform's spend
+# column of CampaignPerformance in batches of SPEND_IMPORT_BATCH_SIZE
+# (campaign, date) pairs. Rows are matched to campaigns by utm_campaign:
+# a utm_campaign column when the export has one (custom columns / URL
+# parameters), otherwise the platform's campaign name. Each batch is one
+# transaction: existing rows are locked and read, missing ones created,
+# total spend, ROAS and CPA recomputed and upserted in bulk, and
+# the spend change added to the daily rollups.
+#
+# Several rows for the same campaign and day (e.g. an ad-set breakdown)
+# are summed. Re-importing a report replaces that platform's spend for the
+# days it covers, so imports are idempotent.
+
+import csv
+import io
+from collections import Counter
+from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import bump_campaign_tenants
+from .models import Campaign, CampaignPerformance
+from .notifications import refresh_brand_notifications
+from .rolling import refresh_rolling
+from .rollups import apply_spend_deltas
+
+CENT = Decimal('0.01')
+
+# Lower-cased header names per platform; the first one present wins
+PLATFORM_COLUMNS = {
+    'META': {
+        'field': 'meta_spend',
+        'campaign': ['campaign name'],
+        'date': ['day', 'reporting starts', 'date'],
+        'spend': ['amount spent', 'spend'],
+    },
+    'GOOGLE': {
+        'field': 'google_spend',
+        'campaign': ['campaign'],
+        'date': ['day', 'date'],
+        'spend': ['cost', 'spend'],
+    },
+    'TIKTOK': {
+        'field': 'tiktok_spend',
+        'campaign': ['campaign name'],
+        'date': ['by day', 'date', 'stat time day'],
+        'spend': ['cost', 'total cost', 'spend'],
+    },
+}
+
+UTM_COLUMNS = ['utm_campaign', 'utm campaign']
+DATE_FORMATS = ('%Y-%m-%d', '%Y/%m/%d', '%d.%m.%Y', '%Y-%m-%d %H:%M:%S')
+
+# Title and date-range lines some exports put above the header (Google Ads)
+MAX_PREAMBLE_LINES = 10
+
+PERFORMANCE_FIELDS = [
+    'meta_spend', 'google_spend', 'tiktok_spend', 'total_spend',
+    'roas', 'cpa', 'spend_data_source', 'last_updated',
+]
+
+
+class SpendImportError(Exception):
+    """The file is not a report the importer understands"""
+
+
+def _header_name(cell):
+    # 'Amount spent (DKK)' -> 'amount spent'
+    return cell.split('(')[0].strip().lower()
+
+
+def _find(headers, names):
+    for name in names:
+        if name in headers:
+            return headers.index(name)
+    return None
+
+
+def parse_amount(value):
+    """Decimal from '1,234.56', '1234,56' or '1 234.56'"""
+    value = value.strip().replace(' ', '').replace('\xa0', '')
+    if ',' in value and '.' not in value:
+        value = value.replace(',', '.')
+    else:
+        value = value.replace(',', '')
+    return Decimal(value or '0')
+
+
+def parse_day(value):
+    value = value.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f'unrecognised date {value!r}')
+
+
+def open_report(binary_file, encoding='utf-8-sig'):
+    """Text reader over an uploaded or opened binary file, without reading it into memory"""
+    if encoding.lower() in ('utf-8', 'utf-8-sig'):
+        # Google Ads exports UTF-16 with a BOM
+        start = binary_file.read(2)
+        binary_file.seek(0)
+        if start in (b'\xff\xfe', b'\xfe\xff'):
+            encoding = 'utf-16'
+    return io.TextIOWrapper(binary_file, encoding=encoding, newline='')
+
+
+def _campaign_lookup(campaigns):
+    """{utm_campaign.lower(): Campaign} with only the fields the import needs"""
+    return {
+        campaign.utm_campaign.strip().lower(): campaign
+        for campaign in campaigns.exclude(utm_campaign='').only('id', 'brand_id', 'selected_agency_id', 'utm_campaign')
+    }
+
+
+class SpendImporter:
+    """Imports one platform report; use import_spend() for the common case"""
+
+    def __init__(self, platform, campaigns=None, source='AGENCY_REPORT', batch_size=None):
+        if platform not in PLATFORM_COLUMNS:
+            raise SpendImportError(f'Unknown platform {platform!r}, expected one of {", ".join(PLATFORM_COLUMNS)}')
+        self.platform = platform
+        self.columns = PLATFORM_COLUMNS[platform]
+        self.field = self.columns['field']
+        self.source = source
+        self.batch_size = batch_size or getattr(settings, 'SPEND_IMPORT_BATCH_SIZE', 1000)
+        self.campaigns = _campaign_lookup(campaigns if campaigns is not None else Campaign.objects.all())
+
+        # (campaign_id, date) pairs already written by this import: later
+        # rows for them add to the spend instead of replacing it
+        self.written = set()
+        self.touched_campaigns = {}
+        self.first_days = {}
+        self.result = {'rows': 0, 'imported': 0, 'days': 0, 'invalid': 0, 'unmatched': Counter()}
+
+    def _read_header(self, text_file):
+        """Skip any preamble and return (delimiter, column positions) of the header line"""
+        for _ in range(MAX_PREAMBLE_LINES):
+            line = text_file.readline()
+            if not line:
+                break
+            for delimiter in (',', '\t', ';'):
+                headers = [_header_name(cell) for cell in next(csv.reader([line], delimiter=delimiter), [])]
+                positions = {key: _find(headers, self.columns[key]) for key in ('campaign', 'date', 'spend')}
+                if None not in positions.values():
+                    positions['utm'] = _find(headers, UTM_COLUMNS)
+                    return delimiter, positions
+        raise SpendImportError(
+            f'No {self.platform} header found: expected columns like '
+            f'{self.columns["campaign"][0]!r}, {self.columns["date"][0]!r} and {self.columns["spend"][0]!r}'
+        )
+
+    def run(self, text_file):
+        delimiter, positions = self._read_header(text_file)
+        reader = csv.reader(text_file, delimiter=delimiter)
+        width = max(i for i in positions.values() if i is not None) + 1
+
+        batch = {}
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            self.result['rows'] += 1
+            if len(row) < width:
+                self.result['invalid'] += 1
+                continue
+
+            name = row[positions['campaign']]
+            if positions['utm'] is not None and row[positions['utm']].strip():
+                name = row[positions['utm']]
+            try:
+                day = parse_day(row[positions['date']])
+                amount = parse_amount(row[positions['spend']])
+            except (ValueError, InvalidOperation):
+                # Also skips the 'Total' lines reports end with
+                self.result['invalid'] += 1
+                continue
+
+            campaign = self.campaigns.get(name.strip().lower())
+            if campaign is None:
+                self.result['unmatched'][name.strip()] += 1
+                continue
+
+            key = (campaign.id, day)
+            batch[key] = batch.get(key, 0) + amount
+            self.result['imported'] += 1
+            if len(batch) >= self.batch_size:
+                self.write(batch)
+                batch = {}
+
+        if batch:
+            self.write(batch)
+        self.finish()
+        return self.result
+
+    def write(self, batch):
+        """Set this platform's spend for {(campaign_id, date): amount} in one transaction"""
+        campaigns = {campaign.id: campaign for campaign in self.campaigns.values()}
+        now = timezone.now()
+
+        with transaction.atomic():
+            existing = {
+                (performance.campaign_id, performance.date): performance
+                for performance in CampaignPerformance.objects.select_for_update().filter(
+                    campaign_id__in={campaign_id for campaign_id, _ in batch},
+                    date__in={day for _, day in batch},
+                )
+            }
+
+            rows, deltas = [], {}
+            for key, amount in batch.items():
+                performance = existing.get(key) or CampaignPerformance(campaign_id=key[0], date=key[1])
+                previous_total = performance.total_spend
+
+                if key in self.written:
+                    amount += getattr(performance, self.field)
+                setattr(performance, self.field, amount)
+                performance.total_spend = performance.meta_spend + performance.google_spend + performance.tiktok_spend
+                performance.spend_data_source = self.source
+                performance.last_updated = now
+                _recalculate(performance)
+                rows.append(performance)
+
+                deltas[(campaigns[key[0]], key[1])] = performance.total_spend - previous_total
+
+            # One INSERT ... ON CONFLICT per 1000 rows for new and existing days alike
+            for performance in rows:
+                performance.pk = None
+            CampaignPerformance.objects.bulk_create(
+                rows, batch_size=1000, update_conflicts=True,
+                unique_fields=['campaign', 'date'], update_fields=PERFORMANCE_FIELDS
+            )
+            apply_spend_deltas(deltas)
+
+        self.written.update(batch)
+        self.result['days'] += len(batch)
+        for campaign_id, day in batch:
+            self.touched_campaigns[campaign_id] = campaigns[campaign_id]
+            self.first_days[campaign_id] = min(day, self.first_days.get(campaign_id, day))
+
+    def finish(self):
+        # Bulk writes skip the model signals, so do their work once here
+        for campaign_id, day in self.first_days.items():
+            refresh_rolling(campaign_id, day)
+        for campaign in self.touched_campaigns.values():
+            bump_campaign_tenants(campaign)
+        for brand_id in {campaign.brand_id for campaign in self.touched_campaigns.values()}:
+            refresh_brand_notifications(brand_id)
+
+
+def _recalculate(performance):
+    """CampaignPerformance.calculate_metrics without the save"""
+    if performance.total_spend > 0:
+        performance.roas = (performance.attributed_revenue / performance.total_spend).quantize(CENT, rounding=ROUND_HALF_UP)
+        performance.cpa = (
+            (performance.total_spend / performance.attributed_orders).quantize(CENT, rounding=ROUND_HALF_UP)
+            if performance.attributed_orders > 0 else 0
+        )
+    else:
+        performance.roas = 0
+        performance.cpa = 0
+
+
+def import_spend(binary_file, platform, campaigns=None, source='AGENCY_REPORT', encoding='utf-8-sig'):
+    """Import a spend report from a binary file object and return the counts"""
+    return SpendImporter(platform, campaigns=campaigns, source=source).run(open_report(binary_file, encoding))
@@ -1,3 +1,1068 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import io
+import json
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import Model, Sum
+from django.db.models.query import QuerySet
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import Agency
+from attribution.models import CustomerJourney
+from attribution.views import journey_events_api
+from performance_marketing.instrumentation import QUERY_BUCKETS, QueryBudgetMiddleware, view_queries
+from performance_marketing.testing import QueryBudgetMixin, create_agency, create_brand, create_campaign
+from .anomalies import close_days, close_hours, observe_order
+from .charts import bucket_sums, fill_daily_gaps, lttb_indices
+from .cache import _version_key, bump_data_version, cached_for_tenant
+from .cohorts import cohort_report, rebuild_cohorts, refresh_cohorts
+from .connector_stub import AdPlatformStub, stub_spend
+from .connectors import TikTokConnector, sync_spend
+from .exports import export_chunks
+from .ledger import BUCKET_TOTAL_FIELDS, rebuild_ledger, sync_escrow_earnings
+from .live import LiveEventHub, channel_for, format_sse, live_hub
+from .models import AgencyEarnings, AgencyLedgerEntry, AgencyScore, AnomalyState, Campaign, CampaignBid, CampaignPerformance, CustomerCohort, DashboardNotification, EscrowPayment, LiveEvent, PaymentRelease, PerformanceMetric, RollingMetric, ShopifyOrder, SpendSyncCursor
+from .notifications import AGENCY_KEYS, refresh_brand_notifications, sync_notifications
+from .pagination import ORDER_KEYS, keyset_page
+from .scoring import score_agencies
+from .pacing import cached_forecasts, forecast_campaigns
+from .rolling import refresh_rolling
+from .rollups import rebuild_rollups
+from .views import EnhancedDashboardView, build_campaign_analytics, export_api, live_events_stream, orders_api
+
+
+class EnhancedDashboardQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Dashboard query counts must not grow with campaigns, orders or days"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = create_brand('budgetbrand')
+        cls.agency = create_agency('budgetagency')
+        today = timezone.localdate()
+        
+        for n in range(5):
+            campaign = create_campaign(cls.brand, n, agency=cls.agency)
+            EscrowPayment.objects.create(
+                campaign=campaign, brand=cls.brand, agency=cls.agency, total_budget=5000,
+                commission_rate=10, target_roas=3, status='HELD'
+            )
+            for days_ago in range(10):
+                CampaignPerformance.objects.create(
+                    campaign=campaign, date=today - timedelta(days=days_ago),
+                    total_spend=100, attributed_revenue=400, attributed_orders=2
+                )
+            for i in range(3):
+                ShopifyOrder.objects.create(
+                    shopify_order_id=n * 100 + i, order_number=f'{n}-{i}', brand=cls.brand,
+                    campaign=campaign, agency=cls.agency, total_price=200, normalized_total=200,
+                    utm_source='facebook', utm_campaign=campaign.utm_campaign,
+                    is_attributed=True, attribution_confidence=90,
+                    order_created_at=timezone.now() - timedelta(days=i)
+                )
+        rebuild_rollups()
+    
+    def test_brand_dashboard(self):
+        request = self.make_request(self.brand.user)
+        self.assertQueryBudget('campaigns:enhanced_dashboard', EnhancedDashboardView.as_view(), request)
+    
+    def test_agency_dashboard(self):
+        request = self.make_request(self.agency.user)
+        self.assertQueryBudget('campaigns:enhanced_dashboard', EnhancedDashboardView.as_view(), request)
+    
+    def test_brand_dashboard_values(self):
+        cache.clear()
+        context = EnhancedDashboardView.as_view()(self.make_request(self.brand.user)).context_data
+        
+        self.assertEqual(context['total_spend'], 5 * 10 * 100)
+        self.assertEqual(context['total_revenue'], 15 * 200)
+        self.assertEqual(context['total_orders'], 15)
+        self.assertEqual(context['attribution_stats']['attribution_rate'], 100)
+        self.assertEqual(context['payment_overview'], {'total_escrowed': 25000, 'total_released': 0, 'pending_campaigns': 5})
+        self.assertEqual(len(context['campaign_performance']), 5)
+        for row in context['campaign_performance']:
+            self.assertEqual((row['spend'], row['revenue'], row['orders']), (1000, 600, 3))
+            self.assertFalse(row['is_meeting_targets'])
+    
+    def test_agency_dashboard_values(self):
+        cache.clear()
+        context = EnhancedDashboardView.as_view()(self.make_request(self.agency.user)).context_data
+        
+        self.assertEqual(context['total_spend'], 5000)
+        self.assertEqual(context['total_revenue'], 3000)
+        self.assertEqual(len(context['campaign_performance']), 5)
+        for row in context['campaign_performance']:
+            self.assertEqual((row['spend'], row['revenue']), (1000, 600))
+            # 10% commission on the spend so far
+            self.assertEqual(row['potential_commission'], 100)
+
+
+class TenantCacheTests(QueryBudgetMixin, TestCase):
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = create_brand('cachebrand')
+        cls.agency = create_agency('cacheagency')
+        cls.campaign = create_campaign(cls.brand, 1, agency=cls.agency)
+    
+    def setUp(self):
+        cache.clear()
+        self.builds = 0
+    
+    def build(self):
+        self.builds += 1
+        return {'build': self.builds}
+    
+    def cached(self, kind='brand', tenant_id=None):
+        return cached_for_tenant(kind, tenant_id or self.brand.id, 'test', self.build)['build']
+    
+    def test_entries_follow_the_data_version(self):
+        self.assertEqual(self.cached(), 1)
+        self.assertEqual(self.cached(), 1)
+        self.assertEqual(self.cached('agency', self.agency.id), 2)
+        
+        bump_data_version('brand', self.brand.id)
+        self.assertEqual(self.cached(), 3)
+        self.assertEqual(self.cached(), 3)
+        self.assertEqual(self.cached('agency', self.agency.id), 2)
+    
+    def test_evicted_version_does_not_revive_old_entries(self):
+        self.assertEqual(self.cached(), 1)
+        bump_data_version('brand', self.brand.id)
+        # The version key is evicted before anyone reads the bumped version
+        cache.delete(_version_key('brand', self.brand.id))
+        self.assertEqual(self.cached(), 2)
+        
+        cache.delete(_version_key('brand', self.brand.id))
+        bump_data_version('brand', self.brand.id)
+        self.assertEqual(self.cached(), 3)
+    
+    def test_writes_invalidate_the_dashboard(self):
+        view = EnhancedDashboardView.as_view()
+        context = view(self.make_request(self.brand.user)).context_data
+        self.assertEqual(context['payment_overview']['total_escrowed'], 0)
+        
+        EscrowPayment.objects.create(
+            campaign=self.campaign, brand=self.brand, agency=self.agency, total_budget=5000,
+            commission_rate=10, target_roas=3, status='HELD'
+        )
+        context = view(self.make_request(self.brand.user)).context_data
+        self.assertEqual(context['payment_overview']['total_escrowed'], 5000)
+        self.assertEqual(context['active_campaigns'][0]['title'], self.campaign.title)
+        
+        self.campaign.title = 'Renamed'
+        self.campaign.save()
+        context = view(self.make_request(self.brand.user)).context_data
+        self.assertEqual(context['campaigns'][0]['title'], 'Renamed')
+    
+    def test_cached_contexts_hold_plain_values(self):
+        def walk(value, path):
+            self.assertNotIsInstance(value, (Model, QuerySet), path)
+            if isinstance(value, dict):
+                for key, item in value.items():
+                    walk(item, f'{path}.{key}')
+            elif isinstance(value, (list, tuple)):
+                for i, item in enumerate(value):
+                    walk(item, f'{path}[{i}]')
+        
+        end = timezone.localdate()
+        view = EnhancedDashboardView()
+        walk(view.get_brand_context(self.brand, end - timedelta(days=30), end), 'brand')
+        walk(view.get_agency_context(self.agency, end - timedelta(days=30), end), 'agency')
+
+
+class ChartSeriesTests(TestCase):
+    
+    def test_fill_daily_gaps(self):
+        start = date(2026, 1, 1)
+        rows = [
+            {'date': start + timedelta(days=1), 'spend': 10, 'orders': 2},
+            {'date': start + timedelta(days=3), 'spend': 25, 'orders': None},
+        ]
+        filled = fill_daily_gaps(rows, start, start + timedelta(days=4), cumulative_fields=('spend',), daily_fields=('orders',))
+        
+        self.assertEqual([row['date'] for row in filled], [start + timedelta(days=n) for n in range(5)])
+        self.assertEqual([row['spend'] for row in filled], [0, 10, 10, 25, 25])
+        self.assertEqual([row['orders'] for row in filled], [0, 2, 0, 0, 0])
+    
+    def test_lttb_keeps_extremes(self):
+        values = [1.0] * 1000
+        values[437] = 6.0
+        values[900] = -3.0
+        keep = lttb_indices(values, 50)
+        
+        self.assertEqual(len(keep), 50)
+        self.assertEqual((keep[0], keep[-1]), (0, 999))
+        self.assertEqual(keep, sorted(set(keep)))
+        self.assertIn(437, keep)
+        self.assertIn(900, keep)
+        
+        self.assertEqual(lttb_indices(values[:10], 50), list(range(10)))
+        self.assertEqual(lttb_indices(values, 2), [0, 999])
+    
+    def test_bucket_sums_fold_dropped_points_forward(self):
+        self.assertEqual(bucket_sums([1, 2, 3, 4, 5, 6], [0, 2, 5]), [1, 5, 15])
+        self.assertEqual(bucket_sums([1, 2, 3], [0, 1, 2]), [1, 2, 3])
+    
+    def test_analytics_chart_is_gap_filled_and_downsampled(self):
+        campaign = create_campaign(create_brand('chartbrand'), 1)
+        end = timezone.localdate()
+        start = end - timedelta(days=59)
+        # Spend every third day only
+        for n in range(0, 60, 3):
+            CampaignPerformance.objects.create(
+                campaign=campaign, date=start + timedelta(days=n), total_spend=100, attributed_revenue=300, attributed_orders=1
+            )
+        
+        chart = build_campaign_analytics(campaign, start, end, max_points=10)['performance_chart']
+        self.assertEqual(len(chart['dates']), 10)
+        self.assertEqual((chart['dates'][0], chart['dates'][-1]), (start.isoformat(), end.isoformat()))
+        self.assertEqual(chart['spend'][-1], 2000.0)
+        self.assertEqual(chart['revenue'][-1], 6000.0)
+        self.assertEqual(chart['roas'][-1], 3.0)
+        self.assertEqual(chart['spend'], sorted(chart['spend']))
+        # Orders on dropped days are carried by the next kept point
+        self.assertEqual(sum(chart['orders']), 20)
+        
+        self.client.force_login(campaign.brand.user)
+        url = f'/campaigns/api/analytics/{campaign.id}/'
+        self.assertEqual(self.client.get(url, {'days': 'week'}).status_code, 400)
+        self.assertEqual(len(self.client.get(url, {'days': 59, 'points': 1}).json()['performance_chart']['dates']), 3)
+
+
+class ConditionalPollingTests(TestCase):
+    """Polling APIs answer 304 until something in their payload changes"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = create_brand('pollbrand')
+        cls.agency = create_agency('pollagency')
+        cls.campaign = create_campaign(cls.brand, 1, agency=cls.agency)
+        cls.bid = CampaignBid.objects.create(
+            campaign=cls.campaign, agency=cls.agency, guaranteed_roas=3, commission_percentage=10,
+            proposal_text='Proposal', estimated_timeline='4 weeks'
+        )
+    
+    def setUp(self):
+        self.client.force_login(self.brand.user)
+        self.url = f'/campaigns/api/analytics/{self.campaign.id}/'
+    
+    def assertNotModified(self, etag):
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+    
+    def assertModified(self, etag):
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        return response['ETag']
+    
+    def test_analytics_validators(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertNotModified(etag)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+        # Another query string is another payload
+        self.assertEqual(self.client.get(self.url, {'days': 7}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        
+        for change in (
+            lambda: CampaignBid.objects.get(id=self.bid.id).save(),
+            lambda: PerformanceMetric.objects.create(campaign=self.campaign, platform='META', date=timezone.localdate(), spend=10),
+            lambda: RollingMetric.objects.create(campaign=self.campaign, date=timezone.localdate(), window=7),
+            lambda: CampaignPerformance.objects.create(campaign=self.campaign, date=timezone.localdate(), total_spend=10),
+        ):
+            change()
+            etag = self.assertModified(etag)
+            self.assertNotModified(etag)
+    
+    def test_no_validators_for_other_tenants(self):
+        self.client.force_login(create_brand('otherpollbrand').user)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(response.has_header('ETag'))
+    
+    def test_notifications_and_shopify_status(self):
+        for url in ('/campaigns/api/notifications/', '/campaigns/api/shopify/status/'):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        
+        etag = self.client.get('/campaigns/api/notifications/')['ETag']
+        DashboardNotification.objects.create(brand=self.brand, key='test', level='info', title='Test', message='Changed')
+        self.assertEqual(self.client.get('/campaigns/api/notifications/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class LiveEventStreamTests(QueryBudgetMixin, TestCase):
+    """Reconnecting dashboards neither miss nor repeat events"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = create_brand('livebrand')
+        cls.channel = channel_for('brand', cls.brand.id)
+        cls.events = [LiveEvent.objects.create(channel=cls.channel, kind='order', payload={'n': n}) for n in range(3)]
+    
+    @override_settings(LIVE_EVENTS_KEEPALIVE_SECONDS=3600)
+    @mock.patch.object(live_hub, '_ensure_tail')
+    async def test_resume_subscribes_before_replaying(self, ensure_tail):
+        request = self.make_request(self.brand.user, path='/campaigns/api/live/', HTTP_LAST_EVENT_ID=str(self.events[0].id))
+        response = await live_events_stream(request)
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+        # Already subscribed when the replay query runs
+        [queue] = live_hub.subscribers[self.channel]
+        try:
+            replayed = [await anext(stream), await anext(stream)]
+            self.assertEqual(replayed, [format_sse(event).encode() for event in self.events[1:]])
+            
+            # The tail fans out a replayed event again, then a new one
+            new = await sync_to_async(LiveEvent.objects.create)(channel=self.channel, kind='order', payload={'n': 3})
+            queue.put_nowait(self.events[2])
+            queue.put_nowait(new)
+            self.assertEqual(await asyncio.wait_for(anext(stream), 5), format_sse(new).encode())
+        finally:
+            live_hub.unsubscribe([self.channel], queue)
+    
+    @override_settings(LIVE_EVENTS_KEEPALIVE_SECONDS=3600)
+    @mock.patch.object(live_hub, '_ensure_tail')
+    async def test_dropped_subscriber_stream_ends(self, ensure_tail):
+        response = await live_events_stream(self.make_request(self.brand.user, path='/campaigns/api/live/'))
+        stream = aiter(response.streaming_content)
+        await anext(stream)
+        [queue] = live_hub.subscribers[self.channel]
+        try:
+            queue.put_nowait(None)
+            with self.assertRaises(StopAsyncIteration):
+                await asyncio.wait_for(anext(stream), 5)
+        finally:
+            live_hub.unsubscribe([self.channel], queue)
+
+
+class LiveEventHubTests(TestCase):
+    
+    def setUp(self):
+        self.hub = LiveEventHub()
+        self.hub.subscribers['brand:1'] = set()
+        self.hub.last_id = LiveEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    
+    def create(self, **fields):
+        return LiveEvent.objects.create(channel='brand:1', kind='order', **fields)
+    
+    def test_late_commit_below_the_cursor_is_read(self):
+        first, late, last = self.create(), self.create(), self.create()
+        late_id = late.id
+        # As if late's transaction had not committed when the tail read last
+        late.delete()
+        self.assertEqual([e.id for e in self.hub._fetch()], [first.id, last.id])
+        
+        self.create(id=late_id)
+        self.assertEqual([e.id for e in self.hub._fetch()], [late_id])
+        self.assertEqual(self.hub._fetch(), [])
+    
+    @override_settings(LIVE_EVENTS_LOOKBACK_SECONDS=0)
+    def test_gaps_are_forgotten_after_the_lookback(self):
+        skipped = self.create()
+        skipped_id = skipped.id
+        skipped.delete()
+        self.create()
+        self.hub._fetch()
+        
+        self.create(id=skipped_id)
+        self.assertEqual(self.hub._fetch(), [])
+    
+    @override_settings(LIVE_EVENTS_QUEUE_SIZE=1)
+    @mock.patch.object(LiveEventHub, '_ensure_tail')
+    def test_overflowing_subscriber_is_dropped(self, ensure_tail):
+        slow = self.hub.subscribe(['brand:1'])
+        self.hub._fan_out([self.create(), self.create()])
+        
+        self.assertIsNone(slow.get_nowait())
+        self.assertTrue(slow.empty())
+        self.assertNotIn('brand:1', self.hub.subscribers)
+
+
+class NotificationSyncTests(TestCase):
+    """Agency notifications follow bidding changes, and only those"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = create_brand('notifybrand')
+        cls.bidder = create_agency('notifybidder', stripe_account_id='acct_1')
+        cls.other = create_agency('notifyother', stripe_account_id='acct_2')
+        cls.campaign = create_campaign(cls.brand, 1)
+        CampaignBid.objects.create(
+            campaign=cls.campaign, agency=cls.bidder, guaranteed_roas=3, commission_percentage=10,
+            proposal_text='Proposal', estimated_timeline='4 weeks'
+        )
+    
+    def opportunities(self, agency):
+        return list(DashboardNotification.objects.filter(agency=agency, key='new_opportunities').values_list('message', 'resolved'))
+    
+    def test_sync_writes_only_differences(self):
+        desired = {self.other.id: {'new_opportunities': {
+            'level': 'info', 'title': 'New Opportunities', 'message': '1 new campaigns available for bidding',
+            'action': 'View campaigns', 'url': '/marketplace/',
+        }}}
+        self.assertEqual(sync_notifications('agency', AGENCY_KEYS, desired, [self.other.id]), 1)
+        self.assertEqual(sync_notifications('agency', AGENCY_KEYS, desired, [self.other.id]), 0)
+        
+        desired[self.other.id]['new_opportunities']['message'] = '2 new campaigns available for bidding'
+        self.assertEqual(sync_notifications('agency', AGENCY_KEYS, desired, [self.other.id]), 1)
+        self.assertEqual(self.opportunities(self.other), [
+            ('1 new campaigns available for bidding', True), ('2 new campaigns available for bidding', False),
+        ])
+        # A cleared condition leaves a resolved marker
+        self.assertEqual(sync_notifications('agency', AGENCY_KEYS, {}, [self.other.id]), 1)
+        self.assertFalse(DashboardNotification.objects.filter(agency=self.other, resolved=False).exists())
+    
+    def test_opening_bidding_refreshes_agencies_without_a_bid(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.campaign.title = 'Renamed'
+            self.campaign.save()
+        self.assertEqual(callbacks, [])
+        
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.campaign.status = 'BIDDING'
+            self.campaign.save()
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(self.opportunities(self.other), [('1 new campaigns available for bidding', False)])
+        self.assertEqual(self.opportunities(self.bidder), [])
+        
+        # Closing bidding resolves it again
+        with self.captureOnCommitCallbacks(execute=True):
+            self.campaign.status = 'ACTIVE'
+            self.campaign.save()
+        self.assertEqual(self.opportunities(self.other), [
+            ('1 new campaigns available for bidding', True), ('1 new campaigns available for bidding', True),
+        ])
+    
+    def test_old_campaigns_are_not_opportunities(self):
+        Campaign.objects.filter(id=self.campaign.id).update(created_at=timezone.now() - timedelta(days=2))
+        self.campaign.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.campaign.status = 'BIDDING'
+            self.campaign.save()
+        self.assertEqual(callbacks, [])
+
+
+class AgencyLedgerTests(TestCase):
+    """Escrow and release writes keep the ledger and running totals in step"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = create_brand('ledgerbrand')
+        cls.agency = create_agency('ledgeragency')
+        cls.campaign = create_campaign(cls.brand, 1, agency=cls.agency)
+    
+    def setUp(self):
+        self.escrow = EscrowPayment.objects.create(
+            campaign=self.campaign, brand=self.brand, agency=self.agency, total_budget=1000,
+            commission_rate=10, target_roas=3, status='HELD'
+        )
+    
+    def release(self, release_type, payout):
+        today = timezone.localdate()
+        return PaymentRelease.objects.create(
+            escrow=self.escrow, release_type=release_type, amount=payout, agency_payout=payout,
+            period_start=today, period_end=today, achieved_roas=3, spend_amount=100
+        )
+    
+    def totals(self):
+        earnings = AgencyEarnings.objects.get(agency=self.agency)
+        ledger = AgencyLedgerEntry.objects.filter(agency=self.agency)
+        balances = {bucket: ledger.filter(bucket=bucket).aggregate(total=Sum('amount'))['total'] or 0 for bucket in BUCKET_TOTAL_FIELDS}
+        # The running totals always equal the sum of the entries
+        self.assertEqual(balances, {bucket: getattr(earnings, field) for bucket, field in BUCKET_TOTAL_FIELDS.items()})
+        return earnings.earned, earnings.pending, earnings.setup_fees
+    
+    def test_release_moves_pending_to_earned(self):
+        self.assertEqual(self.totals(), (0, 100, 0))
+        self.release('PARTIAL', 60)
+        self.release('SETUP', 5)
+        self.assertEqual(self.totals(), (60, 40, 5))
+        # Idempotent without a change
+        self.assertEqual(sync_escrow_earnings(self.escrow.id), 0)
+        
+        self.escrow.status = 'RELEASED'
+        self.escrow.save()
+        self.assertEqual(self.totals(), (60, 0, 5))
+        self.assertEqual(rebuild_ledger(), (2, 1))
+        self.assertEqual(self.totals(), (60, 0, 5))
+    
+    def test_refund_clears_pending(self):
+        self.release('PARTIAL', 30)
+        self.escrow.status = 'REFUNDED'
+        self.escrow.save()
+        self.assertEqual(self.totals(), (30, 0, 0))
+    
+    def test_deletes_reverse_their_entries(self):
+        release = self.release('PARTIAL', 60)
+        with self.captureOnCommitCallbacks(execute=True):
+            release.delete()
+        self.assertEqual(self.totals(), (0, 100, 0))
+        
+        self.release('PARTIAL', 25)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.escrow.delete()
+        self.assertEqual(self.totals(), (0, 0, 0))
+        self.assertEqual(AgencyLedgerEntry.objects.filter(agency=self.agency).count(), 9)
+
+
+class QueryBudgetMiddlewareTests(TestCase):
+    """Per-view metrics are recorded for sync and async requests alike"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = create_brand('metricsbrand')
+    
+    def recorded(self, view='campaigns:dashboard_notifications'):
+        series = view_queries.series.get(view, [0] * (len(QUERY_BUCKETS) + 2))
+        return series[-2], series[-1]
+    
+    def test_sync_request(self):
+        self.client.force_login(self.brand.user)
+        requests, queries = self.recorded()
+        self.assertEqual(self.client.get('/campaigns/api/notifications/').status_code, 200)
+        self.assertEqual(self.recorded()[0], requests + 1)
+        self.assertGreater(self.recorded()[1], queries)
+    
+    async def test_async_request_stays_async(self):
+        async def view(request):
+            return HttpResponse()
+        self.assertTrue(iscoroutinefunction(QueryBudgetMiddleware(view)))
+        
+        await sync_to_async(self.client.force_login)(self.brand.user)
+        self.async_client.cookies = self.client.cookies
+        requests, queries = self.recorded()
+        with mock.patch.object(QueryBudgetMiddleware, '__acall__', autospec=True, side_effect=QueryBudgetMiddleware.__acall__) as acall:
+            response = await self.async_client.get('/campaigns/api/notifications/')
+        self.assertEqual(response.status_code, 200)
+        acall.assert_called_once()
+        # Queries the view ran in sync_to_async threads are counted
+        self.assertEqual(self.recorded()[0], requests + 1)
+        self.assertGreater(self.recorded()[1], queries)
+
+
+class SpendConnectorTests(TestCase):
+    """Connectors against the local stub of the platform reporting APIs"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = create_brand('syncbrand')
+        cls.campaigns = [
+            create_campaign(cls.brand, n, platforms=['META', 'GOOGLE', 'TIKTOK']) for n in range(3)
+        ]
+        cls.campaigns.append(create_campaign(cls.brand, 3, platforms=['META']))
+        cls.paused = create_campaign(cls.brand, 4, status='PAUSED', platforms=['META'])
+    
+    def setUp(self):
+        names = [c.utm_campaign for c in self.campaigns] + ['not-ours']
+        self.stub = AdPlatformStub(campaigns=names).start()
+        self.addCleanup(self.stub.stop)
+    
+    def test_sync_and_incremental_cursor(self):
+        today = timezone.localdate()
+        with self.settings(SPEND_SYNC_WINDOW_DAYS=14, SPEND_SYNC_LOOKBACK_DAYS=3):
+            stats = sync_spend(configs=self.stub.connector_configs(), workers=4)
+        
+        self.assertEqual(stats['errors'], [])
+        # 31 days (campaign start through today), 3 campaigns on every platform + 1 on Meta
+        self.assertEqual(stats['days'], 31 * (3 * 3 + 1))
+        self.assertEqual(CampaignPerformance.objects.count(), 31 * 4)
+        
+        campaign = self.campaigns[0]
+        day = today - timedelta(days=5)
+        performance = CampaignPerformance.objects.get(campaign=campaign, date=day)
+        expected = {p: stub_spend(p, campaign.utm_campaign, day) for p in ('META', 'GOOGLE', 'TIKTOK')}
+        self.assertEqual(performance.meta_spend, expected['META'])
+        self.assertEqual(performance.google_spend, expected['GOOGLE'])
+        self.assertEqual(performance.tiktok_spend, expected['TIKTOK'])
+        self.assertEqual(performance.total_spend, sum(expected.values()))
+        self.assertEqual(performance.spend_data_source, 'API')
+        self.assertFalse(CampaignPerformance.objects.filter(campaign=self.paused).exists())
+        
+        self.assertEqual(SpendSyncCursor.objects.count(), 10)
+        self.assertEqual(set(SpendSyncCursor.objects.values_list('synced_through', flat=True)), {today})
+        
+        # The next run only re-fetches the lookback window
+        stats = sync_spend(configs=self.stub.connector_configs(), workers=4)
+        self.assertEqual(stats['days'], 4 * 10)
+        self.assertEqual(CampaignPerformance.objects.get(campaign=campaign, date=day).total_spend, sum(expected.values()))
+    
+    def test_malformed_response_fails_only_its_task(self):
+        with mock.patch.object(TikTokConnector, 'fetch', side_effect=KeyError('list')), self.assertLogs('campaigns.connectors'):
+            stats = sync_spend(configs=self.stub.connector_configs(), workers=4)
+        
+        # Both 30-day windows of the one TikTok task chunk
+        self.assertEqual(len(stats['errors']), 2)
+        self.assertTrue(all(error.startswith('TIKTOK') for error in stats['errors']))
+        # Meta and Google were written and their cursors moved; TikTok is retried next run
+        self.assertEqual(set(SpendSyncCursor.objects.values_list('platform', flat=True)), {'META', 'GOOGLE'})
+        self.assertEqual(SpendSyncCursor.objects.count(), 7)
+        performance = CampaignPerformance.objects.get(campaign=self.campaigns[0], date=timezone.localdate())
+        self.assertEqual(performance.tiktok_spend, 0)
+        self.assertEqual(performance.total_spend, performance.meta_spend + performance.google_spend)
+
+
+class RollingMetricTests(TestCase):
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.campaign = create_campaign(create_brand('rollingbrand'), 1)
+        cls.today = timezone.localdate()
+        for days_ago in range(40):
+            if days_ago % 5 == 3:
+                continue  # days without data still roll the windows
+            day = cls.today - timedelta(days=days_ago)
+            CampaignPerformance.objects.create(
+                campaign=cls.campaign, date=day, total_spend=10 + days_ago,
+                attributed_revenue=(10 + days_ago) * 3, attributed_orders=days_ago % 4
+            )
+            PerformanceMetric.objects.create(
+                campaign=cls.campaign, platform='META', date=day, impressions=1000, clicks=10 + days_ago % 7
+            )
+    
+    def expected(self, window, day):
+        """Window sums the slow way"""
+        performance = CampaignPerformance.objects.filter(
+            campaign=self.campaign, date__range=[day - timedelta(days=window - 1), day]
+        )
+        spend = sum((p.total_spend for p in performance), Decimal('0'))
+        orders = sum(p.attributed_orders for p in performance)
+        clicks = sum(PerformanceMetric.objects.filter(
+            campaign=self.campaign, date__range=[day - timedelta(days=window - 1), day]
+        ).values_list('clicks', flat=True))
+        return spend, orders, clicks
+    
+    def assertWindowsMatch(self):
+        for row in RollingMetric.objects.filter(campaign=self.campaign):
+            self.assertEqual((row.spend, row.orders, row.clicks), self.expected(row.window, row.date), row)
+    
+    def test_incremental_matches_full_scan(self):
+        # Build in two steps, the second one sliding on from the stored rows
+        refresh_rolling(self.campaign.id, through=self.today - timedelta(days=10))
+        refresh_rolling(self.campaign.id, through=self.today)
+        self.assertEqual(RollingMetric.objects.filter(campaign=self.campaign).count(), 40 * 3)
+        self.assertWindowsMatch()
+        
+        latest = RollingMetric.objects.get(campaign=self.campaign, window=7, date=self.today)
+        self.assertEqual(latest.roas, Decimal('3.00'))
+        
+        # A back-dated change recomputes from that day on
+        day = self.today - timedelta(days=12)
+        CampaignPerformance.objects.filter(campaign=self.campaign, date=day).update(total_spend=500, attributed_orders=9)
+        refresh_rolling(self.campaign.id, day)
+        self.assertWindowsMatch()
+        
+        payload = build_campaign_analytics(self.campaign, self.today - timedelta(days=30), self.today)
+        self.assertEqual(set(payload['rolling']), {7, 14, 28})
+        self.assertEqual(payload['rolling'][7]['roas'], 3.0)
+        self.assertEqual(len(payload['performance_chart']['rolling'][28]['ctr']), len(payload['performance_chart']['dates']))
+
+
+class AnomalyDetectionTests(TestCase):
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = create_brand('anomalybrand')
+        cls.campaign = create_campaign(cls.brand, 1)
+    
+    def order(self, n, created_at, total=100):
+        return ShopifyOrder.objects.create(
+            shopify_order_id=900000 + n, order_number=str(n), brand=self.brand, campaign=self.campaign,
+            total_price=total, normalized_total=total, is_attributed=True, attribution_confidence=90,
+            order_created_at=created_at
+        )
+    
+    def test_hourly_revenue_collapse(self):
+        start = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=100)
+        n = 0
+        for hour in range(96):
+            for i in range(3 + hour % 2):
+                n += 1
+                observe_order(self.order(n, start + timedelta(hours=hour, minutes=10 * i)))
+        state = AnomalyState.objects.get(campaign=self.campaign, metric='orders', granularity='hour')
+        self.assertEqual(state.count, 95)
+        self.assertIsNone(state.alert_bucket)
+        self.assertAlmostEqual(state.mean, 3.5, delta=0.3)
+        
+        # Nothing arrives for the next hours: the periodic pass closes them
+        close_hours(start + timedelta(hours=98))
+        state.refresh_from_db()
+        self.assertIsNotNone(state.alert_bucket)
+        self.assertLess(state.alert_sigmas, -3)
+        
+        refresh_brand_notifications(self.brand.id)
+        notification = DashboardNotification.objects.get(
+            brand=self.brand, key=f'anomaly:{self.campaign.id}:orders:hour', resolved=False
+        )
+        self.assertIn('Orders dropped', notification.message)
+        
+        # Back to normal: the alert and the notification resolve
+        for i in range(4):
+            n += 1
+            observe_order(self.order(n, start + timedelta(hours=98, minutes=i)))
+        observe_order(self.order(n + 1, start + timedelta(hours=99)))
+        refresh_brand_notifications(self.brand.id)
+        self.assertFalse(DashboardNotification.objects.filter(
+            brand=self.brand, key__startswith='anomaly:', resolved=False
+        ).exists())
+    
+    def test_daily_roas_drop(self):
+        today = timezone.localdate()
+        for days_ago in range(1, 29):
+            revenue = 300 + (days_ago % 3) * 20 if days_ago > 1 else 40
+            CampaignPerformance.objects.create(
+                campaign=self.campaign, date=today - timedelta(days=days_ago),
+                total_spend=100, attributed_revenue=revenue, attributed_orders=3
+            )
+        with self.settings(ANOMALY_DAILY_GRACE_HOURS=0, ANOMALY_SEED_DAYS=28):
+            self.assertEqual(close_days(), {self.brand.id})
+        
+        roas = AnomalyState.objects.get(campaign=self.campaign, metric='roas', granularity='day')
+        self.assertEqual(timezone.localdate(roas.bucket_start), today)
+        self.assertEqual(timezone.localdate(roas.alert_bucket), today - timedelta(days=1))
+        self.assertAlmostEqual(roas.alert_value, 0.4)
+        
+        refresh_brand_notifications(self.brand.id)
+        notification = DashboardNotification.objects.get(key=f'anomaly:{self.campaign.id}:roas:day')
+        self.assertIn('ROAS dropped', notification.message)
+        self.assertIn('0.40 vs 3.', notification.message)
+
+
+class PacingForecastTests(TestCase):
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = create_brand('pacingbrand')
+        cls.today = timezone.localdate()
+        start, end = cls.today - timedelta(days=20), cls.today + timedelta(days=9)
+        cls.linear = create_campaign(cls.brand, 1, campaign_start=start, campaign_end=end)
+        cls.noisy = create_campaign(cls.brand, 2, campaign_start=start, campaign_end=end, budget_min=500, budget_max=1000)
+        cls.upcoming = create_campaign(cls.brand, 3, campaign_start=cls.today + timedelta(days=1))
+        for k in range(20):
+            day = start + timedelta(days=k)
+            CampaignPerformance.objects.create(
+                campaign=cls.linear, date=day, total_spend=10 + k, attributed_revenue=(10 + k) * 4
+            )
+            CampaignPerformance.objects.create(
+                campaign=cls.noisy, date=day, total_spend=40 if k % 2 else 20, attributed_revenue=60
+            )
+        # Today's partial numbers are not part of the trend
+        CampaignPerformance.objects.create(campaign=cls.linear, date=cls.today, total_spend=1, attributed_revenue=1)
+    
+    def test_linear_trend_projection(self):
+        forecasts = forecast_campaigns([self.linear, self.noisy, self.upcoming], self.today)
+        self.assertIsNone(forecasts[self.upcoming.id])
+        
+        # 10..29 booked, the line continues 30..39 over today and the 9 days left
+        forecast = forecasts[self.linear.id]
+        self.assertEqual(forecast['days_remaining'], 10)
+        self.assertEqual(forecast['spend_to_date'], Decimal('390.00'))
+        self.assertEqual(forecast['projected_spend'], Decimal('735.00'))
+        self.assertEqual(forecast['projected_spend_low'], forecast['projected_spend_high'])
+        self.assertEqual(forecast['projected_roas'], Decimal('4.00'))
+        self.assertEqual(forecast['spend_pacing'], 'UNDER')
+        self.assertEqual(forecast['required_daily_spend'], Decimal('61.00'))
+        self.assertTrue(forecast['meets_target_roas'])
+        
+        noisy = forecasts[self.noisy.id]
+        self.assertEqual(noisy['spend_pacing'], 'ON_TRACK')
+        self.assertLess(noisy['projected_spend_low'], noisy['projected_spend'])
+        self.assertLess(noisy['projected_spend'], noisy['projected_spend_high'])
+        self.assertLess(noisy['projected_roas_low'], noisy['projected_roas'])
+        self.assertLess(noisy['projected_roas'], noisy['projected_roas_high'])
+        self.assertFalse(noisy['meets_target_roas'])
+    
+    def test_cached_per_data_version(self):
+        campaigns = [self.linear, self.noisy]
+        first = cached_forecasts(campaigns, self.today)
+        with self.assertNumQueries(0):
+            self.assertEqual(cached_forecasts(campaigns, self.today), first)
+        
+        CampaignPerformance.objects.filter(campaign=self.linear, date=self.today - timedelta(days=1)).update(total_spend=500)
+        bump_data_version('brand', self.brand.id)
+        with self.assertNumQueries(1):
+            refitted = cached_forecasts(campaigns, self.today)
+        self.assertGreater(refitted[self.linear.id]['spend_to_date'], first[self.linear.id]['spend_to_date'])
+
+
+class CustomerCohortTests(TestCase):
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = create_brand('cohortbrand')
+        cls.agency = create_agency('cohortagency')
+        cls.campaign_a = create_campaign(cls.brand, 1, agency=cls.agency)
+        cls.campaign_b = create_campaign(cls.brand, 2)
+    
+    def order(self, n, email, day, total, campaign=None, **fields):
+        return ShopifyOrder.objects.create(
+            **fields, shopify_order_id=800000 + n, order_number=str(n), brand=self.brand, customer_email=email,
+            campaign=campaign, agency=campaign.selected_agency if campaign else None,
+            total_price=total, normalized_total=total, is_attributed=campaign is not None,
+            order_created_at=timezone.make_aware(datetime(2026, *day, 12))
+        )
+    
+    def stored(self):
+        return sorted(
+            (row.cohort_month, row.campaign_id, row.agency_id, row.customers, row.active_customers, row.orders, row.revenue)
+            for row in CustomerCohort.objects.filter(brand=self.brand)
+        )
+    
+    def test_incremental_matches_rebuild(self):
+        self.order(1, 'alice@example.com', (1, 15), 100, self.campaign_a)
+        self.order(2, 'alice@example.com', (2, 3), 50)
+        self.order(3, 'alice@example.com', (2, 20), 25)
+        self.order(4, 'bob@example.com', (1, 31), 80, self.campaign_b)
+        self.order(5, 'carol@example.com', (2, 10), 40)
+        self.assertEqual(refresh_cohorts(self.brand.id), 5)
+        
+        january = CustomerCohort.objects.get(brand=self.brand, campaign=self.campaign_a)
+        self.assertEqual((january.customers, january.agency_id), (1, self.agency.id))
+        self.assertEqual(january.active_customers, [1, 1])
+        self.assertEqual(january.orders, [1, 2])
+        self.assertEqual(january.revenue, ['100.00', '75.00'])
+        
+        # A repeat purchase, and an earlier order that moves carol to January
+        self.order(6, 'bob@example.com', (3, 2), 20)
+        self.order(7, 'carol@example.com', (1, 5), 10, self.campaign_a)
+        self.assertEqual(refresh_cohorts(self.brand.id), 2)
+        self.assertEqual(refresh_cohorts(self.brand.id), 0)
+        incremental = self.stored()
+        
+        rebuild_cohorts(self.brand.id)
+        self.assertEqual(self.stored(), incremental)
+        self.assertFalse(CustomerCohort.objects.filter(brand=self.brand, cohort_month=datetime(2026, 2, 1)).exists())
+        
+        report = cohort_report(CustomerCohort.objects.filter(brand=self.brand))
+        self.assertEqual(len(report), 1)
+        january = report[0]
+        self.assertEqual(january['customers'], 3)
+        self.assertEqual(january['active_customers'], [3, 2, 1])
+        self.assertEqual(january['retention'], [100.0, 66.7, 33.3])
+        self.assertEqual(january['revenue'], [Decimal('190.00'), Decimal('115.00'), Decimal('20.00')])
+        self.assertEqual(january['cumulative_ltv'], [Decimal('63.33'), Decimal('101.67'), Decimal('108.33')])
+    
+    def test_late_committed_order_is_folded_in(self):
+        self.order(1, 'alice@example.com', (1, 15), 100, self.campaign_a, id=1001)
+        self.assertEqual(refresh_cohorts(self.brand.id), 1)
+        
+        # Committed after order 1001 although its id is lower
+        self.order(2, 'bob@example.com', (1, 20), 30, id=1000)
+        self.assertEqual(refresh_cohorts(self.brand.id), 1)
+        self.assertEqual(refresh_cohorts(self.brand.id), 0)
+        self.assertEqual(CustomerCohort.objects.filter(brand=self.brand).aggregate(total=Sum('customers'))['total'], 2)
+        self.assertFalse(ShopifyOrder.objects.filter(brand=self.brand, in_cohorts=False).exists())
+    
+    def test_customers_keyed_by_normalized_email(self):
+        self.order(1, ' Alice@Example.com', (1, 15), 100, self.campaign_a)
+        self.order(2, '', (1, 16), 70)
+        self.assertEqual(refresh_cohorts(self.brand.id), 1)
+        
+        self.order(3, 'alice@example.com ', (2, 3), 50)
+        self.order(4, '  ', (2, 4), 60)
+        self.assertEqual(refresh_cohorts(self.brand.id), 1)
+        incremental = self.stored()
+        self.assertEqual(incremental, [
+            (date(2026, 1, 1), self.campaign_a.id, self.agency.id, 1, [1, 1], [1, 1], ['100.00', '50.00']),
+        ])
+        self.assertFalse(ShopifyOrder.objects.filter(brand=self.brand, in_cohorts=False).exists())
+        
+        self.assertEqual(rebuild_cohorts(self.brand.id), 2)
+        self.assertEqual(self.stored(), incremental)
+    
+    def test_orders_are_folded_in_by_the_worker(self):
+        # Saving an order leaves the cohorts to update_cohorts
+        with self.captureOnCommitCallbacks(execute=True):
+            self.order(1, 'alice@example.com', (1, 15), 100, self.campaign_a)
+        self.assertFalse(CustomerCohort.objects.filter(brand=self.brand).exists())
+        
+        out = io.StringIO()
+        call_command('update_cohorts', stdout=out)
+        self.assertIn('Folded 1 orders', out.getvalue())
+        self.assertEqual(CustomerCohort.objects.get(brand=self.brand).customers, 1)
+        
+        self.order(2, 'bob@example.com', (2, 3), 50)
+        call_command('update_cohorts', brand=self.brand.id, stdout=out)
+        self.assertEqual(CustomerCohort.objects.filter(brand=self.brand).aggregate(total=Sum('customers'))['total'], 2)
+        self.assertFalse(ShopifyOrder.objects.filter(brand=self.brand, in_cohorts=False).exists())
+
+
+class ExportTests(QueryBudgetMixin, TestCase):
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = create_brand('exportbrand')
+        cls.other = create_brand('otherexportbrand')
+        for n in range(7):
+            ShopifyOrder.objects.create(
+                shopify_order_id=700000 + n, order_number=str(n), brand=cls.other if n == 3 else cls.brand,
+                total_price=10 + n, normalized_total=10 + n, customer_email=f'c{n}@example.com',
+                order_created_at=timezone.now() - timedelta(days=n)
+            )
+    
+    def export(self, **params):
+        response = export_api(self.make_request(self.brand.user, data=params), 'orders')
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+    
+    def test_csv_export_resumes_by_id(self):
+        with self.settings(EXPORT_CHUNK_SIZE=2):
+            response, body = self.export()
+        rows = list(csv.DictReader(io.StringIO(body.decode())))
+        ids = [int(row['id']) for row in rows]
+        self.assertEqual(len(ids), 6)
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(response['X-Export-Until-Id'], str(ids[-1]))
+        self.assertEqual(rows[0]['total_price'], '10.00')
+        
+        # Resume after the third row, pinned to the first response's range
+        ShopifyOrder.objects.create(
+            shopify_order_id=700100, order_number='100', brand=self.brand, total_price=1,
+            customer_email='late@example.com', order_created_at=timezone.now()
+        )
+        _, body = self.export(after=ids[2], until_id=response['X-Export-Until-Id'])
+        self.assertEqual([int(row['id']) for row in csv.DictReader(io.StringIO(body.decode()))], ids[3:])
+    
+    def test_gzipped_ndjson(self):
+        response, body = self.export(format='ndjson', gzip='1', since=(timezone.localdate() - timedelta(days=2)).isoformat())
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        lines = gzip.decompress(body).decode().splitlines()
+        self.assertEqual({json.loads(line)['order_number'] for line in lines}, {'0', '1', '2'})
+        
+        response = export_api(self.make_request(self.brand.user, data={'format': 'xml'}), 'orders')
+        self.assertEqual(response.status_code, 400)
+    
+    async def test_streams_one_chunk_at_a_time_under_asgi(self):
+        produced = []
+        
+        def chunks(*args, **kwargs):
+            for chunk in export_chunks(*args, **kwargs):
+                produced.append(chunk)
+                yield chunk
+        
+        request = AsyncRequestFactory().get('/', {'format': 'ndjson'})
+        request.user = self.brand.user
+        with self.settings(EXPORT_CHUNK_SIZE=2), mock.patch('campaigns.views.export_chunks', chunks):
+            response = await sync_to_async(export_api)(request, 'orders')
+            self.assertTrue(response.is_async)
+            received = []
+            async for part in response:
+                received.append(part)
+                # Nothing is read ahead of what has been sent
+                self.assertEqual(len(produced), len(received))
+        
+        self.assertEqual(received, produced)
+        self.assertEqual(len(received), 3)
+        lines = b''.join(received).decode().splitlines()
+        self.assertEqual(sorted(json.loads(line)['order_number'] for line in lines), ['0', '1', '2', '4', '5', '6'])
+
+
+class KeysetPaginationTests(QueryBudgetMixin, TestCase):
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = create_brand('keysetbrand')
+        cls.campaign = create_campaign(cls.brand, 1)
+        moment = timezone.now()
+        for n in range(23):
+            # Runs of equal timestamps must be neither skipped nor repeated
+            ShopifyOrder.objects.create(
+                shopify_order_id=600000 + n, order_number=str(n), brand=cls.brand, total_price=n,
+                customer_email='k@example.com', order_created_at=moment - timedelta(seconds=n // 4, microseconds=n % 2)
+            )
+        cls.expected = list(ShopifyOrder.objects.filter(brand=cls.brand).order_by('-order_created_at', '-id').values_list('id', flat=True))
+        for n in range(5):
+            CustomerJourney.objects.create(
+                session_id=f's{n}', user_agent_hash='x', event_type='CLICK', campaign=cls.campaign,
+                page_url='https://shop.example.com/', ip_address='127.0.0.1', user_agent='test'
+            )
+    
+    def test_pages_cover_every_order_once(self):
+        seen, cursor = [], None
+        while True:
+            data = {'page_size': 4, **({'cursor': cursor} if cursor else {})}
+            request = self.make_request(self.brand.user, data=data)
+            response = self.assertQueryBudget('campaigns:orders', orders_api, request)
+            payload = json.loads(response.content)
+            seen.extend(order['id'] for order in payload['orders'])
+            cursor = payload['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(seen, self.expected)
+        
+        response = orders_api(self.make_request(self.brand.user, data={'cursor': 'forged'}))
+        self.assertEqual(response.status_code, 400)
+    
+    def test_journey_events(self):
+        request = self.make_request(self.brand.user, data={'page_size': 3})
+        payload = json.loads(self.assertQueryBudget('journey_events', journey_events_api, request).content)
+        self.assertEqual([event['session_id'] for event in payload['events']], ['s4', 's3', 's2'])
+        
+        # An order cursor is not accepted by the journey listing
+        _, order_cursor = keyset_page(ShopifyOrder.objects.all(), ORDER_KEYS, page_size=1)
+        request = self.make_request(self.brand.user, data={'cursor': order_cursor})
+        self.assertEqual(journey_events_api(request).status_code, 400)
+        
+        request = self.make_request(self.brand.user, data={'cursor': payload['next_cursor']})
+        payload = json.loads(journey_events_api(request).content)
+        self.assertEqual([event['session_id'] for event in payload['events']], ['s1', 's0'])
+        self.assertIsNone(payload['next_cursor'])
+
+
+class AgencyScoringTests(TestCase):
+    
+    @classmethod
+    def setUpTestData(cls):
+        brand = create_brand('scorebrand')
+        cls.proven = create_agency('provenagency')
+        cls.newcomer = create_agency('newagency')
+        cls.rising = create_agency('risingagency')
+        # ROAS 4 and 2 against a target of 3; the first escrow released, the second refunded
+        for n, (revenue, status) in enumerate([(400, 'RELEASED'), (200, 'REFUNDED')]):
+            campaign = create_campaign(brand, n, agency=cls.proven, status='COMPLETED')
+            CampaignPerformance.objects.create(campaign=campaign, date=timezone.localdate(), total_spend=100, attributed_revenue=revenue)
+            EscrowPayment.objects.create(
+                campaign=campaign, brand=brand, agency=cls.proven, total_budget=1000,
+                commission_rate=10, target_roas=3, status=status
+            )
+        cls.running = create_campaign(brand, 5, agency=cls.rising)
+        CampaignPerformance.objects.create(campaign=cls.running, date=timezone.localdate(), total_spend=100, attributed_revenue=375)
+    
+    def test_scores_from_outcomes(self):
+        self.assertEqual(score_agencies(), [self.proven.id])
+        self.proven.refresh_from_db()
+        self.assertEqual(self.proven.total_campaigns, 2)
+        self.assertEqual(self.proven.success_rate, Decimal('50.00'))
+        self.assertEqual(self.proven.avg_rating, Decimal('3.17'))
+        self.assertEqual(self.proven.competitiveness_score, 52)
+        
+        history = AgencyScore.objects.get(agency=self.proven)
+        self.assertEqual((history.settled_escrows, history.released_escrows), (2, 1))
+        self.assertEqual(history.roas_attainment, Decimal('1.000'))
+        self.assertEqual(score_agencies(), [])
+        
+        # Completing a campaign rescores its agency on commit
+        self.running.status = 'COMPLETED'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.running.save()
+        self.rising.refresh_from_db()
+        self.assertEqual((self.rising.total_campaigns, self.rising.competitiveness_score), (1, 61))
+        self.assertEqual(AgencyScore.objects.get(agency=self.rising).reason, f'campaign {self.running.id} completed')
+        
+        # Later saves of a completed campaign are not a new outcome
+        self.running.title = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.running.save()
+        self.assertEqual(callbacks, [])
+        
+        ranking = list(Agency.objects.order_by('-competitiveness_score', 'id').values_list('id', flat=True))
+        self.assertEqual(ranking, [self.rising.id, self.proven.id, self.newcomer.id])
@@ -1,18 +1,20 @@
 # campaigns/urls.py
 
 from django.urls import path
+from marketplace.views import CampaignDetailView
 from . import views
 
 app_name = 'campaigns'
 
 urlpatterns = [
-    path('', views.DashboardView.as_view(), name='dashboard'),
-    path('campaigns/', views.CampaignListView.as_view(), name='list'),
-    path('campaigns/create/', views.CampaignCreateView.as_view(), name='create'),
-    path('campaigns/<int:pk>/', views.CampaignDetailView.as_view(), name='detail'),
-    path('campaigns/<int:pk>/bid/', views.CreateBidView.as_view(), name='bid'),
-    path('dashboard/enhanced/', EnhancedDashboardView.as_view(), name='enhanced_dashboard'),
-    path('api/analytics/<int:campaign_id>/', campaign_analytics_api, name='campaign_analytics_api'),
-    path('api/shopify/status/', shopify_connection_status, name='shopify_status'),
-    path('api/notifications/', dashboard_notifications, name='dashboard_notifications'),
-]
\ No newline at end of file
+    path('', views.EnhancedDashboardView.as_view(), name='dashboard'),
+    path('campaigns/<int:pk>/', CampaignDetailView.as_view(), name='detail'),
+    path('dashboard/enhanced/', views.EnhancedDashboardView.as_view(), name='enhanced_dashboard'),
+    path('api/analytics/<int:campaign_id>/', views.campaign_analytics_api, name='campaign_analytics_api'),
+    path('api/shopify/status/', views.shopify_connection_status, name='shopify_status'),
+    path('api/cohorts/', views.cohort_analytics_api, name='cohort_analytics_api'),
+    path('api/orders/', views.orders_api, name='orders'),
+    path('api/export/<str:dataset>/', views.export_api, name='export'),
+    path('api/notifications/', views.dashboard_notifications, name='dashboard_notifications'),
+    path('api/live/', views.live_events_stream, name='live_events'),
+]
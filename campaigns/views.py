@@ -1,16 +1,41 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
+from django.core.handlers.asgi import ASGIRequest
 from django.views.generic import TemplateView
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.conf import settings
 from django.utils import timezone
-from django.db.models import Sum, Avg, Count, Q
+from django.db.models import Sum, Avg, Count, Q, F, Window
 from datetime import datetime, timedelta
+import asyncio
 import json
 
-from .models import Campaign, CampaignPerformance, ShopifyOrder, EscrowPayment
+from .models import Campaign, CampaignPerformance, ShopifyOrder, EscrowPayment, BrandDailyRollup, AgencyDailyRollup, CustomerCohort
+from .rollups import summarize_rollups
+from .rolling import SUM_FIELDS as ROLLING_SUM_FIELDS, rolling_summary
+from .cache import cached_for_tenant
+from .cohorts import cohort_report
+from .pagination import ORDER_KEYS, InvalidCursor, keyset_page
+from .exports import FORMATS as EXPORT_FORMATS, AsyncChunks, ExportError, export_chunks, export_queryset, gzip_chunks
+from .pacing import cached_forecasts, pacing_summary
+from .charts import bucket_sums, fill_daily_gaps, lttb_indices
+from .live import channel_for, format_sse, live_hub, replay_since
+from .notifications import notifications_for_user, NOTIFICATION_PAGE_SIZE
+from .conditional import campaign_analytics_condition, notifications_condition, shopify_status_condition
 from accounts.models import Brand, Agency
 
+def annotate_period_performance(campaigns, start_date, end_date):
+    """Annotate campaigns with spend, revenue and orders for a date range in one grouped query"""
+    in_period = Q(daily_rollups__date__range=[start_date, end_date])
+    return campaigns.annotate(
+        period_spend=Sum('daily_rollups__spend', filter=in_period),
+        period_revenue=Sum('daily_rollups__attributed_revenue', filter=in_period),
+        period_orders=Sum('daily_rollups__attributed_orders', filter=in_period),
+    )
+
+CAMPAIGN_SUMMARY_FIELDS = ('id', 'title', 'status', 'utm_campaign', 'budget_min', 'budget_max', 'campaign_start', 'campaign_end', 'created_at')
+
 class EnhancedDashboardView(LoginRequiredMixin, TemplateView):
     template_name = 'campaigns/enhanced_dashboard.html'
     
@@ -22,34 +47,45 @@ class EnhancedDashboardView(LoginRequiredMixin, TemplateView):
         end_date = timezone.now().date()
         start_date = end_date - timedelta(days=30)
         
+        # Contexts are cached per tenant data version; any write that touches
+        # the brand/agency bumps the version and makes old entries unreachable.
+        # Only plain values are cached: querysets and model instances would be
+        # pickled with their state and served stale from the cache.
+        cache_name = f'enhanced_dashboard:{end_date.isoformat()}'
+        
         if user.user_type == 'BRAND':
-            context.update(self.get_brand_context(user, start_date, end_date))
+            brand = get_object_or_404(Brand, user=user)
+            context['brand'] = brand
+            context.update(cached_for_tenant(
+                'brand', brand.id, cache_name,
+                lambda: self.get_brand_context(brand, start_date, end_date)
+            ))
         elif user.user_type == 'AGENCY':
-            context.update(self.get_agency_context(user, start_date, end_date))
+            agency = get_object_or_404(Agency.objects.select_related('earnings'), user=user)
+            context['agency'] = agency
+            context.update(cached_for_tenant(
+                'agency', agency.id, cache_name,
+                lambda: self.get_agency_context(agency, start_date, end_date)
+            ))
         
         return context
     
-    def get_brand_context(self, user, start_date, end_date):
+    def get_brand_context(self, brand, start_date, end_date):
         """Get dashboard context for brands"""
-        brand = get_object_or_404(Brand, user=user)
         
         # Campaign overview
         campaigns = Campaign.objects.filter(brand=brand)
         active_campaigns = campaigns.filter(status='ACTIVE')
         
-        # Performance metrics
-        performance_data = CampaignPerformance.objects.filter(
-            campaign__brand=brand,
+        # Performance and attribution metrics from the daily rollups
+        rollup = summarize_rollups(BrandDailyRollup.objects.filter(
+            brand=brand,
             date__range=[start_date, end_date]
-        ).aggregate(
-            total_spend=Sum('total_spend'),
-            total_revenue=Sum('attributed_revenue'),
-            total_orders=Sum('attributed_orders')
-        )
+        ))
         
-        total_spend = performance_data['total_spend'] or 0
-        total_revenue = performance_data['total_revenue'] or 0
-        total_orders = performance_data['total_orders'] or 0
+        total_spend = rollup['spend']
+        total_revenue = rollup['attributed_revenue']
+        total_orders = rollup['attributed_orders']
         overall_roas = total_revenue / total_spend if total_spend > 0 else 0
         
         # Attribution analytics
@@ -59,64 +95,59 @@ class EnhancedDashboardView(LoginRequiredMixin, TemplateView):
         )
         
         attribution_stats = {
-            'total_orders': recent_orders.count(),
-            'attributed_orders': recent_orders.filter(is_attributed=True).count(),
-            'attribution_rate': 0,
-            'avg_confidence': recent_orders.aggregate(Avg('attribution_confidence'))['attribution_confidence__avg'] or 0,
-            'total_revenue': recent_orders.aggregate(Sum('total_price'))['total_price__sum'] or 0,
-            'attributed_revenue': recent_orders.filter(is_attributed=True).aggregate(Sum('total_price'))['total_price__sum'] or 0
+            'total_orders': rollup['orders'],
+            'attributed_orders': rollup['attributed_orders'],
+            'attribution_rate': rollup['attribution_rate'],
+            'avg_confidence': rollup['avg_confidence'],
+            'total_revenue': rollup['revenue'],
+            'attributed_revenue': rollup['attributed_revenue']
         }
         
-        if attribution_stats['total_orders'] > 0:
-            attribution_stats['attribution_rate'] = (attribution_stats['attributed_orders'] / attribution_stats['total_orders']) * 100
-        
         # Source breakdown
-        source_breakdown = recent_orders.filter(is_attributed=True).values('utm_source').annotate(
-            order_count=Count('id'),
-            revenue=Sum('total_price')
-        ).order_by('-revenue')[:5]
+        source_breakdown = rollup['sources'][:5]
         
-        # Campaign performance breakdown
+        # Campaign performance breakdown (one grouped query for all active campaigns)
         campaign_performance = []
-        for campaign in active_campaigns:
-            perf = CampaignPerformance.objects.filter(
-                campaign=campaign,
-                date__range=[start_date, end_date]
-            ).aggregate(
-                spend=Sum('total_spend'),
-                revenue=Sum('attributed_revenue'),
-                orders=Sum('attributed_orders')
-            )
-            
-            spend = perf['spend'] or 0
-            revenue = perf['revenue'] or 0
+        active_with_perf = list(annotate_period_performance(
+            active_campaigns.select_related('selected_agency__user'), start_date, end_date
+        ))
+        # Projected final spend and ROAS, fitted for all active campaigns at once
+        forecasts = cached_forecasts(active_with_perf, end_date)
+        for campaign in active_with_perf:
+            spend = campaign.period_spend or 0
+            revenue = campaign.period_revenue or 0
             current_roas = revenue / spend if spend > 0 else 0
+            agency = campaign.selected_agency
             
             campaign_performance.append({
-                'campaign': campaign,
+                'campaign': {field: getattr(campaign, field) for field in CAMPAIGN_SUMMARY_FIELDS},
                 'spend': spend,
                 'revenue': revenue,
-                'orders': perf['orders'] or 0,
+                'orders': campaign.period_orders or 0,
                 'current_roas': current_roas,
                 'target_roas': campaign.target_roas,
                 'is_meeting_targets': current_roas >= campaign.target_roas if spend > 0 else None,
-                'agency': campaign.selected_agency,
-                'utm_campaign': campaign.utm_campaign
+                'agency': {'id': agency.id, 'company_name': agency.user.company_name} if agency else None,
+                'utm_campaign': campaign.utm_campaign,
+                'forecast': forecasts[campaign.id],
             })
         
         # Payment overview
-        escrows = EscrowPayment.objects.filter(brand=brand)
+        escrow_totals = EscrowPayment.objects.filter(brand=brand).aggregate(
+            total_escrowed=Sum('total_budget', filter=Q(status='HELD')),
+            total_released=Sum('total_budget', filter=Q(status='RELEASED')),
+            pending_campaigns=Count('id', filter=Q(status='HELD')),
+        )
         payment_overview = {
-            'total_escrowed': escrows.filter(status='HELD').aggregate(Sum('total_budget'))['total_budget__sum'] or 0,
-            'total_released': escrows.filter(status='RELEASED').aggregate(Sum('total_budget'))['total_budget__sum'] or 0,
-            'pending_campaigns': escrows.filter(status='HELD').count()
+            'total_escrowed': escrow_totals['total_escrowed'] or 0,
+            'total_released': escrow_totals['total_released'] or 0,
+            'pending_campaigns': escrow_totals['pending_campaigns']
         }
         
         return {
             'user_type': 'brand',
-            'brand': brand,
-            'campaigns': campaigns.order_by('-created_at')[:5],
-            'active_campaigns': active_campaigns,
+            'campaigns': list(campaigns.order_by('-created_at').values(*CAMPAIGN_SUMMARY_FIELDS)[:5]),
+            'active_campaigns': [row['campaign'] for row in campaign_performance],
             'total_spend': total_spend,
             'total_revenue': total_revenue,
             'total_orders': total_orders,
@@ -124,25 +155,28 @@ class EnhancedDashboardView(LoginRequiredMixin, TemplateView):
             'attribution_stats': attribution_stats,
             'source_breakdown': source_breakdown,
             'campaign_performance': campaign_performance,
+            'pacing_summary': pacing_summary(forecasts),
             'payment_overview': payment_overview,
-            'recent_orders': recent_orders.order_by('-order_created_at')[:10],
+            'recent_orders': list(recent_orders.order_by('-order_created_at').values(
+                'id', 'order_number', 'order_created_at', 'normalized_total', 'campaign_id',
+                'is_attributed', 'attribution_confidence', 'utm_source',
+            )[:10]),
             'shopify_connected': brand.shopify_connected,
         }
     
-    def get_agency_context(self, user, start_date, end_date):
+    def get_agency_context(self, agency, start_date, end_date):
         """Get dashboard context for agencies"""
-        agency = get_object_or_404(Agency, user=user)
         
         # Campaign overview
         active_campaigns = Campaign.objects.filter(selected_agency=agency, status='ACTIVE')
         won_campaigns = Campaign.objects.filter(selected_agency=agency).exclude(status__in=['DRAFT', 'BIDDING'])
         
-        # Performance metrics
-        performance_data = CampaignPerformance.objects.filter(
-            campaign__selected_agency=agency,
+        # Performance metrics from the daily rollups
+        performance_data = AgencyDailyRollup.objects.filter(
+            agency=agency,
             date__range=[start_date, end_date]
         ).aggregate(
-            total_spend=Sum('total_spend'),
+            total_spend=Sum('spend'),
             total_revenue=Sum('attributed_revenue'),
             total_orders=Sum('attributed_orders')
         )
@@ -151,37 +185,23 @@ class EnhancedDashboardView(LoginRequiredMixin, TemplateView):
         total_revenue = performance_data['total_revenue'] or 0
         overall_roas = total_revenue / total_spend if total_spend > 0 else 0
         
-        # Earnings overview
-        escrows = EscrowPayment.objects.filter(agency=agency)
+        # Earnings overview from the ledger's running totals (joined above)
+        earnings = getattr(agency, 'earnings', None)
         earnings_data = {
-            'total_earned': 0,  # From PaymentRelease model
-            'pending_earnings': 0,
-            'setup_fees_earned': 0
+            'total_earned': earnings.earned if earnings else 0,
+            'pending_earnings': earnings.pending if earnings else 0,
+            'setup_fees_earned': earnings.setup_fees if earnings else 0,
         }
         
-        for escrow in escrows:
-            if escrow.status == 'HELD':
-                # Calculate potential earnings
-                potential = total_spend * (escrow.commission_rate / 100)
-                earnings_data['pending_earnings'] += potential
-            elif escrow.status == 'RELEASED':
-                released_amount = escrow.total_budget * (escrow.commission_rate / 100)
-                earnings_data['total_earned'] += released_amount
-        
         # Campaign performance tracking
         campaign_performance = []
-        for campaign in active_campaigns:
-            perf = CampaignPerformance.objects.filter(
-                campaign=campaign,
-                date__range=[start_date, end_date]
-            ).aggregate(
-                spend=Sum('total_spend'),
-                revenue=Sum('attributed_revenue'),
-                orders=Sum('attributed_orders')
-            )
-            
-            spend = perf['spend'] or 0
-            revenue = perf['revenue'] or 0
+        active_with_perf = list(annotate_period_performance(
+            active_campaigns.select_related('brand', 'selected_bid', 'escrow'), start_date, end_date
+        ))
+        forecasts = cached_forecasts(active_with_perf, end_date)
+        for campaign in active_with_perf:
+            spend = campaign.period_spend or 0
+            revenue = campaign.period_revenue or 0
             current_roas = revenue / spend if spend > 0 else 0
             
             # Calculate potential earnings
@@ -189,16 +209,17 @@ class EnhancedDashboardView(LoginRequiredMixin, TemplateView):
             potential_commission = spend * (escrow.commission_rate / 100) if escrow else 0
             
             campaign_performance.append({
-                'campaign': campaign,
+                'campaign': {field: getattr(campaign, field) for field in CAMPAIGN_SUMMARY_FIELDS},
                 'spend': spend,
                 'revenue': revenue,
-                'orders': perf['orders'] or 0,
+                'orders': campaign.period_orders or 0,
                 'current_roas': current_roas,
                 'target_roas': campaign.target_roas,
                 'guaranteed_roas': campaign.selected_bid.guaranteed_roas if campaign.selected_bid else 0,
                 'is_meeting_targets': current_roas >= campaign.target_roas if spend > 0 else None,
                 'potential_commission': potential_commission,
-                'tracking_links': campaign.generate_tracking_links(agency) if spend == 0 else None
+                'tracking_links': campaign.generate_tracking_links(agency) if spend == 0 else None,
+                'forecast': forecasts[campaign.id],
             })
         
         # Available opportunities
@@ -207,28 +228,36 @@ class EnhancedDashboardView(LoginRequiredMixin, TemplateView):
             bidding_deadline__gt=timezone.now()
         ).exclude(
             bids__agency=agency  # Exclude campaigns already bid on
-        ).order_by('-created_at')[:5]
+        ).order_by('-created_at').values(*CAMPAIGN_SUMMARY_FIELDS, 'bidding_deadline')[:5]
         
         # Recent bids
         from .models import CampaignBid
-        recent_bids = CampaignBid.objects.filter(agency=agency).order_by('-created_at')[:5]
+        recent_bids = CampaignBid.objects.filter(agency=agency).order_by('-created_at').values(
+            'id', 'campaign_id', 'campaign__title', 'commission_percentage', 'guaranteed_roas', 'created_at',
+        )[:5]
         
         return {
             'user_type': 'agency',
-            'agency': agency,
-            'active_campaigns': active_campaigns,
-            'won_campaigns': won_campaigns,
-            'available_campaigns': available_campaigns,
-            'recent_bids': recent_bids,
+            'active_campaigns': [row['campaign'] for row in campaign_performance],
+            'won_campaigns': list(won_campaigns.values(*CAMPAIGN_SUMMARY_FIELDS)),
+            'available_campaigns': list(available_campaigns),
+            'recent_bids': list(recent_bids),
             'total_spend': total_spend,
             'total_revenue': total_revenue,
             'overall_roas': overall_roas,
             'campaign_performance': campaign_performance,
+            'pacing_summary': pacing_summary(forecasts),
             'earnings_data': earnings_data,
-            'stripe_connected': hasattr(agency, 'stripe_account_id') and agency.stripe_account_id,
+            'stripe_connected': bool(getattr(agency, 'stripe_account_id', None)),
         }
 
+# Chart payloads stay a fixed size regardless of the requested range
+MAX_ANALYTICS_DAYS = 3 * 365
+DEFAULT_CHART_POINTS = 120
+MAX_CHART_POINTS = 500
+
 @login_required
+@campaign_analytics_condition
 def campaign_analytics_api(request, campaign_id):
     """API endpoint for detailed campaign analytics"""
     
@@ -242,38 +271,71 @@ def campaign_analytics_api(request, campaign_id):
         if campaign.selected_agency.user != request.user:
             return JsonResponse({'error': 'Access denied'}, status=403)
     
-    # Get date range
-    days = int(request.GET.get('days', 30))
+    # Get date range and chart point budget
+    try:
+        days = min(max(int(request.GET.get('days', 30)), 1), MAX_ANALYTICS_DAYS)
+        points = min(max(int(request.GET.get('points', DEFAULT_CHART_POINTS)), 3), MAX_CHART_POINTS)
+    except ValueError:
+        return JsonResponse({'error': 'days and points must be integers'}, status=400)
     end_date = timezone.now().date()
     start_date = end_date - timedelta(days=days)
     
-    # Performance over time
+    payload = cached_for_tenant(
+        'brand', campaign.brand_id,
+        f'campaign_analytics:{campaign.id}:{days}:{points}:{end_date.isoformat()}',
+        lambda: build_campaign_analytics(campaign, start_date, end_date, points)
+    )
+    return JsonResponse(payload)
+
+def build_campaign_analytics(campaign, start_date, end_date, max_points=DEFAULT_CHART_POINTS):
+    """Build the campaign_analytics_api payload for a date range"""
+    
+    # Cumulative series computed by the database with window functions
+    running = {'order_by': F('date').asc()}
     daily_performance = CampaignPerformance.objects.filter(
         campaign=campaign,
         date__range=[start_date, end_date]
-    ).order_by('date')
+    ).annotate(
+        cumulative_spend=Window(Sum('total_spend'), **running),
+        cumulative_revenue=Window(Sum('attributed_revenue'), **running),
+    ).order_by('date').values('date', 'cumulative_spend', 'cumulative_revenue', 'attributed_orders')
+    
+    # One point per day, then downsampled to the requested point budget
+    series = fill_daily_gaps(
+        daily_performance, start_date, end_date,
+        cumulative_fields=('cumulative_spend', 'cumulative_revenue'),
+        daily_fields=('attributed_orders',)
+    )
+    roas_series = [
+        float(p['cumulative_revenue']) / float(p['cumulative_spend']) if p['cumulative_spend'] else 0
+        for p in series
+    ]
+    keep = lttb_indices(roas_series, max_points)
     
     performance_chart = {
-        'dates': [],
-        'spend': [],
-        'revenue': [],
-        'roas': [],
-        'orders': []
+        'dates': [series[i]['date'].strftime('%Y-%m-%d') for i in keep],
+        'spend': [float(series[i]['cumulative_spend']) for i in keep],
+        'revenue': [float(series[i]['cumulative_revenue']) for i in keep],
+        'roas': [roas_series[i] for i in keep],
+        # Daily counts, so dropped days are added to the next kept point
+        'orders': bucket_sums([p['attributed_orders'] for p in series], keep)
     }
+    cumulative_roas = roas_series[-1] if roas_series else 0
     
-    cumulative_spend = 0
-    cumulative_revenue = 0
-    
-    for perf in daily_performance:
-        cumulative_spend += float(perf.total_spend)
-        cumulative_revenue += float(perf.attributed_revenue)
-        cumulative_roas = cumulative_revenue / cumulative_spend if cumulative_spend > 0 else 0
-        
-        performance_chart['dates'].append(perf.date.strftime('%Y-%m-%d'))
-        performance_chart['spend'].append(cumulative_spend)
-        performance_chart['revenue'].append(cumulative_revenue)
-        performance_chart['roas'].append(cumulative_roas)
-        performance_chart['orders'].append(perf.attributed_orders)
+    # Trailing 7/14/28-day windows, maintained incrementally in RollingMetric
+    rolling_rows = {}
+    for row in campaign.rolling_metrics.filter(date__range=[start_date, end_date]).values(
+        'window', 'date', 'roas', 'cpa', 'ctr', *ROLLING_SUM_FIELDS
+    ):
+        rolling_rows.setdefault(row['window'], {})[row['date']] = row
+    performance_chart['rolling'] = {
+        window: {
+            metric: [float(rows[series[i]['date']][metric]) if series[i]['date'] in rows else None for i in keep]
+            for metric in ('roas', 'cpa', 'ctr')
+        }
+        for window, rows in sorted(rolling_rows.items())
+    }
+    latest_rolling = rolling_summary(rows[max(rows)] for rows in rolling_rows.values())
     
     # Attribution breakdown
     orders = ShopifyOrder.objects.filter(
@@ -281,27 +343,28 @@ def campaign_analytics_api(request, campaign_id):
         order_created_at__gte=start_date
     )
     
+    rollup = summarize_rollups(campaign.daily_rollups.filter(date__range=[start_date, end_date]))
     attribution_breakdown = {
-        'by_source': list(orders.values('utm_source').annotate(
-            count=Count('id'),
-            revenue=Sum('total_price')
-        ).order_by('-revenue')),
+        'by_source': [
+            {'utm_source': source['utm_source'], 'count': source['order_count'], 'revenue': source['revenue']}
+            for source in rollup['sources']
+        ],
         'by_confidence': {
-            'high': orders.filter(attribution_confidence__gte=80).count(),
-            'medium': orders.filter(attribution_confidence__gte=50, attribution_confidence__lt=80).count(),
-            'low': orders.filter(attribution_confidence__lt=50).count()
+            'high': rollup['high_confidence_orders'],
+            'medium': rollup['medium_confidence_orders'],
+            'low': rollup['low_confidence_orders']
         },
-        'total_orders': orders.count(),
-        'attributed_orders': orders.filter(is_attributed=True).count()
+        'total_orders': rollup['orders'],
+        'attributed_orders': rollup['attributed_orders']
     }
     
-    # Recent order details
-    recent_orders = orders.order_by('-order_created_at')[:20].values(
-        'order_number', 'total_price', 'utm_source', 'utm_campaign',
+    # Recent order details: the first keyset page, orders_api continues from the cursor
+    recent_orders, recent_orders_cursor = keyset_page(orders, ORDER_KEYS, page_size=20, fields=(
+        'order_number', 'total_price', 'currency', 'normalized_total', 'utm_source', 'utm_campaign',
         'is_attributed', 'attribution_confidence', 'order_created_at'
-    )
+    ))
     
-    return JsonResponse({
+    return {
         'campaign': {
             'id': campaign.id,
             'title': campaign.title,
@@ -310,12 +373,21 @@ def campaign_analytics_api(request, campaign_id):
         },
         'performance_chart': performance_chart,
         'attribution_breakdown': attribution_breakdown,
-        'recent_orders': list(recent_orders),
+        'recent_orders': recent_orders,
+        'recent_orders_cursor': recent_orders_cursor,
         'target_roas': float(campaign.target_roas),
-        'current_roas': cumulative_roas if 'cumulative_roas' in locals() else 0
-    })
+        'current_roas': cumulative_roas,
+        'rolling': {
+            window: {
+                'roas': float(values['roas']), 'cpa': float(values['cpa']), 'ctr': float(values['ctr']),
+                'spend': float(values['spend']), 'revenue': float(values['revenue']), 'orders': values['orders'],
+            }
+            for window, values in sorted(latest_rolling.items())
+        }
+    }
 
 @login_required
+@shopify_status_condition
 def shopify_connection_status(request):
     """Check Shopify connection status and provide setup instructions"""
     
@@ -339,77 +411,217 @@ def shopify_connection_status(request):
 from django.contrib.sessions.models import Session
 
 @login_required
+@notifications_condition
 def dashboard_notifications(request):
-    """Get real-time notifications for dashboard"""
+    """Get dashboard notifications newer than the client's cursor.
     
-    notifications = []
+    Without ``after`` the current (unresolved) notifications are returned;
+    with it, every notification and resolved marker written since. Either
+    way the response carries the ``cursor`` to send on the next poll.
+    """
     
-    if request.user.user_type == 'BRAND':
-        brand = get_object_or_404(Brand, user=request.user)
-        
-        # Check for low attribution rates
-        recent_orders = ShopifyOrder.objects.filter(
-            brand=brand,
-            order_created_at__gte=timezone.now() - timedelta(days=7)
+    notifications = notifications_for_user(request.user)
+    if notifications is None:
+        return JsonResponse({'notifications': [], 'cursor': 0})
+    
+    after = request.GET.get('after')
+    if after:
+        try:
+            after = int(after)
+        except ValueError:
+            return JsonResponse({'error': 'after must be an integer'}, status=400)
+        rows = list(notifications.filter(id__gt=after).order_by('id')[:NOTIFICATION_PAGE_SIZE])
+        cursor = rows[-1].id if rows else after
+    else:
+        rows = list(notifications.filter(resolved=False).order_by('id'))
+        cursor = notifications.order_by('-id').values_list('id', flat=True).first() or 0
+    
+    return JsonResponse({
+        'notifications': [n.as_dict() for n in rows],
+        'cursor': cursor,
+    })
+
+@login_required
+def cohort_analytics_api(request):
+    """Acquisition cohorts with monthly retention and LTV.
+    
+    Brands see all of their customers (or one campaign's with ``campaign``),
+    agencies the customers their campaigns acquired across brands.
+    """
+    
+    user = request.user
+    if user.user_type == 'BRAND':
+        brand = get_object_or_404(Brand, user=user)
+        kind, tenant_id = 'brand', brand.id
+        rows = CustomerCohort.objects.filter(brand=brand)
+    elif user.user_type == 'AGENCY':
+        agency = get_object_or_404(Agency, user=user)
+        kind, tenant_id = 'agency', agency.id
+        rows = CustomerCohort.objects.filter(agency=agency)
+    else:
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    
+    campaign_id = request.GET.get('campaign')
+    if campaign_id:
+        try:
+            rows = rows.filter(campaign_id=int(campaign_id))
+        except ValueError:
+            return JsonResponse({'error': 'campaign must be an integer'}, status=400)
+    
+    fields = ('cohort_month', 'customers', 'active_customers', 'orders', 'revenue')
+    cohorts = cached_for_tenant(
+        kind, tenant_id, f'cohorts:{campaign_id or "all"}',
+        lambda: cohort_report(rows.values(*fields))
+    )
+    return JsonResponse({'cohorts': cohorts})
+
+ORDER_LIST_FIELDS = (
+    'id', 'shopify_order_id', 'order_number', 'order_created_at', 'total_price', 'currency', 'normalized_total',
+    'campaign_id', 'agency_id', 'is_attributed', 'attribution_confidence', 'attribution_method',
+    'utm_source', 'utm_medium', 'utm_campaign',
+)
+
+@login_required
+def orders_api(request):
+    """The user's orders, newest first, keyset-paginated.
+    
+    Pass ``cursor`` from the previous response (or ``recent_orders_cursor``
+    from the analytics API) for the next page; every page costs one index
+    seek however deep it is. Optional filters: ``campaign``, ``attributed``.
+    """
+    
+    user = request.user
+    if user.user_type == 'BRAND':
+        orders = ShopifyOrder.objects.filter(brand=get_object_or_404(Brand, user=user))
+    elif user.user_type == 'AGENCY':
+        orders = ShopifyOrder.objects.filter(agency=get_object_or_404(Agency, user=user))
+    else:
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    
+    try:
+        if request.GET.get('campaign'):
+            orders = orders.filter(campaign_id=int(request.GET['campaign']))
+        if request.GET.get('attributed') in ('0', '1'):
+            orders = orders.filter(is_attributed=request.GET['attributed'] == '1')
+        page_size = int(request.GET['page_size']) if request.GET.get('page_size') else None
+        rows, next_cursor = keyset_page(
+            orders, ORDER_KEYS, request.GET.get('cursor'), page_size, fields=ORDER_LIST_FIELDS
         )
-        
-        if recent_orders.exists():
-            attribution_rate = recent_orders.filter(is_attributed=True).count() / recent_orders.count()
-            
-            if attribution_rate < 0.6:  # Less than 60% attribution
-                notifications.append({
-                    'type': 'warning',
-                    'title': 'Low Attribution Rate',
-                    'message': f'Only {attribution_rate*100:.1f}% of recent orders are attributed to campaigns',
-                    'action': 'Review tracking setup',
-                    'url': '/shopify/analytics/'
-                })
-        
-        # Check for campaigns needing payment release
-        ready_for_release = []
-        escrows = EscrowPayment.objects.filter(brand=brand, status='HELD')
-        
-        for escrow in escrows:
-            release_check = escrow.check_release_conditions()
-            if release_check['should_release']:
-                ready_for_release.append(escrow.campaign.title)
-        
-        if ready_for_release:
-            notifications.append({
-                'type': 'success',
-                'title': 'Payments Ready for Release',
-                'message': f'{len(ready_for_release)} campaigns have met performance targets',
-                'action': 'Release payments',
-                'url': '/payments/dashboard/'
-            })
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except ValueError:
+        return JsonResponse({'error': 'campaign and page_size must be integers'}, status=400)
     
-    elif request.user.user_type == 'AGENCY':
-        agency = get_object_or_404(Agency, user=request.user)
-        
-        # Check for new campaign opportunities
-        new_campaigns = Campaign.objects.filter(
-            status='BIDDING',
-            created_at__gte=timezone.now() - timedelta(hours=24),
-            bidding_deadline__gt=timezone.now()
-        ).exclude(bids__agency=agency).count()
-        
-        if new_campaigns > 0:
-            notifications.append({
-                'type': 'info',
-                'title': 'New Opportunities',
-                'message': f'{new_campaigns} new campaigns available for bidding',
-                'action': 'View campaigns',
-                'url': '/marketplace/'
-            })
-        
-        # Check Stripe onboarding
-        if not hasattr(agency, 'stripe_account_id') or not agency.stripe_account_id:
-            notifications.append({
-                'type': 'warning',
-                'title': 'Payment Setup Required',
-                'message': 'Complete Stripe onboarding to receive payments',
-                'action': 'Set up payments',
-                'url': '/payments/onboarding/'
-            })
+    return JsonResponse({'orders': rows, 'next_cursor': next_cursor})
+
+@login_required
+def export_api(request, dataset):
+    """Stream a raw export of orders, journeys, performance or attributions.
+    
+    Query parameters: ``format`` (csv or ndjson), ``gzip=1``, ``since`` and
+    ``until`` (days), and ``after``/``until_id`` to resume an interrupted
+    download from the last id received. The response's X-Export-Until-Id
+    is the highest id the export covers; pass it back when resuming.
+    """
+    
+    user = request.user
+    if user.user_type == 'BRAND':
+        kind, tenant_id = 'brand', get_object_or_404(Brand, user=user).id
+    elif user.user_type == 'AGENCY':
+        kind, tenant_id = 'agency', get_object_or_404(Agency, user=user).id
+    else:
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    
+    export_format = request.GET.get('format', 'csv')
+    try:
+        ids = {name: int(request.GET[name]) if request.GET.get(name) else None for name in ('after', 'until_id')}
+        days = {
+            name: datetime.strptime(request.GET[name], '%Y-%m-%d').date() if request.GET.get(name) else None
+            for name in ('since', 'until')
+        }
+        if export_format not in EXPORT_FORMATS:
+            raise ExportError(f'format must be one of {", ".join(EXPORT_FORMATS)}')
+        rows = export_queryset(dataset, kind, tenant_id, **ids, **days)
+    except ExportError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except ValueError:
+        return JsonResponse({'error': 'after and until_id must be integers, since and until YYYY-MM-DD'}, status=400)
+    
+    # Pin the end of the range so rows arriving mid-download join the next export
+    if ids['until_id'] is None:
+        ids['until_id'] = rows.order_by('-id').values_list('id', flat=True).first() or ids['after'] or 0
+        rows = rows.filter(id__lte=ids['until_id'])
+    
+    chunks = export_chunks(dataset, rows, export_format)
+    content_type = f'{EXPORT_FORMATS[export_format]}; charset=utf-8'
+    filename = f'{dataset}-{ids["after"] or 0}-{ids["until_id"]}.{export_format}'
+    if request.GET.get('gzip') in ('1', 'true'):
+        chunks, content_type = gzip_chunks(chunks), 'application/gzip'
+        filename += '.gz'
+    if isinstance(request, ASGIRequest):
+        chunks = AsyncChunks(chunks)
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['X-Export-Until-Id'] = str(ids['until_id'])
+    return response
+
+# Live dashboard push (Server-Sent Events, served from the ASGI app)
+from asgiref.sync import sync_to_async
+
+def _live_channels(user):
+    """Channels a dashboard user may listen to"""
+    if not user.is_authenticated:
+        return None
+    if user.user_type == 'BRAND':
+        brand = Brand.objects.filter(user=user).values_list('id', flat=True).first()
+        return [channel_for('brand', brand)] if brand else None
+    if user.user_type == 'AGENCY':
+        agency = Agency.objects.filter(user=user).values_list('id', flat=True).first()
+        return [channel_for('agency', agency)] if agency else None
+    return None
+
+async def live_events_stream(request):
+    """Push attributed orders, performance deltas and notifications to a dashboard.
+    
+    Each connection is an idle coroutine waiting on its queue, so one ASGI
+    process can hold thousands of them; clients replace their polling loop
+    with an EventSource and resume from Last-Event-ID after reconnecting.
+    """
+    
+    channels = await sync_to_async(_live_channels)(request.user)
+    if channels is None:
+        return JsonResponse({'error': 'Authentication required'}, status=403)
+    
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    keepalive = getattr(settings, 'LIVE_EVENTS_KEEPALIVE_SECONDS', 15)
+    
+    async def stream():
+        # Subscribe before replaying: an event written in between is then
+        # both replayed and queued (and skipped below) instead of lost
+        queue = live_hub.subscribe(channels)
+        try:
+            yield 'retry: 5000\n\n'
+            replayed_id = 0
+            if last_event_id.isdigit():
+                for event in await sync_to_async(replay_since)(channels, int(last_event_id)):
+                    replayed_id = event.id
+                    yield format_sse(event)
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), keepalive)
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+                if event is None:
+                    # Fell behind and dropped by the hub: the client reconnects
+                    # with Last-Event-ID and replays what it missed
+                    return
+                if event.id > replayed_id:
+                    yield format_sse(event)
+        finally:
+            live_hub.unsubscribe(channels, queue)
     
-    return JsonResponse({'notifications': notifications})
\ No newline at end of file
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
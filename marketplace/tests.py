@@ -1,3 +1,83 @@
 from django.test import TestCase
 
-# Create your tests here.
+from campaigns.models import CampaignBid
+from campaigns.search import rebuild_search_index
+from performance_marketing.testing import QueryBudgetMixin, create_agency, create_brand, create_campaign
+from .views import MarketplaceView
+
+
+class MarketplaceQueryBudgetTests(QueryBudgetMixin, TestCase):
+    
+    @classmethod
+    def setUpTestData(cls):
+        brand = create_brand('marketbrand')
+        cls.agencies = [create_agency(f'marketagency{i}') for i in range(3)]
+        for n in range(15):
+            campaign = create_campaign(brand, n, status='OPEN')
+            for agency in cls.agencies:
+                CampaignBid.objects.create(
+                    campaign=campaign, agency=agency, guaranteed_roas=3, commission_percentage=10,
+                    proposal_text='Proposal', estimated_timeline='4 weeks'
+                )
+    
+    def list_page(self, **params):
+        request = self.make_request(self.agencies[0].user, data=params)
+        response = self.assertQueryBudget('marketplace:list', MarketplaceView.as_view(), request)
+        return response.context_data
+    
+    def test_marketplace_list(self):
+        context = self.list_page()
+        campaigns = list(context['campaigns'])
+        self.assertEqual(len(campaigns), 12)
+        self.assertEqual(context['paginator'].count, 15)
+        self.assertEqual(context['total_campaigns'], 15)
+        self.assertEqual({campaign.bid_count for campaign in campaigns}, {3})
+        
+        context = self.list_page(page=2)
+        self.assertEqual(len(context['campaigns']), 3)
+    
+    def test_marketplace_search(self):
+        context = self.list_page(search='campaign')
+        self.assertEqual(len(context['campaigns']), 12)
+        self.assertEqual(context['paginator'].count, 15)
+        
+        context = self.list_page(search='campaign 7')
+        self.assertEqual([(campaign.title, campaign.bid_count) for campaign in context['campaigns']], [('Campaign 7', 3)])
+
+
+class MarketplaceSearchTests(QueryBudgetMixin, TestCase):
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.agency = create_agency('searchagency')
+        cls.brand = create_brand('nordicroast')
+        other = create_brand('trailgear')
+        cls.coffee = create_campaign(cls.brand, 1, status='OPEN', title='Autumn coffee launch', description='Single origin beans')
+        cls.mention = create_campaign(other, 2, status='OPEN', title='Hiking boots', description='Boots for coffee lovers')
+        cls.closed = create_campaign(cls.brand, 3, status='COMPLETED', title='Coffee subscription')
+    
+    def search(self, text):
+        response = MarketplaceView.as_view()(self.make_request(self.agency.user, data={'search': text}))
+        return list(response.context_data['campaigns'])
+    
+    def test_ranked_prefix_search(self):
+        # Title matches outrank description matches; closed campaigns stay filtered out
+        self.assertEqual(self.search('coff'), [self.coffee, self.mention])
+        self.assertEqual(self.search('coffee single'), [self.coffee])
+        self.assertEqual(self.search('nordic'), [self.coffee])
+        self.assertEqual(self.search('coffee" -beans*'), [self.coffee])
+        self.assertEqual(self.search('!!'), [])
+    
+    def test_index_follows_changes(self):
+        self.mention.title = 'Espresso gear'
+        self.mention.save()
+        self.assertEqual(self.search('espresso'), [self.mention])
+        
+        self.brand.user.company_name = 'Copenhagen Roasters'
+        self.brand.user.save()
+        self.assertEqual(self.search('roasters'), [self.coffee])
+        self.assertEqual(self.search('nordic'), [])
+        
+        self.coffee.delete()
+        self.assertEqual(self.search('autumn'), [])
+        self.assertEqual(rebuild_search_index(), 2)
@@ -4,8 +4,10 @@ from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import ListView, DetailView
 from django.utils import timezone
-from django.db.models import Q, Count, Avg
+from django.db.models import Count, Avg, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 from campaigns.models import Campaign, CampaignBid
+from campaigns.search import search_campaigns
 from accounts.models import Agency
 
 class MarketplaceView(LoginRequiredMixin, ListView):
@@ -15,21 +17,22 @@ class MarketplaceView(LoginRequiredMixin, ListView):
     paginate_by = 12
     
     def get_queryset(self):
+        bid_counts = CampaignBid.objects.filter(campaign=OuterRef('pk')).order_by().values('campaign').annotate(
+            count=Count('id')
+        ).values('count')
         queryset = Campaign.objects.filter(
             status__in=['OPEN', 'PUBLISHED'],
             bidding_deadline__gt=timezone.now()
         ).annotate(
-            bid_count=Count('bids')
+            # A correlated subquery rather than a join: no GROUP BY over every
+            # column when counting and sorting the matches
+            bid_count=Coalesce(Subquery(bid_counts), Value(0))
         ).order_by('-is_featured', '-created_at')
         
-        # Search functionality
+        # Search functionality (FTS5 index, best matches first)
         search = self.request.GET.get('search')
         if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) |
-                Q(description__icontains=search) |
-                Q(brand__user__company_name__icontains=search)
-            )
+            queryset = search_campaigns(queryset, search).order_by('search_rank', '-is_featured', '-created_at')
         
         # Platform filter
         platform = self.request.GET.get('platform')
@@ -76,6 +79,8 @@ class MarketplaceView(LoginRequiredMixin, ListView):
         # Add marketplace stats
         context['total_campaigns'] = Campaign.objects.filter(status='OPEN').count()
         context['total_agencies'] = Agency.objects.count()
+        # Scores are precomputed from campaign outcomes (campaigns.scoring), so ranking is an index scan
+        context['top_agencies'] = Agency.objects.select_related('user').order_by('-competitiveness_score', 'id')[:5]
         context['avg_competitiveness'] = CampaignBid.objects.aggregate(
             avg_score=Avg('competitiveness_score')
         )['avg_score'] or 0
@@ -95,6 +100,9 @@ class CampaignDetailView(LoginRequiredMixin, DetailView):
         bids = CampaignBid.objects.filter(campaign=campaign)
         context['bid_count'] = bids.count()
         
+        # Bids ranked by the bidding agency's outcome-based score
+        context['ranked_bids'] = bids.select_related('agency__user').order_by('-agency__competitiveness_score', 'created_at')
+        
         if bids.exists():
             context['best_roas'] = bids.filter(guaranteed_roas__isnull=False).order_by('-guaranteed_roas').first()
             context['best_cpa'] = bids.filter(guaranteed_cpa__isnull=False).order_by('guaranteed_cpa').first()
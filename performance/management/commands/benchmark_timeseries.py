@@ -0,0 +1,107 @@
+# performance/management/commands/benchmark_timeseries.py
+
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from accounts.models import Brand, CustomUser
+from campaigns.models import Campaign, PerformanceMetric
+from performance.timeseries import FIELDS, PerformanceTimeSeriesCache
+
+
+class Command(BaseCommand):
+    help = 'Compare date-range sums from the in-memory time series with the ORM (data is rolled back)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--campaigns', type=int, default=1000)
+        parser.add_argument('--days', type=int, default=730)
+        parser.add_argument('--queries', type=int, default=500, help='Random (campaign set, range) lookups to time')
+        parser.add_argument('--set-size', type=int, default=10, help='Campaigns per lookup')
+        parser.add_argument('--seed', type=int, default=42)
+    
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options)
+            transaction.set_rollback(True)
+    
+    def run(self, options):
+        rng = random.Random(options['seed'])
+        today = timezone.localdate()
+        first_day = today - timedelta(days=options['days'] - 1)
+        
+        self.stdout.write(f"Creating {options['campaigns']} campaigns x {options['days']} days...")
+        user = CustomUser.objects.create(username='timeseries_benchmark', user_type='BRAND')
+        brand = Brand.objects.create(user=user, industry='Benchmark', company_size='1', annual_ad_spend=0)
+        campaigns = Campaign.objects.bulk_create([
+            Campaign(
+                brand=brand, title=f'Benchmark {n}', description='', budget_min=0, budget_max=0, target_roas=1,
+                campaign_start=first_day, campaign_end=today, bidding_deadline=timezone.now(),
+                utm_campaign=f'timeseries_benchmark_{n}'
+            )
+            for n in range(options['campaigns'])
+        ])
+        campaign_ids = [c.id for c in campaigns]
+        
+        started = time.perf_counter()
+        batch = []
+        for campaign_id in campaign_ids:
+            for offset in range(options['days']):
+                impressions = rng.randint(500, 5000)
+                clicks = impressions * rng.randint(5, 40) // 1000
+                spend = rng.randint(1000, 50000) / 100
+                batch.append(PerformanceMetric(
+                    campaign_id=campaign_id, platform='META', date=first_day + timedelta(days=offset),
+                    impressions=impressions, clicks=clicks, conversions=clicks // 10,
+                    spend=spend, revenue=round(spend * rng.uniform(0.5, 5), 2)
+                ))
+            if len(batch) >= 20000:
+                PerformanceMetric.objects.bulk_create(batch)
+                batch = []
+        PerformanceMetric.objects.bulk_create(batch)
+        self.stdout.write(f'  loaded in {time.perf_counter() - started:.1f}s')
+        
+        lookups = []
+        for _ in range(options['queries']):
+            start = first_day + timedelta(days=rng.randrange(options['days']))
+            end = min(today, start + timedelta(days=rng.choice([7, 14, 28, 90, 365])))
+            lookups.append((rng.sample(campaign_ids, options['set_size']), start, end))
+        
+        started = time.perf_counter()
+        orm_results = [
+            PerformanceMetric.objects.filter(campaign_id__in=ids, date__range=[start, end]).aggregate(
+                **{field: Sum(field) for field in FIELDS}
+            )
+            for ids, start, end in lookups
+        ]
+        orm_seconds = time.perf_counter() - started
+        
+        cache = PerformanceTimeSeriesCache()
+        started = time.perf_counter()
+        cache.get_many(campaign_ids)
+        warm_seconds = time.perf_counter() - started
+        
+        started = time.perf_counter()
+        cache_results = [cache.range_sums(ids, start, end) for ids, start, end in lookups]
+        cache_seconds = time.perf_counter() - started
+        
+        # SQLite sums decimals as floats, so compare to the cent
+        mismatches = sum(
+            1 for orm, cached in zip(orm_results, cache_results)
+            if any(round(Decimal(orm[field] or 0), 2) != cached[field] for field in FIELDS)
+        )
+        
+        n = len(lookups)
+        self.stdout.write(f'ORM:         {orm_seconds * 1000 / n:8.3f} ms/lookup')
+        self.stdout.write(f'Time series: {cache_seconds * 1000 / n:8.3f} ms/lookup '
+                          f'(warm-up {warm_seconds:.1f}s, {cache.nbytes / 1024 / 1024:.1f} MiB)')
+        self.stdout.write(f'Speed-up:    {orm_seconds / cache_seconds:8.1f}x')
+        if mismatches:
+            self.stdout.write(self.style.ERROR(f'{mismatches} lookups differ from the ORM'))
+        else:
+            self.stdout.write(self.style.SUCCESS('All lookups match the ORM'))
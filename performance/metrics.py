@@ -0,0 +1,84 @@
+# performance/metrics.py - Totals and weighted ratios over PerformanceMetric
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Sum
+
+from campaigns.cache import cached_for_tenant
+from campaigns.models import PerformanceMetric
+from .timeseries import performance_series
+
+TOTAL_FIELDS = ('impressions', 'clicks', 'conversions', 'spend', 'revenue')
+
+
+def weighted_ratios(totals):
+    """Ratios of the summed counts, so every day and platform weighs by its volume"""
+    impressions, clicks = totals['impressions'], totals['clicks']
+    conversions, spend, revenue = totals['conversions'], totals['spend'], totals['revenue']
+    return {
+        'roas': revenue / spend if spend else Decimal('0'),
+        'cpa': spend / conversions if conversions else Decimal('0'),
+        'ctr': Decimal(clicks * 100) / impressions if impressions else Decimal('0'),
+        'cpm': spend * 1000 / impressions if impressions else Decimal('0'),
+        'conversion_rate': Decimal(conversions * 100) / clicks if clicks else Decimal('0'),
+    }
+
+
+def metric_totals(campaigns, start_date=None, end_date=None):
+    """Totals and weighted ratios for a set of campaigns in one query.
+
+    ``campaigns`` may be a Campaign queryset or a list of ids; the date
+    range is inclusive and open-ended when omitted. With the in-memory time
+    series enabled the sums come from array slices instead of SQL.
+    """
+
+    if getattr(settings, 'PERFORMANCE_TIMESERIES_ENABLED', True):
+        if not isinstance(campaigns, (list, tuple, set)):
+            campaigns = list(campaigns.values_list('id', flat=True))
+        totals = performance_series.range_sums(campaigns, start_date, end_date)
+        totals.update(weighted_ratios(totals))
+        return totals
+
+    metrics = PerformanceMetric.objects.filter(campaign__in=campaigns)
+    if start_date:
+        metrics = metrics.filter(date__gte=start_date)
+    if end_date:
+        metrics = metrics.filter(date__lte=end_date)
+
+    row = metrics.aggregate(**{field: Sum(field) for field in TOTAL_FIELDS})
+    totals = {field: row[field] or 0 for field in TOTAL_FIELDS}
+    totals.update(weighted_ratios(totals))
+    return totals
+
+
+def cached_metric_totals(kind, tenant_id, campaigns, start_date=None, end_date=None, name='all'):
+    """metric_totals for a tenant's dashboard.
+
+    With the time series enabled the sums come straight from this process's
+    series, which check their campaigns' data versions on every read. Without
+    it the SQL totals are cached until the tenant's data version moves;
+    ``name`` must then identify the campaign set within the tenant (e.g. a
+    campaign id), the dates are added to the key here.
+    """
+
+    if getattr(settings, 'PERFORMANCE_TIMESERIES_ENABLED', True):
+        return metric_totals(campaigns, start_date, end_date)
+    return cached_for_tenant(
+        kind, tenant_id, f'metric_totals:{name}:{start_date}:{end_date}',
+        lambda: metric_totals(campaigns, start_date, end_date)
+    )
+
+
+def legacy_context(totals):
+    """Totals under the context names the performance templates use"""
+    return {
+        'total_impressions': totals['impressions'],
+        'total_clicks': totals['clicks'],
+        'total_conversions': totals['conversions'],
+        'total_spend': totals['spend'],
+        'total_revenue': totals['revenue'],
+        'avg_roas': totals['roas'],
+        'avg_cpa': totals['cpa'],
+        'avg_ctr': totals['ctr'],
+    }
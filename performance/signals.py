@@ -0,0 +1,15 @@
+# performance/signals.py - Outdate the in-process metric time series on writes
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from campaigns.cache import bump_data_version
+from campaigns.models import PerformanceMetric
+
+
+@receiver([post_save, post_delete], sender=PerformanceMetric)
+def metric_changed(sender, instance, **kwargs):
+    # After commit, so a process reloading on the new version reads the write
+    campaign_id = instance.campaign_id
+    transaction.on_commit(lambda: bump_data_version('campaign', campaign_id))
@@ -1,3 +1,156 @@
+from datetime import timedelta
+from decimal import Decimal
+
 from django.test import TestCase
+from django.utils import timezone
+
+from campaigns.cache import bump_data_version
+from campaigns.models import PerformanceMetric
+from performance_marketing.testing import QueryBudgetMixin, create_agency, create_brand, create_campaign
+from .metrics import cached_metric_totals, metric_totals
+from .timeseries import PerformanceTimeSeriesCache, performance_series
+from .views import PerformanceDashboardView
+
+
+class PerformanceDashboardQueryBudgetTests(QueryBudgetMixin, TestCase):
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = create_brand('perfbrand')
+        cls.agency = create_agency('perfagency')
+        today = timezone.localdate()
+        for n in range(5):
+            campaign = create_campaign(cls.brand, n, agency=cls.agency)
+            for days_ago in range(10):
+                PerformanceMetric.objects.create(
+                    campaign=campaign, platform='META', date=today - timedelta(days=days_ago),
+                    impressions=1000, clicks=20, conversions=2, spend=100, revenue=300
+                )
+    
+    def setUp(self):
+        performance_series.invalidate()
+    
+    def assertDashboardTotals(self, response):
+        context = response.context_data
+        self.assertEqual(
+            (context['total_impressions'], context['total_clicks'], context['total_conversions']), (50000, 1000, 100)
+        )
+        self.assertEqual((context['total_spend'], context['total_revenue']), (Decimal('5000'), Decimal('15000')))
+        self.assertEqual((context['avg_roas'], context['avg_cpa'], context['avg_ctr']), (Decimal('3'), Decimal('50'), Decimal('2')))
+    
+    def test_brand_dashboard(self):
+        request = self.make_request(self.brand.user)
+        response = self.assertQueryBudget('performance:dashboard', PerformanceDashboardView.as_view(), request)
+        self.assertDashboardTotals(response)
+        self.assertEqual(len(response.context_data['campaigns']), 5)
+    
+    def test_agency_dashboard(self):
+        request = self.make_request(self.agency.user)
+        response = self.assertQueryBudget('performance:dashboard', PerformanceDashboardView.as_view(), request)
+        self.assertDashboardTotals(response)
+        self.assertEqual(response.context_data['agency'], self.agency)
+        self.assertEqual(len(response.context_data['won_campaigns']), 5)
+
+
+class MetricTotalsTests(TestCase):
+    
+    def setUp(self):
+        # Rolled-back test data must not linger in the per-process series
+        performance_series.invalidate()
+    
+    def test_ratios_are_weighted_by_volume(self):
+        campaign = create_campaign(create_brand('ratiobrand'), 1)
+        today = timezone.localdate()
+        # Per-row ROAS of 10 and 1 would average to 5.5; the weighted ROAS is 1100 / 1000
+        PerformanceMetric.objects.create(
+            campaign=campaign, platform='META', date=today, impressions=100, clicks=10,
+            conversions=1, spend=10, revenue=100, roas=10
+        )
+        PerformanceMetric.objects.create(
+            campaign=campaign, platform='GOOGLE', date=today, impressions=900, clicks=10,
+            conversions=9, spend=990, revenue=1000, roas=Decimal('1.01')
+        )
+        
+        with self.assertNumQueries(1):
+            totals = metric_totals([campaign.id], today, today)
+        
+        self.assertEqual(totals['roas'], Decimal('1.1'))
+        self.assertEqual(totals['cpa'], Decimal('100'))
+        self.assertEqual(totals['ctr'], Decimal('2'))
+
 
-# Create your tests here.
+class PerformanceTimeSeriesTests(TestCase):
+    """The per-process series load in one query, follow writes and stay within their byte budget"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = create_brand('seriesbrand')
+        cls.today = timezone.localdate()
+        cls.campaigns = [create_campaign(cls.brand, n) for n in range(3)]
+        for campaign in cls.campaigns:
+            for days_ago in range(5):
+                for platform in ('META', 'GOOGLE'):
+                    PerformanceMetric.objects.create(
+                        campaign=campaign, platform=platform, date=cls.today - timedelta(days=days_ago),
+                        impressions=100, clicks=5, conversions=1, spend=Decimal('10.25'), revenue=30
+                    )
+    
+    def setUp(self):
+        self.series = PerformanceTimeSeriesCache()
+        performance_series.invalidate()
+        self.addCleanup(performance_series.invalidate)
+        self.ids = [campaign.id for campaign in self.campaigns]
+    
+    def test_load_and_range_sums(self):
+        with self.assertNumQueries(1):
+            totals = self.series.range_sums(self.ids, self.today - timedelta(days=1), self.today)
+        self.assertEqual(totals, {'impressions': 1200, 'clicks': 60, 'conversions': 12, 'spend': Decimal('123'), 'revenue': Decimal('360')})
+        with self.assertNumQueries(0):
+            daily = self.series.daily(self.ids[:1], self.today - timedelta(days=6), self.today)
+        self.assertEqual(daily['spend'], [0.0, 0.0, 20.5, 20.5, 20.5, 20.5, 20.5])
+        self.assertEqual(daily['clicks'], [0, 0, 10, 10, 10, 10, 10])
+    
+    def test_writes_reload_only_the_changed_campaign(self):
+        campaign = self.campaigns[0]
+        performance_series.get_many(self.ids)
+        with self.captureOnCommitCallbacks(execute=True):
+            PerformanceMetric.objects.filter(campaign=campaign, date=self.today, platform='META').get().delete()
+            PerformanceMetric.objects.create(
+                campaign=campaign, platform='META', date=self.today + timedelta(days=40), impressions=7, spend=1
+            )
+        with self.assertNumQueries(1):
+            totals = performance_series.range_sums(self.ids, self.today, self.today)
+        self.assertEqual(totals['impressions'], 500)
+        with self.assertNumQueries(0):
+            future = performance_series.range_sums([campaign.id], self.today + timedelta(days=1))
+        self.assertEqual((future['impressions'], future['spend']), (7, Decimal('1')))
+    
+    def test_least_recently_used_series_are_evicted(self):
+        one_series = PerformanceTimeSeriesCache()
+        one_series.get_many(self.ids[:1])
+        with self.settings(PERFORMANCE_TIMESERIES_BYTES=2 * one_series.nbytes):
+            self.series.get_many(self.ids[:2])
+            # Touch the first, so the second is the least recently used
+            self.series.get_many(self.ids[:1])
+            self.series.get_many(self.ids[2:])
+            self.assertEqual(list(self.series.series), [self.ids[0], self.ids[2]])
+            self.assertEqual(self.series.nbytes, 2 * one_series.nbytes)
+            with self.assertNumQueries(1):
+                self.series.get_many(self.ids[1:2])
+    
+    def test_dashboard_totals_follow_other_processes_writes(self):
+        performance_series.get_many(self.ids)
+        # A write this process did not see: another worker's signal bumps the versions
+        PerformanceMetric.objects.filter(campaign_id__in=self.ids).update(spend=1)
+        for campaign_id in self.ids:
+            bump_data_version('campaign', campaign_id)
+        totals = cached_metric_totals('brand', self.brand.id, self.ids, self.today - timedelta(days=1), self.today)
+        self.assertEqual(totals['spend'], Decimal('12'))
+    
+    def test_totals_are_cached_per_tenant_without_the_series(self):
+        with self.settings(PERFORMANCE_TIMESERIES_ENABLED=False):
+            totals = cached_metric_totals('brand', self.brand.id, self.ids, name='series-off')
+            with self.assertNumQueries(0):
+                self.assertEqual(cached_metric_totals('brand', self.brand.id, self.ids, name='series-off'), totals)
+        self.assertEqual(totals['spend'], Decimal('307.5'))
+        self.assertFalse(performance_series.series)
@@ -0,0 +1,192 @@
+# performance/timeseries.py - In-memory columnar cache of PerformanceMetric
+#
+# Each campaign's metrics are held as one int64 NumPy array of shape
+# (len(FIELDS), days): column i is day origin + i, summed over platforms,
+# money in cents so sums stay exact. Range sums are a slice and a sum, so
+# the performance views answer date-range totals without SQL.
+#
+# Series load lazily (one query for all missing campaigns of a request)
+# and are evicted least-recently-used once the arrays exceed
+# PERFORMANCE_TIMESERIES_BYTES. A PerformanceMetric write bumps the
+# campaign's data version on commit (performance.signals); every read
+# checks the versions of its campaigns in one cache round trip and reloads
+# the ones that moved, so writes from any process are seen on the next
+# read. PERFORMANCE_TIMESERIES_TTL bounds how long a series outlives writes
+# that bypass signals.
+
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Sum
+
+from campaigns.cache import get_data_versions
+from campaigns.models import PerformanceMetric
+
+FIELDS = ('impressions', 'clicks', 'conversions', 'spend', 'revenue')
+MONEY_FIELDS = ('spend', 'revenue')
+FIELD_INDEX = {field: i for i, field in enumerate(FIELDS)}
+
+def _to_cell(field, value):
+    if field in MONEY_FIELDS:
+        return int((Decimal(value or 0) * 100).to_integral_value())
+    return int(value or 0)
+
+
+def _from_cell(field, value):
+    if field in MONEY_FIELDS:
+        return Decimal(int(value)) / 100
+    return int(value)
+
+
+class CampaignSeries:
+    """Daily metric columns of one campaign"""
+
+    __slots__ = ('origin', 'data', 'loaded_at', 'version')
+
+    def __init__(self, origin, data):
+        self.origin = origin
+        self.data = data
+        self.loaded_at = time.monotonic()
+        self.version = None
+
+    @classmethod
+    def from_rows(cls, rows):
+        """rows: (date, impressions, clicks, conversions, spend, revenue), one per platform and day"""
+        if not rows:
+            return cls(None, np.zeros((len(FIELDS), 0), dtype=np.int64))
+        origin = min(row[0] for row in rows)
+        days = (max(row[0] for row in rows) - origin).days + 1
+        data = np.zeros((len(FIELDS), days), dtype=np.int64)
+        offsets = np.fromiter(((row[0] - origin).days for row in rows), dtype=np.int64, count=len(rows))
+        for i, field in enumerate(FIELDS):
+            values = np.fromiter((_to_cell(field, row[i + 1]) for row in rows), dtype=np.int64, count=len(rows))
+            np.add.at(data[i], offsets, values)
+        return cls(origin, data)
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes
+
+    def _span(self, start_date, end_date):
+        """Array slice bounds for an inclusive date range (clipped to the data)"""
+        if self.origin is None:
+            return 0, 0
+        days = self.data.shape[1]
+        lo = 0 if start_date is None else min(max((start_date - self.origin).days, 0), days)
+        hi = days if end_date is None else min(max((end_date - self.origin).days + 1, 0), days)
+        return lo, max(lo, hi)
+
+    def sums(self, start_date=None, end_date=None):
+        lo, hi = self._span(start_date, end_date)
+        return self.data[:, lo:hi].sum(axis=1)
+
+    def window(self, start_date, end_date):
+        """Columns for every day of [start_date, end_date], zero where there is no data"""
+        days = (end_date - start_date).days + 1
+        out = np.zeros((len(FIELDS), days), dtype=np.int64)
+        if self.origin is None:
+            return out
+        lo, hi = self._span(start_date, end_date)
+        if hi > lo:
+            dest = (self.origin - start_date).days + lo
+            out[:, dest:dest + hi - lo] = self.data[:, lo:hi]
+        return out
+
+
+class PerformanceTimeSeriesCache:
+    """LRU of CampaignSeries bounded by total array bytes"""
+
+    def __init__(self):
+        self.series = OrderedDict()  # campaign_id -> CampaignSeries
+        self.nbytes = 0
+        self.lock = threading.RLock()
+
+    @property
+    def budget(self):
+        return getattr(settings, 'PERFORMANCE_TIMESERIES_BYTES', 64 * 1024 * 1024)
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'PERFORMANCE_TIMESERIES_TTL', 300)
+
+    def _store(self, campaign_id, series):
+        old = self.series.pop(campaign_id, None)
+        if old is not None:
+            self.nbytes -= old.nbytes
+        self.series[campaign_id] = series
+        self.nbytes += series.nbytes
+        # Evict least recently used, but never the series just stored
+        while self.nbytes > self.budget and len(self.series) > 1:
+            _, evicted = self.series.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+
+    def _load(self, campaign_ids):
+        rows = {campaign_id: [] for campaign_id in campaign_ids}
+        for row in PerformanceMetric.objects.filter(campaign_id__in=campaign_ids).values_list(
+            'campaign_id', 'date', *FIELDS
+        ).order_by():
+            rows[row[0]].append(row[1:])
+        return {campaign_id: CampaignSeries.from_rows(r) for campaign_id, r in rows.items()}
+
+    def get_many(self, campaign_ids):
+        """{campaign_id: CampaignSeries}, loading every missing or outdated one in a single query"""
+        now = time.monotonic()
+        # Read before loading: a write committed meanwhile moves the version again
+        versions = get_data_versions('campaign', campaign_ids)
+        found, missing = {}, []
+        with self.lock:
+            for campaign_id in campaign_ids:
+                series = self.series.get(campaign_id)
+                if series is None or series.version != versions[campaign_id] or now - series.loaded_at > self.ttl:
+                    missing.append(campaign_id)
+                else:
+                    self.series.move_to_end(campaign_id)
+                    found[campaign_id] = series
+
+        if missing:
+            loaded = self._load(missing)
+            with self.lock:
+                for campaign_id, series in loaded.items():
+                    series.version = versions[campaign_id]
+                    self._store(campaign_id, series)
+            found.update(loaded)
+        return found
+
+    def invalidate(self, campaign_id=None):
+        with self.lock:
+            if campaign_id is None:
+                self.series.clear()
+                self.nbytes = 0
+            else:
+                series = self.series.pop(campaign_id, None)
+                if series is not None:
+                    self.nbytes -= series.nbytes
+
+    def range_sums(self, campaign_ids, start_date=None, end_date=None):
+        """{field: total} over campaigns and an inclusive date range"""
+        totals = np.zeros(len(FIELDS), dtype=np.int64)
+        for series in self.get_many(campaign_ids).values():
+            totals += series.sums(start_date, end_date)
+        return {field: _from_cell(field, totals[i]) for i, field in enumerate(FIELDS)}
+
+    def daily(self, campaign_ids, start_date, end_date):
+        """{field: list per day} summed over campaigns, for charts"""
+        out = np.zeros((len(FIELDS), (end_date - start_date).days + 1), dtype=np.int64)
+        for series in self.get_many(campaign_ids).values():
+            out += series.window(start_date, end_date)
+        return {
+            field: (out[i] / 100).tolist() if field in MONEY_FIELDS else out[i].tolist()
+            for i, field in enumerate(FIELDS)
+        }
+
+    def daily_means(self, campaign_ids, start_date, end_date):
+        """{field: mean per day} over an inclusive date range"""
+        days = (end_date - start_date).days + 1
+        return {field: value / days for field, value in self.range_sums(campaign_ids, start_date, end_date).items()}
+
+
+performance_series = PerformanceTimeSeriesCache()
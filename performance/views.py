@@ -2,11 +2,14 @@
 
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.exceptions import PermissionDenied
 from django.views.generic import TemplateView
 from django.utils import timezone
-from django.db.models import Avg, Sum, Count
 from campaigns.models import Campaign, PerformanceMetric
+from campaigns.cache import cached_for_tenant
+from campaigns.rolling import latest_rolling
 from accounts.models import Brand, Agency
+from .metrics import cached_metric_totals, legacy_context
 
 class PerformanceDashboardView(LoginRequiredMixin, TemplateView):
     template_name = 'performance/dashboard.html'
@@ -17,68 +20,29 @@ class PerformanceDashboardView(LoginRequiredMixin, TemplateView):
         
         if user.user_type == 'BRAND':
             brand = get_object_or_404(Brand, user=user)
+            kind, tenant_id = 'brand', brand.id
             campaigns = Campaign.objects.filter(brand=brand)
-            
-            # Get performance metrics for the last 30 days
-            end_date = timezone.now().date()
-            start_date = end_date - timezone.timedelta(days=30)
-            
-            metrics = PerformanceMetric.objects.filter(
-                campaign__in=campaigns,
-                date__range=[start_date, end_date]
-            )
-            
-            # Calculate aggregated metrics
-            if metrics.exists():
-                context['total_impressions'] = metrics.aggregate(Sum('impressions'))['impressions__sum']
-                context['total_clicks'] = metrics.aggregate(Sum('clicks'))['clicks__sum']
-                context['total_conversions'] = metrics.aggregate(Sum('conversions'))['conversions__sum']
-                context['total_spend'] = metrics.aggregate(Sum('spend'))['spend__sum']
-                context['total_revenue'] = metrics.aggregate(Sum('revenue'))['revenue__sum']
-                context['avg_roas'] = metrics.aggregate(Avg('roas'))['roas__avg']
-                context['avg_cpa'] = metrics.aggregate(Avg('cpa'))['cpa__avg']
-                context['avg_ctr'] = metrics.aggregate(Avg('ctr'))['ctr__avg']
-            else:
-                context.update({
-                    'total_impressions': 0, 'total_clicks': 0, 'total_conversions': 0,
-                    'total_spend': 0, 'total_revenue': 0, 'avg_roas': 0,
-                    'avg_cpa': 0, 'avg_ctr': 0
-                })
-            
             context['campaigns'] = campaigns[:10]
-            
         elif user.user_type == 'AGENCY':
             agency = get_object_or_404(Agency, user=user)
-            won_campaigns = Campaign.objects.filter(selected_agency=agency)
-            
-            # Get performance metrics for agency's campaigns
-            end_date = timezone.now().date()
-            start_date = end_date - timezone.timedelta(days=30)
-            
-            metrics = PerformanceMetric.objects.filter(
-                campaign__in=won_campaigns,
-                date__range=[start_date, end_date]
-            )
-            
-            if metrics.exists():
-                context['total_impressions'] = metrics.aggregate(Sum('impressions'))['impressions__sum']
-                context['total_clicks'] = metrics.aggregate(Sum('clicks'))['clicks__sum']
-                context['total_conversions'] = metrics.aggregate(Sum('conversions'))['conversions__sum']
-                context['total_spend'] = metrics.aggregate(Sum('spend'))['spend__sum']
-                context['total_revenue'] = metrics.aggregate(Sum('revenue'))['revenue__sum']
-                context['avg_roas'] = metrics.aggregate(Avg('roas'))['roas__avg']
-                context['avg_cpa'] = metrics.aggregate(Avg('cpa'))['cpa__avg']
-                context['avg_ctr'] = metrics.aggregate(Avg('ctr'))['ctr__avg']
-            else:
-                context.update({
-                    'total_impressions': 0, 'total_clicks': 0, 'total_conversions': 0,
-                    'total_spend': 0, 'total_revenue': 0, 'avg_roas': 0,
-                    'avg_cpa': 0, 'avg_ctr': 0
-                })
-            
-            context['won_campaigns'] = won_campaigns[:10]
+            kind, tenant_id = 'agency', agency.id
+            campaigns = Campaign.objects.filter(selected_agency=agency)
+            context['won_campaigns'] = campaigns[:10]
             context['agency'] = agency
+        else:
+            return context
         
+        # Performance metrics for the last 30 days (in-memory series, or the tenant cache without them)
+        end_date = timezone.now().date()
+        start_date = end_date - timezone.timedelta(days=30)
+        totals = cached_metric_totals(kind, tenant_id, campaigns, start_date, end_date)
+        
+        context.update(legacy_context(totals))
+        context['metric_totals'] = totals
+        # Trailing 7/14/28-day ROAS, CPA and CTR across the tenant's campaigns
+        context['rolling_metrics'] = cached_for_tenant(
+            kind, tenant_id, f'rolling:all:{end_date}', lambda: latest_rolling(campaigns, end_date)
+        )
         return context
 
 class CampaignPerformanceView(LoginRequiredMixin, TemplateView):
@@ -87,17 +51,15 @@ class CampaignPerformanceView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         campaign_id = kwargs['campaign_id']
-        campaign = get_object_or_404(Campaign, pk=campaign_id)
+        campaign = get_object_or_404(Campaign.objects.select_related('brand', 'selected_agency'), pk=campaign_id)
         
         # Check permissions
         user = self.request.user
         if user.user_type == 'BRAND':
-            brand = get_object_or_404(Brand, user=user)
-            if campaign.brand != brand:
+            if campaign.brand.user_id != user.id:
                 raise PermissionDenied("You don't have permission to view this campaign")
         elif user.user_type == 'AGENCY':
-            agency = get_object_or_404(Agency, user=user)
-            if campaign.selected_agency != agency:
+            if not campaign.selected_agency or campaign.selected_agency.user_id != user.id:
                 raise PermissionDenied("You don't have permission to view this campaign")
         
         # Get performance metrics
@@ -106,15 +68,13 @@ class CampaignPerformanceView(LoginRequiredMixin, TemplateView):
         context['campaign'] = campaign
         context['metrics'] = metrics[:30]  # Last 30 days
         
-        # Calculate totals
-        if metrics.exists():
-            context['total_impressions'] = metrics.aggregate(Sum('impressions'))['impressions__sum']
-            context['total_clicks'] = metrics.aggregate(Sum('clicks'))['clicks__sum']
-            context['total_conversions'] = metrics.aggregate(Sum('conversions'))['conversions__sum']
-            context['total_spend'] = metrics.aggregate(Sum('spend'))['spend__sum']
-            context['total_revenue'] = metrics.aggregate(Sum('revenue'))['revenue__sum']
-            context['avg_roas'] = metrics.aggregate(Avg('roas'))['roas__avg']
-            context['avg_cpa'] = metrics.aggregate(Avg('cpa'))['cpa__avg']
-            context['avg_ctr'] = metrics.aggregate(Avg('ctr'))['ctr__avg']
+        # Lifetime totals (in-memory series, or cached with the brand's data without them)
+        totals = cached_metric_totals('brand', campaign.brand_id, [campaign.id], name=f'campaign:{campaign.id}')
+        context.update(legacy_context(totals))
+        context['metric_totals'] = totals
+        today = timezone.localdate()
+        context['rolling_metrics'] = cached_for_tenant(
+            'brand', campaign.brand_id, f'rolling:campaign:{campaign.id}:{today}', lambda: latest_rolling([campaign.id], today)
+        )
         
-        return context
\ No newline at end of file
+        return context
@@ -3,6 +3,36 @@ ASGI config for performance_marketing project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+ASGI deployment profile
+-----------------------
+The tracking pixel beacons (``/api/journey/``) are served by an ``async def``
+view that only parses the payload and puts it on an in-process queue; a
+single writer task per process batches the inserts. Run the project under an
+ASGI server so that a process can keep thousands of keepalive beacon
+connections open without a thread per connection::
+
+    JOURNEY_INGEST_QUEUE_ENABLED=True \\
+    gunicorn performance_marketing.asgi:application \\
+        -c python:performance_marketing.gunicorn_asgi
+
+or, for a single process::
+
+    JOURNEY_INGEST_QUEUE_ENABLED=True \\
+    uvicorn performance_marketing.asgi:application --host 0.0.0.0 --port 8000
+
+Queue size, batch size and flush interval are read from the
+``JOURNEY_INGEST_*`` settings. Leave ``JOURNEY_INGEST_QUEUE_ENABLED`` off
+under WSGI or ``runserver``: they have no long-lived event loop, so the view
+writes each event inline instead. On lifespan shutdown (or, failing that,
+at interpreter exit) the queued events are written before the process
+stops.
+
+The live dashboard stream (``/campaigns/api/live/``, Server-Sent Events) is
+also an ``async def`` view: each open dashboard is an idle coroutine, and
+one tail task per process reads new ``LiveEvent`` rows every
+``LIVE_EVENTS_POLL_INTERVAL`` seconds and fans them out. Under WSGI every
+open stream would hold a worker thread, so only serve it from ASGI.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
@@ -13,4 +43,24 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'performance_marketing.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+
+async def application(scope, receive, send):
+    """Django's ASGI handler plus the lifespan protocol.
+
+    Django only serves HTTP, so lifespan messages are answered here; on
+    shutdown the journey events still queued are written before the worker
+    exits.
+    """
+    if scope['type'] != 'lifespan':
+        return await django_application(scope, receive, send)
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            from attribution.ingestion import journey_queue
+            await journey_queue.aclose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
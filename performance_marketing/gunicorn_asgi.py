@@ -0,0 +1,19 @@
+# performance_marketing/gunicorn_asgi.py - Gunicorn profile for the ASGI app
+#
+#   gunicorn performance_marketing.asgi:application -c python:performance_marketing.gunicorn_asgi
+#
+# Each worker runs one uvicorn event loop with its own journey ingestion
+# queue and writer task, so concurrency comes from open connections rather
+# than threads. Keep the worker count near the CPU count.
+
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count()))
+worker_class = 'uvicorn.workers.UvicornWorker'
+
+# Beacons are sent with `keepalive: true`; hold idle connections open
+keepalive = 75
+timeout = 30
+graceful_timeout = 30
@@ -0,0 +1,205 @@
+# performance_marketing/instrumentation.py - Per-view query budgets and Prometheus metrics
+#
+# QueryBudgetMiddleware wraps every database call of a request (through
+# connection.execute_wrapper, so it also works with DEBUG off) and records
+# the query count, DB time, total time and response size per URL name into
+# in-process histograms. metrics_view renders them in the Prometheus text
+# format. Histograms are per process: scrape every worker, or sum in PromQL.
+
+import hmac
+import logging
+import threading
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger(__name__)
+
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+UNRESOLVED_VIEW = '<unresolved>'
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by view name"""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = {}  # view -> [bucket counts..., +Inf count, sum]
+        self.lock = threading.Lock()
+
+    def observe(self, view, value):
+        with self.lock:
+            series = self.series.get(view)
+            if series is None:
+                series = self.series[view] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        with self.lock:
+            snapshot = {view: list(series) for view, series in self.series.items()}
+
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for view, series in sorted(snapshot.items()):
+            label = _label(view)
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{view="{label}",le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{view="{label}",le="+Inf"}} {series[-2]}')
+            lines.append(f'{self.name}_sum{{view="{label}"}} {series[-1]:g}')
+            lines.append(f'{self.name}_count{{view="{label}"}} {series[-2]}')
+        return lines
+
+
+class Counter:
+    """Monotonic counter keyed by view name"""
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, view):
+        with self.lock:
+            self.values[view] = self.values.get(view, 0) + 1
+
+    def render(self):
+        with self.lock:
+            snapshot = dict(self.values)
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        for view, value in sorted(snapshot.items()):
+            lines.append(f'{self.name}{{view="{_label(view)}"}} {value}')
+        return lines
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+view_queries = Histogram('django_view_queries', 'Database queries per request', QUERY_BUCKETS)
+view_db_seconds = Histogram('django_view_db_seconds', 'Time spent in database queries per request', SECONDS_BUCKETS)
+view_seconds = Histogram('django_view_seconds', 'Total request handling time', SECONDS_BUCKETS)
+view_response_bytes = Histogram('django_view_response_bytes', 'Response body size (non-streaming responses)', BYTES_BUCKETS)
+view_budget_exceeded = Counter('django_view_query_budget_exceeded_total', 'Requests that ran more queries than QUERY_BUDGETS allows')
+
+METRICS = (view_queries, view_db_seconds, view_seconds, view_response_bytes, view_budget_exceeded)
+
+
+def query_budget(view_name):
+    """Maximum queries allowed for a URL name (None when it has no budget)"""
+    return getattr(settings, 'QUERY_BUDGETS', {}).get(view_name)
+
+
+class QueryRecorder:
+    """execute_wrapper that counts queries and accumulates their duration"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+class QueryBudgetMiddleware:
+    """Record per-view query count, DB time, total time and response size"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Under ASGI the chain stays async, so async views (the live event
+        # stream) are not run through async_to_sync for this middleware
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with self._wrap_connections(recorder):
+            response = self.get_response(request)
+        self._observe(request, response, recorder, started)
+        return response
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        # Connections are per thread: wrap them in the thread that
+        # sync_to_async runs this request's queries in
+        stack = await sync_to_async(self._wrap_connections)(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        self._observe(request, response, recorder, started)
+        return response
+
+    def _wrap_connections(self, recorder):
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(recorder))
+        return stack
+
+    def _observe(self, request, response, recorder, started):
+        elapsed = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        # Only resolved URL names become labels, so 404 scans can't blow up cardinality
+        view = match.view_name if match is not None else UNRESOLVED_VIEW
+
+        view_queries.observe(view, recorder.count)
+        view_db_seconds.observe(view, recorder.seconds)
+        view_seconds.observe(view, elapsed)
+        if not response.streaming:
+            view_response_bytes.observe(view, len(response.content))
+
+        budget = query_budget(view)
+        if budget is not None and recorder.count > budget:
+            view_budget_exceeded.inc(view)
+            logger.warning('%s ran %d queries (budget %d)', view, recorder.count, budget)
+
+
+def _client_ip(request):
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def metrics_view(request):
+    """Prometheus text exposition of the in-process view metrics.
+
+    Touches no database and only reads snapshots of the histograms. Access
+    needs either the METRICS_TOKEN bearer token or a REMOTE_ADDR listed in
+    METRICS_ALLOWED_IPS.
+    """
+
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    authorization = request.headers.get('Authorization', '')
+    allowed = (
+        bool(token) and hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode())
+    ) or _client_ip(request) in getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1', '::1'])
+    if not allowed:
+        return HttpResponseForbidden('Forbidden')
+
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -31,9 +31,12 @@ INSTALLED_APPS = [
     'marketplace',
     'performance',
     'payments',
+    'attribution',
+    'shopify_integration',
 ]
 
 MIDDLEWARE = [
+    'performance_marketing.instrumentation.QueryBudgetMiddleware',  # First, so it sees every query
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -62,6 +65,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'performance_marketing.wsgi.application'
+ASGI_APPLICATION = 'performance_marketing.asgi.application'
 
 # Database
 DATABASES = {
@@ -71,6 +75,29 @@ DATABASES = {
     }
 }
 
+# Cache (dashboard/analytics payloads and per-tenant data versions).
+# Redis is shared by all workers so a version bump is seen everywhere;
+# without REDIS_URL (local development) fall back to a per-process cache.
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'pm',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'performance-marketing',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv('DASHBOARD_CACHE_TIMEOUT', 300))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -125,4 +152,144 @@ SITE_URL = os.getenv('SITE_URL', 'https://yourdomain.com')
 
 # Stripe for payments
 STRIPE_PUBLISHABLE_KEY = os.getenv('STRIPE_PUBLISHABLE_KEY')
-STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY')
\ No newline at end of file
+STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY')
+
+# Journey ingestion (see performance_marketing/asgi.py for the ASGI profile)
+JOURNEY_INGEST_QUEUE_ENABLED = os.getenv('JOURNEY_INGEST_QUEUE_ENABLED', 'False') == 'True'
+JOURNEY_INGEST_QUEUE_SIZE = int(os.getenv('JOURNEY_INGEST_QUEUE_SIZE', 10000))
+JOURNEY_INGEST_BATCH_SIZE = int(os.getenv('JOURNEY_INGEST_BATCH_SIZE', 500))
+JOURNEY_INGEST_FLUSH_INTERVAL = float(os.getenv('JOURNEY_INGEST_FLUSH_INTERVAL', 0.5))
+
+# Journey de-duplication: rotating Bloom filter in front of the tracking APIs.
+# ERROR_RATE is the false-positive budget (share of unique non-conversion
+# events that may be dropped); CAPACITY is the expected events per window.
+JOURNEY_DEDUPE_ENABLED = os.getenv('JOURNEY_DEDUPE_ENABLED', 'True') == 'True'
+JOURNEY_DEDUPE_CAPACITY = int(os.getenv('JOURNEY_DEDUPE_CAPACITY', 1000000))
+JOURNEY_DEDUPE_ERROR_RATE = float(os.getenv('JOURNEY_DEDUPE_ERROR_RATE', 0.001))
+JOURNEY_DEDUPE_WINDOW_SECONDS = int(os.getenv('JOURNEY_DEDUPE_WINDOW_SECONDS', 3600))
+JOURNEY_DEDUPE_COARSE_SECONDS = int(os.getenv('JOURNEY_DEDUPE_COARSE_SECONDS', 10))
+JOURNEY_DEDUPE_EXACT_CACHE_SIZE = int(os.getenv('JOURNEY_DEDUPE_EXACT_CACHE_SIZE', 50000))
+
+# Live dashboard events (SSE). Each ASGI process tails the LiveEvent log once
+# per poll interval and fans events out to its connected dashboards.
+LIVE_EVENTS_POLL_INTERVAL = float(os.getenv('LIVE_EVENTS_POLL_INTERVAL', 1.0))
+LIVE_EVENTS_KEEPALIVE_SECONDS = int(os.getenv('LIVE_EVENTS_KEEPALIVE_SECONDS', 15))
+LIVE_EVENTS_QUEUE_SIZE = int(os.getenv('LIVE_EVENTS_QUEUE_SIZE', 100))
+LIVE_EVENTS_RETENTION_SECONDS = int(os.getenv('LIVE_EVENTS_RETENTION_SECONDS', 3600))
+# How long the tail keeps re-reading ids it skipped, for transactions that commit late
+LIVE_EVENTS_LOOKBACK_SECONDS = int(os.getenv('LIVE_EVENTS_LOOKBACK_SECONDS', 10))
+
+# Per-view instrumentation (performance_marketing/instrumentation.py). Budgets
+# are the maximum queries per request by URL name; the middleware counts
+# requests over budget and the view tests assert them.
+QUERY_BUDGETS = {
+    'campaigns:enhanced_dashboard': 12,
+    'campaigns_dashboard:enhanced_dashboard': 12,
+    'marketplace:list': 6,
+    'performance:dashboard': 6,
+    # The first attributed order of a campaign day, with the rolling windows
+    # and notifications its commit refreshes; cohorts are left to update_cohorts
+    'shopify_integration:order_webhook': 43,
+    'campaigns:orders': 2,
+    'campaigns_dashboard:orders': 2,
+    'journey_events': 2,
+}
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+
+# Order amounts are normalized to the brand's currency at ingest from the local
+# FxRate table (load_fx_rates), kept in memory for this many seconds per process
+FX_RATE_CACHE_SECONDS = int(os.getenv('FX_RATE_CACHE_SECONDS', 3600))
+
+# In-memory columnar PerformanceMetric cache (performance/timeseries.py)
+PERFORMANCE_TIMESERIES_ENABLED = os.getenv('PERFORMANCE_TIMESERIES_ENABLED', 'True') == 'True'
+PERFORMANCE_TIMESERIES_BYTES = int(os.getenv('PERFORMANCE_TIMESERIES_BYTES', 64 * 1024 * 1024))
+PERFORMANCE_TIMESERIES_TTL = int(os.getenv('PERFORMANCE_TIMESERIES_TTL', 300))
+
+# Ad-platform spend imports (campaigns/spend_import.py) write this many
+# (campaign, date) rows per transaction
+SPEND_IMPORT_BATCH_SIZE = int(os.getenv('SPEND_IMPORT_BATCH_SIZE', 1000))
+
+# Ad platform spend connectors (campaigns/connectors.py, manage.py sync_spend).
+# A platform without credentials is skipped; `manage.py ad_platform_stub`
+# serves a local stand-in for all three APIs.
+AD_PLATFORM_CONNECTORS = {
+    'META': {
+        'base_url': os.getenv('META_ADS_API_URL', 'https://graph.facebook.com'),
+        'version': os.getenv('META_ADS_API_VERSION', 'v19.0'),
+        'access_token': os.getenv('META_ADS_ACCESS_TOKEN', ''),
+        'account_id': os.getenv('META_ADS_ACCOUNT_ID', ''),
+        'requests_per_second': float(os.getenv('META_ADS_REQUESTS_PER_SECOND', 4)),
+    },
+    'GOOGLE': {
+        'base_url': os.getenv('GOOGLE_ADS_API_URL', 'https://googleads.googleapis.com'),
+        'version': os.getenv('GOOGLE_ADS_API_VERSION', 'v16'),
+        'access_token': os.getenv('GOOGLE_ADS_ACCESS_TOKEN', ''),
+        'developer_token': os.getenv('GOOGLE_ADS_DEVELOPER_TOKEN', ''),
+        'customer_id': os.getenv('GOOGLE_ADS_CUSTOMER_ID', ''),
+        'login_customer_id': os.getenv('GOOGLE_ADS_LOGIN_CUSTOMER_ID', ''),
+        'requests_per_second': float(os.getenv('GOOGLE_ADS_REQUESTS_PER_SECOND', 10)),
+    },
+    'TIKTOK': {
+        'base_url': os.getenv('TIKTOK_ADS_API_URL', 'https://business-api.tiktok.com'),
+        'version': os.getenv('TIKTOK_ADS_API_VERSION', 'v1.3'),
+        'access_token': os.getenv('TIKTOK_ADS_ACCESS_TOKEN', ''),
+        'advertiser_id': os.getenv('TIKTOK_ADS_ADVERTISER_ID', ''),
+        'requests_per_second': float(os.getenv('TIKTOK_ADS_REQUESTS_PER_SECOND', 10)),
+    },
+}
+SPEND_SYNC_WORKERS = int(os.getenv('SPEND_SYNC_WORKERS', 8))
+SPEND_SYNC_LOOKBACK_DAYS = int(os.getenv('SPEND_SYNC_LOOKBACK_DAYS', 3))
+SPEND_SYNC_WINDOW_DAYS = int(os.getenv('SPEND_SYNC_WINDOW_DAYS', 30))
+SPEND_SYNC_MAX_RETRIES = int(os.getenv('SPEND_SYNC_MAX_RETRIES', 3))
+SPEND_SYNC_TIMEOUT = int(os.getenv('SPEND_SYNC_TIMEOUT', 30))
+
+# Rolling-window KPIs per campaign and day (campaigns/rolling.py)
+ROLLING_WINDOWS = tuple(int(days) for days in os.getenv('ROLLING_WINDOWS', '7,14,28').split(','))
+
+# Campaign anomaly detection (campaigns/anomalies.py): EWMA smoothing per
+# bucket, buckets needed before alerting, and the alert distance in sigmas
+ANOMALY_EWMA_ALPHA = {
+    'hour': float(os.getenv('ANOMALY_EWMA_ALPHA_HOURLY', 0.05)),
+    'day': float(os.getenv('ANOMALY_EWMA_ALPHA_DAILY', 0.15)),
+}
+ANOMALY_WARMUP_BUCKETS = {
+    'hour': int(os.getenv('ANOMALY_WARMUP_HOURS', 72)),
+    'day': int(os.getenv('ANOMALY_WARMUP_DAYS', 14)),
+}
+ANOMALY_THRESHOLD_SIGMA = float(os.getenv('ANOMALY_THRESHOLD_SIGMA', 3.0))
+ANOMALY_DAILY_GRACE_HOURS = int(os.getenv('ANOMALY_DAILY_GRACE_HOURS', 6))
+ANOMALY_SEED_DAYS = int(os.getenv('ANOMALY_SEED_DAYS', 28))
+
+# Budget pacing forecasts (campaigns/pacing.py): days of trend fitted, width
+# of the confidence band in standard deviations, and the budget tolerance
+PACING_TREND_DAYS = int(os.getenv('PACING_TREND_DAYS', 14))
+PACING_CONFIDENCE_Z = float(os.getenv('PACING_CONFIDENCE_Z', 1.96))
+PACING_TOLERANCE = float(os.getenv('PACING_TOLERANCE', 0.05))
+PACING_CACHE_TIMEOUT = int(os.getenv('PACING_CACHE_TIMEOUT', 3600))
+
+# Customer cohorts (campaigns/cohorts.py), kept current by a worker running
+# `manage.py update_cohorts --interval 60`: orders read per chunk, and how
+# many customers a refresh recomputes before it rebuilds the brand instead
+COHORT_CHUNK_SIZE = int(os.getenv('COHORT_CHUNK_SIZE', 20000))
+COHORT_INCREMENTAL_MAX_CUSTOMERS = int(os.getenv('COHORT_INCREMENTAL_MAX_CUSTOMERS', 5000))
+
+# Streaming exports (campaigns/exports.py): rows fetched and written per chunk
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 2000))
+
+# Keyset-paginated listings (campaigns/pagination.py)
+KEYSET_PAGE_SIZE = int(os.getenv('KEYSET_PAGE_SIZE', 50))
+KEYSET_MAX_PAGE_SIZE = int(os.getenv('KEYSET_MAX_PAGE_SIZE', 500))
+
+# Agency scoring from campaign outcomes (campaigns/scoring.py): attainment
+# (achieved / guaranteed ROAS) earning five stars, the attainment cap, the
+# blend of the competitiveness score, and how many campaigns it takes for an
+# agency's own record to outweigh the neutral prior of 50
+AGENCY_RATING_FULL_ATTAINMENT = float(os.getenv('AGENCY_RATING_FULL_ATTAINMENT', 1.25))
+AGENCY_SCORE_ATTAINMENT_CAP = float(os.getenv('AGENCY_SCORE_ATTAINMENT_CAP', 1.5))
+AGENCY_SCORE_WEIGHTS = {'success': 0.5, 'attainment': 0.3, 'release': 0.2}
+AGENCY_SCORE_PRIOR_CAMPAIGNS = int(os.getenv('AGENCY_SCORE_PRIOR_CAMPAIGNS', 3))
+
+# Marketplace full-text search (campaigns/search.py): bm25 weight per
+# indexed column; a match in the title or brand name outranks the description
+MARKETPLACE_SEARCH_WEIGHTS = {'title': 10.0, 'description': 1.0, 'company_name': 5.0}
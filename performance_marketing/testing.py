@@ -0,0 +1,81 @@
+# performance_marketing/testing.py - Query budget assertions for view tests
+
+from django.conf import settings
+from django.db import connection
+from django.db.models.query import QuerySet
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """TestCase mixin asserting that a view stays within its QUERY_BUDGETS entry.
+
+    The budgets in settings are the same ones QueryBudgetMiddleware reports
+    against in production, so a view that starts issuing one query per row
+    fails CI before it shows up on the metrics endpoint. Tests should create
+    several rows of everything the view lists, otherwise an N+1 stays hidden.
+    """
+
+    request_factory = RequestFactory()
+
+    def make_request(self, user=None, method='get', path='/', **kwargs):
+        request = getattr(self.request_factory, method)(path, **kwargs)
+        if user is not None:
+            request.user = user
+        return request
+
+    def assertQueryBudget(self, view_name, view, request, *args, **kwargs):
+        """Call view(request) and fail if it runs more queries than its budget.
+
+        Templates are not rendered, but querysets in a TemplateResponse's
+        context are evaluated so lazy querysets count against the budget.
+        on_commit callbacks run (and count) too: outside a test transaction
+        the view's writes autocommit and run them within the request.
+        """
+
+        budget = settings.QUERY_BUDGETS[view_name]
+
+        with CaptureQueriesContext(connection) as captured:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = view(request, *args, **kwargs)
+            for value in (getattr(response, 'context_data', None) or {}).values():
+                if isinstance(value, QuerySet):
+                    list(value)
+
+        queries = captured.captured_queries
+        if len(queries) > budget:
+            self.fail('%s ran %d queries, budget is %d:\n%s' % (
+                view_name, len(queries), budget,
+                '\n'.join(f'{i}. {q["sql"]}' for i, q in enumerate(queries, start=1))
+            ))
+        return response
+
+
+def create_brand(username, **fields):
+    from accounts.models import Brand, CustomUser
+    user = CustomUser.objects.create_user(username=username, password='x', user_type='BRAND', company_name=username.title())
+    return Brand.objects.create(
+        user=user, industry='Retail', company_size='10-50', annual_ad_spend=100000,
+        shopify_domain=f'{username}.myshopify.com', **fields
+    )
+
+
+def create_agency(username, **fields):
+    from accounts.models import Agency, CustomUser
+    user = CustomUser.objects.create_user(username=username, password='x', user_type='AGENCY', company_name=username.title())
+    return Agency.objects.create(user=user, team_size=5, years_experience=3, **fields)
+
+
+def create_campaign(brand, n, agency=None, status='ACTIVE', **fields):
+    from datetime import timedelta
+    from django.utils import timezone
+    from campaigns.models import Campaign
+    today = timezone.localdate()
+    values = dict(
+        title=f'Campaign {n}', description='Test campaign', platforms=['META'],
+        budget_min=1000, budget_max=5000, target_roas=3,
+        campaign_start=today - timedelta(days=30), campaign_end=today + timedelta(days=30),
+        bidding_deadline=timezone.now() + timedelta(days=7), utm_campaign=f'{brand.user.username}_{n}',
+    )
+    values.update(fields)
+    return Campaign.objects.create(brand=brand, status=status, selected_agency=agency, **values)
@@ -4,6 +4,8 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from django.views.generic import TemplateView
+from attribution.views import journey_events_api, journey_ingest_api
+from performance_marketing.instrumentation import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -13,7 +15,11 @@ urlpatterns = [
     path('marketplace/', include('marketplace.urls')),
     path('performance/', include('performance.urls')),
     path('payments/', include('payments.urls')),
+    path('shopify/', include('shopify_integration.urls')),  # OAuth, order webhooks, spend imports
     path('dashboard/', include('campaigns.urls', namespace='campaigns_dashboard')),  # Dashboard views are in campaigns
+    path('api/journey/', journey_ingest_api, name='journey_ingest'),  # Tracking pixel beacons (async)
+    path('api/journey/events/', journey_events_api, name='journey_events'),
+    path('metrics', metrics_view, name='metrics'),  # Prometheus scrape target
 ]
 
 if settings.DEBUG:
@@ -1,3 +1,307 @@
-from django.test import TestCase
+import base64
+import hashlib
+import hmac
+import io
+import json
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from campaigns.cache import get_data_version
+from campaigns.fx import fx_rates
+from campaigns.models import AgencyDailyRollup, BrandDailyRollup, CampaignPerformance, FxRate, ShopifyOrder
+from campaigns.rollups import apply_order, rebuild_rollups
+from performance_marketing.testing import QueryBudgetMixin, create_agency, create_brand, create_campaign
+from .views import shopify_order_webhook, spend_import_upload, verify_shopify_webhook
+
+
+class OrderWebhookQueryBudgetTests(QueryBudgetMixin, TestCase):
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = create_brand('hookbrand')
+        agency = create_agency('hookagency')
+        cls.campaign = create_campaign(cls.brand, 1, agency=agency)
+    
+    def post_order(self, order_id, email, attributed=True):
+        # The fields of an orders/create payload the webhook reads, as Shopify sends them
+        body = json.dumps({
+            'id': order_id,
+            'order_number': order_id,
+            'email': email,
+            'total_price': '250.00',
+            'currency': 'DKK',
+            'created_at': timezone.now().isoformat(),
+            'landing_site_ref': f'/?utm_source=facebook&utm_campaign={self.campaign.utm_campaign}' if attributed else '/',
+            'referring_site': 'https://www.facebook.com/' if attributed else '',
+            'source_name': 'web',
+            'customer': {'id': order_id + 5000, 'email': email},
+            'line_items': [{'id': order_id * 10, 'title': 'Coffee beans', 'quantity': 2, 'price': '125.00'}],
+        })
+        return self.make_request(
+            method='post', path='/shopify/webhooks/orders/', data=body, content_type='application/json',
+            HTTP_X_SHOPIFY_SHOP_DOMAIN=self.brand.shopify_domain,
+        )
+    
+    # Signature checks are not what is being measured here
+    @mock.patch('shopify_integration.views.verify_shopify_webhook', return_value=True)
+    def test_attributed_order(self, verify):
+        # The first order also creates the day's rollup and performance rows;
+        # on_commit work (rolling windows, notifications) counts as well
+        self.assertQueryBudget('shopify_integration:order_webhook', shopify_order_webhook, self.post_order(1001, 'anna@example.com'))
+        response = self.assertQueryBudget('shopify_integration:order_webhook', shopify_order_webhook, self.post_order(1002, 'ben@example.com'))
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ShopifyOrder.objects.filter(campaign=self.campaign).count(), 2)
+        self.assertEqual(ShopifyOrder.objects.get(shopify_order_id=1002).customer_email, 'ben@example.com')
+    
+    @mock.patch('shopify_integration.views.verify_shopify_webhook', return_value=True)
+    def test_unattributed_order(self, verify):
+        response = self.assertQueryBudget(
+            'shopify_integration:order_webhook', shopify_order_webhook, self.post_order(1003, 'anna@example.com', attributed=False)
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        order = ShopifyOrder.objects.get(shopify_order_id=1003)
+        self.assertFalse(order.is_attributed)
+        self.assertFalse(order.in_cohorts)
+
+
+@override_settings(SHOPIFY_WEBHOOK_SECRET='hush')
+class WebhookSignatureTests(TestCase):
+    
+    def signed_request(self, body, secret='hush'):
+        # Shopify signs the raw body and sends the base64-encoded HMAC
+        signature = base64.b64encode(hmac.new(secret.encode('utf-8'), body, hashlib.sha256).digest()).decode()
+        return RequestFactory().post(
+            '/shopify/webhooks/orders/', data=body, content_type='application/json',
+            HTTP_X_SHOPIFY_HMAC_SHA256=signature,
+        )
+    
+    def test_accepts_the_base64_signature(self):
+        self.assertTrue(verify_shopify_webhook(self.signed_request(b'{"id": 1}')))
+    
+    def test_rejects_a_wrong_secret_or_missing_header(self):
+        self.assertFalse(verify_shopify_webhook(self.signed_request(b'{"id": 1}', secret='other')))
+        self.assertFalse(verify_shopify_webhook(RequestFactory().post('/shopify/webhooks/orders/', data=b'{}', content_type='application/json')))
+
+
+class RollupMaintenanceTests(TestCase):
+    """Rollups folded in by the webhook and spend entry match a full rebuild"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = create_brand('rollupbrand')
+        cls.agency = create_agency('rollupagency')
+        cls.campaign = create_campaign(cls.brand, 1, agency=cls.agency)
+        cls.unassigned = create_campaign(cls.brand, 2)
+    
+    def setUp(self):
+        self.client.force_login(self.brand.user)
+    
+    @mock.patch('shopify_integration.views.verify_shopify_webhook', return_value=True)
+    def post_order(self, order_id, campaign, total, verify):
+        return self.client.post('/shopify/webhooks/orders/', json.dumps({
+            'id': order_id,
+            'order_number': order_id,
+            'total_price': total,
+            'currency': 'DKK',
+            'created_at': timezone.now().isoformat(),
+            'landing_site_ref': f'/?utm_source=google&utm_campaign={campaign.utm_campaign}' if campaign else '/',
+        }), content_type='application/json', HTTP_X_SHOPIFY_SHOP_DOMAIN=self.brand.shopify_domain)
+    
+    def enter_spend(self, campaign, **spend):
+        url = reverse('shopify_integration:manual_spend', args=[campaign.id])
+        return self.client.post(url, {'date': timezone.localdate().isoformat(), **spend})
+    
+    def snapshot(self):
+        fields = ['date', 'orders', 'attributed_orders', 'revenue', 'attributed_revenue', 'spend', 'source_counts']
+        return (
+            list(BrandDailyRollup.objects.order_by('brand', 'date').values('brand', *fields)),
+            list(AgencyDailyRollup.objects.order_by('agency', 'campaign', 'date').values('agency', 'campaign', *fields)),
+        )
+    
+    def test_incremental_rollups_match_rebuild(self):
+        self.post_order(2001, self.campaign, '100.00')
+        self.post_order(2002, self.campaign, '50.50')
+        self.post_order(2003, None, '30.00')
+        self.assertEqual(self.enter_spend(self.campaign, meta_spend='40', google_spend='10').status_code, 200)
+        # Corrected the same day: only the difference is applied
+        self.assertEqual(self.enter_spend(self.campaign, meta_spend='25').status_code, 200)
+        self.enter_spend(self.unassigned, meta_spend='12.5')
+        self.enter_spend(self.unassigned, meta_spend='20')
+        
+        incremental = self.snapshot()
+        brand_day = incremental[0][0]
+        self.assertEqual((brand_day['orders'], brand_day['attributed_orders']), (3, 2))
+        self.assertEqual(brand_day['revenue'], Decimal('180.50'))
+        self.assertEqual(brand_day['attributed_revenue'], Decimal('150.50'))
+        self.assertEqual(brand_day['spend'], Decimal('45.00'))
+        self.assertEqual(brand_day['source_counts'], {'google': {'orders': 2, 'revenue': '150.50'}})
+        # One row for the campaign without an agency, however often its spend changes
+        self.assertEqual(AgencyDailyRollup.objects.filter(campaign=self.unassigned).get().spend, Decimal('20.00'))
+        
+        rebuild_rollups()
+        self.assertEqual(self.snapshot(), incremental)
+    
+    def test_dashboards_are_invalidated_after_the_rollups_change(self):
+        seen = []
+        
+        def read_between_save_and_rollup(order):
+            # A dashboard read landing after the order row is saved
+            seen.append(get_data_version('brand', self.brand.id))
+            apply_order(order)
+        
+        with mock.patch('shopify_integration.views.apply_order', side_effect=read_between_save_and_rollup):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.post_order(2004, None, '30.00')
+        
+        self.assertEqual(BrandDailyRollup.objects.get(brand=self.brand).orders, 1)
+        self.assertNotEqual(get_data_version('brand', self.brand.id), seen[0])
+    
+    def test_rejects_invalid_spend(self):
+        for spend in ({'meta_spend': 'NaN'}, {'google_spend': 'Infinity'}, {'tiktok_spend': '-5'},
+                      {'meta_spend': '9999999999', 'google_spend': '1'}, {'meta_spend': 'lots'}):
+            with self.subTest(spend=spend):
+                self.assertEqual(self.enter_spend(self.campaign, **spend).status_code, 400)
+        self.assertFalse(CampaignPerformance.objects.exists())
+        self.assertFalse(BrandDailyRollup.objects.exists())
+
+
+class SpendImportTests(QueryBudgetMixin, TestCase):
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = create_brand('importbrand')
+        cls.agency = create_agency('importagency')
+        cls.campaigns = [create_campaign(cls.brand, n, agency=cls.agency) for n in range(2)]
+        other = create_brand('otherbrand')
+        cls.foreign = create_campaign(other, 9)
+    
+    def upload(self, platform, content):
+        request = self.make_request(
+            self.agency.user, method='post', path='/shopify/spend/import/',
+            data={'platform': platform, 'file': SimpleUploadedFile('report.csv', content.encode('utf-8'))},
+        )
+        return json.loads(spend_import_upload(request).content)
+    
+    def test_meta_and_google_reports(self):
+        first, second = (c.utm_campaign for c in self.campaigns)
+        meta = (
+            'Campaign name,Day,Amount spent (DKK),Impressions\n'
+            f'{first},2026-03-01,100.50,1000\n'
+            f'{first},2026-03-01,49.50,400\n'  # ad-set breakdown: summed
+            f'{second},2026-03-01,"1,200.00",9000\n'
+            f'{self.foreign.utm_campaign},2026-03-01,10,1\n'
+            'Unknown,2026-03-01,10,1\n'
+            'Total,,1360.00,10401\n'
+        )
+        result = self.upload('meta', meta)
+        self.assertEqual((result['imported'], result['days'], result['invalid']), (3, 2, 1))
+        self.assertEqual(result['unmatched'], {self.foreign.utm_campaign: 1, 'Unknown': 1})
+        
+        # Google Ads puts a title and the date range above the header
+        google = f'Campaign report\n"March 1, 2026 - March 1, 2026"\nCampaign\tDay\tCost\n{first}\t2026-03-01\t50.00\n'
+        self.upload('google', google)
+        # Importing the same report again replaces instead of adding
+        self.upload('meta', meta)
+        
+        performance = CampaignPerformance.objects.get(campaign=self.campaigns[0], date='2026-03-01')
+        self.assertEqual(performance.meta_spend, Decimal('150.00'))
+        self.assertEqual(performance.google_spend, Decimal('50.00'))
+        self.assertEqual(performance.total_spend, Decimal('200.00'))
+        self.assertEqual(performance.spend_data_source, 'AGENCY_REPORT')
+        
+        self.assertEqual(BrandDailyRollup.objects.get(brand=self.brand, date='2026-03-01').spend, Decimal('1400.00'))
+        self.assertEqual(
+            AgencyDailyRollup.objects.get(agency=self.agency, campaign=self.campaigns[0], date='2026-03-01').spend,
+            Decimal('200.00')
+        )
+        self.assertFalse(CampaignPerformance.objects.filter(campaign=self.foreign).exists())
+    
+    def test_unknown_header(self):
+        request = self.make_request(
+            self.agency.user, method='post', path='/shopify/spend/import/',
+            data={'platform': 'tiktok', 'file': SimpleUploadedFile('report.csv', b'a,b,c\n1,2,3\n')},
+        )
+        self.assertEqual(spend_import_upload(request).status_code, 400)
+    
+    def test_upload_through_url(self):
+        self.client.force_login(self.agency.user)
+        report = f'Campaign name,Day,Amount spent (DKK)\n{self.campaigns[0].utm_campaign},2026-03-02,75.00\n'
+        response = self.client.post(reverse('shopify_integration:spend_import'), {
+            'platform': 'meta', 'file': SimpleUploadedFile('report.csv', report.encode('utf-8')),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['imported'], 1)
+        self.assertEqual(CampaignPerformance.objects.get(campaign=self.campaigns[0], date='2026-03-02').meta_spend, Decimal('75.00'))
+
+
+class FxNormalizationTests(TestCase):
+    """Orders ingested before their currency has a rate get their revenue once it has"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = create_brand('fxbrand')
+        cls.agency = create_agency('fxagency')
+        cls.campaign = create_campaign(cls.brand, 1, agency=cls.agency)
+    
+    def setUp(self):
+        fx_rates.invalidate()
+        self.addCleanup(fx_rates.invalidate)
+    
+    @mock.patch('shopify_integration.views.verify_shopify_webhook', return_value=True)
+    def post_order(self, order_id, total, currency, verify):
+        return self.client.post('/shopify/webhooks/orders/', json.dumps({
+            'id': order_id,
+            'order_number': order_id,
+            'total_price': total,
+            'currency': currency,
+            'created_at': timezone.now().isoformat(),
+            'landing_site_ref': f'/?utm_source=google&utm_campaign={self.campaign.utm_campaign}',
+        }), content_type='application/json', HTTP_X_SHOPIFY_SHOP_DOMAIN=self.brand.shopify_domain)
+    
+    def test_converted_at_ingest(self):
+        FxRate.objects.bulk_create([
+            FxRate(date=timezone.localdate(), currency='DKK', rate=Decimal('7.46')),
+            FxRate(date=timezone.localdate(), currency='SEK', rate=Decimal('11.50')),
+        ])
+        self.post_order(3001, '100.00', 'SEK')
+        self.assertEqual(ShopifyOrder.objects.get(shopify_order_id=3001).normalized_total, Decimal('64.87'))
+        self.assertEqual(CampaignPerformance.objects.get(campaign=self.campaign).attributed_revenue, Decimal('64.87'))
+    
+    def test_backfill_books_revenue_held_back_for_a_missing_rate(self):
+        with self.assertLogs('shopify_integration.views', 'WARNING'):
+            self.post_order(3002, '100.00', 'SEK')
+        self.post_order(3003, '20.00', 'DKK')
+        order = ShopifyOrder.objects.get(shopify_order_id=3002)
+        self.assertIsNone(order.normalized_total)
+        performance = CampaignPerformance.objects.get(campaign=self.campaign)
+        self.assertEqual((performance.attributed_orders, performance.attributed_revenue), (2, Decimal('20.00')))
+        
+        FxRate.objects.bulk_create([
+            FxRate(date=timezone.localdate(), currency='DKK', rate=Decimal('7.46')),
+            FxRate(date=timezone.localdate(), currency='SEK', rate=Decimal('11.50')),
+        ])
+        fx_rates.invalidate()
+        versions = get_data_version('brand', self.brand.id), get_data_version('agency', self.agency.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('backfill_normalized_totals', stdout=io.StringIO())
+        
+        order.refresh_from_db()
+        self.assertEqual(order.normalized_total, Decimal('64.87'))
+        performance.refresh_from_db()
+        self.assertEqual(performance.attributed_revenue, Decimal('84.87'))
+        brand_day = BrandDailyRollup.objects.get(brand=self.brand)
+        self.assertEqual((brand_day.revenue, brand_day.attributed_revenue), (Decimal('84.87'), Decimal('84.87')))
+        self.assertNotEqual((get_data_version('brand', self.brand.id), get_data_version('agency', self.agency.id)), versions)
+        
+        # Nothing left to repair
+        call_command('backfill_normalized_totals', stdout=io.StringIO())
+        performance.refresh_from_db()
+        self.assertEqual(performance.attributed_revenue, Decimal('84.87'))
@@ -11,10 +11,7 @@ urlpatterns = [
     # Webhooks
     path('webhooks/orders/', views.shopify_order_webhook, name='order_webhook'),
     
-    # Attribution analytics
-    path('analytics/<int:campaign_id>/', views.attribution_analytics, name='analytics'),
+    # Spend entry and platform report imports
     path('spend/<int:campaign_id>/', views.manual_spend_entry, name='manual_spend'),
-    
-    # First-party tracking
-    path('api/track/', views.track_conversion_api, name='track_conversion'),
-]
\ No newline at end of file
+    path('spend/import/', views.spend_import_upload, name='spend_import'),
+]
@@ -1,9 +1,14 @@
 # shopify_integration/views.py - Webhook handling and attribution
 
+import base64
 import json
 import hmac
 import hashlib
+import logging
+from django.db.models import Q
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.contrib.auth.decorators import login_required
 from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
@@ -11,10 +16,18 @@ from django.conf import settings
 from django.utils import timezone
 from urllib.parse import urlparse, parse_qs
 from datetime import datetime
+from decimal import Decimal, InvalidOperation
 
 from accounts.models import Brand, Agency
-from campaigns.models import Campaign, CampaignPerformance
-from .models import ShopifyOrder
+from campaigns.models import Campaign, CampaignPerformance, ShopifyOrder
+from campaigns.rollups import apply_order, apply_spend
+from campaigns.anomalies import observe_order
+from campaigns.fx import normalize_order_total
+from campaigns.live import publish_order, publish_performance
+from campaigns.notifications import refresh_brand_notifications
+from campaigns.spend_import import SpendImportError, import_spend
+
+logger = logging.getLogger(__name__)
 
 @csrf_exempt
 @require_POST
@@ -35,9 +48,19 @@ def shopify_order_webhook(request):
         # Process attribution
         shopify_order = process_order_attribution(order_data, brand)
         
+        # Keep brand/agency daily rollups and the hourly anomaly baselines current
+        apply_order(shopify_order)
+        observe_order(shopify_order)
+        
         # Update campaign performance if attributed
         if shopify_order.is_attributed and shopify_order.campaign:
-            update_campaign_performance(shopify_order.campaign, shopify_order)
+            performance = update_campaign_performance(shopify_order.campaign, shopify_order)
+            
+            # Push to connected live dashboards
+            publish_order(shopify_order)
+            publish_performance(shopify_order.campaign, performance)
+        
+        refresh_brand_notifications(brand.id)
         
         return HttpResponse('OK')
         
@@ -56,11 +79,12 @@ def verify_shopify_webhook(request):
         return False
     
     webhook_secret = settings.SHOPIFY_WEBHOOK_SECRET
-    computed_signature = hmac.new(
+    # Shopify sends the base64-encoded digest
+    computed_signature = base64.b64encode(hmac.new(
         webhook_secret.encode('utf-8'),
         request.body,
         hashlib.sha256
-    ).digest()
+    ).digest())
     
     return hmac.compare_digest(signature.encode('utf-8'), computed_signature)
 
@@ -77,7 +101,7 @@ def process_order_attribution(order_data, brand):
     confidence = calculate_attribution_confidence(attribution_data, campaign)
     
     # Create order record
-    shopify_order = ShopifyOrder.objects.create(
+    shopify_order = ShopifyOrder(
         shopify_order_id=order_data['id'],
         order_number=order_data.get('order_number', str(order_data['id'])),
         brand=brand,
@@ -85,7 +109,7 @@ def process_order_attribution(order_data, brand):
         agency=agency,
         
         # Order details
-        total_price=float(order_data['total_price']),
+        total_price=Decimal(str(order_data['total_price'])),
         currency=order_data.get('currency', 'DKK'),
         customer_email=order_data.get('email', ''),
         
@@ -109,6 +133,16 @@ def process_order_attribution(order_data, brand):
         order_created_at=datetime.fromisoformat(order_data['created_at'].replace('Z', '+00:00'))
     )
     
+    # Convert once here so every revenue aggregate is a plain SUM
+    shopify_order.normalized_total = normalize_order_total(shopify_order, brand.currency)
+    if shopify_order.normalized_total is None:
+        # Revenue is booked when backfill_normalized_totals finds a rate
+        logger.warning(
+            'No FX rate for %s -> %s (order %s); run load_fx_rates and backfill_normalized_totals',
+            shopify_order.currency, brand.currency, shopify_order.shopify_order_id
+        )
+    shopify_order.save()
+    
     return shopify_order
 
 def extract_attribution_data(order_data):
@@ -262,7 +296,7 @@ def update_campaign_performance(campaign, order):
     )
     
     # Add this order's revenue
-    performance.attributed_revenue += order.total_price
+    performance.attributed_revenue += order.normalized_total or 0
     performance.attributed_orders += 1
     
     # Recalculate metrics
@@ -270,6 +304,82 @@ def update_campaign_performance(campaign, order):
     
     return performance
 
+# CampaignPerformance spend fields are DecimalField(max_digits=12, decimal_places=2)
+MAX_SPEND = Decimal('1e10')
+
+@login_required
+@require_POST
+def manual_spend_entry(request, campaign_id):
+    """Record a day's ad spend for a campaign (agency or brand owner)"""
+    
+    campaign = get_object_or_404(Campaign, id=campaign_id)
+    
+    user = request.user
+    if not (campaign.brand.user_id == user.id or
+            (campaign.selected_agency and campaign.selected_agency.user_id == user.id)):
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    
+    try:
+        date = datetime.strptime(request.POST.get('date', ''), '%Y-%m-%d').date()
+        platform_spend = {
+            field: Decimal(request.POST.get(field) or 0)
+            for field in ('meta_spend', 'google_spend', 'tiktok_spend')
+        }
+    except (ValueError, InvalidOperation):
+        return JsonResponse({'error': 'Invalid date or spend amount'}, status=400)
+    
+    # Decimal() also accepts 'NaN', 'Infinity' and negative amounts
+    amounts = platform_spend.values()
+    if not all(amount.is_finite() and amount >= 0 for amount in amounts) or sum(amounts) >= MAX_SPEND:
+        return JsonResponse({'error': 'Spend amounts must be positive and total below 10,000,000,000'}, status=400)
+    
+    performance, created = CampaignPerformance.objects.get_or_create(campaign=campaign, date=date)
+    previous_spend = performance.total_spend
+    
+    for field, amount in platform_spend.items():
+        setattr(performance, field, amount)
+    performance.total_spend = sum(platform_spend.values())
+    performance.spend_data_source = 'MANUAL'
+    performance.calculate_metrics()
+    
+    apply_spend(campaign, date, performance.total_spend - previous_spend)
+    publish_performance(campaign, performance)
+    refresh_brand_notifications(campaign.brand_id)
+    
+    return JsonResponse({
+        'status': 'saved',
+        'date': date.isoformat(),
+        'total_spend': float(performance.total_spend),
+        'roas': float(performance.roas),
+        'cpa': float(performance.cpa),
+    })
+
+@login_required
+@require_POST
+def spend_import_upload(request):
+    """Import a Meta, Google Ads or TikTok spend export for the user's campaigns"""
+    
+    upload = request.FILES.get('file')
+    if upload is None:
+        return JsonResponse({'error': 'No file uploaded'}, status=400)
+    
+    # Only campaigns the user owns or runs can be matched
+    campaigns = Campaign.objects.filter(Q(brand__user=request.user) | Q(selected_agency__user=request.user))
+    
+    try:
+        result = import_spend(upload.file, request.POST.get('platform', '').upper(), campaigns=campaigns)
+    except (SpendImportError, UnicodeDecodeError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    return JsonResponse({
+        'status': 'imported',
+        'rows': result['rows'],
+        'imported': result['imported'],
+        'days': result['days'],
+        'invalid': result['invalid'],
+        'unmatched': dict(result['unmatched'].most_common(20)),
+    })
+
 # Enhanced Shopify OAuth and connection flow
 def connect_shopify_store(request):
     """Initiate Shopify OAuth for store connection"""
@@ -371,7 +481,7 @@ def setup_shopify_webhooks(brand):
         'Content-Type': 'application/json'
     }
     
-    webhook_url = f"{settings.SITE_URL}/webhooks/shopify/orders/"
+    webhook_url = f"{settings.SITE_URL}{reverse('shopify_integration:order_webhook')}"
     
     # Order creation webhook
     webhook_data = {